@@ -0,0 +1,530 @@
+import time
+import asyncio
+import asyncpg
+from typing import Dict, List, Any, Tuple, Optional
+from connection_pool import pool_key
+from result_cache import is_read_only, is_cacheable, estimate_size, referenced_tables, canonicalize_sql
+from generation_cache import normalize_question
+from instrumentation import trace_query, current_trace, stage, add_duration, add_count
+from generation_stream import read_stream_async
+from db_processors import NLToPostgresProcessor, OperationType
+from routing import Replica
+from config import GENERATION_CONFIG, ASYNC_CONFIG
+
+_ASYNC_POOLS: Dict[Tuple, asyncpg.Pool] = {}
+_ASYNC_POOL_LOCKS: Dict[Tuple, asyncio.Lock] = {}
+_ASYNC_POOL_LOOPS: Dict[Tuple, asyncio.AbstractEventLoop] = {}
+
+async def get_async_pool(connection_params: Dict[str, Any], min_size: int = 1,
+                         max_size: int = 20) -> asyncpg.Pool:
+    """
+    Return the shared asyncpg pool for a connection target on the running event loop.
+
+    asyncpg pools are bound to the loop that created them, so pools are keyed
+    by connection target and loop.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters including
+            host, port, database name, user, and password
+        min_size (int): Connections opened when the pool is created
+        max_size (int): Upper bound on open connections
+
+    Returns:
+        asyncpg.Pool: The shared pool
+    """
+    loop = asyncio.get_running_loop()
+    key = (pool_key(connection_params), id(loop))
+    pool = _ASYNC_POOLS.get(key)
+    if pool is not None and not pool.is_closing():
+        return pool
+
+    lock = _ASYNC_POOL_LOCKS.setdefault(key, asyncio.Lock())
+    async with lock:
+        pool = _ASYNC_POOLS.get(key)
+        if pool is None or pool.is_closing():
+            pool = await asyncpg.create_pool(min_size=min_size, max_size=max_size, **connection_params)
+            _ASYNC_POOLS[key] = pool
+            _ASYNC_POOL_LOOPS[key] = loop
+        return pool
+
+async def close_async_pools() -> None:
+    """
+    Close every asyncpg pool created on the running event loop.
+    """
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _ASYNC_POOLS if key[1] == loop_id]:
+        pool = _ASYNC_POOLS.pop(key)
+        _ASYNC_POOL_LOCKS.pop(key, None)
+        _ASYNC_POOL_LOOPS.pop(key, None)
+        await pool.close()
+
+def release_async_pools(connection_params: List[Dict[str, Any]]) -> None:
+    """
+    Close the asyncpg pools of connection targets on every event loop.
+
+    Each pool is closed on its own loop: directly as a task when that loop is
+    the running one, otherwise scheduled thread-safely. Pools of closed loops
+    are just forgotten.
+
+    Args:
+        connection_params (List[Dict[str, Any]]): Connection parameters of the targets
+    """
+    targets = {pool_key(params) for params in connection_params}
+    for key in [key for key in _ASYNC_POOLS if key[0] in targets]:
+        pool = _ASYNC_POOLS.pop(key)
+        _ASYNC_POOL_LOCKS.pop(key, None)
+        loop = _ASYNC_POOL_LOOPS.pop(key, None)
+        if loop is None or loop.is_closed():
+            continue
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is running:
+            loop.create_task(pool.close())
+        else:
+            asyncio.run_coroutine_threadsafe(pool.close(), loop)
+
+async def _apply_settings(conn: asyncpg.Connection, settings: Dict[str, str]) -> None:
+    """
+    Apply settings to the current transaction in one round trip (like SET LOCAL).
+
+    Args:
+        conn (asyncpg.Connection): Connection inside a transaction
+        settings (Dict[str, str]): Setting names and values
+    """
+    calls = ", ".join(f"set_config(${2 * i + 1}, ${2 * i + 2}, true)" for i in range(len(settings)))
+    args = [str(part) for item in settings.items() for part in item]
+    await conn.execute(f"SELECT {calls}", *args)
+
+class StageTimeoutError(asyncio.TimeoutError):
+    """
+    Raised when a stage of the async pipeline exceeds its timeout.
+
+    Attributes:
+        stage (str): Name of the stage that timed out
+    """
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"{stage} stage timed out after {timeout:.1f}s")
+        self.stage = stage
+
+class AsyncNLToPostgresProcessor(NLToPostgresProcessor):
+    """
+    asyncio-native variant of NLToPostgresProcessor.
+
+    Model calls use the async Vertex AI client (`generate_content_async`) and SQL
+    runs on a shared asyncpg pool, so many questions can be in flight on one
+    event loop. Schema context loading starts as soon as a question arrives and
+    overlaps with acquiring a database connection. Each stage (schema, generation,
+    execution) runs under its own timeout, and cancelling the calling task
+    cancels the in-flight model call or query.
+
+    Schema catalog, prompt building, pruning and both caches are shared with the
+    synchronous processor.
+
+    Attributes:
+        async_config (Dict[str, Any]): Async pool sizes and per-stage timeouts
+
+    Args:
+        connection_params (Dict[str, str]): Database connection parameters including host,
+            port, database name, user, and password
+        table_metadata (Dict[str, str]): Mapping of table names to their descriptions
+        async_config (Optional[Dict[str, Any]]): Async settings; defaults to ASYNC_CONFIG
+        **processor_kwargs: Keyword arguments forwarded to NLToPostgresProcessor
+    """
+
+    def __init__(self, connection_params: Dict[str, str], table_metadata: Dict[str, str],
+                 async_config: Optional[Dict[str, Any]] = None, **processor_kwargs):
+        super().__init__(connection_params, table_metadata, **processor_kwargs)
+        self.async_config = ASYNC_CONFIG if async_config is None else async_config
+
+    def close(self) -> None:
+        """
+        Release everything held for this processor's database, see
+        `NLToPostgresProcessor.close`, including its asyncpg pools.
+        """
+        targets = [self.connection_params]
+        if self.router is not None:
+            targets += [replica.connection_params for replica in self.router.replicas]
+        release_async_pools(targets)
+        super().close()
+
+    async def _stage(self, stage: str, awaitable, timeout: Optional[float]):
+        """
+        Await one pipeline stage under its timeout.
+
+        Args:
+            stage (str): Stage name used in the timeout error
+            awaitable: Coroutine or future implementing the stage
+            timeout (Optional[float]): Seconds allowed; None waits indefinitely
+
+        Returns:
+            Any: The stage result
+
+        Raises:
+            StageTimeoutError: If the stage exceeds its timeout
+        """
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise StageTimeoutError(stage, timeout) from None
+
+    async def _get_async_pool(self, replica: Optional[Replica] = None) -> asyncpg.Pool:
+        """
+        Return the asyncpg pool for this processor's connection target.
+
+        Args:
+            replica (Optional[Replica]): Replica whose pool to return instead of the primary's
+
+        Returns:
+            asyncpg.Pool: The shared pool
+        """
+        return await get_async_pool(
+            self.connection_params if replica is None else replica.connection_params,
+            min_size=self.async_config.get("pool_min_size", 1),
+            max_size=self.async_config.get("pool_max_size", 20)
+        )
+
+    async def _call_model_async(self, prompt: str) -> str:
+        """
+        Call the model without blocking the event loop.
+
+        Uses `generate_content_async` when the model provides it and otherwise
+        runs `generate_content` in a worker thread. With streamed generation the
+        response is read only until its JSON answer is complete, see `_call_model`.
+
+        Args:
+            prompt (str): Full NL2SQL prompt
+
+        Returns:
+            str: Raw response text
+        """
+        config = self.streaming_generation_config
+        streaming = config.get("enabled", True)
+        cancel = config.get("cancel_on_complete", True)
+        generate_async = getattr(self.model, "generate_content_async", None)
+        if generate_async is None:
+            response = await asyncio.to_thread(self._call_model, prompt)
+        elif streaming:
+            response = await read_stream_async(
+                await generate_async(prompt, generation_config=GENERATION_CONFIG, stream=True),
+                cancel=cancel
+            )
+            self._record_stream(response)
+        else:
+            response = await generate_async(prompt, generation_config=GENERATION_CONFIG)
+        self._record_usage(prompt, response)
+        return response.text.strip()
+
+    async def _generate_candidate_async(self, prompt: str) -> Tuple[OperationType, str, bool]:
+        """
+        Make one hedged model call and validate its answer, see `_generate_candidate`.
+
+        Args:
+            prompt (str): Full NL2SQL prompt
+
+        Returns:
+            Tuple[OperationType, str, bool]: Operation type, SQL query and validity
+        """
+        add_count("generation_calls")
+        operation, sql_query = self._extract_query_info(await self._call_model_async(prompt))
+        valid = await asyncio.to_thread(self._is_valid_candidate, operation, sql_query)
+        if not valid:
+            add_count("invalid_candidates")
+        return operation, sql_query, valid
+
+    async def _generate_query_async(self, nl_query: str, fingerprint: Optional[str]) -> Tuple[OperationType, str]:
+        """
+        Generate the operation type and SQL query for a question.
+
+        Concurrent callers asking the same normalized question, from tasks or
+        threads, share one model call.
+
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+            fingerprint (Optional[str]): Schema fingerprint used as generation cache key
+
+        Returns:
+            Tuple[OperationType, str]: The operation type and generated SQL query
+        """
+        if self.generation_cache is None:
+            fingerprint = None
+        if fingerprint is not None:
+            with stage("generation_cache"):
+                cached = self.generation_cache.get(nl_query, fingerprint)
+            if cached is not None:
+                add_count("generation_cache_hits")
+                return OperationType[cached[0]], cached[1]
+
+        if self.generation_flights is None:
+            return await self._generate_uncached_async(nl_query, fingerprint)
+        generated, _ = await self.generation_flights.do_async(
+            (fingerprint, normalize_question(nl_query)),
+            lambda: self._generate_uncached_async(nl_query, fingerprint)
+        )
+        return generated
+
+    async def _generate_uncached_async(self, nl_query: str, fingerprint: Optional[str]) -> Tuple[OperationType, str]:
+        """
+        Call the model for a question missing from the generation cache, see `_generate_query_async`.
+
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+            fingerprint (Optional[str]): Schema fingerprint to cache the result under,
+                None if the generation cache is disabled
+
+        Returns:
+            Tuple[OperationType, str]: The operation type and generated SQL query
+        """
+        prompt = await asyncio.to_thread(self._build_prompt, nl_query)
+        if self.hedger is not None:
+            with stage("generation"):
+                operation, sql_query, _ = await self.hedger.run_async(
+                    lambda: self._generate_candidate_async(prompt),
+                    lambda candidate: candidate[2]
+                )
+        else:
+            with stage("generation"):
+                text = await self._call_model_async(prompt)
+            with stage("parse"):
+                operation, sql_query = self._extract_query_info(text)
+
+        if fingerprint is not None and operation != OperationType.UNKNOWN and sql_query:
+            self.generation_cache.put(nl_query, fingerprint, operation.value, sql_query)
+        return operation, sql_query
+
+    async def _execute_query_async(self, operation: OperationType, sql_query: str,
+                                   pool: asyncpg.Pool,
+                                   settings: Optional[Dict[str, str]] = None,
+                                   replica: Optional[Replica] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Execute the SQL query on the asyncpg pool.
+
+        Mirrors `_execute_query`: READ results go through the result cache,
+        writes run in a transaction and invalidate the cached results of the
+        tables they touch. Guard settings are applied transaction-locally with
+        `set_config`, so throttled READs run in a transaction too. Executions
+        are added to the query template statistics; the SQL itself runs as
+        generated, since asyncpg already prepares and caches statements per
+        connection and binds parameters with strict types. Concurrent executions
+        of the same read-only query share one execution, also with `_execute_query`.
+
+        Args:
+            operation (OperationType): Type of operation being performed
+            sql_query (str): SQL query to execute
+            pool (asyncpg.Pool): Pool to run the query on
+            settings (Optional[Dict[str, str]]): Settings applied to the query's transaction
+            replica (Optional[Replica]): Replica `pool` belongs to, None for the primary
+
+        Returns:
+            Tuple[List[Dict], Optional[str]]: Query results and error message, if any
+        """
+        cache = self.result_cache
+        read_only = operation == OperationType.READ and is_read_only(sql_query)
+        epoch = None
+        if cache is not None and read_only and is_cacheable(sql_query):
+            with stage("result_cache"):
+                cached = cache.get(sql_query)
+            if cached is not None:
+                add_count("result_cache_hits")
+                add_count("rows", len(cached))
+                return cached, None
+            epoch = cache.epoch()
+
+        if not read_only or self.execution_flights is None:
+            return await self._run_query_async(operation, sql_query, pool, settings, replica, epoch)
+
+        key = (canonicalize_sql(sql_query), tuple(sorted(settings.items())) if settings else (),
+               replica.name if replica is not None else None)
+        (results, error), shared = await self.execution_flights.do_async(
+            key, lambda: self._run_query_async(operation, sql_query, pool, settings, replica, epoch)
+        )
+        if shared:
+            add_count("rows", len(results))
+        return results, error
+
+    async def _run_query_async(self, operation: OperationType, sql_query: str, pool: asyncpg.Pool,
+                               settings: Optional[Dict[str, str]], replica: Optional[Replica],
+                               epoch: Optional[int]) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Execute a query that was not served from the result cache, see `_execute_query_async`.
+
+        Args:
+            operation (OperationType): Type of operation being performed
+            sql_query (str): SQL query to execute
+            pool (asyncpg.Pool): Pool to run the query on
+            settings (Optional[Dict[str, str]]): Settings applied to the query's transaction
+            replica (Optional[Replica]): Replica `pool` belongs to, None for the primary
+            epoch (Optional[int]): Result cache epoch read before the lookup, None
+                if the result is not to be cached
+
+        Returns:
+            Tuple[List[Dict], Optional[str]]: Query results and error message, if any
+        """
+        cache = self.result_cache
+        template = None
+        if self.query_templates is not None:
+            with stage("normalize"):
+                template = self.query_templates.normalize(sql_query)
+
+        try:
+            start = time.perf_counter()
+            async with pool.acquire() as conn:
+                add_duration("connection_wait", time.perf_counter() - start)
+                start = time.perf_counter()
+                with stage("execution"):
+                    if operation == OperationType.READ and not settings:
+                        records = await conn.fetch(sql_query)
+                    else:
+                        async with conn.transaction():
+                            if settings:
+                                await _apply_settings(conn, settings)
+                            records = await conn.fetch(sql_query)
+            with stage("materialization"):
+                results = [dict(record) for record in records]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if template is not None:
+                self.query_templates.record(template, time.perf_counter() - start, error=True)
+            return [], str(e)
+
+        if template is not None:
+            self.query_templates.record(template, time.perf_counter() - start, len(results))
+        if self.workload_log is not None:
+            self.workload_log.record(sql_query)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_count("rows", len(results))
+            trace.add_count("bytes", estimate_size(results))
+
+        if not is_read_only(sql_query):
+            if self.router is not None:
+                self.router.record_write()
+            if self.execution_flights is not None:
+                self.execution_flights.forget()
+        if epoch is not None:
+            if self.router is None or self.router.is_current(replica):
+                cache.put(sql_query, results, epoch=epoch)
+        elif cache is not None:
+            cache.invalidate_for_write(sql_query)
+        if operation != OperationType.READ and self.rollups is not None:
+            self.rollups.mark_stale(referenced_tables(sql_query))
+        return results, None
+
+    async def query_db_async(self, nl_query: str, include_timings: bool = False) -> Dict[str, Any]:
+        """
+        Process a natural language query without blocking the event loop.
+
+        Same contract as `query_db`. A stage timeout is reported as an error
+        response naming the stage; cancellation of the calling task propagates.
+
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+            include_timings (bool): Add the per-stage `timings` section to the response
+
+        Returns:
+            Dict[str, Any]: Standardized response, see `query_db`
+
+        Example:
+            >>> processor = AsyncNLToPostgresProcessor(connection_params, table_metadata)
+            >>> results = await asyncio.gather(*(processor.query_db_async(q) for q in questions))
+        """
+        with trace_query(self.instrumentation, include_timings) as trace:
+            response = await self._query_db_async(nl_query)
+            self._record_outcome(response)
+        if include_timings:
+            response["timings"] = trace.timings()
+        return response
+
+    async def _query_db_async(self, nl_query: str) -> Dict[str, Any]:
+        """
+        Run the async pipeline for one question, see `query_db_async`.
+
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+
+        Returns:
+            Dict[str, Any]: Standardized response
+        """
+        config = self.async_config
+        operation, sql_query = OperationType.UNKNOWN, None
+        schema_task = asyncio.ensure_future(asyncio.to_thread(self._get_compiled_context))
+        pool_task = asyncio.ensure_future(self._get_async_pool())
+        try:
+            with stage("schema"):
+                compiled, pool = await self._stage(
+                    "schema",
+                    asyncio.gather(schema_task, pool_task),
+                    config.get("schema_timeout")
+                )
+            operation, sql_query = await self._stage(
+                "generation",
+                self._generate_query_async(nl_query, compiled.fingerprint),
+                config.get("generation_timeout")
+            )
+
+            if operation == OperationType.UNKNOWN or not sql_query:
+                return self._format_response(
+                    operation=OperationType.UNKNOWN,
+                    status="error",
+                    sql_query=sql_query,
+                    message="Failed to determine operation type or generate valid query"
+                )
+
+            decision = None
+            if self.query_guard is not None:
+                decision = await asyncio.to_thread(self._guard, operation, sql_query)
+                if decision.action == "reject":
+                    return self._rejected(operation, decision)
+                sql_query = decision.sql_query
+
+            replica = None
+            if operation == OperationType.READ and self.router is not None:
+                replica = await asyncio.to_thread(self._route_read, sql_query)
+                if replica is not None:
+                    try:
+                        pool = await self._get_async_pool(replica)
+                    except (OSError, asyncpg.PostgresError):
+                        self.router.mark_down(replica)
+                        replica = None
+
+            results, error = await self._stage(
+                "execution",
+                self._execute_query_async(
+                    operation, sql_query, pool,
+                    settings=decision.settings if decision is not None else None,
+                    replica=replica
+                ),
+                config.get("execution_timeout")
+            )
+            if error:
+                response = self._format_response(
+                    operation=operation,
+                    status="error",
+                    sql_query=sql_query,
+                    message=error
+                )
+            else:
+                response = self._format_response(
+                    operation=operation,
+                    status="success",
+                    sql_query=sql_query,
+                    results=results
+                )
+            if decision is not None:
+                response["guard"] = decision.as_dict()
+            return response
+
+        except asyncio.CancelledError:
+            schema_task.cancel()
+            pool_task.cancel()
+            raise
+        except Exception as e:
+            return self._format_response(
+                operation=operation,
+                status="error",
+                sql_query=sql_query,
+                message=str(e)
+            )
@@ -0,0 +1,104 @@
+"""
+Benchmark single-flight coalescing of concurrent identical questions.
+
+Simulates analysts opening the same shared question at once: bursts of
+`--concurrency` threads ask one corpus question simultaneously, for every
+question of data/interesting_queries.sql, through `query_db` with a fake
+model. Caches are disabled so every burst reaches the model and the
+database. Runs with coalescing off and on and reports model calls and
+executed queries per question, and total latency percentiles.
+
+Usage:
+    python -m benchmarks.bench_coalescing --host /tmp/pgdata --database retail
+"""
+import os
+import sys
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import TABLE_METADATA
+from db_processors import NLToPostgresProcessor
+from benchmarks.fake_llm import FakeModel, load_corpus
+from benchmarks.bench_e2e import CORPUS_FILE, summarize
+
+def run_mode(connection_params: Dict[str, Any], corpus: List[Tuple[str, str]],
+             coalescing_config: Dict[str, Any], concurrency: int, llm_latency: float) -> Dict[str, Any]:
+    """
+    Ask every corpus question in a burst of identical concurrent calls.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        corpus (List[Tuple[str, str]]): (question, SQL query) pairs
+        coalescing_config (Dict[str, Any]): Coalescing settings under test
+        concurrency (int): Identical calls per burst
+        llm_latency (float): Fake model latency in seconds
+
+    Returns:
+        Dict[str, Any]: Model calls and executions per question, latency
+            percentiles and failures
+    """
+    model = FakeModel.from_corpus(corpus, latency=llm_latency)
+    processor = NLToPostgresProcessor(
+        connection_params,
+        TABLE_METADATA,
+        generation_cache_config={"enabled": False},
+        result_cache_config={"enabled": False},
+        rollup_config={"enabled": False},
+        model=model,
+        coalescing_config=coalescing_config
+    )
+    latencies: List[float] = []
+    executions, failures = 0, 0
+    with ThreadPoolExecutor(max_workers=concurrency) as workers:
+        for question, _ in corpus:
+            barrier = threading.Barrier(concurrency)
+
+            def ask(_: int) -> Dict[str, Any]:
+                barrier.wait()
+                return processor.query_db(question, include_timings=True)
+
+            for response in workers.map(ask, range(concurrency)):
+                latencies.append(response["timings"]["total_ms"])
+                executions += "execution" in response["timings"]["stages_ms"]
+                failures += response["status"] != "success"
+    return {
+        "model_calls_per_question": round(model.calls / len(corpus), 2),
+        "executions_per_question": round(executions / len(corpus), 2),
+        "total_ms": summarize(latencies),
+        "failed": failures,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("PGDATABASE", "postgres"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--concurrency", type=int, default=8, help="identical calls per burst")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    connection_params = {
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }
+    corpus = load_corpus(CORPUS_FILE)
+    print(f"{len(corpus)} questions, bursts of {args.concurrency} identical calls, "
+          f"{args.llm_latency * 1000:.0f} ms per model call")
+    print(f"{'mode':<12}{'calls/q':>9}{'execs/q':>9}{'total p50':>11}{'total p95':>11}{'failed':>8}")
+    for mode, coalescing_config in (("independent", {"enabled": False}), ("coalesced", {"enabled": True})):
+        report = run_mode(connection_params, corpus, coalescing_config, args.concurrency, args.llm_latency)
+        print(f"{mode:<12}{report['model_calls_per_question']:>9.2f}{report['executions_per_question']:>9.2f}"
+              f"{report['total_ms']['p50']:>11.1f}{report['total_ms']['p95']:>11.1f}{report['failed']:>8}")
+
+if __name__ == "__main__":
+    main()
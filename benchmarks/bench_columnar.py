@@ -0,0 +1,142 @@
+"""
+Benchmark columnar results against the list-of-dicts path on a large Invoice result.
+
+Generates an Invoice-shaped result joined with Stock and Customers columns
+(InvoiceNo, StockCode, InvoiceDate, Quantity, UnitPrice, Country) with
+generate_series, so no data needs to be loaded, and reads it two ways:
+
+- dicts: RealDictCursor batches turned into a list of dicts, then a pandas
+  DataFrame built from it (what `query_db` followed by st.table does)
+- columnar: `execute_columnar` into Arrow columns, then `to_pandas`
+
+Reports the time to a DataFrame, peak Python heap (tracemalloc) and
+the size of the Arrow buffers. Timings are taken in a separate pass without
+tracemalloc.
+
+Usage:
+    python -m benchmarks.bench_columnar --host /tmp/pgdata --database retail --rows 1000000
+"""
+import os
+import gc
+import sys
+import time
+import uuid
+import argparse
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Any, Callable, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from columnar import execute_columnar
+
+INVOICE_QUERY = """
+SELECT ('5' || lpad(g::text, 9, '0'))::varchar(10) AS InvoiceNo,
+       (20000 + g % 4000)::text::varchar(15) AS StockCode,
+       timestamp '2010-12-01 08:00' + (g % 525600) * interval '1 minute' AS InvoiceDate,
+       (g % 48 + 1)::int AS Quantity,
+       ((g % 4000) / 100.0 + 0.5)::numeric(5, 2) AS UnitPrice,
+       ((ARRAY['United Kingdom', 'France', 'Germany', 'EIRE', 'Spain', 'Netherlands',
+               'Belgium', 'Switzerland', 'Portugal', 'Australia'])[g % 10 + 1])::varchar(25) AS Country
+FROM generate_series(1, {rows}) AS g
+"""
+
+def read_dicts(conn, sql_query: str, batch_size: int) -> pd.DataFrame:
+    """
+    Read the result as a list of dicts and build a DataFrame from it.
+
+    Args:
+        conn (psycopg2.extensions.connection): Connection to read on
+        sql_query (str): Query to run
+        batch_size (int): Rows per round trip
+
+    Returns:
+        pd.DataFrame: The result
+    """
+    rows = []
+    with conn.cursor(name=f"bench_{uuid.uuid4().hex}", cursor_factory=RealDictCursor) as cur:
+        cur.itersize = batch_size
+        cur.execute(sql_query)
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            rows.extend(dict(row) for row in batch)
+    return pd.DataFrame(rows)
+
+def read_columnar(conn, sql_query: str, batch_size: int) -> pd.DataFrame:
+    """
+    Read the result into Arrow columns and convert it to a DataFrame.
+
+    Args:
+        conn (psycopg2.extensions.connection): Connection to read on
+        sql_query (str): Query to run
+        batch_size (int): Rows per round trip
+
+    Returns:
+        pd.DataFrame: The result
+    """
+    result = execute_columnar(conn, sql_query, batch_size=batch_size)
+    read_columnar.nbytes = result.nbytes
+    return result.to_pandas()
+
+def measure(conn, reader: Callable, sql_query: str, batch_size: int) -> Tuple[float, int]:
+    """
+    Time a reader, then run it again under tracemalloc for its peak heap.
+
+    Args:
+        conn (psycopg2.extensions.connection): Connection to read on
+        reader (Callable): `read_dicts` or `read_columnar`
+        sql_query (str): Query to run
+        batch_size (int): Rows per round trip
+
+    Returns:
+        Tuple[float, int]: Seconds taken and peak traced bytes
+    """
+    gc.collect()
+    start = time.perf_counter()
+    frame = reader(conn, sql_query, batch_size)
+    elapsed = time.perf_counter() - start
+    conn.rollback()
+    del frame
+
+    gc.collect()
+    tracemalloc.start()
+    frame = reader(conn, sql_query, batch_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    conn.rollback()
+    del frame
+    return elapsed, peak
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("PGDATABASE", "postgres"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(host=args.host, port=args.port, database=args.database,
+                            user=args.user, password=args.password)
+    sql_query = INVOICE_QUERY.format(rows=int(args.rows))
+
+    stats: Dict[str, Any] = {}
+    for name, reader in (("dicts", read_dicts), ("columnar", read_columnar)):
+        stats[name] = measure(conn, reader, sql_query, args.batch_size)
+    conn.close()
+
+    print(f"{args.rows} rows, batch size {args.batch_size}")
+    print(f"{'path':>10}{'seconds':>10}{'peak MB':>10}")
+    for name, (elapsed, peak) in stats.items():
+        print(f"{name:>10}{elapsed:>10.2f}{peak / 2**20:>10.1f}")
+    print(f"Arrow buffers: {read_columnar.nbytes / 2**20:.1f} MB")
+
+if __name__ == "__main__":
+    main()
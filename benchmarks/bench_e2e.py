@@ -0,0 +1,213 @@
+"""
+Offline end-to-end benchmark of NLToPostgresProcessor.query_db.
+
+Replays the commented queries of data/interesting_queries.sql as a question
+corpus through the processor, against a local Postgres fixture and a fake
+model that answers each question with its canned SQL after an artificial
+latency. Reports throughput, total and per-stage latency percentiles,
+database round trips per question and peak RSS.
+
+A run can be saved as a JSON baseline and later runs compared against it: a
+throughput drop or a p50/p95 latency or peak RSS increase beyond
+`--tolerance` (latencies by at least `--min-delta-ms`), more round trips or
+more errors fail the run with exit status 1. Baselines are machine-specific; regenerate one with
+`--save-baseline` when the hardware changes.
+
+Usage:
+    python -m benchmarks.bench_e2e --host /tmp/pgdata --database retail --load-fixture --bulk \\
+        --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_e2e --host /tmp/pgdata --database retail --bulk \\
+        --baseline benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+from pathlib import Path
+from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import TABLE_METADATA
+from db_processors import NLToPostgresProcessor
+from benchmarks.fake_llm import FakeModel, load_corpus
+from benchmarks.fixture import DATA_DIR, CountingConnection, load_fixture, round_trips
+from benchmarks.bench_schema_pruning import percentile
+
+CORPUS_FILE = DATA_DIR / "interesting_queries.sql"
+PERCENTILES = (50, 95, 99)
+COMPARED_PERCENTILES = ("p50", "p95")
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """
+    Compute the reported percentiles of a list of latencies.
+
+    Args:
+        values (List[float]): Latencies in milliseconds
+
+    Returns:
+        Dict[str, float]: p50/p95/p99 in milliseconds
+    """
+    return {f"p{p}": round(percentile(values, p), 3) for p in PERCENTILES}
+
+def run(processor: NLToPostgresProcessor, questions: List[str], concurrency: int) -> Dict[str, Any]:
+    """
+    Run every question through `query_db` and aggregate the measurements.
+
+    Args:
+        processor (NLToPostgresProcessor): Processor under test
+        questions (List[str]): Questions to ask, in order
+        concurrency (int): Worker threads asking questions in parallel
+
+    Returns:
+        Dict[str, Any]: Throughput, latency percentiles, round trips, errors and peak RSS
+    """
+    trips_before = round_trips()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        responses = list(executor.map(lambda q: processor.query_db(q, include_timings=True), questions))
+    elapsed = time.perf_counter() - start
+    trips = round_trips() - trips_before
+
+    totals, stages = [], {}
+    for response in responses:
+        timings = response["timings"]
+        totals.append(timings["total_ms"])
+        for name, ms in timings["stages_ms"].items():
+            stages.setdefault(name, []).append(ms)
+
+    return {
+        "questions": len(questions),
+        "errors": sum(1 for response in responses if response["status"] != "success"),
+        "throughput_qps": round(len(questions) / elapsed, 3),
+        "latency_ms": {
+            "total": summarize(totals),
+            **{name: summarize(values) for name, values in stages.items()},
+        },
+        "round_trips_per_question": round(trips / len(questions), 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            min_delta_ms: float) -> List[str]:
+    """
+    List the regressions of a run against a baseline.
+
+    Args:
+        report (Dict[str, Any]): Current run, see `run`
+        baseline (Dict[str, Any]): Saved run
+        tolerance (float): Allowed relative slowdown, e.g. 0.25 for 25%
+        min_delta_ms (float): Latency increases below this are ignored as noise
+
+    Returns:
+        List[str]: One message per regression, empty if none
+    """
+    regressions = []
+    if report["throughput_qps"] < baseline["throughput_qps"] * (1 - tolerance):
+        regressions.append(f"throughput {report['throughput_qps']} q/s < baseline {baseline['throughput_qps']} q/s")
+    if report["round_trips_per_question"] > baseline["round_trips_per_question"]:
+        regressions.append(f"round trips/question {report['round_trips_per_question']} > "
+                           f"baseline {baseline['round_trips_per_question']}")
+    if report["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak RSS {report['peak_rss_mb']} MB > baseline {baseline['peak_rss_mb']} MB")
+    if report["errors"] > baseline["errors"]:
+        regressions.append(f"errors {report['errors']} > baseline {baseline['errors']}")
+
+    for name, old in baseline["latency_ms"].items():
+        new = report["latency_ms"].get(name)
+        if new is None:
+            continue
+        for key in COMPARED_PERCENTILES:
+            if new[key] > old[key] * (1 + tolerance) and new[key] - old[key] >= min_delta_ms:
+                regressions.append(f"{name} {key} {new[key]:.2f} ms > baseline {old[key]:.2f} ms")
+    return regressions
+
+def print_report(report: Dict[str, Any]) -> None:
+    """
+    Print a run as a table.
+
+    Args:
+        report (Dict[str, Any]): Run, see `run`
+    """
+    print(f"{report['questions']} questions, {report['errors']} errors, "
+          f"{report['throughput_qps']:.1f} q/s, {report['round_trips_per_question']:.2f} round trips/question, "
+          f"peak RSS {report['peak_rss_mb']:.1f} MB")
+    print(f"{'stage':>18}" + "".join(f"{f'p{p} ms':>10}" for p in PERCENTILES))
+    for name, values in report["latency_ms"].items():
+        print(f"{name:>18}" + "".join(f"{values[f'p{p}']:>10.2f}" for p in PERCENTILES))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("PGDATABASE", "postgres"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--load-fixture", action="store_true", help="recreate and load the tables first")
+    parser.add_argument("--bulk", action="store_true", help="use data/bulk_insert_queries.sql data (loaded with --load-fixture)")
+    parser.add_argument("--rounds", type=int, default=20, help="passes over the question corpus")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--with-caches", action="store_true")
+    parser.add_argument("--baseline", type=Path, help="fail on regressions against this JSON report")
+    parser.add_argument("--save-baseline", type=Path, help="write this run as a JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    connection_params = {
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }
+    if args.load_fixture:
+        counts = load_fixture(connection_params, bulk=args.bulk)
+        print("Loaded fixture:", ", ".join(f"{table} {count}" for table, count in counts.items()))
+
+    corpus = load_corpus(CORPUS_FILE)
+    cache_config = None if args.with_caches else {"enabled": False}
+    processor = NLToPostgresProcessor(
+        {**connection_params, "connection_factory": CountingConnection},
+        TABLE_METADATA,
+        generation_cache_config=cache_config,
+        result_cache_config=cache_config,
+        model=FakeModel.from_corpus(corpus, latency=args.llm_latency, jitter=args.llm_jitter)
+    )
+    questions = [question for question, _ in corpus]
+    for question in questions:
+        processor.query_db(question)
+
+    settings = {
+        "corpus": len(corpus),
+        "rounds": args.rounds,
+        "concurrency": args.concurrency,
+        "llm_latency": args.llm_latency,
+        "llm_jitter": args.llm_jitter,
+        "with_caches": args.with_caches,
+        "bulk": args.bulk,
+    }
+    report = {"settings": settings, **run(processor, questions * args.rounds, args.concurrency)}
+    print_report(report)
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("settings") != settings:
+            sys.exit(f"Baseline settings {baseline.get('settings')} differ from this run's {settings}")
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
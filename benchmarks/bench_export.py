@@ -0,0 +1,141 @@
+"""
+Benchmark COPY exports against the list-of-dicts path on a large Invoice result.
+
+Reads the generated Invoice-shaped result of bench_columnar and writes it to
+a file three ways:
+
+- dicts: `_execute_query` into a list of dicts, then written with
+  csv.DictWriter (what a download built on `query_db` would do)
+- copy csv: `export.export_query` streaming `COPY ... TO STDOUT` to CSV
+- copy parquet: the same COPY converted to Parquet row groups
+
+Reports seconds, rows/s, MB/s of result data (the size of the CSV the
+result copies as, so the paths compare on the same bytes), the file size,
+peak Python heap (tracemalloc) and peak Arrow memory. Timings are taken in a
+separate pass without tracemalloc.
+
+Usage:
+    python -m benchmarks.bench_export --host /tmp/pgdata --database retail --rows 1000000
+"""
+import os
+import gc
+import csv
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pyarrow as pa
+from config import TABLE_METADATA, EXPORT_CONFIG
+from db_processors import NLToPostgresProcessor, OperationType
+from export import export_query
+from benchmarks.fake_llm import FakeModel
+from benchmarks.bench_columnar import INVOICE_QUERY
+
+def write_dicts(processor: NLToPostgresProcessor, sql_query: str, path: str) -> int:
+    """
+    Materialize the result as a list of dicts and write it as CSV.
+
+    Args:
+        processor (NLToPostgresProcessor): Processor to execute with
+        sql_query (str): Query to run
+        path (str): File to write
+
+    Returns:
+        int: Rows written
+    """
+    rows, error = processor._execute_query(OperationType.READ, sql_query)
+    if error:
+        raise RuntimeError(error)
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+def measure(run: Callable[[], int]) -> Dict[str, Any]:
+    """
+    Time an export, then run it again under tracemalloc for its peak heap.
+
+    Args:
+        run (Callable[[], int]): Writes the file and returns the rows written
+
+    Returns:
+        Dict[str, Any]: Seconds, rows, peak traced bytes and peak Arrow bytes
+    """
+    gc.collect()
+    start = time.perf_counter()
+    rows = run()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    arrow_pool = pa.default_memory_pool()
+    arrow_start = arrow_pool.bytes_allocated()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": elapsed,
+        "rows": rows,
+        "peak": peak,
+        "arrow_peak": max(0, arrow_pool.max_memory() - arrow_start),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("PGDATABASE", "postgres"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    connection_params = {
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }
+    processor = NLToPostgresProcessor(
+        connection_params,
+        TABLE_METADATA,
+        model=FakeModel(["SELECT 1"]),
+        result_cache_config={"enabled": False},
+        rollup_config={"enabled": False},
+        template_config={"enabled": False},
+        coalescing_config={"enabled": False}
+    )
+    sql_query = INVOICE_QUERY.format(rows=int(args.rows))
+
+    def copy_export(path: str, file_format: str) -> int:
+        with processor.pool.connection() as conn:
+            return export_query(conn, sql_query, path, file_format=file_format, **EXPORT_CONFIG)["rows"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {name: os.path.join(directory, f"{name.replace(' ', '_')}.{name.split()[-1]}")
+                 for name in ("dicts csv", "copy csv", "copy parquet")}
+        stats = {
+            "dicts csv": measure(lambda: write_dicts(processor, sql_query, paths["dicts csv"])),
+            "copy csv": measure(lambda: copy_export(paths["copy csv"], "csv")),
+            "copy parquet": measure(lambda: copy_export(paths["copy parquet"], "parquet")),
+        }
+        sizes = {name: os.path.getsize(path) for name, path in paths.items()}
+    data_mb = sizes["copy csv"] / 2**20
+
+    print(f"{args.rows} rows, {data_mb:.1f} MB as CSV, parquet row groups of {EXPORT_CONFIG['row_group_size']}")
+    print(f"{'path':<14}{'seconds':>9}{'rows/s':>12}{'MB/s':>8}{'file MB':>9}{'peak MB':>9}{'arrow MB':>10}")
+    for name, stat in stats.items():
+        print(f"{name:<14}{stat['seconds']:>9.2f}{stat['rows'] / stat['seconds']:>12,.0f}"
+              f"{data_mb / stat['seconds']:>8.1f}{sizes[name] / 2**20:>9.1f}"
+              f"{stat['peak'] / 2**20:>9.1f}{stat['arrow_peak'] / 2**20:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark hedged generation against single model calls.
+
+Replays the question corpus of data/interesting_queries.sql through
+`query_db` with a fake model whose latency has a slow tail and which
+sometimes answers with SQL that fails to plan. Runs once with hedging off
+and once with HEDGED_GENERATION_CONFIG enabled, after a warm-up pass that
+fills the latency window, and reports:
+
+- time-to-SQL (the `generation` stage) and total latency p50/p99
+- failed questions (invalid SQL reaching execution)
+- model calls per question, i.e. the extra cost of hedging
+
+Usage:
+    python -m benchmarks.bench_hedging --host /tmp/pgdata --database retail
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+from typing import Dict, List, Any, Tuple, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import TABLE_METADATA, HEDGED_GENERATION_CONFIG
+from db_processors import NLToPostgresProcessor
+from benchmarks.fake_llm import FakeModel, load_corpus
+from benchmarks.bench_e2e import CORPUS_FILE
+from benchmarks.bench_schema_pruning import percentile
+
+def run_mode(connection_params: Dict[str, Any], corpus: List[Tuple[str, str]],
+             hedging_config: Dict[str, Any], rounds: int, model_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ask every corpus question `rounds` times with one hedging configuration.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        corpus (List[Tuple[str, str]]): (question, SQL query) pairs
+        hedging_config (Dict[str, Any]): Hedged generation settings under test
+        rounds (int): Measured passes over the corpus
+        model_kwargs (Dict[str, Any]): FakeModel latency tail and invalid answers
+
+    Returns:
+        Dict[str, Any]: Latency percentiles, failures, calls per question and
+            the hedger metrics when hedging is enabled
+    """
+    model = FakeModel.from_corpus(corpus, **model_kwargs)
+    processor = NLToPostgresProcessor(
+        connection_params,
+        TABLE_METADATA,
+        generation_cache_config={"enabled": False},
+        result_cache_config={"enabled": False},
+        rollup_config={"enabled": False},
+        model=model,
+        hedging_config=hedging_config
+    )
+    questions = [question for question, _ in corpus]
+    warm_up = -(-HEDGED_GENERATION_CONFIG["min_samples"] // len(questions))
+    for question in questions * warm_up:
+        processor.query_db(question)
+
+    calls = model.calls
+    to_sql, totals, failures = [], [], 0
+    for question in questions * rounds:
+        response = processor.query_db(question, include_timings=True)
+        to_sql.append(response["timings"]["stages_ms"]["generation"])
+        totals.append(response["timings"]["total_ms"])
+        failures += response["status"] != "success"
+
+    hedger_metrics: Optional[Dict[str, Any]] = processor.hedger.metrics() if processor.hedger else None
+    asked = len(questions) * rounds
+    return {
+        "time_to_sql_ms": {p: round(percentile(to_sql, int(p[1:])), 1) for p in ("p50", "p99")},
+        "total_ms": {p: round(percentile(totals, int(p[1:])), 1) for p in ("p50", "p99")},
+        "failed": failures,
+        "calls_per_question": round((model.calls - calls) / asked, 3),
+        "hedger": hedger_metrics,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("PGDATABASE", "postgres"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--rounds", type=int, default=40, help="measured passes over the question corpus")
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--llm-jitter", type=float, default=0.05)
+    parser.add_argument("--tail-probability", type=float, default=0.05)
+    parser.add_argument("--tail-latency", type=float, default=1.0)
+    parser.add_argument("--invalid-rate", type=float, default=0.03)
+    parser.add_argument("--max-attempts", type=int, default=HEDGED_GENERATION_CONFIG["max_attempts"])
+    parser.add_argument("--percentile", type=float, default=HEDGED_GENERATION_CONFIG["deadline_percentile"])
+    parser.add_argument("--budget", type=float, default=HEDGED_GENERATION_CONFIG["extra_call_budget"],
+                        help="extra calls allowed per question")
+    args = parser.parse_args()
+
+    connection_params = {
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }
+    corpus = load_corpus(CORPUS_FILE)
+    model_kwargs = {
+        "latency": args.llm_latency,
+        "jitter": args.llm_jitter,
+        "tail_probability": args.tail_probability,
+        "tail_latency": args.tail_latency,
+        "invalid_rate": args.invalid_rate,
+    }
+    hedged = {
+        **HEDGED_GENERATION_CONFIG,
+        "enabled": True,
+        "max_attempts": args.max_attempts,
+        "deadline_percentile": args.percentile,
+        "extra_call_budget": args.budget,
+    }
+    print(f"{len(corpus)} questions x {args.rounds} rounds, {args.llm_latency * 1000:.0f}"
+          f"+{args.llm_jitter * 1000:.0f} ms per call, {args.tail_probability:.0%} of calls "
+          f"+{args.tail_latency * 1000:.0f} ms, {args.invalid_rate:.0%} invalid answers")
+    print(f"{'mode':<10}{'to-SQL p50':>12}{'to-SQL p99':>12}{'total p50':>12}{'total p99':>12}"
+          f"{'failed':>8}{'calls/q':>9}")
+    for mode, hedging_config in (("single", {"enabled": False}), ("hedged", hedged)):
+        report = run_mode(connection_params, corpus, hedging_config, args.rounds, model_kwargs)
+        print(f"{mode:<10}{report['time_to_sql_ms']['p50']:>12.1f}{report['time_to_sql_ms']['p99']:>12.1f}"
+              f"{report['total_ms']['p50']:>12.1f}{report['total_ms']['p99']:>12.1f}"
+              f"{report['failed']:>8}{report['calls_per_question']:>9.3f}")
+        if report["hedger"]:
+            metrics = report["hedger"]
+            print(f"          deadline {metrics['deadline_ms']:.0f} ms, {metrics['hedges']} hedges, "
+                  f"{metrics['retries']} retries, {metrics['hedge_wins']} won by an extra call, "
+                  f"{metrics['budget_denied']} denied by the budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark partition pruning on date-filtered questions over a generated dataset.
+
+data/interesting_queries.sql has no date filter, so its questions are asked
+here restricted to a month, a quarter or a date range, plus one unfiltered
+question as a control. Each query runs against two databases filled by
+datagen.py with the same scale and seed, one plain and one with --partitioned,
+and reports the median latency and how many Invoice partitions the plan
+scans (after planning-time pruning).
+
+Usage:
+    python datagen.py --scale 100 --database retail_sf100
+    python datagen.py --scale 100 --database retail_sf100_part --partitioned
+    python -m benchmarks.bench_partitioning --host /tmp/pgdata \\
+        --database retail_sf100 --partitioned-database retail_sf100_part
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import psycopg2
+
+DATE_QUESTIONS: List[Tuple[str, str]] = [
+    ("Total sales for each product in November 2011",
+     "SELECT s.StockCode, s.Description, SUM(i.Quantity * s.UnitPrice) AS TotalSales "
+     "FROM Stock s JOIN Invoice i ON s.StockCode = i.StockCode "
+     "WHERE i.InvoiceDate >= '2011-11-01' AND i.InvoiceDate < '2011-12-01' "
+     "GROUP BY s.StockCode, s.Description ORDER BY TotalSales DESC LIMIT 10"),
+    ("Most popular products in the first quarter of 2011",
+     "SELECT s.StockCode, s.Description, SUM(i.Quantity) AS TotalQuantitySold "
+     "FROM Stock s JOIN Invoice i ON s.StockCode = i.StockCode "
+     "WHERE i.InvoiceDate >= '2011-01-01' AND i.InvoiceDate < '2011-04-01' "
+     "GROUP BY s.StockCode, s.Description ORDER BY TotalQuantitySold DESC LIMIT 10"),
+    ("Purchases of United Kingdom customers in the last week of September 2011",
+     "SELECT c.CustomerID, i.InvoiceNo, i.StockCode, i.Quantity, i.InvoiceDate "
+     "FROM Customers c JOIN Invoice i ON c.InvoiceNo = i.InvoiceNo "
+     "WHERE c.Country = 'United Kingdom' AND i.InvoiceDate BETWEEN '2011-09-24' AND '2011-09-30 23:59' "
+     "ORDER BY i.InvoiceDate DESC"),
+    ("Customers who bought the most popular product in December 2010",
+     "SELECT DISTINCT c.CustomerID, c.Country, c.InvoiceNo FROM Customers c "
+     "JOIN Invoice i ON c.InvoiceNo = i.InvoiceNo "
+     "WHERE i.StockCode = '10002' AND i.InvoiceDate < '2011-01-01' ORDER BY c.CustomerID"),
+    ("Products not sold since October 2011",
+     "SELECT s.StockCode, s.Description FROM Stock s LEFT JOIN Invoice i "
+     "ON s.StockCode = i.StockCode AND i.InvoiceDate >= '2011-10-01' WHERE i.InvoiceNo IS NULL"),
+    ("Invoice lines per month (unfiltered control)",
+     "SELECT date_trunc('month', InvoiceDate) AS Month, count(*) AS Lines "
+     "FROM Invoice GROUP BY 1 ORDER BY 1"),
+]
+
+def scanned_partitions(plan: Dict[str, Any]) -> int:
+    """
+    Count the Invoice partitions scanned by a plan.
+
+    Args:
+        plan (Dict[str, Any]): Plan node of EXPLAIN (FORMAT JSON)
+
+    Returns:
+        int: Scans of relations named invoice_*
+    """
+    own = plan.get("Relation Name", "").startswith("invoice_")
+    return own + sum(scanned_partitions(child) for child in plan.get("Plans", []))
+
+def measure(conn, sql_query: str, repeats: int) -> Dict[str, Any]:
+    """
+    Run a query `repeats` times and plan it once.
+
+    Args:
+        conn (psycopg2.extensions.connection): Connection to run on
+        sql_query (str): Query to run
+        repeats (int): Timed executions
+
+    Returns:
+        Dict[str, Any]: Median milliseconds, rows returned and partitions scanned
+    """
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql_query)
+        plan = cur.fetchone()[0]
+        plan = plan[0]["Plan"] if isinstance(plan, list) else json.loads(plan)[0]["Plan"]
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            cur.execute(sql_query)
+            rows = len(cur.fetchall())
+            timings.append((time.perf_counter() - start) * 1000)
+    conn.rollback()
+    return {"ms": statistics.median(timings), "rows": rows, "partitions": scanned_partitions(plan)}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", required=True, help="database generated without --partitioned")
+    parser.add_argument("--partitioned-database", required=True, help="database generated with --partitioned")
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    connections = {
+        layout: psycopg2.connect(host=args.host, port=args.port, database=database,
+                                 user=args.user, password=args.password)
+        for layout, database in (("plain", args.database), ("partitioned", args.partitioned_database))
+    }
+    with connections["plain"].cursor() as cur:
+        cur.execute("SELECT count(*) FROM Invoice")
+        invoices = cur.fetchone()[0]
+    connections["plain"].rollback()
+
+    print(f"{invoices} invoices, median of {args.repeats} runs")
+    print(f"{'question':<74}{'rows':>8}{'plain ms':>10}{'part. ms':>10}{'speedup':>9}{'partitions':>12}")
+    for question, sql_query in DATE_QUESTIONS:
+        plain = measure(connections["plain"], sql_query, args.repeats)
+        partitioned = measure(connections["partitioned"], sql_query, args.repeats)
+        if plain["rows"] != partitioned["rows"]:
+            print(f"  row counts differ for {question!r}: {plain['rows']} vs {partitioned['rows']}")
+        print(f"{question:<74}{plain['rows']:>8}{plain['ms']:>10.1f}{partitioned['ms']:>10.1f}"
+              f"{plain['ms'] / partitioned['ms']:>8.1f}x{partitioned['partitions']:>12}")
+    for conn in connections.values():
+        conn.close()
+
+if __name__ == "__main__":
+    main()
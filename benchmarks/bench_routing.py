@@ -0,0 +1,183 @@
+"""
+Benchmark read/write routing between a primary and its replicas.
+
+Worker threads play analyst sessions running the analytic queries of
+data/interesting_queries.sql. Some of them also write: before each pass
+they insert a row tagged with their session and immediately count their
+own rows, a read-your-writes follow-up that must see the write. The mix
+runs once against the primary only and once with the replicas, and reports:
+
+- throughput and READ latency p50/p95
+- READs served per target and why READs stayed on the primary
+- read-your-writes violations (a session not seeing its own write)
+
+Replicas are given with --replica (repeatable), e.g. a local standby set up
+with `pg_basebackup -R`. Without one, --simulate-lag uses the primary as a
+stand-in replica whose lag is reported as the given number of seconds.
+
+Usage:
+    python -m benchmarks.bench_routing --host /tmp/pgdata --database retail \\
+        --replica /tmp/pgreplica:5433
+    python -m benchmarks.bench_routing --host /tmp/pgdata --database retail --simulate-lag 0.5
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import psycopg2
+from config import TABLE_METADATA, REPLICA_ROUTING_CONFIG
+from db_processors import NLToPostgresProcessor, OperationType
+from routing import routing_session
+from benchmarks.fake_llm import FakeModel, load_corpus
+from benchmarks.bench_e2e import CORPUS_FILE, summarize
+
+SCRATCH_TABLE = "routing_bench_writes"
+
+def run_mode(connection_params: Dict[str, Any], replica_params: List[Dict[str, Any]],
+             routing_config: Dict[str, Any], queries: List[str], sessions: int,
+             writers: int, rounds: int) -> Dict[str, Any]:
+    """
+    Run the session mix against one routing setup.
+
+    Args:
+        connection_params (Dict[str, Any]): Connection parameters of the primary
+        replica_params (List[Dict[str, Any]]): Replicas, empty for the primary only
+        routing_config (Dict[str, Any]): Replica routing settings
+        queries (List[str]): Analytic READ queries of every pass
+        sessions (int): Concurrent sessions
+        writers (int): Sessions that write before every pass
+        rounds (int): Passes over `queries` per session
+
+    Returns:
+        Dict[str, Any]: Throughput, READ latency percentiles, violations and
+            the router metrics
+    """
+    processor = NLToPostgresProcessor(
+        connection_params,
+        TABLE_METADATA,
+        model=FakeModel(["SELECT 1"]),
+        generation_cache_config={"enabled": False},
+        result_cache_config={"enabled": False},
+        rollup_config={"enabled": False},
+        template_config={"enabled": False},
+        replica_params=replica_params,
+        routing_config=routing_config
+    )
+    latencies: List[float] = []
+    violations = 0
+    lock = threading.Lock()
+
+    def session(index: int) -> None:
+        nonlocal violations
+        name = f"s{os.getpid()}_{id(processor)}_{index}"
+        with routing_session(name):
+            for written in range(1, rounds + 1):
+                seen = written
+                if index < writers:
+                    processor._respond(OperationType.INSERT,
+                                       f"INSERT INTO {SCRATCH_TABLE} (session) VALUES ('{name}')")
+                    own = processor._respond(OperationType.READ,
+                                             f"SELECT count(*) AS n FROM {SCRATCH_TABLE} WHERE session = '{name}'")
+                    seen = own["results"][0]["n"] if own["status"] == "success" else -1
+                timings = []
+                for sql_query in queries:
+                    start = time.perf_counter()
+                    processor._respond(OperationType.READ, sql_query)
+                    timings.append((time.perf_counter() - start) * 1000)
+                with lock:
+                    violations += seen != written
+                    latencies.extend(timings)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as workers:
+        list(workers.map(session, range(sessions)))
+    elapsed = time.perf_counter() - start
+    return {
+        "reads_per_second": round(len(latencies) / elapsed, 1),
+        "read_ms": summarize(latencies),
+        "violations": violations,
+        "router": processor.router.metrics() if processor.router is not None else None,
+    }
+
+def parse_target(target: str, base: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build replica connection parameters from "host[:port]".
+
+    Args:
+        target (str): Replica host, optionally with a port
+        base (Dict[str, Any]): Connection parameters of the primary
+
+    Returns:
+        Dict[str, Any]: Connection parameters of the replica
+    """
+    host, _, port = target.partition(":")
+    return {**base, "host": host, "port": int(port or 5432)}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("PGDATABASE", "postgres"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--replica", action="append", default=[], help="replica as host[:port]")
+    parser.add_argument("--simulate-lag", type=float, default=None,
+                        help="use the primary as a replica reporting this lag in seconds")
+    parser.add_argument("--max-lag", type=float, default=REPLICA_ROUTING_CONFIG["max_lag"])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2, help="sessions that also write")
+    parser.add_argument("--rounds", type=int, default=5, help="passes over the queries per session")
+    args = parser.parse_args()
+
+    connection_params = {
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }
+    routing_config: Dict[str, Any] = {**REPLICA_ROUTING_CONFIG, "max_lag": args.max_lag}
+    routing_config.pop("enabled")
+    replica_params = [parse_target(target, connection_params) for target in args.replica]
+    if args.simulate_lag is not None:
+        # A distinct application_name gives the stand-in replica its own pool.
+        replica_params.append({**connection_params, "application_name": "simulated_replica"})
+        lag: Optional[float] = args.simulate_lag
+        routing_config["lag_probe"] = lambda params: lag if "application_name" in params else None
+    if not replica_params:
+        parser.error("give --replica or --simulate-lag")
+
+    queries = [sql_query for _, sql_query in load_corpus(CORPUS_FILE)]
+    with psycopg2.connect(**{k: v for k, v in connection_params.items() if v is not None}) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {SCRATCH_TABLE} (id serial PRIMARY KEY, session text)")
+    # Let the replicas replay the new table before reading from them.
+    time.sleep(1.0)
+
+    try:
+        print(f"{args.sessions} sessions ({args.writers} writing) x {args.rounds} passes over {len(queries)} "
+              f"analytic READs, {len(replica_params)} replica(s), max lag {args.max_lag:.1f}s")
+        print(f"{'mode':<10}{'reads/s':>10}{'read p50':>10}{'read p95':>10}{'on replica':>12}"
+              f"{'pinned':>8}{'lagging':>9}{'RYW violations':>16}")
+        for mode, replicas in (("primary", []), ("replicas", replica_params)):
+            report = run_mode(connection_params, replicas, routing_config, queries,
+                              args.sessions, args.writers, args.rounds)
+            router = report["router"] or {}
+            print(f"{mode:<10}{report['reads_per_second']:>10.1f}{report['read_ms']['p50']:>10.1f}"
+                  f"{report['read_ms']['p95']:>10.1f}{router.get('replica_reads', 0):>12}"
+                  f"{router.get('pinned_reads', 0):>8}{router.get('skipped_lagging', 0):>9}"
+                  f"{report['violations']:>16}")
+    finally:
+        with psycopg2.connect(**{k: v for k, v in connection_params.items() if v is not None}) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+
+if __name__ == "__main__":
+    main()
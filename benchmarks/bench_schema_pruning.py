@@ -0,0 +1,188 @@
+"""
+Benchmark schema-relevance pruning on a synthetic 500-table schema.
+
+Compares prompt size and end-to-end latency of building the NL2SQL prompt with
+the full schema context against the pruned context. LLM latency is modeled as
+`--base-ms + --per-token-ms * prompt_tokens` so the benchmark runs offline;
+context building and table retrieval are measured.
+
+Usage:
+    python -m benchmarks.bench_schema_pruning [--tables 500] [--top-k 5]
+"""
+import sys
+import time
+import random
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from schema_context import compile_context
+from schema_retrieval import SchemaIndex, estimate_tokens
+
+SUBJECTS = [
+    "customer", "order", "invoice", "product", "shipment", "supplier", "payment",
+    "employee", "warehouse", "refund", "campaign", "coupon", "review", "category",
+    "store", "region", "carrier", "subscription", "ticket", "inventory",
+]
+QUALIFIERS = [
+    "detail", "history", "audit", "summary", "archive", "snapshot", "event",
+    "log", "line", "status", "note", "rating", "address", "contact", "price",
+    "schedule", "batch", "allocation", "forecast", "adjustment", "transfer",
+    "return", "tax", "discount", "fee",
+]
+ATTRIBUTES = [
+    "name", "amount", "quantity", "created_at", "updated_at", "country", "city",
+    "email", "phone", "status", "currency", "total", "weight", "score", "code",
+    "description", "start_date", "end_date", "channel", "priority",
+]
+
+def build_schema(table_count: int, seed: int) -> Tuple[Dict[str, str], Dict[str, List[Dict[str, Any]]]]:
+    """
+    Generate table metadata and column information for a synthetic schema.
+
+    Args:
+        table_count (int): Number of tables to generate
+        seed (int): Random seed
+
+    Returns:
+        Tuple[Dict[str, str], Dict[str, List[Dict[str, Any]]]]: TABLE_METADATA-style
+            descriptions and schema-catalog-style column lists
+    """
+    rng = random.Random(seed)
+    names = [f"{s}_{q}" for s in SUBJECTS for q in QUALIFIERS][:table_count]
+    while len(names) < table_count:
+        names.append(f"{rng.choice(SUBJECTS)}_{rng.choice(QUALIFIERS)}_{len(names)}")
+
+    metadata, schemas = {}, {}
+    for index, name in enumerate(names):
+        subject, qualifier = name.split("_")[:2]
+        metadata[name] = f"Stores {qualifier} records for each {subject}"
+        columns = [{
+            "name": f"{subject}_{qualifier}_id",
+            "type": "integer",
+            "description": f"Primary key of the {subject} {qualifier}",
+            "nullable": "NO",
+            "default": None,
+        }]
+        for attribute in rng.sample(ATTRIBUTES, 8):
+            columns.append({
+                "name": attribute,
+                "type": rng.choice(["integer", "numeric(10,2)", "character varying(40)", "timestamp"]),
+                "description": f"{attribute.replace('_', ' ').capitalize()} of the {subject} {qualifier}",
+                "nullable": "YES",
+                "default": None,
+            })
+        if index:
+            target = names[rng.randrange(index)]
+            target_subject, target_qualifier = target.split("_")[:2]
+            columns.append({
+                "name": f"{target_subject}_{target_qualifier}_id",
+                "type": "integer",
+                "description": "No description available",
+                "nullable": "YES",
+                "default": None,
+                "foreign_key": {
+                    "references_table": target,
+                    "references_column": f"{target_subject}_{target_qualifier}_id",
+                },
+            })
+        schemas[name] = columns
+    return metadata, schemas
+
+def build_questions(metadata: Dict[str, str], count: int, seed: int) -> List[str]:
+    """
+    Generate analyst-style questions that each target one table.
+
+    Args:
+        metadata (Dict[str, str]): Synthetic table metadata
+        count (int): Number of questions
+        seed (int): Random seed
+
+    Returns:
+        List[str]: Questions
+    """
+    rng = random.Random(seed)
+    templates = [
+        "Show the total amount of {subject} {qualifier} by country",
+        "How many {subject} {qualifier} records were created last month?",
+        "List the top 10 {subject} {qualifier} entries by quantity",
+        "What is the average score per {subject} in the {qualifier} table?",
+    ]
+    questions = []
+    for name in rng.sample(list(metadata), count):
+        subject, qualifier = name.split("_")[:2]
+        questions.append(rng.choice(templates).format(subject=subject, qualifier=qualifier))
+    return questions
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile.
+
+    Args:
+        values (List[float]): Samples
+        pct (float): Percentile in [0, 100]
+
+    Returns:
+        float: The percentile value
+    """
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=6000)
+    parser.add_argument("--base-ms", type=float, default=400.0, help="Modeled fixed LLM latency")
+    parser.add_argument("--per-token-ms", type=float, default=0.02, help="Modeled LLM latency per prompt token")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    metadata, schemas = build_schema(args.tables, args.seed)
+    questions = build_questions(metadata, min(args.questions, args.tables), args.seed)
+
+    start = time.perf_counter()
+    compiled = compile_context(metadata, schemas, version=1)
+    compile_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    index = SchemaIndex(metadata, schemas)
+    index_ms = (time.perf_counter() - start) * 1000
+
+    results = {"full": {"tokens": [], "build_ms": [], "total_ms": []},
+               "pruned": {"tokens": [], "build_ms": [], "total_ms": [], "tables": []}}
+    for question in questions:
+        start = time.perf_counter()
+        context = compiled.render()
+        build_ms = (time.perf_counter() - start) * 1000
+        tokens = estimate_tokens(context) + estimate_tokens(question)
+        results["full"]["tokens"].append(tokens)
+        results["full"]["build_ms"].append(build_ms)
+        results["full"]["total_ms"].append(build_ms + args.base_ms + args.per_token_ms * tokens)
+
+        start = time.perf_counter()
+        tables = index.select_tables(question, compiled, top_k=args.top_k, max_tokens=args.max_tokens)
+        context = compiled.render(tables)
+        build_ms = (time.perf_counter() - start) * 1000
+        tokens = estimate_tokens(context) + estimate_tokens(question)
+        results["pruned"]["tokens"].append(tokens)
+        results["pruned"]["build_ms"].append(build_ms)
+        results["pruned"]["total_ms"].append(build_ms + args.base_ms + args.per_token_ms * tokens)
+        results["pruned"]["tables"].append(len(tables))
+
+    print(f"Schema: {args.tables} tables, {len(questions)} questions")
+    print(f"One-off: compile context {compile_ms:.1f} ms, build index {index_ms:.1f} ms")
+    print(f"{'mode':<8}{'tokens p50':>12}{'tokens max':>12}{'build p50 ms':>14}"
+          f"{'e2e p50 ms':>12}{'e2e p99 ms':>12}")
+    for mode, data in results.items():
+        print(f"{mode:<8}{statistics.median(data['tokens']):>12.0f}{max(data['tokens']):>12}"
+              f"{statistics.median(data['build_ms']):>14.3f}"
+              f"{percentile(data['total_ms'], 50):>12.1f}{percentile(data['total_ms'], 99):>12.1f}")
+    print(f"Pruned prompts kept {statistics.mean(results['pruned']['tables']):.1f} tables on average")
+
+if __name__ == "__main__":
+    main()
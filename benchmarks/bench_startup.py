@@ -0,0 +1,188 @@
+"""
+Benchmark the start-up cost of the Streamlit front end.
+
+Two measurements, each in fresh interpreter processes:
+
+- import time: `python -X importtime` of the modules main.py and the pages
+  load, reported as the cumulative milliseconds of each requested module
+  plus its heaviest dependency
+- first request: a cold process imports the pages the way main.py does,
+  gets the shared processor and answers one question, then a rerun asks
+  again through the same processor, as Streamlit does on every interaction
+
+The question is answered by FakeModel so no Vertex AI project is needed.
+With --vertex-model the processor still builds its Vertex AI model first
+(PROJECT_ID and MODEL_NAME must be set, no request is sent), so the cost of
+importing the SDK on first use is included.
+
+Usage:
+    python -m benchmarks.bench_startup --host /tmp/pgdata --database retail
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+IMPORT_TARGETS = [
+    ["config"],
+    ["db_processors"],
+    ["pages.login"],
+    ["pages.signup"],
+    ["pages.query_page"],
+    ["pages.login", "pages.signup", "pages.query_page"],
+]
+
+def child_env() -> Dict[str, str]:
+    """
+    Return the environment for child interpreters, with the repository importable.
+
+    Returns:
+        Dict[str, str]: Environment variables
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    return env
+
+def parse_importtime(output: str, modules: List[str]) -> Tuple[float, str, float]:
+    """
+    Read the cost of importing `modules` from `-X importtime` output.
+
+    Args:
+        output (str): stderr of `python -X importtime -c "import ..."`
+        modules (List[str]): Modules imported by the command
+
+    Returns:
+        Tuple[float, str, float]: Cumulative milliseconds of the requested
+            modules, and the name and cumulative milliseconds of the heaviest
+            module they imported
+    """
+    total, heaviest = 0.0, ("", 0.0)
+    children: List[Tuple[str, float]] = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        ms = int(cumulative) / 1000
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), ms))
+        elif depth == 0:
+            # Output is in post-order: a module's direct imports come before it.
+            if name.strip() in modules:
+                total += ms
+                heaviest = max(children + [heaviest], key=lambda child: child[1])
+            children = []
+    return total, heaviest[0], heaviest[1]
+
+def import_time(modules: List[str], repeats: int) -> Tuple[float, str, float]:
+    """
+    Measure the import time of `modules` in fresh interpreters.
+
+    Args:
+        modules (List[str]): Modules to import together
+        repeats (int): Processes to run; the fastest is kept
+
+    Returns:
+        Tuple[float, str, float]: See `parse_importtime`
+    """
+    runs = []
+    for _ in range(repeats):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+            capture_output=True, text=True, env=child_env(), cwd=ROOT, check=True
+        )
+        runs.append(parse_importtime(completed.stderr, modules))
+    return min(runs)
+
+def first_request(connection_params: Dict[str, Any], vertex_model: bool) -> Dict[str, Any]:
+    """
+    Time a cold process from importing the pages to its first answer.
+
+    Runs inside the child process started by `main`.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        vertex_model (bool): Build the Vertex AI model before swapping in FakeModel
+
+    Returns:
+        Dict[str, Any]: Milliseconds per phase and the status of the answer
+    """
+    timings = {}
+    start = time.perf_counter()
+    import pages.login, pages.signup, pages.query_page
+    timings["import_pages_ms"] = (time.perf_counter() - start) * 1000
+
+    from config import TABLE_METADATA
+    from db_processors import get_processor
+    from benchmarks.fake_llm import FakeModel, load_corpus
+    from benchmarks.bench_e2e import CORPUS_FILE
+    corpus = load_corpus(CORPUS_FILE)
+    model = FakeModel.from_corpus(corpus)
+
+    start = time.perf_counter()
+    processor = get_processor(connection_params, TABLE_METADATA, model=None if vertex_model else model)
+    timings["processor_ms"] = (time.perf_counter() - start) * 1000
+    processor.model = model
+
+    start = time.perf_counter()
+    response = processor.query_db(corpus[0][0])
+    timings["first_query_ms"] = (time.perf_counter() - start) * 1000
+    timings["first_request_ms"] = sum(timings.values())
+
+    start = time.perf_counter()
+    get_processor(connection_params, TABLE_METADATA).query_db(corpus[1][0])
+    timings["rerun_query_ms"] = (time.perf_counter() - start) * 1000
+    timings["status"] = response["status"]
+    return timings
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("PGDATABASE", "postgres"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--repeats", type=int, default=3, help="fresh processes per measurement")
+    parser.add_argument("--vertex-model", action="store_true",
+                        help="build the Vertex AI model on first request (no request is sent)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    connection_params = {
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }
+    if args.child:
+        print(json.dumps(first_request(connection_params, args.vertex_model)))
+        return
+
+    print(f"{'imported modules':<52}{'import ms':>11}  heaviest dependency")
+    for modules in IMPORT_TARGETS:
+        total, heaviest, heaviest_ms = import_time(modules, args.repeats)
+        print(f"{', '.join(modules):<52}{total:>11.1f}  {heaviest} ({heaviest_ms:.1f} ms)")
+
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child"] + sys.argv[1:]
+    runs = []
+    for _ in range(args.repeats):
+        completed = subprocess.run(command, capture_output=True, text=True, env=child_env(), cwd=ROOT, check=True)
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    best = min(runs, key=lambda run: run["first_request_ms"])
+    print()
+    print(f"{'import pages':>14}{'processor':>11}{'1st query':>11}{'1st request':>13}{'rerun query':>13}  status")
+    print(f"{best['import_pages_ms']:>14.1f}{best['processor_ms']:>11.1f}{best['first_query_ms']:>11.1f}"
+          f"{best['first_request_ms']:>13.1f}{best['rerun_query_ms']:>13.1f}  {best['status']}")
+
+if __name__ == "__main__":
+    main()
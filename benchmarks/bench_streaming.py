@@ -0,0 +1,141 @@
+"""
+Benchmark streamed generation against the blocking model call.
+
+Replays the question corpus of data/interesting_queries.sql, plus questions
+whose SQL contains braces and escaped quotes, through `query_db` with a fake
+model that paces its output per token and follows the JSON answer with an
+explanation, the way Gemini usually answers NL2SQL_PROMPT. Three modes are
+compared:
+
+- blocking: `generate_content` returns the complete response
+- streaming: the response is streamed and read to the end
+- early-stop: the stream is closed as soon as the JSON answer is complete
+
+Reports time-to-SQL (the `generation` stage) and total latency percentiles,
+output tokens generated per question and failed extractions.
+
+Usage:
+    python -m benchmarks.bench_streaming --host /tmp/pgdata --database retail
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import TABLE_METADATA
+from db_processors import NLToPostgresProcessor
+from benchmarks.fake_llm import FakeModel, load_corpus
+from benchmarks.bench_e2e import CORPUS_FILE, summarize
+
+BRACE_CORPUS = [
+    ("List the stock descriptions that contain a closing brace",
+     "SELECT StockCode, Description FROM stock WHERE Description LIKE '%}%'"),
+    ("Show the countries of customers as a JSON object per customer",
+     "SELECT json_build_object('id', CustomerID, 'country', Country) AS customer FROM customers LIMIT 20"),
+    ("Find stock items described with a double quote character",
+     "SELECT StockCode FROM stock WHERE Description LIKE '%\"%' OR Description ~ '[{}]'"),
+]
+
+TRAILER = """
+
+Explanation:
+The query reads only the columns needed to answer the question and lets
+PostgreSQL do the aggregation, so the result stays small. Joins use the
+foreign keys between invoice, stock and customers, and the ORDER BY returns
+the most relevant rows first. If you need the result for a specific period,
+add a condition on InvoiceDate, which is indexed on most deployments; to
+include returns, remove the filter on positive quantities. Note that
+customer details can be missing for some invoices, in which case an outer
+join keeps those rows.
+"""
+
+MODES = {
+    "blocking": {"enabled": False},
+    "streaming": {"enabled": True, "cancel_on_complete": False},
+    "early-stop": {"enabled": True, "cancel_on_complete": True},
+}
+
+def run_mode(connection_params: Dict[str, Any], corpus: List[Tuple[str, str]],
+             streaming_config: Dict[str, Any], rounds: int, model_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ask every corpus question `rounds` times with one streaming configuration.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        corpus (List[Tuple[str, str]]): (question, SQL query) pairs
+        streaming_config (Dict[str, Any]): Streamed generation settings under test
+        rounds (int): Passes over the corpus
+        model_kwargs (Dict[str, Any]): FakeModel pacing and trailer
+
+    Returns:
+        Dict[str, Any]: Latency percentiles, tokens per question and failures
+    """
+    model = FakeModel.from_corpus(corpus, **model_kwargs)
+    processor = NLToPostgresProcessor(
+        connection_params,
+        TABLE_METADATA,
+        generation_cache_config={"enabled": False},
+        result_cache_config={"enabled": False},
+        rollup_config={"enabled": False},
+        model=model,
+        streaming_generation_config=streaming_config
+    )
+    questions = [question for question, _ in corpus] * rounds
+    expected = dict(corpus)
+    to_sql, totals, failures = [], [], 0
+    for question in questions:
+        response = processor.query_db(question, include_timings=True)
+        timings = response["timings"]
+        to_sql.append(timings["stages_ms"]["generation"])
+        totals.append(timings["total_ms"])
+        if response["sql_query"] != expected[question]:
+            failures += 1
+    return {
+        "time_to_sql_ms": summarize(to_sql),
+        "total_ms": summarize(totals),
+        "tokens_per_question": round(model.tokens_generated / len(questions), 1),
+        "failed_extractions": failures,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("PGDATABASE", "postgres"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the question corpus")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds to the first token")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="seconds per output token")
+    parser.add_argument("--chunk-tokens", type=int, default=8)
+    parser.add_argument("--no-trailer", action="store_true", help="answer with the JSON block only")
+    args = parser.parse_args()
+
+    connection_params = {
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }
+    corpus = load_corpus(CORPUS_FILE) + BRACE_CORPUS
+    model_kwargs = {
+        "latency": args.llm_latency,
+        "token_latency": args.token_latency,
+        "chunk_tokens": args.chunk_tokens,
+        "trailer": "" if args.no_trailer else TRAILER,
+    }
+    print(f"{len(corpus)} questions x {args.rounds} rounds, first token after {args.llm_latency * 1000:.0f} ms, "
+          f"{args.token_latency * 1000:.1f} ms/token, {args.chunk_tokens} tokens/chunk")
+    print(f"{'mode':<12}{'to-SQL p50':>12}{'to-SQL p95':>12}{'total p50':>12}{'tokens/q':>10}{'failed':>8}")
+    for mode, streaming_config in MODES.items():
+        report = run_mode(connection_params, corpus, streaming_config, args.rounds, model_kwargs)
+        print(f"{mode:<12}{report['time_to_sql_ms']['p50']:>12.1f}{report['time_to_sql_ms']['p95']:>12.1f}"
+              f"{report['total_ms']['p50']:>12.1f}{report['tokens_per_question']:>10.1f}"
+              f"{report['failed_extractions']:>8}")
+
+if __name__ == "__main__":
+    main()
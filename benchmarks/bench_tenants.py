@@ -0,0 +1,157 @@
+"""
+Benchmark the tenant registry against one processor per tenant built at startup.
+
+Serves `--requests` questions spread over `--tenants` databases with a Zipf
+popularity (a few hot tenants, a long tail), through:
+
+- eager: a processor per tenant created, connected and compiled at startup
+- lazy: a TenantRegistry loading tenants on first use, evicting the least
+  recently used ones beyond `--max-tenants`
+- lazy + warm-up: the same registry with the `--max-tenants` hottest tenants
+  warmed up at startup
+
+Reports the startup seconds, the latency of each tenant's first request and
+of all requests, tenant loads and evictions, and the peak number of server
+connections held by the tenants (sampled from pg_stat_activity).
+
+Usage:
+    for i in 1 2 3 4 5 6 7 8; do createdb -T retail tenant_$i; done
+    python -m benchmarks.bench_tenants --host /tmp/pgdata --database-prefix tenant_ --tenants 8
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import Dict, List, Any, Callable, ContextManager
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import psycopg2
+from contextlib import nullcontext
+from config import TABLE_METADATA, TENANT_REGISTRY_CONFIG
+from db_processors import NLToPostgresProcessor
+from tenants import TenantRegistry, TenantSpec
+from benchmarks.fake_llm import FakeModel, load_corpus
+from benchmarks.bench_e2e import CORPUS_FILE, summarize
+
+def server_connections(connection_params: Dict[str, Any], prefix: str) -> int:
+    """
+    Count the server connections open to the tenant databases.
+
+    Args:
+        connection_params (Dict[str, Any]): Connection parameters of a monitoring database
+        prefix (str): Name prefix of the tenant databases
+
+    Returns:
+        int: Connections in pg_stat_activity
+    """
+    conn = psycopg2.connect(**connection_params)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM pg_stat_activity WHERE datname LIKE %s", (prefix + "%",))
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+def run(lease: Callable[[str], ContextManager[NLToPostgresProcessor]], workload: List[tuple],
+        monitor: Callable[[], int]) -> Dict[str, Any]:
+    """
+    Serve the workload, one request at a time.
+
+    Args:
+        lease (Callable[[str], ContextManager[NLToPostgresProcessor]]): Gives the processor of a tenant
+        workload (List[tuple]): (tenant id, question) pairs
+        monitor (Callable[[], int]): Returns the server connections currently open
+
+    Returns:
+        Dict[str, Any]: First-request and overall latency percentiles, failures
+            and peak connections
+    """
+    first, latencies, seen = [], [], set()
+    failures, peak = 0, monitor()
+    for n, (tenant_id, question) in enumerate(workload):
+        start = time.perf_counter()
+        with lease(tenant_id) as processor:
+            failures += processor.query_db(question)["status"] != "success"
+        elapsed = (time.perf_counter() - start) * 1000
+        latencies.append(elapsed)
+        if tenant_id not in seen:
+            seen.add(tenant_id)
+            first.append(elapsed)
+        if n % 10 == 0:
+            peak = max(peak, monitor())
+    return {"first_ms": summarize(first), "total_ms": summarize(latencies), "failed": failures,
+            "peak_connections": max(peak, monitor())}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--database-prefix", default="tenant_", help="tenant databases are <prefix>1..<prefix>N")
+    parser.add_argument("--tenants", type=int, default=8)
+    parser.add_argument("--max-tenants", type=int, default=3, help="tenants the registry keeps loaded")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--zipf", type=float, default=1.2, help="exponent of the tenant popularity")
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    server = {"host": args.host, "port": args.port, "user": args.user, "password": args.password}
+    specs = {
+        f"t{i}": TenantSpec({**server, "database": f"{args.database_prefix}{i}"}, TABLE_METADATA)
+        for i in range(1, args.tenants + 1)
+    }
+    corpus = load_corpus(CORPUS_FILE)
+    rng = random.Random(args.seed)
+    tenant_ids = list(specs)
+    weights = [1 / rank ** args.zipf for rank in range(1, len(tenant_ids) + 1)]
+    workload = [(rng.choices(tenant_ids, weights)[0], rng.choice(corpus)[0]) for _ in range(args.requests)]
+    processor_config = {
+        "pool_config": TENANT_REGISTRY_CONFIG["pool_config"],
+        "result_cache_config": TENANT_REGISTRY_CONFIG["result_cache_config"],
+        "rollup_config": {"enabled": False},
+    }
+    monitor = lambda: server_connections({**server, "database": "postgres"}, args.database_prefix)
+
+    print(f"{args.tenants} tenants, {args.requests} requests, zipf {args.zipf}, "
+          f"registry keeps {args.max_tenants} loaded")
+    print(f"{'mode':<16}{'startup s':>10}{'first p50':>11}{'first p95':>11}{'p50':>8}{'p95':>8}"
+          f"{'loads':>7}{'evicted':>9}{'peak conns':>12}{'failed':>8}")
+    for mode in ("eager", "lazy", "lazy + warm-up"):
+        model = FakeModel.from_corpus(corpus, latency=args.llm_latency)
+        start = time.perf_counter()
+        if mode == "eager":
+            processors = {}
+            for tenant_id, spec in specs.items():
+                processors[tenant_id] = NLToPostgresProcessor(spec.connection_params, spec.table_metadata,
+                                                              model=model, **processor_config)
+                processors[tenant_id].pool.prefill()
+                processors[tenant_id]._get_compiled_context()
+            lease = lambda tenant_id: nullcontext(processors[tenant_id])
+        else:
+            registry = TenantRegistry(specs, max_tenants=args.max_tenants, max_connections=10**6,
+                                      idle_timeout=None, model=model, **processor_config)
+            if mode == "lazy + warm-up":
+                registry.warm_up(tenant_ids[:args.max_tenants])
+            lease = registry.lease
+        startup = time.perf_counter() - start
+        report = run(lease, workload, monitor)
+        if mode == "eager":
+            loads, evicted = len(processors), 0
+            for processor in processors.values():
+                processor.close()
+        else:
+            metrics = registry.metrics()
+            loads = metrics["loads"]
+            evicted = sum(value for name, value in metrics.items() if name.startswith("evictions_"))
+            registry.close()
+        print(f"{mode:<16}{startup:>10.2f}{report['first_ms']['p50']:>11.1f}{report['first_ms']['p95']:>11.1f}"
+              f"{report['total_ms']['p50']:>8.1f}{report['total_ms']['p95']:>8.1f}{loads:>7}{evicted:>9}"
+              f"{report['peak_connections']:>12}{report['failed']:>8}")
+
+if __name__ == "__main__":
+    main()
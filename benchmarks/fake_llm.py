@@ -0,0 +1,226 @@
+import json
+import time
+import random
+import asyncio
+from pathlib import Path
+from typing import List, Tuple, Optional, Callable, Iterator, AsyncIterator
+from schema_retrieval import estimate_tokens
+
+class FakeResponse:
+    """
+    Minimal stand-in for a Vertex AI GenerationResponse.
+
+    Attributes:
+        text (str): Response text
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+def format_answer(operation: str, sql_query: str) -> str:
+    """
+    Render an answer the way the model is asked to in NL2SQL_PROMPT.
+
+    Args:
+        operation (str): Operation type value, e.g. "READ"
+        sql_query (str): SQL query
+
+    Returns:
+        str: Fenced JSON block with `operation` and `query`
+    """
+    return "```json\n" + json.dumps({"operation": operation, "query": sql_query}, indent=4) + "\n```"
+
+def load_corpus(path: Path) -> List[Tuple[str, str]]:
+    """
+    Build a question corpus from the commented queries of a SQL file.
+
+    Each SELECT statement becomes one entry, with the comment line above it
+    (e.g. "-- Get the Total Sales for Each Product") as the question.
+
+    Args:
+        path (Path): SQL file such as data/interesting_queries.sql
+
+    Returns:
+        List[Tuple[str, str]]: (question, SQL query) pairs
+    """
+    from benchmarks.fixture import read_statements
+    return [
+        (comment, " ".join(statement.split()))
+        for comment, statement in read_statements(path)
+        if comment and statement.lstrip().upper().startswith(("SELECT", "WITH"))
+    ]
+
+def corpus_picker(corpus: List[Tuple[str, str]]) -> Callable[[str], int]:
+    """
+    Map a prompt to the corpus entry whose question it asks.
+
+    Args:
+        corpus (List[Tuple[str, str]]): (question, SQL query) pairs
+
+    Returns:
+        Callable[[str], int]: Picker for FakeModel; the longest matching question
+            wins, unmatched prompts get the first entry
+    """
+    questions = sorted(range(len(corpus)), key=lambda index: -len(corpus[index][0]))
+
+    def pick(prompt: str) -> int:
+        for index in questions:
+            if corpus[index][0] in prompt:
+                return index
+        return 0
+
+    return pick
+
+class FakeModel:
+    """
+    Deterministic offline replacement for GenerativeModel.
+
+    Answers every prompt with canned SQL after an artificial latency, through
+    both `generate_content` and `generate_content_async`, so the processors can
+    be benchmarked without Vertex AI.
+
+    With `token_latency` set, output is also paced per token like a real
+    decoder: a blocking call returns after every token is generated, while
+    `stream=True` yields chunks of `chunk_tokens` tokens as they are generated
+    and stops generating when the consumer closes the stream. `trailer` text
+    after the JSON block (e.g. an explanation of the query) makes early
+    termination measurable.
+
+    `tail_probability` and `tail_latency` add a slow tail to the latency, and
+    `invalid_rate` answers with SQL that fails to plan, to exercise hedged
+    generation.
+
+    Attributes:
+        calls (int): Number of generate calls served
+        tokens_generated (int): Estimated output tokens produced over all calls
+
+    Args:
+        answers (List[str]): SQL queries to answer with, chosen by `picker` or round robin
+        latency (float): Mean artificial latency in seconds
+        jitter (float): Maximum extra latency in seconds, drawn uniformly
+        operation (str): Operation type reported for every answer
+        picker (Optional[Callable[[str], int]]): Maps a prompt to an index into `answers`
+        seed (int): Random seed for the jitter
+        token_latency (float): Seconds per generated output token
+        chunk_tokens (int): Tokens per streamed chunk
+        trailer (str): Text generated after the JSON block
+        tail_probability (float): Probability that a call is slowed down by `tail_latency`
+        tail_latency (float): Extra latency in seconds of slow calls
+        invalid_rate (float): Probability that an answer's SQL is broken
+    """
+
+    def __init__(self, answers: List[str], latency: float = 0.0, jitter: float = 0.0,
+                 operation: str = "READ", picker: Optional[Callable[[str], int]] = None,
+                 seed: int = 0, token_latency: float = 0.0, chunk_tokens: int = 8,
+                 trailer: str = "", tail_probability: float = 0.0, tail_latency: float = 0.0,
+                 invalid_rate: float = 0.0):
+        self.answers = answers
+        self.latency = latency
+        self.jitter = jitter
+        self.operation = operation
+        self.picker = picker
+        self.token_latency = token_latency
+        self.chunk_tokens = chunk_tokens
+        self.trailer = trailer
+        self.tail_probability = tail_probability
+        self.tail_latency = tail_latency
+        self.invalid_rate = invalid_rate
+        self.calls = 0
+        self.tokens_generated = 0
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_corpus(cls, corpus: List[Tuple[str, str]], latency: float = 0.0,
+                    jitter: float = 0.0, seed: int = 0, **kwargs) -> "FakeModel":
+        """
+        Create a model answering each corpus question with its canned SQL.
+
+        Args:
+            corpus (List[Tuple[str, str]]): (question, SQL query) pairs, see `load_corpus`
+            latency (float): Mean artificial latency in seconds
+            jitter (float): Maximum extra latency in seconds
+            seed (int): Random seed for the jitter
+            **kwargs: Output pacing, slow tail and invalid answers, see FakeModel
+
+        Returns:
+            FakeModel: The model
+        """
+        return cls([sql_query for _, sql_query in corpus], latency=latency, jitter=jitter,
+                   picker=corpus_picker(corpus), seed=seed, **kwargs)
+
+    def _answer(self, prompt: str) -> FakeResponse:
+        """
+        Pick the canned answer for a prompt.
+
+        Args:
+            prompt (str): Prompt sent to the model
+
+        Returns:
+            FakeResponse: The formatted answer
+        """
+        index = self.picker(prompt) if self.picker else self.calls
+        self.calls += 1
+        sql_query = self.answers[index % len(self.answers)]
+        if self.invalid_rate and self._rng.random() < self.invalid_rate:
+            sql_query = "SELEC" + sql_query[len("SELECT"):]
+        text = format_answer(self.operation, sql_query)
+        return FakeResponse(text + self.trailer)
+
+    def _chunks(self, text: str) -> List[str]:
+        """
+        Split a response into streamed chunks of about `chunk_tokens` tokens.
+
+        Args:
+            text (str): Full response text
+
+        Returns:
+            List[str]: Chunks in order
+        """
+        size = max(1, self.chunk_tokens * 4)
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def _delay(self) -> float:
+        """
+        Draw the artificial latency of one call.
+
+        Returns:
+            float: Seconds to wait
+        """
+        delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self.tail_probability and self._rng.random() < self.tail_probability:
+            delay += self.tail_latency
+        return delay
+
+    def _stream(self, response: FakeResponse) -> Iterator[FakeResponse]:
+        for chunk in self._chunks(response.text):
+            tokens = estimate_tokens(chunk)
+            time.sleep(tokens * self.token_latency)
+            self.tokens_generated += tokens
+            yield FakeResponse(chunk)
+
+    async def _stream_async(self, response: FakeResponse) -> AsyncIterator[FakeResponse]:
+        for chunk in self._chunks(response.text):
+            tokens = estimate_tokens(chunk)
+            await asyncio.sleep(tokens * self.token_latency)
+            self.tokens_generated += tokens
+            yield FakeResponse(chunk)
+
+    def generate_content(self, prompt: str, generation_config=None, stream: bool = False, **kwargs):
+        time.sleep(self._delay())
+        response = self._answer(prompt)
+        if stream:
+            return self._stream(response)
+        tokens = estimate_tokens(response.text)
+        time.sleep(tokens * self.token_latency)
+        self.tokens_generated += tokens
+        return response
+
+    async def generate_content_async(self, prompt: str, generation_config=None, stream: bool = False, **kwargs):
+        await asyncio.sleep(self._delay())
+        response = self._answer(prompt)
+        if stream:
+            return self._stream_async(response)
+        tokens = estimate_tokens(response.text)
+        await asyncio.sleep(tokens * self.token_latency)
+        self.tokens_generated += tokens
+        return response
@@ -0,0 +1,236 @@
+"""
+Local Postgres fixture for the offline benchmarks.
+
+Loads the project schema and data from `data/database.sql` (or the larger
+`data/bulk_insert_queries.sql`) into a local database, and provides a
+connection factory counting database round trips.
+
+The SQL files insert rows in an order that violates the foreign keys
+(Invoice before Stock), so statements are replayed by kind: DDL first, then
+INSERTs ordered by when their table is created, which is dependency order.
+
+Usage:
+    python -m benchmarks.fixture --host /tmp/pgdata --database retail [--bulk]
+"""
+import os
+import re
+import time
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+SCHEMA_FILE = DATA_DIR / "database.sql"
+BULK_FILE = DATA_DIR / "bulk_insert_queries.sql"
+
+CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+INSERT_INTO = re.compile(r"^\s*INSERT\s+INTO\s+(\w+)", re.IGNORECASE)
+DDL = re.compile(r"^\s*(CREATE|DROP|ALTER)\b", re.IGNORECASE)
+
+def split_sql(text: str) -> List[Tuple[str, str]]:
+    """
+    Split a SQL script into statements, keeping the comment above each one.
+
+    Quotes are tracked so semicolons and `--` inside string literals are kept;
+    comments are removed from the statement text.
+
+    Args:
+        text (str): SQL script
+
+    Returns:
+        List[Tuple[str, str]]: (last comment line before the statement, statement)
+            pairs, statements without the trailing semicolon
+    """
+    statements = []
+    comment, current = "", []
+    in_quote = False
+    i, length = 0, len(text)
+    while i < length:
+        char = text[i]
+        if in_quote:
+            current.append(char)
+            if char == "'":
+                in_quote = False
+        elif char == "'":
+            in_quote = True
+            current.append(char)
+        elif text.startswith("--", i):
+            end = text.find("\n", i)
+            end = length if end == -1 else end
+            if not "".join(current).strip():
+                comment = text[i + 2:end].strip()
+            i = end
+            continue
+        elif char == ";":
+            statement = "".join(current).strip()
+            if statement:
+                statements.append((comment, statement))
+            comment, current = "", []
+        else:
+            current.append(char)
+        i += 1
+
+    statement = "".join(current).strip()
+    if statement:
+        statements.append((comment, statement))
+    return statements
+
+def read_statements(path: Path) -> List[Tuple[str, str]]:
+    """
+    Read and split a SQL file.
+
+    Args:
+        path (Path): SQL file
+
+    Returns:
+        List[Tuple[str, str]]: (comment, statement) pairs, see `split_sql`
+    """
+    return split_sql(path.read_text(encoding="utf-8"))
+
+def load_fixture(connection_params: Dict[str, Any], bulk: bool = False) -> Dict[str, int]:
+    """
+    Recreate the project tables and load their rows.
+
+    Args:
+        connection_params (Dict[str, Any]): psycopg2 connection parameters
+        bulk (bool): Load rows from bulk_insert_queries.sql instead of database.sql
+
+    Returns:
+        Dict[str, int]: Row count per table after loading
+    """
+    schema = read_statements(SCHEMA_FILE)
+    ddl = [statement for _, statement in schema if DDL.match(statement)]
+    tables = [CREATE_TABLE.match(statement).group(1) for statement in ddl if CREATE_TABLE.match(statement)]
+    order = {table.lower(): index for index, table in enumerate(tables)}
+
+    source = read_statements(BULK_FILE) if bulk else schema
+    inserts = [statement for _, statement in source if INSERT_INTO.match(statement)]
+    inserts.sort(key=lambda statement: order.get(INSERT_INTO.match(statement).group(1).lower(), len(order)))
+
+    with psycopg2.connect(**connection_params) as conn:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS {} CASCADE".format(", ".join(reversed(tables))))
+            for statement in ddl:
+                cur.execute(statement)
+            for statement in inserts:
+                cur.execute(statement)
+            counts = {}
+            for table in tables:
+                cur.execute(f"SELECT COUNT(*) FROM {table}")
+                counts[table] = cur.fetchone()[0]
+            cur.execute("ANALYZE")
+    conn.close()
+    return counts
+
+_ROUND_TRIPS = 0
+_ROUND_TRIPS_LOCK = threading.Lock()
+_COUNTING_CURSORS: Dict[type, type] = {}
+
+def _count_round_trip() -> None:
+    global _ROUND_TRIPS
+    with _ROUND_TRIPS_LOCK:
+        _ROUND_TRIPS += 1
+
+def round_trips() -> int:
+    """
+    Return the number of round trips made through CountingConnection so far.
+
+    Returns:
+        int: Round trips since the process started
+    """
+    return _ROUND_TRIPS
+
+def _counting_cursor(base: type) -> type:
+    """
+    Return a subclass of a cursor class that counts its round trips.
+
+    Every execute is a round trip; on named (server-side) cursors every fetch
+    is one too.
+
+    Args:
+        base (type): psycopg2 cursor class
+
+    Returns:
+        type: The counting cursor class
+    """
+    cursor_class = _COUNTING_CURSORS.get(base)
+    if cursor_class is not None:
+        return cursor_class
+
+    class CountingCursor(base):
+        def execute(self, query, vars=None):
+            _count_round_trip()
+            return super().execute(query, vars)
+
+        def executemany(self, query, vars_list):
+            _count_round_trip()
+            return super().executemany(query, vars_list)
+
+        def fetchone(self):
+            if self.name:
+                _count_round_trip()
+            return super().fetchone()
+
+        def fetchmany(self, size=None):
+            if self.name:
+                _count_round_trip()
+            return super().fetchmany(size) if size is not None else super().fetchmany()
+
+        def fetchall(self):
+            if self.name:
+                _count_round_trip()
+            return super().fetchall()
+
+    _COUNTING_CURSORS[base] = CountingCursor
+    return CountingCursor
+
+class CountingConnection(psycopg2.extensions.connection):
+    """
+    psycopg2 connection counting the round trips of its cursors and commits.
+
+    Pass it as `connection_factory` in the connection parameters to make every
+    pooled connection count into `round_trips()`.
+    """
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _counting_cursor(base)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        if self.status != psycopg2.extensions.STATUS_READY:
+            _count_round_trip()
+        return super().commit()
+
+    def rollback(self):
+        if self.status != psycopg2.extensions.STATUS_READY:
+            _count_round_trip()
+        return super().rollback()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("PGDATABASE", "postgres"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--bulk", action="store_true", help="load data/bulk_insert_queries.sql")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = load_fixture({
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }, bulk=args.bulk)
+    print(", ".join(f"{table}: {count} rows" for table, count in counts.items()),
+          f"({time.perf_counter() - start:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Load test for AsyncNLToPostgresProcessor against a fake LLM and a local Postgres.
+
+Runs a fixed number of questions at each concurrency level on one event loop
+and reports throughput and p50/p99 latency. The fake model answers with canned
+READ queries after `--llm-latency` seconds, so the numbers reflect pipeline
+overhead and database time rather than Vertex AI. Generation and result caches
+are disabled unless `--with-caches` is given.
+
+Usage:
+    python -m benchmarks.load_test_async --host 127.0.0.1 --database retail \\
+        --user postgres --concurrency 1 8 32 128
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import TABLE_METADATA
+from async_processor import AsyncNLToPostgresProcessor, close_async_pools
+from benchmarks.fake_llm import FakeModel
+from benchmarks.bench_schema_pruning import percentile
+
+CANNED_QUERIES = [
+    "SELECT s.StockCode, s.Description, SUM(i.Quantity) AS total_quantity FROM Stock s "
+    "JOIN Invoice i ON s.StockCode = i.StockCode GROUP BY s.StockCode, s.Description "
+    "ORDER BY total_quantity DESC LIMIT 10",
+    "SELECT c.Country, COUNT(*) AS customers FROM Customers c GROUP BY c.Country ORDER BY customers DESC",
+    "SELECT date_trunc('month', i.InvoiceDate) AS month, SUM(i.Quantity * s.UnitPrice) AS revenue "
+    "FROM Invoice i JOIN Stock s ON s.StockCode = i.StockCode GROUP BY month ORDER BY month",
+    "SELECT s.StockCode, s.Description FROM Stock s LEFT JOIN Invoice i ON s.StockCode = i.StockCode "
+    "WHERE i.InvoiceNo IS NULL LIMIT 50",
+]
+
+async def run_level(processor: AsyncNLToPostgresProcessor, concurrency: int, requests: int) -> dict:
+    """
+    Run `requests` questions with at most `concurrency` in flight.
+
+    Args:
+        processor (AsyncNLToPostgresProcessor): Processor under test
+        concurrency (int): Maximum in-flight questions
+        requests (int): Total questions to run
+
+    Returns:
+        dict: Throughput, latency percentiles and error count
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await processor.query_db_async(f"load test question {index}")
+            latencies.append(time.perf_counter() - start)
+            if response["status"] != "success":
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "throughput": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": errors,
+    }
+
+async def main_async(args: argparse.Namespace) -> None:
+    connection_params = {
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }
+    model = FakeModel(CANNED_QUERIES, latency=args.llm_latency, jitter=args.llm_jitter)
+    cache_config = None if args.with_caches else {"enabled": False}
+    processor = AsyncNLToPostgresProcessor(
+        connection_params,
+        TABLE_METADATA,
+        async_config={
+            "pool_min_size": 1,
+            "pool_max_size": args.pool_size,
+            "schema_timeout": 30.0,
+            "generation_timeout": 60.0,
+            "execution_timeout": 60.0,
+        },
+        generation_cache_config=cache_config,
+        result_cache_config=cache_config,
+        model=model
+    )
+    await processor.query_db_async("warm up")
+
+    print(f"{'concurrency':>12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for concurrency in args.concurrency:
+        stats = await run_level(processor, concurrency, args.requests)
+        print(f"{stats['concurrency']:>12}{stats['throughput']:>10.1f}{stats['p50_ms']:>10.1f}"
+              f"{stats['p99_ms']:>10.1f}{stats['errors']:>8}")
+    await close_async_pools()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PGPORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("PGDATABASE", "postgres"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--with-caches", action="store_true")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+Load PreProcessedData.csv into Stock, Invoice and Customers with COPY.
+
+The CSV is read once in chunks of `chunk_size` rows. Each chunk is cleaned and
+deduplicated with vectorized pandas/NumPy operations (first occurrence of a
+key wins, as in GenerateQueries.ipynb) and streamed to the tables with
+`COPY ... FROM STDIN`. One worker thread and connection per table copies
+in parallel; bounded queues keep at most `queue_size` chunks per table in
+memory.
+
+Modes:
+    replace  Truncate the tables, drop their indexes and constraints, load,
+             then rebuild them (foreign keys last, which validates them).
+    upsert   Keep the tables; copy into UNLOGGED staging tables, then merge
+             in foreign-key order (Stock, Invoice, Customers) with
+             INSERT ... ON CONFLICT DO UPDATE.
+
+Usage:
+    python bulk_loader.py data/PreProcessedData.csv [--mode upsert] \\
+        [--host 127.0.0.1 --database retail --user postgres]
+"""
+import io
+import time
+import queue
+import argparse
+import threading
+from typing import Dict, List, Any, Tuple, Optional, NamedTuple
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+from config import CLOUD_SQL_CONNECTION, BULK_LOAD_CONFIG
+
+class TableSpec(NamedTuple):
+    """
+    How one table is filled from the CSV.
+
+    Attributes:
+        name (str): Table name
+        columns (List[str]): CSV columns copied into the table, in table column order
+        keys (List[str]): Columns that must be unique; the first occurrence wins
+        required (List[str]): Columns whose rows are dropped when missing
+        references (Optional[Tuple[str, str]]): (parent table, column) of the
+            foreign key, if any
+    """
+    name: str
+    columns: List[str]
+    keys: List[str]
+    required: List[str]
+    references: Optional[Tuple[str, str]] = None
+
+# In foreign-key dependency order.
+TABLES = [
+    TableSpec("Stock", ["StockCode", "Description", "UnitPrice"], ["StockCode"],
+              ["StockCode", "Description", "UnitPrice"]),
+    TableSpec("Invoice", ["InvoiceNo", "StockCode", "InvoiceDate", "Quantity"], ["InvoiceNo"],
+              ["InvoiceNo", "StockCode", "InvoiceDate", "Quantity"], ("Stock", "StockCode")),
+    TableSpec("Customers", ["CustomerID", "InvoiceNo", "Country"], ["CustomerID", "InvoiceNo"],
+              ["CustomerID", "InvoiceNo"], ("Invoice", "InvoiceNo")),
+]
+
+CSV_DTYPES = {
+    "InvoiceNo": str,
+    "StockCode": str,
+    "Description": str,
+    "Country": str,
+    "CustomerID": str,
+}
+MAX_DESCRIPTION = 40
+MAX_UNIT_PRICE = 1000
+
+def clean_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize one CSV chunk to the column types of the tables.
+
+    Args:
+        chunk (pd.DataFrame): Raw CSV rows
+
+    Returns:
+        pd.DataFrame: Rows with stripped codes, integer CustomerID, truncated
+            Description, formatted InvoiceDate and out-of-range prices dropped
+    """
+    chunk = chunk.copy()
+    for column in ("InvoiceNo", "StockCode"):
+        chunk[column] = chunk[column].str.strip()
+    chunk["Description"] = chunk["Description"].str.strip().str.slice(0, MAX_DESCRIPTION)
+    chunk["CustomerID"] = pd.to_numeric(chunk["CustomerID"], errors="coerce").astype("Int64")
+    chunk["InvoiceDate"] = pd.to_datetime(chunk["InvoiceDate"], errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S")
+    chunk["Quantity"] = pd.to_numeric(chunk["Quantity"], errors="coerce").astype("Int64")
+    chunk["UnitPrice"] = pd.to_numeric(chunk["UnitPrice"], errors="coerce").round(2)
+    chunk.loc[chunk["UnitPrice"].abs() >= MAX_UNIT_PRICE, "UnitPrice"] = np.nan
+    return chunk
+
+class KeyFilter:
+    """
+    Drops rows whose key was already seen in this or an earlier chunk.
+
+    Seen keys are kept as NumPy arrays, so memory grows with the number of
+    distinct keys, not with the number of rows read.
+
+    Args:
+        keys (List[str]): Columns that must each be unique
+    """
+
+    def __init__(self, keys: List[str]):
+        self.seen: Dict[str, np.ndarray] = {key: np.empty(0, dtype=object) for key in keys}
+
+    def __call__(self, rows: pd.DataFrame) -> pd.DataFrame:
+        for key, seen in self.seen.items():
+            rows = rows.drop_duplicates(subset=key, keep="first")
+            if len(seen):
+                rows = rows[~rows[key].isin(seen)]
+        for key in self.seen:
+            self.seen[key] = np.concatenate([self.seen[key], rows[key].to_numpy(dtype=object)])
+        return rows
+
+def _copy_rows(cur, table: str, columns: List[str], rows: pd.DataFrame) -> None:
+    """
+    Stream rows into a table with COPY FROM STDIN in CSV format.
+
+    Args:
+        cur (psycopg2.extensions.cursor): Cursor to copy with
+        table (str): Target table
+        columns (List[str]): Target columns, matching the DataFrame columns
+        rows (pd.DataFrame): Rows to copy
+    """
+    buffer = io.StringIO()
+    rows.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cur.copy_expert(
+        sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+            sql.Identifier(table.lower()),
+            sql.SQL(", ").join(sql.Identifier(column.lower()) for column in columns)
+        ),
+        buffer
+    )
+
+def _table_definitions(cur, tables: List[str]) -> Dict[str, List[Any]]:
+    """
+    Capture the indexes and constraints of tables so they can be rebuilt.
+
+    Args:
+        cur (psycopg2.extensions.cursor): Cursor to query the catalog with
+        tables (List[str]): Table names
+
+    Returns:
+        Dict[str, List[Any]]: Containing:
+            - foreign_keys / constraints: (table, name, definition) for foreign
+              keys and for primary key/unique constraints
+            - indexes: (name, CREATE INDEX statement) for other indexes
+    """
+    names = [table.lower() for table in tables]
+    cur.execute(
+        """
+        SELECT c.relname, con.conname, con.contype, pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema() AND c.relname = ANY(%s) AND con.contype IN ('p', 'u', 'f')
+        ORDER BY con.contype, c.relname
+        """,
+        (names,)
+    )
+    rows = cur.fetchall()
+    cur.execute(
+        """
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema() AND c.relname = ANY(%s)
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint con WHERE con.conindid = i.indexrelid)
+        """,
+        (names,)
+    )
+    return {
+        "foreign_keys": [(table, name, definition) for table, name, kind, definition in rows if kind == "f"],
+        "constraints": [(table, name, definition) for table, name, kind, definition in rows if kind != "f"],
+        "indexes": cur.fetchall(),
+    }
+
+def _drop_definitions(cur, definitions: Dict[str, List[Any]]) -> None:
+    """
+    Drop foreign keys, then primary key/unique constraints, then indexes.
+
+    Args:
+        cur (psycopg2.extensions.cursor): Cursor to run the DDL with
+        definitions (Dict[str, List[Any]]): Output of `_table_definitions`
+    """
+    for table, name, _ in definitions["foreign_keys"] + definitions["constraints"]:
+        cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT IF EXISTS {}").format(
+            sql.Identifier(table), sql.Identifier(name)))
+    for name, _ in definitions["indexes"]:
+        cur.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.SQL(name)))
+
+def _rebuild_definitions(cur, definitions: Dict[str, List[Any]]) -> None:
+    """
+    Recreate indexes, then primary key/unique constraints, then foreign keys.
+
+    Args:
+        cur (psycopg2.extensions.cursor): Cursor to run the DDL with
+        definitions (Dict[str, List[Any]]): Output of `_table_definitions`
+    """
+    for _, statement in definitions["indexes"]:
+        cur.execute(statement)
+    for table, name, definition in definitions["constraints"] + definitions["foreign_keys"]:
+        cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {}").format(
+            sql.Identifier(table), sql.Identifier(name), sql.SQL(definition)))
+
+def _stage_name(spec: TableSpec) -> str:
+    return f"_stage_{spec.name.lower()}"
+
+def _merge_statement(spec: TableSpec) -> sql.Composed:
+    """
+    Build the INSERT ... ON CONFLICT merging a staging table into its table.
+
+    Rows are upserted on the first key. Customers rows whose InvoiceNo already
+    belongs to another customer are skipped to respect the unique constraint.
+
+    Args:
+        spec (TableSpec): Table to merge
+
+    Returns:
+        sql.Composed: The merge statement
+    """
+    columns = [sql.Identifier(column.lower()) for column in spec.columns]
+    key = spec.keys[0].lower()
+    updates = [sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column.lower()))
+               for column in spec.columns if column.lower() != key]
+    guard = sql.SQL("")
+    for other in spec.keys[1:]:
+        guard = sql.SQL(" WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{other} = s.{other} "
+                        "AND t.{key} <> s.{key})").format(
+            table=sql.Identifier(spec.name.lower()),
+            other=sql.Identifier(other.lower()),
+            key=sql.Identifier(key)
+        )
+    return sql.SQL("INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage} s{guard} "
+                   "ON CONFLICT ({key}) DO UPDATE SET {updates}").format(
+        table=sql.Identifier(spec.name.lower()),
+        columns=sql.SQL(", ").join(columns),
+        stage=sql.Identifier(_stage_name(spec)),
+        guard=guard,
+        key=sql.Identifier(key),
+        updates=sql.SQL(", ").join(updates)
+    )
+
+class _CopyWorker(threading.Thread):
+    """
+    Copies the chunks of one table on its own connection, in one transaction.
+
+    Args:
+        connection_params (Dict[str, Any]): psycopg2 connection parameters
+        table (str): Table (or staging table) to copy into
+        columns (List[str]): Columns to copy
+        queue_size (int): Chunks buffered before the reader blocks
+    """
+
+    def __init__(self, connection_params: Dict[str, Any], table: str, columns: List[str], queue_size: int):
+        super().__init__(name=f"copy-{table}", daemon=True)
+        self.connection_params = connection_params
+        self.table = table
+        self.columns = columns
+        self.chunks: "queue.Queue[Optional[pd.DataFrame]]" = queue.Queue(maxsize=queue_size)
+        self.rows = 0
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        try:
+            with psycopg2.connect(**self.connection_params) as conn:
+                with conn.cursor() as cur:
+                    while True:
+                        rows = self.chunks.get()
+                        if rows is None:
+                            break
+                        _copy_rows(cur, self.table, self.columns, rows)
+                        self.rows += len(rows)
+            conn.close()
+        except BaseException as e:
+            self.error = e
+            while self.chunks.get() is not None:
+                pass
+
+    def put(self, rows: Optional[pd.DataFrame]) -> None:
+        self.chunks.put(rows)
+
+def load_csv(csv_path: str, connection_params: Dict[str, Any], mode: str = "replace",
+             chunk_size: int = 50000, queue_size: int = 2) -> Dict[str, Any]:
+    """
+    Load the CSV into Stock, Invoice and Customers.
+
+    Args:
+        csv_path (str): Path to PreProcessedData.csv
+        connection_params (Dict[str, Any]): psycopg2 connection parameters
+        mode (str): "replace" or "upsert", see the module docstring
+        chunk_size (int): CSV rows read per chunk
+        queue_size (int): Chunks buffered per table
+
+    Returns:
+        Dict[str, Any]: Containing:
+            - rows_read: CSV rows read
+            - rows: Rows copied per table
+            - seconds: Time per phase (prepare, copy, rebuild or merge) and total
+            - rows_per_second: CSV rows read per second overall
+
+    Raises:
+        ValueError: If `mode` is unknown
+        psycopg2.Error: If loading fails; in replace mode the dropped indexes
+            and constraints are restored before re-raising
+    """
+    if mode not in ("replace", "upsert"):
+        raise ValueError(f"Unknown mode: {mode}")
+
+    seconds = {}
+    start = time.perf_counter()
+    conn = psycopg2.connect(**connection_params)
+    definitions = None
+    try:
+        with conn.cursor() as cur:
+            if mode == "replace":
+                definitions = _table_definitions(cur, [spec.name for spec in TABLES])
+                cur.execute(sql.SQL("TRUNCATE {}").format(
+                    sql.SQL(", ").join(sql.Identifier(spec.name.lower()) for spec in TABLES)))
+                _drop_definitions(cur, definitions)
+            else:
+                for spec in TABLES:
+                    cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(_stage_name(spec))))
+                    cur.execute(sql.SQL("CREATE UNLOGGED TABLE {} (LIKE {} INCLUDING DEFAULTS)").format(
+                        sql.Identifier(_stage_name(spec)), sql.Identifier(spec.name.lower())))
+        conn.commit()
+        seconds["prepare"] = time.perf_counter() - start
+
+        phase = time.perf_counter()
+        workers = [
+            _CopyWorker(connection_params,
+                        spec.name if mode == "replace" else _stage_name(spec),
+                        spec.columns, queue_size)
+            for spec in TABLES
+        ]
+        for worker in workers:
+            worker.start()
+
+        filters = {spec.name: KeyFilter(spec.keys) for spec in TABLES}
+        rows_read = 0
+        try:
+            for chunk in pd.read_csv(csv_path, chunksize=chunk_size, dtype=CSV_DTYPES):
+                rows_read += len(chunk)
+                chunk = clean_chunk(chunk)
+                for spec, worker in zip(TABLES, workers):
+                    if worker.error is not None:
+                        raise worker.error
+                    rows = chunk[spec.columns].dropna(subset=spec.required)
+                    if mode == "replace" and spec.references is not None:
+                        # Rows whose parent was rejected would fail the rebuilt foreign key.
+                        parent, column = spec.references
+                        rows = rows[rows[column].isin(filters[parent].seen[column])]
+                    rows = filters[spec.name](rows)
+                    if len(rows):
+                        worker.put(rows)
+        finally:
+            for worker in workers:
+                worker.put(None)
+            for worker in workers:
+                worker.join()
+        for worker in workers:
+            if worker.error is not None:
+                raise worker.error
+        seconds["copy"] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        with conn.cursor() as cur:
+            if mode == "replace":
+                _rebuild_definitions(cur, definitions)
+                definitions = None
+            else:
+                for spec in TABLES:
+                    cur.execute(_merge_statement(spec))
+                    cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(_stage_name(spec))))
+            for spec in TABLES:
+                cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(spec.name.lower())))
+        conn.commit()
+        seconds["rebuild" if mode == "replace" else "merge"] = time.perf_counter() - phase
+    except BaseException:
+        conn.rollback()
+        if definitions is not None:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("TRUNCATE {}").format(
+                    sql.SQL(", ").join(sql.Identifier(spec.name.lower()) for spec in TABLES)))
+                _rebuild_definitions(cur, definitions)
+            conn.commit()
+        raise
+    finally:
+        conn.close()
+
+    seconds["total"] = time.perf_counter() - start
+    return {
+        "rows_read": rows_read,
+        "rows": {spec.name: worker.rows for spec, worker in zip(TABLES, workers)},
+        "seconds": {phase: round(value, 3) for phase, value in seconds.items()},
+        "rows_per_second": round(rows_read / seconds["total"], 1) if seconds["total"] else 0.0,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv_path")
+    parser.add_argument("--mode", choices=["replace", "upsert"], default="replace")
+    parser.add_argument("--host", default=CLOUD_SQL_CONNECTION["host"])
+    parser.add_argument("--port", type=int, default=CLOUD_SQL_CONNECTION["port"])
+    parser.add_argument("--database", default=CLOUD_SQL_CONNECTION["database"])
+    parser.add_argument("--user", default=CLOUD_SQL_CONNECTION["user"])
+    parser.add_argument("--password", default=CLOUD_SQL_CONNECTION["password"])
+    parser.add_argument("--chunk-size", type=int, default=BULK_LOAD_CONFIG["chunk_size"])
+    parser.add_argument("--queue-size", type=int, default=BULK_LOAD_CONFIG["queue_size"])
+    args = parser.parse_args()
+
+    report = load_csv(
+        args.csv_path,
+        {
+            "host": args.host,
+            "port": args.port,
+            "database": args.database,
+            "user": args.user,
+            "password": args.password,
+        },
+        mode=args.mode,
+        chunk_size=args.chunk_size,
+        queue_size=args.queue_size
+    )
+    print(f"Read {report['rows_read']} CSV rows in {report['seconds']['total']:.1f}s "
+          f"({report['rows_per_second']:.0f} rows/s)")
+    for table, rows in report["rows"].items():
+        print(f"  {table}: {rows} rows")
+    print("  " + ", ".join(f"{phase} {value:.2f}s" for phase, value in report["seconds"].items()))
+
+if __name__ == "__main__":
+    main()
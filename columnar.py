@@ -0,0 +1,266 @@
+import uuid
+import pyarrow as pa
+from typing import Dict, List, Any, Optional, Sequence, Callable
+
+# PostgreSQL type OIDs mapped to the Arrow types their columns are built with.
+PG_ARROW_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    700: pa.float32(),
+    701: pa.float64(),
+    1082: pa.date32(),
+    1114: pa.timestamp('us'),
+    1184: pa.timestamp('us', tz='UTC'),
+}
+PG_STRING_TYPES = frozenset({18, 19, 25, 1042, 1043})
+PG_NUMERIC = 1700
+
+def _numeric_type(precision: Optional[int], scale: Optional[int]) -> pa.DataType:
+    """
+    Arrow type for a PostgreSQL numeric column.
+
+    Columns declared with a precision (e.g. NUMERIC(5, 2)) become exact
+    decimals; unconstrained numerics, such as SUM or AVG results, become
+    float64 since their scale is unbounded.
+
+    Args:
+        precision (Optional[int]): Declared precision from the cursor description
+        scale (Optional[int]): Declared scale from the cursor description
+
+    Returns:
+        pa.DataType: The Arrow type
+    """
+    if precision and 0 < precision <= 38:
+        return pa.decimal128(precision, scale or 0)
+    return pa.float64()
+
+class _ColumnBuilder:
+    """
+    Accumulates one column as Arrow chunks, one chunk per fetched batch.
+
+    Args:
+        arrow_type (Optional[pa.DataType]): Target type; None infers it from the
+            first non-empty chunk
+        convert (Optional[Callable[[Any], Any]]): Applied to every non-null value
+            before it is handed to Arrow
+    """
+
+    def __init__(self, arrow_type: Optional[pa.DataType],
+                 convert: Optional[Callable[[Any], Any]] = None):
+        self.arrow_type = arrow_type
+        self.convert = convert
+        self.chunks: List[pa.Array] = []
+
+    def append(self, values: Sequence[Any]) -> None:
+        if self.convert is not None:
+            values = [None if value is None else self.convert(value) for value in values]
+        if self.arrow_type is None:
+            chunk = pa.array(values)
+            if chunk.null_count < len(chunk):
+                self.arrow_type = chunk.type
+                self.chunks = [c.cast(chunk.type) for c in self.chunks]
+            self.chunks.append(chunk)
+        else:
+            self.chunks.append(pa.array(values, type=self.arrow_type, from_pandas=False))
+
+    def finish(self) -> pa.ChunkedArray:
+        arrow_type = self.arrow_type or pa.null()
+        return pa.chunked_array([c.cast(arrow_type) for c in self.chunks], type=arrow_type)
+
+class _DictionaryColumnBuilder:
+    """
+    Accumulates a string column as dictionary codes while its cardinality is low.
+
+    Values are mapped to int32 codes through a Python dict as batches arrive.
+    Once the number of distinct values exceeds `max_dictionary_size`, the
+    column falls back to plain strings.
+
+    Args:
+        max_dictionary_size (int): Distinct values allowed before falling back
+    """
+
+    def __init__(self, max_dictionary_size: int):
+        self.max_dictionary_size = max_dictionary_size
+        self.codes: Dict[Any, int] = {}
+        self.chunks: List[pa.Array] = []
+        self.plain: Optional[_ColumnBuilder] = None
+
+    def append(self, values: Sequence[Any]) -> None:
+        if self.plain is not None:
+            self.plain.append(values)
+            return
+
+        codes = self.codes
+        indices = [None if value is None else codes.setdefault(value, len(codes)) for value in values]
+        if len(codes) > self.max_dictionary_size:
+            dictionary = pa.array(list(codes), type=pa.string())
+            self.plain = _ColumnBuilder(pa.string())
+            self.plain.chunks = [pa.DictionaryArray.from_arrays(chunk, dictionary).cast(pa.string())
+                                 for chunk in self.chunks]
+            self.plain.append(values)
+            self.codes, self.chunks = {}, []
+            return
+        self.chunks.append(pa.array(indices, type=pa.int32()))
+
+    def finish(self) -> pa.ChunkedArray:
+        if self.plain is not None:
+            return self.plain.finish()
+        dictionary = pa.array(list(self.codes), type=pa.string())
+        arrow_type = pa.dictionary(pa.int32(), pa.string())
+        return pa.chunked_array(
+            [pa.DictionaryArray.from_arrays(chunk, dictionary) for chunk in self.chunks],
+            type=arrow_type
+        )
+
+class ColumnarResult:
+    """
+    Query results stored column by column in Arrow arrays.
+
+    Built directly from cursor batches without creating per-row dicts: numeric
+    and temporal columns become typed Arrow arrays, and string columns are
+    dictionary-encoded while they have few distinct values (e.g. Country).
+    `to_arrow` hands the data over without copying and `to_pandas` converts
+    dictionary columns to pandas categoricals.
+
+    Attributes:
+        table (pa.Table): The results
+        truncated (bool): True if `max_rows` stopped the read before the end
+
+    Args:
+        table (pa.Table): The results
+        truncated (bool): True if `max_rows` stopped the read before the end
+    """
+
+    def __init__(self, table: pa.Table, truncated: bool = False):
+        self.table = table
+        self.truncated = truncated
+
+    @classmethod
+    def from_cursor(cls, cursor, batch_size: int = 10000, max_rows: Optional[int] = None,
+                    max_dictionary_size: int = 1024) -> "ColumnarResult":
+        """
+        Build a columnar result from an executed cursor returning tuples.
+
+        Args:
+            cursor: psycopg2 cursor (plain tuple cursor, possibly named) after `execute`
+            batch_size (int): Rows fetched per round trip
+            max_rows (Optional[int]): Row cap, None for unlimited
+            max_dictionary_size (int): Distinct values a string column may have and
+                still be dictionary-encoded
+
+        Returns:
+            ColumnarResult: The results
+        """
+        builders, names = None, []
+        fetched, truncated = 0, False
+        while True:
+            size = batch_size if max_rows is None else min(batch_size, max_rows - fetched)
+            rows = cursor.fetchmany(size) if size > 0 else []
+            if builders is None and cursor.description:
+                names = [column.name for column in cursor.description]
+                builders = [cls._builder_for(column, max_dictionary_size) for column in cursor.description]
+            if not rows:
+                if max_rows is not None and fetched >= max_rows:
+                    truncated = bool(cursor.fetchmany(1))
+                break
+            for builder, values in zip(builders, zip(*rows)):
+                builder.append(values)
+            fetched += len(rows)
+            if len(rows) < size:
+                break
+
+        if builders is None:
+            return cls(pa.table({}), truncated)
+        return cls(pa.table({name: builder.finish() for name, builder in zip(names, builders)}), truncated)
+
+    @staticmethod
+    def _builder_for(column, max_dictionary_size: int):
+        """
+        Choose the column builder for a cursor description entry.
+
+        Args:
+            column: psycopg2 Column description
+            max_dictionary_size (int): Dictionary size limit for string columns
+
+        Returns:
+            The builder for the column
+        """
+        if column.type_code in PG_STRING_TYPES:
+            return _DictionaryColumnBuilder(max_dictionary_size)
+        if column.type_code == PG_NUMERIC:
+            arrow_type = _numeric_type(column.precision, column.scale)
+            # psycopg2 returns Decimal, which Arrow does not convert to float64.
+            return _ColumnBuilder(arrow_type, float if pa.types.is_floating(arrow_type) else None)
+        return _ColumnBuilder(PG_ARROW_TYPES.get(column.type_code))
+
+    @property
+    def num_rows(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def columns(self) -> List[str]:
+        return self.table.column_names
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the Arrow buffers of the result.
+
+        Returns:
+            int: Size in bytes
+        """
+        return self.table.nbytes
+
+    def to_arrow(self) -> pa.Table:
+        """
+        Return the results as an Arrow table, without copying.
+
+        Returns:
+            pa.Table: The results
+        """
+        return self.table
+
+    def to_pandas(self):
+        """
+        Convert the results to a pandas DataFrame.
+
+        Dictionary-encoded strings become categoricals and each column keeps
+        its own block, avoiding the consolidation copy.
+
+        Returns:
+            pandas.DataFrame: The results
+        """
+        return self.table.to_pandas(split_blocks=True, self_destruct=False)
+
+    def to_pylist(self) -> List[Dict[str, Any]]:
+        """
+        Convert the results back to the list-of-dicts format of `query_db`.
+
+        Returns:
+            List[Dict[str, Any]]: One dict per row
+        """
+        return self.table.to_pylist()
+
+def execute_columnar(conn, sql_query: str, batch_size: int = 10000, max_rows: Optional[int] = None,
+                     max_dictionary_size: int = 1024) -> ColumnarResult:
+    """
+    Run a READ query on a server-side cursor and collect it column by column.
+
+    Args:
+        conn (psycopg2.extensions.connection): Connection to run the query on
+        sql_query (str): READ query
+        batch_size (int): Rows fetched per round trip
+        max_rows (Optional[int]): Row cap, None for unlimited
+        max_dictionary_size (int): Dictionary size limit for string columns
+
+    Returns:
+        ColumnarResult: The results
+    """
+    import psycopg2.extensions
+    with conn.cursor(name=f"talk_to_db_{uuid.uuid4().hex}",
+                     cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.itersize = batch_size
+        cur.execute(sql_query)
+        return ColumnarResult.from_cursor(cur, batch_size, max_rows, max_dictionary_size)
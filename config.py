@@ -1,6 +1,6 @@
 import os
-import bcrypt
-import pyrebase
+import json
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,13 +16,57 @@ firebase_config = {
     "measurementId": os.getenv("FB_MEASUREMENT_ID")
 }
 
-# Initialize Firebase
-firebase = pyrebase.initialize_app(firebase_config)
-auth = firebase.auth()
-db = firebase.database()
+# Firebase is initialized on first use, so pages that never sign anyone in
+# do not pay for importing pyrebase and building its clients.
+_firebase = None
+_firebase_lock = threading.Lock()
+
+def get_firebase():
+    """
+    Return the process-wide Firebase app, initializing it on first use.
+
+    Returns:
+        pyrebase.pyrebase.Firebase: The Firebase app
+    """
+    global _firebase
+    with _firebase_lock:
+        if _firebase is None:
+            import pyrebase
+            _firebase = pyrebase.initialize_app(firebase_config)
+        return _firebase
+
+def firebase_auth():
+    """
+    Return the Firebase authentication client.
+
+    Returns:
+        pyrebase.pyrebase.Auth: Client for signing users up and in
+    """
+    return get_firebase().auth()
+
+def firebase_db():
+    """
+    Return the Firebase realtime database client.
+
+    Returns:
+        pyrebase.pyrebase.Database: Client for the realtime database
+    """
+    return get_firebase().database()
+
+def __getattr__(name):
+    # Keeps `from config import firebase, auth, db` working without
+    # initializing Firebase at import time.
+    if name == "firebase":
+        return get_firebase()
+    if name == "auth":
+        return firebase_auth()
+    if name == "db":
+        return firebase_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Password hashing function
 def hash_password(password):
+    import bcrypt
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 LOCATION = os.getenv("LOCATION")
@@ -37,6 +81,128 @@ CLOUD_SQL_CONNECTION = {
     "port": 5432,
 }
 
+# Read replicas of CLOUD_SQL_CONNECTION, as "host:port" entries separated by commas
+CLOUD_SQL_REPLICAS = [
+    {**CLOUD_SQL_CONNECTION, "host": host, "port": int(port or 5432)}
+    for host, _, port in (
+        entry.strip().partition(":") for entry in os.getenv("REPLICA_HOSTS", "").split(",") if entry.strip()
+    )
+]
+
+POOL_CONFIG = {
+    "min_size": 1,
+    "max_size": 10,
+    "checkout_timeout": 30.0,
+    "idle_timeout": 300.0,
+    "health_check_interval": 5.0,
+}
+
+SCHEMA_CATALOG_CONFIG = {
+    "ttl": 600.0,
+    "listen_channel": os.getenv("SCHEMA_CHANGE_CHANNEL"),
+}
+
+SCHEMA_PRUNING_CONFIG = {
+    "enabled": True,
+    "top_k": 5,
+    "max_context_tokens": 6000,
+    "include_fk_neighbours": True,
+    "embedding_weight": 0.5,
+}
+
+GENERATION_CACHE_CONFIG = {
+    "enabled": True,
+    "max_entries": 1000,
+    "ttl": 3600.0,
+    "sqlite_path": os.getenv("GENERATION_CACHE_PATH"),
+    "similarity_threshold": None,
+}
+
+RESULT_CACHE_CONFIG = {
+    "enabled": True,
+    "max_bytes": 64 * 1024 * 1024,
+    "max_entry_bytes": 16 * 1024 * 1024,
+    "ttl": 300.0,
+}
+
+ASYNC_CONFIG = {
+    "pool_min_size": 1,
+    "pool_max_size": 20,
+    "schema_timeout": 10.0,
+    "generation_timeout": 60.0,
+    "execution_timeout": 30.0,
+}
+
+BATCH_CONFIG = {
+    "max_concurrency": 8,
+    "requests_per_minute": 60,
+}
+
+STREAMING_CONFIG = {
+    "batch_size": 500,
+    "max_rows": 100000,
+    "max_bytes": 256 * 1024 * 1024,
+    # Seconds without a fetch after which a stream gives back its connection
+    "idle_timeout": 120.0,
+}
+
+QUERY_GUARD_CONFIG = {
+    "enabled": True,
+    "max_cost": 1e7,
+    "max_rows": 100000,
+    "throttle_cost": 1e5,
+    "statement_timeout_ms": 30000,
+    "work_mem": "64MB",
+    "max_cartesian_rows": 1e6,
+    "cache_size": 1024,
+    "cache_ttl": 600,
+}
+
+WORKLOAD_LOG_CONFIG = {
+    "enabled": True,
+    "max_queries": 1000,
+    "path": os.getenv("WORKLOAD_LOG_PATH"),
+}
+
+INDEX_ADVISOR_CONFIG = {
+    # "hypopg" only; "rollback" builds real indexes and is for the CLI on a scratch copy
+    "method": "hypopg",
+    "max_candidates": 30,
+    "max_columns": 3,
+    "min_improvement": 0.05,
+}
+
+ROLLUP_CONFIG = {
+    "enabled": True,
+    "refresh_interval": 300.0,
+    "status_ttl": 30.0,
+}
+
+BULK_LOAD_CONFIG = {
+    "chunk_size": 50000,
+    "queue_size": 2,
+}
+
+DATAGEN_CONFIG = {
+    "scale": 1.0,
+    "seed": 42,
+    "start": "2010-12-01",
+    "end": "2011-12-10",
+    "queue_size": 2,
+}
+
+COLUMNAR_CONFIG = {
+    "batch_size": 10000,
+    "max_rows": 1000000,
+    "max_dictionary_size": 1024,
+}
+
+EXPORT_CONFIG = {
+    "chunk_size": 1024 * 1024,
+    "row_group_size": 100000,
+    "compression": "snappy",
+}
+
 TABLE_METADATA = {
     "customers": "Contains the information about customers",
     "invoice": "Stores invoice details of all orders for a given customer",
@@ -49,6 +215,75 @@ GENERATION_CONFIG = {
     "top_p": 0.95,
 }
 
+GENERATION_STREAMING_CONFIG = {
+    "enabled": True,
+    "cancel_on_complete": True,
+}
+
+QUERY_TEMPLATE_CONFIG = {
+    "enabled": True,
+    "prepare": True,
+    "max_prepared": 256,
+    "max_templates": 1000,
+}
+
+REPLICA_ROUTING_CONFIG = {
+    "enabled": True,
+    "max_lag": 5.0,
+    "lag_check_interval": 1.0,
+    "retry_interval": 10.0,
+    "probe_timeout": 1.0,
+}
+
+COALESCING_CONFIG = {
+    "enabled": True,
+    "generation": True,
+    "execution": True,
+}
+
+HEDGED_GENERATION_CONFIG = {
+    "enabled": False,
+    "validate": True,
+    "max_attempts": 3,
+    "deadline_percentile": 90.0,
+    "initial_deadline": 4.0,
+    "min_deadline": 0.2,
+    "min_samples": 20,
+    "extra_call_budget": 0.2,
+    "budget_burst": 5,
+}
+
+# Tenant databases served by one deployment, by tenant id. TENANTS_FILE names a
+# JSON file mapping each id to its "connection" parameters, merged over
+# CLOUD_SQL_CONNECTION (so tenants on the same server need only a "database"),
+# and optional "table_metadata" and "replicas". Without it the only tenant is
+# CLOUD_SQL_CONNECTION.
+def _load_tenants(path):
+    if not path:
+        return {"default": {"connection": CLOUD_SQL_CONNECTION, "table_metadata": TABLE_METADATA,
+                            "replicas": CLOUD_SQL_REPLICAS}}
+    with open(path) as file:
+        tenants = json.load(file)
+    return {
+        tenant_id: {**tenant, "connection": {**CLOUD_SQL_CONNECTION, **tenant.get("connection", {})}}
+        for tenant_id, tenant in tenants.items()
+    }
+
+TENANTS = _load_tenants(os.getenv("TENANTS_FILE"))
+
+TENANT_REGISTRY_CONFIG = {
+    "max_tenants": 32,
+    "max_connections": 80,
+    "max_memory_bytes": 512 * 1024 * 1024,
+    "idle_timeout": 900.0,
+    "sweep_interval": 30.0,
+    # Tenant ids separated by commas, loaded in the background at startup
+    "warm_tenants": [t.strip() for t in os.getenv("WARM_TENANTS", "").split(",") if t.strip()],
+    "warm_up_workers": 4,
+    "pool_config": {**POOL_CONFIG, "max_size": 4},
+    "result_cache_config": {**RESULT_CACHE_CONFIG, "max_bytes": 16 * 1024 * 1024},
+}
+
 SYSTEM_PROMPT = "You are an expert in writing the error free PostgreSQL query based on the questions \
 asked by the analyst who is analyzing the transactions of the e-commerce stores."
 NL2SQL_PROMPT = """
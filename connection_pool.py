@@ -0,0 +1,393 @@
+import time
+import threading
+import psycopg2
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple, Optional, Iterator
+from psycopg2.extras import RealDictCursor
+
+class PoolExhaustedError(psycopg2.OperationalError):
+    """
+    Raised when no connection could be checked out of the pool in time.
+
+    Subclasses psycopg2.OperationalError so callers that already handle
+    database connectivity errors also handle pool exhaustion.
+    """
+
+class PostgresConnectionPool:
+    """
+    A thread-safe pool of PostgreSQL connections.
+
+    Connections are created on demand up to `max_size` and handed back to the
+    pool after use instead of being closed. Idle connections are pinged before
+    being reused, connections idle for longer than `idle_timeout` are closed
+    whenever a connection is checked out or returned (never dropping below
+    `min_size`), and callers wait up to `checkout_timeout` seconds when every
+    connection is in use. `min_size` is a floor for reaping, not a prefill:
+    the pool starts empty unless `prefill` is called.
+
+    Attributes:
+        connection_params (Dict[str, Any]): psycopg2 connection parameters
+        min_size (int): Number of connections kept open even when idle
+        max_size (int): Upper bound on open connections
+        checkout_timeout (float): Seconds to wait for a free connection
+        idle_timeout (float): Seconds after which an idle connection is closed
+        health_check_interval (float): Idle seconds after which a connection is
+            pinged with `SELECT 1` before being handed out
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters including
+            host, port, database name, user, and password
+        min_size (int): Number of connections kept open even when idle
+        max_size (int): Upper bound on open connections
+        checkout_timeout (float): Seconds to wait for a free connection
+        idle_timeout (float): Seconds after which an idle connection is closed
+        health_check_interval (float): Idle seconds before a connection is pinged
+    """
+
+    def __init__(self, connection_params: Dict[str, Any], min_size: int = 1,
+                 max_size: int = 10, checkout_timeout: float = 30.0,
+                 idle_timeout: float = 300.0, health_check_interval: float = 5.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self.connection_params = connection_params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.Condition()
+        self._idle: deque = deque()
+        self._size = 0
+        self._closed = False
+        self._metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "exhausted": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "health_check_failures": 0,
+        }
+
+    @property
+    def closed(self) -> bool:
+        """
+        Whether `close` has been called and checkouts are refused.
+
+        Returns:
+            bool: True once the pool is closed
+        """
+        return self._closed
+
+    def _connect(self):
+        """
+        Open a new physical connection configured with RealDictCursor.
+
+        Returns:
+            psycopg2.extensions.connection: A new connection object
+        """
+        conn = psycopg2.connect(**self.connection_params, cursor_factory=RealDictCursor)
+        with self._lock:
+            self._metrics["connections_created"] += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        """
+        Close a connection and release its slot in the pool.
+
+        Args:
+            conn (psycopg2.extensions.connection): Connection to close
+        """
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._metrics["connections_closed"] += 1
+            self._lock.notify()
+
+    def _is_healthy(self, conn, idle_for: float) -> bool:
+        """
+        Check whether an idle connection can be handed out again.
+
+        Args:
+            conn (psycopg2.extensions.connection): Connection taken from the idle set
+            idle_for (float): Seconds the connection has been idle
+
+        Returns:
+            bool: True if the connection is open and, when idle long enough,
+                answered a `SELECT 1`
+        """
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self._lock:
+                self._metrics["health_check_failures"] += 1
+            return False
+
+    def _reap_idle(self, now: float) -> list:
+        """
+        Detach idle connections past `idle_timeout`. Must be called with the lock held.
+
+        Args:
+            now (float): Current monotonic time
+
+        Returns:
+            list: Connections that should be closed by the caller outside the lock
+        """
+        expired = []
+        while self._idle and self._size - len(expired) > self.min_size:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            expired.append(conn)
+        return expired
+
+    def getconn(self, timeout: Optional[float] = None):
+        """
+        Check a connection out of the pool, waiting if all are in use.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait; defaults to `checkout_timeout`
+
+        Returns:
+            psycopg2.extensions.connection: A healthy connection
+
+        Raises:
+            PoolExhaustedError: If no connection became available in time
+            psycopg2.Error: If a new connection could not be opened
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        wait_started = 0.0
+
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise psycopg2.InterfaceError("Connection pool is closed")
+
+                while not self._idle and self._size >= self.max_size:
+                    if not waited:
+                        waited = True
+                        wait_started = time.monotonic()
+                        self._metrics["waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["exhausted"] += 1
+                        self._metrics["wait_time_total"] += time.monotonic() - wait_started
+                        raise PoolExhaustedError(
+                            f"No connection available within {timeout:.1f}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    self._lock.wait(remaining)
+
+                now = time.monotonic()
+                if waited:
+                    self._metrics["wait_time_total"] += now - wait_started
+                    waited = False
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    expired = self._reap_idle(now)
+                else:
+                    conn, last_used, expired = None, now, []
+                    self._size += 1
+
+            for stale in expired:
+                self._discard(stale)
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+            elif not self._is_healthy(conn, now - last_used):
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                self._metrics["checkouts"] += 1
+            return conn
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """
+        Return a connection to the pool.
+
+        Any open transaction is rolled back so the next borrower starts clean.
+        Broken or explicitly discarded connections are closed instead, and
+        idle connections past `idle_timeout` are closed on the way.
+
+        Args:
+            conn (psycopg2.extensions.connection): Connection obtained from `getconn`
+            discard (bool): Close the connection instead of keeping it
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.status != psycopg2.extensions.STATUS_READY:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._lock:
+            keep = not discard and not conn.closed and not self._closed
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+                self._lock.notify()
+                expired = self._reap_idle(time.monotonic())
+        if not keep:
+            self._discard(conn)
+            return
+        for stale in expired:
+            self._discard(stale)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Borrow a connection for the duration of a `with` block.
+
+        The transaction is committed when the block exits normally and rolled
+        back when it raises, mirroring `with psycopg2.connect(...) as conn`.
+        Connections that fail at the connection level are discarded.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait for a free connection
+
+        Yields:
+            psycopg2.extensions.connection: A pooled connection
+        """
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.putconn(conn, discard=True)
+            raise
+        except BaseException:
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def prefill(self) -> None:
+        """
+        Open connections until the pool holds at least `min_size` of them.
+        """
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+            self.putconn(conn)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the pool counters.
+
+        Returns:
+            Dict[str, Any]: Counters for checkouts, waits, wait time, exhaustion,
+                created/closed connections and health-check failures, plus the
+                current `size`, `idle` and `in_use` gauges
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["size"] = self._size
+            snapshot["idle"] = len(self._idle)
+            snapshot["in_use"] = self._size - len(self._idle)
+        return snapshot
+
+    def close(self) -> None:
+        """
+        Close every idle connection and refuse further checkouts.
+
+        Connections currently checked out are closed when they are returned.
+        """
+        with self._lock:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._lock.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+_POOLS: Dict[Tuple, PostgresConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+def pool_key(connection_params: Dict[str, Any]) -> Tuple:
+    """
+    Build the key identifying a connection target.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+
+    Returns:
+        Tuple: Sorted (name, value) pairs of the connection parameters
+    """
+    return tuple(sorted((k, str(v)) for k, v in connection_params.items()))
+
+def get_pool(connection_params: Dict[str, Any], **pool_config) -> PostgresConnectionPool:
+    """
+    Return the process-wide pool for a connection target, creating it on first use.
+
+    Every processor pointed at the same database shares one pool. The pool
+    configuration is only applied when the pool is created, and connections
+    are opened on first checkout; call `prefill` to open `min_size` up front.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        **pool_config: Keyword arguments forwarded to PostgresConnectionPool
+
+    Returns:
+        PostgresConnectionPool: The shared pool for this target
+    """
+    key = pool_key(connection_params)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None or pool.closed:
+            pool = PostgresConnectionPool(connection_params, **pool_config)
+            _POOLS[key] = pool
+        return pool
+
+def close_pool(connection_params: Dict[str, Any]) -> None:
+    """
+    Close and forget the shared pool of one connection target, if any.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+    """
+    with _POOLS_LOCK:
+        pool = _POOLS.pop(pool_key(connection_params), None)
+    if pool is not None:
+        pool.close()
+
+def close_all_pools() -> None:
+    """
+    Close and forget every shared pool.
+    """
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
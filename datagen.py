@@ -0,0 +1,512 @@
+"""
+Generate a synthetic Stock/Invoice/Customers dataset at a scale factor and load it with COPY.
+
+Scale factor 1 has the row counts of the loaded sample (3,684 products,
+22,190 invoices, 4,372 customers); every table grows linearly, so 10M
+invoices is about scale 451. Values are sampled with vectorized NumPy from
+distributions fitted to the data explored in data/EDA.ipynb:
+
+- countries: the customer country mix (about 90% United Kingdom)
+- quantities: the common pack sizes (1, 12, 2, 6, ...) plus a log-normal
+  tail; about one invoice in six is a cancellation ("C" InvoiceNo,
+  negative quantity)
+- prices: log-normal around 2.06, as NUMERIC(5, 2)
+- dates: the invoice volume per month, weekday (almost nothing on
+  Saturdays) and business hour; InvoiceNo grows with InvoiceDate
+- products: Zipf-like popularity, with about 28% of the catalogue never sold
+
+Foreign keys hold by construction: invoices pick existing products and every
+customer references a distinct existing invoice. Rows are generated in
+fixed blocks, each with its own seeded generator, so the same seed and
+scale give the same data whatever the load settings.
+
+The tables are recreated (dependent rollups are dropped; recreate them with
+`python rollups.py create`) without constraints, filled by one COPY worker
+per table while the next blocks are generated, then constrained and
+analyzed. With --partitioned, Invoice is range-partitioned by InvoiceDate
+into monthly partitions (plus a default one). PostgreSQL requires the
+primary key of a partitioned table to include the partition key, so it
+becomes (InvoiceNo, InvoiceDate), and Customers cannot declare its foreign
+key to Invoice(InvoiceNo); it is checked after loading instead and
+InvoiceNo gets a plain index.
+
+Usage:
+    python datagen.py --scale 100 [--partitioned] [--seed 42] \\
+        [--host 127.0.0.1 --database retail_sf100 --user postgres]
+"""
+import math
+import time
+import argparse
+from typing import Dict, List, Any, Tuple
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+from bulk_loader import TABLES, _CopyWorker
+from config import CLOUD_SQL_CONNECTION, DATAGEN_CONFIG
+
+# Rows per generated block; part of the seed, so changing it changes the data.
+BLOCK_ROWS = 100000
+BASE_ROWS = {"Stock": 3684, "Invoice": 22190, "Customers": 4372}
+FIRST_INVOICE_NO = 536365
+FIRST_CUSTOMER_ID = 12346
+FIRST_STOCK_CODE = 10002
+
+COUNTRY_MIX = {
+    "United Kingdom": 0.9035, "Germany": 0.0217, "France": 0.0199, "Spain": 0.0066,
+    "Belgium": 0.0055, "Switzerland": 0.0046, "Portugal": 0.0043, "Italy": 0.0034,
+    "Finland": 0.0027, "Norway": 0.0023, "Australia": 0.0021, "Channel Islands": 0.0021,
+    "Austria": 0.0021, "Netherlands": 0.0021, "Sweden": 0.0018, "Denmark": 0.0018,
+    "Japan": 0.0018, "Cyprus": 0.0016, "Poland": 0.0014, "Israel": 0.0009, "USA": 0.0009,
+    "Greece": 0.0009, "Unspecified": 0.0009, "Canada": 0.0009, "EIRE": 0.0007,
+    "Bahrain": 0.0005, "Malta": 0.0005, "United Arab Emirates": 0.0005,
+    "European Community": 0.0002, "Saudi Arabia": 0.0002, "Lithuania": 0.0002,
+    "Singapore": 0.0002, "Brazil": 0.0002, "Iceland": 0.0002, "Lebanon": 0.0002,
+    "Czech Republic": 0.0002, "RSA": 0.0002,
+}
+# Share of invoice lines per absolute quantity; the remaining mass follows QUANTITY_TAIL.
+QUANTITY_PMF = {
+    1: 0.1835, 12: 0.1391, 2: 0.1060, 6: 0.0822, 4: 0.0706, 24: 0.0691, 10: 0.0500,
+    3: 0.0479, 8: 0.0299, 48: 0.0264, 5: 0.0150, 20: 0.0149, 36: 0.0139, 16: 0.0138,
+    25: 0.0122, 72: 0.0114, 96: 0.0109, 100: 0.0102, 40: 0.0073, 144: 0.0067,
+}
+QUANTITY_TAIL = (math.log(70.7), 1.44)  # log-normal (mu, sigma) of the other quantities
+MAX_QUANTITY = 80995
+CANCELLATION_RATE = 0.165
+PRICE = (math.log(2.06), 1.0)  # log-normal (mu, sigma) of UnitPrice
+MAX_UNIT_PRICE = 999.99
+POPULARITY_EXPONENT = 0.6
+UNSOLD_SHARE = 0.28
+# Invoice lines per calendar month (January first), weekday (Monday first) and hour.
+MONTH_WEIGHTS = np.array([1236, 1202, 1619, 1384, 1849, 1707, 1593, 1544, 2078, 2263, 3086, 1708], dtype=float)
+WEEKDAY_WEIGHTS = np.array([3512, 3892, 4110, 4978, 3356, 22, 2342], dtype=float)
+HOUR_WEIGHTS = np.zeros(24)
+HOUR_WEIGHTS[6:21] = [22, 31, 608, 1622, 2613, 2770, 3596, 3043, 2645, 2405, 1491, 842, 257, 217, 28]
+
+DESCRIPTION_WORDS = (
+    ["WHITE", "RED", "PINK", "BLUE", "GREEN", "IVORY", "BLACK", "VINTAGE",
+     "RETRO", "SILVER", "GOLD", "PAPER", "WOODEN", "GLASS", "ZINC", "LACE"],
+    ["HANGING HEART", "POLKADOT", "REGENCY", "SPACEBOY", "DOLLY GIRL", "WOODLAND",
+     "CHRISTMAS", "BIRD", "FLORAL", "STAR", "ROSE", "SKULL", "ANGEL", "LOVE", "JAM", "RABBIT"],
+    ["T-LIGHT HOLDER", "LANTERN", "CAKE CASES", "LUNCH BAG", "MUG", "BUNTING",
+     "NAPKINS", "DOORSTOP", "WALL CLOCK", "TEA SET", "PHOTO FRAME", "CUSHION COVER",
+     "JUMBO BAG", "PURSE", "DECORATION", "ALARM CLOCK"],
+)
+
+def scaled_rows(scale: float) -> Dict[str, int]:
+    """
+    Row counts of every table at a scale factor.
+
+    Args:
+        scale (float): Scale factor, 1 for the size of the sample
+
+    Returns:
+        Dict[str, int]: Rows per table name
+
+    Raises:
+        ValueError: If the scale is not positive or InvoiceNo would overflow VARCHAR(10)
+    """
+    if scale <= 0:
+        raise ValueError("The scale factor must be positive")
+    rows = {table: max(1, round(base * scale)) for table, base in BASE_ROWS.items()}
+    if FIRST_INVOICE_NO + rows["Invoice"] >= 10 ** 9:
+        raise ValueError(f"Scale factor {scale} overflows InvoiceNo")
+    return rows
+
+def _mix(values: np.ndarray, seed: int) -> np.ndarray:
+    """
+    Hash integers to uniform 64-bit values (splitmix64), vectorized.
+
+    Args:
+        values (np.ndarray): Integers, e.g. row numbers
+        seed (int): Seed mixed into the hash
+
+    Returns:
+        np.ndarray: uint64 hashes
+    """
+    z = values.astype(np.uint64) + np.uint64((seed * 0x9E3779B97F4A7C15) % 2 ** 64)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def _coprime_stride(n: int) -> int:
+    """
+    A stride coprime with `n`, so `i * stride % n` permutes range(n).
+
+    Args:
+        n (int): Size of the range
+
+    Returns:
+        int: The stride
+    """
+    stride = int(n * 0.6180339887) | 1
+    while math.gcd(stride, n) != 1:
+        stride += 2
+    return stride
+
+class RetailGenerator:
+    """
+    Generates the blocks of every table of a scaled dataset.
+
+    Args:
+        scale (float): Scale factor, see `scaled_rows`
+        seed (int): Random seed
+        start (str): First InvoiceDate, as YYYY-MM-DD
+        end (str): Day after the last InvoiceDate, as YYYY-MM-DD
+    """
+
+    def __init__(self, scale: float, seed: int, start: str, end: str):
+        self.rows = scaled_rows(scale)
+        self.seed = seed
+        self.start = np.datetime64(start, "h")
+        self.end = np.datetime64(end, "h")
+        if self.end <= self.start:
+            raise ValueError("The date range is empty")
+
+        # Popularity rank r of a product maps to product r * stride % n, so
+        # popular products are spread over the catalogue.
+        self._stock_stride = _coprime_stride(self.rows["Stock"])
+        self._sold = max(1, int(self.rows["Stock"] * (1 - UNSOLD_SHARE)))
+        self._invoice_stride = _coprime_stride(self.rows["Invoice"])
+
+        # Business hours of the date range and the cumulative share of invoices up to each.
+        self._hours = np.arange(self.start, self.end)
+        months = self._hours.astype("datetime64[M]")
+        days_in_month = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(float)
+        weekday = (self._hours.astype("datetime64[D]").astype(np.int64) + 3) % 7
+        weights = (MONTH_WEIGHTS[months.astype(np.int64) % 12] / days_in_month
+                   * WEEKDAY_WEIGHTS[weekday] * HOUR_WEIGHTS[self._hours.astype(np.int64) % 24])
+        self._hour_cdf = np.cumsum(weights) / weights.sum()
+
+        self._countries = np.array(list(COUNTRY_MIX))
+        shares = np.array(list(COUNTRY_MIX.values()))
+        self._country_p = shares / shares.sum()
+        shares = np.array(list(QUANTITY_PMF.values()))
+        self._quantities = np.array(list(QUANTITY_PMF) + [0])
+        self._quantity_p = np.append(shares, max(0.0, 1 - shares.sum()))
+        self._quantity_p /= self._quantity_p.sum()
+
+    def blocks(self, table: str) -> int:
+        """
+        Number of blocks of a table.
+
+        Args:
+            table (str): Table name
+
+        Returns:
+            int: Blocks
+        """
+        return -(-self.rows[table] // BLOCK_ROWS)
+
+    def _block(self, table: str, block: int) -> Tuple[np.ndarray, np.random.Generator]:
+        """
+        Row numbers and random generator of a block.
+
+        Args:
+            table (str): Table name
+            block (int): Block number
+
+        Returns:
+            Tuple[np.ndarray, np.random.Generator]: Row numbers and generator
+        """
+        start = block * BLOCK_ROWS
+        rows = np.arange(start, min(start + BLOCK_ROWS, self.rows[table]), dtype=np.int64)
+        table_number = [spec.name for spec in TABLES].index(table)
+        return rows, np.random.default_rng([self.seed, table_number, block])
+
+    def cancelled(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Which invoice rows are cancellations.
+
+        Args:
+            rows (np.ndarray): Invoice row numbers
+
+        Returns:
+            np.ndarray: Boolean mask
+        """
+        return _mix(rows, self.seed) < np.uint64(CANCELLATION_RATE * 2 ** 64)
+
+    def invoice_numbers(self, rows: np.ndarray) -> pd.Series:
+        """
+        InvoiceNo of invoice rows; cancellations are prefixed with "C".
+
+        Args:
+            rows (np.ndarray): Invoice row numbers
+
+        Returns:
+            pd.Series: InvoiceNo strings
+        """
+        numbers = pd.Series(rows + FIRST_INVOICE_NO).astype(str)
+        return numbers.where(~self.cancelled(rows), "C" + numbers)
+
+    def stock(self, block: int) -> pd.DataFrame:
+        """
+        Generate a block of Stock rows.
+
+        Args:
+            block (int): Block number
+
+        Returns:
+            pd.DataFrame: StockCode, Description and UnitPrice columns
+        """
+        rows, rng = self._block("Stock", block)
+        words = _mix(rows, self.seed + 1)
+        description = pd.Series(np.array(DESCRIPTION_WORDS[0])[words & np.uint64(15)])
+        for shift, choices in ((4, DESCRIPTION_WORDS[1]), (8, DESCRIPTION_WORDS[2])):
+            description = description + " " + np.array(choices)[(words >> np.uint64(shift)) & np.uint64(15)]
+        price = np.clip(rng.lognormal(*PRICE, size=len(rows)), 0.01, MAX_UNIT_PRICE)
+        return pd.DataFrame({
+            "StockCode": pd.Series(rows + FIRST_STOCK_CODE).astype(str),
+            "Description": description.str.slice(0, 40),
+            "UnitPrice": np.round(price, 2),
+        })
+
+    def invoices(self, block: int) -> pd.DataFrame:
+        """
+        Generate a block of Invoice rows.
+
+        Args:
+            block (int): Block number
+
+        Returns:
+            pd.DataFrame: InvoiceNo, StockCode, InvoiceDate and Quantity columns
+        """
+        rows, rng = self._block("Invoice", block)
+        n = len(rows)
+
+        # Inverse CDF of a power law over the popularity ranks of the sold products.
+        s, sold = POPULARITY_EXPONENT, self._sold
+        rank = ((((sold + 1) ** (1 - s) - 1) * rng.random(n) + 1) ** (1 / (1 - s))).astype(np.int64) - 1
+        product = np.minimum(rank, sold - 1) * self._stock_stride % self.rows["Stock"]
+
+        # Invoices are spread over the business hours in order, so dates grow with InvoiceNo.
+        position = (rows + rng.random(n)) / self.rows["Invoice"]
+        hour = np.minimum(np.searchsorted(self._hour_cdf, position, side="right"), len(self._hours) - 1)
+        date = self._hours[hour].astype("datetime64[m]") + rng.integers(0, 60, n).astype("timedelta64[m]")
+
+        quantity = rng.choice(self._quantities, size=n, p=self._quantity_p)
+        tail = quantity == 0
+        quantity[tail] = np.clip(rng.lognormal(*QUANTITY_TAIL, size=int(tail.sum())), 1, MAX_QUANTITY)
+        return pd.DataFrame({
+            "InvoiceNo": self.invoice_numbers(rows),
+            "StockCode": pd.Series(product + FIRST_STOCK_CODE).astype(str),
+            "InvoiceDate": date.astype("datetime64[s]"),
+            "Quantity": np.where(self.cancelled(rows), -quantity, quantity),
+        })
+
+    def customers(self, block: int) -> pd.DataFrame:
+        """
+        Generate a block of Customers rows.
+
+        Customer j references invoice j * stride % invoices, so every customer
+        gets a distinct invoice spread over the whole date range.
+
+        Args:
+            block (int): Block number
+
+        Returns:
+            pd.DataFrame: CustomerID, InvoiceNo and Country columns
+        """
+        rows, rng = self._block("Customers", block)
+        invoice = rows * self._invoice_stride % self.rows["Invoice"]
+        return pd.DataFrame({
+            "CustomerID": rows + FIRST_CUSTOMER_ID,
+            "InvoiceNo": self.invoice_numbers(invoice),
+            "Country": rng.choice(self._countries, size=len(rows), p=self._country_p),
+        })
+
+SCHEMA = """
+DROP TABLE IF EXISTS Customers, Invoice, Stock CASCADE;
+CREATE TABLE Stock (
+    StockCode VARCHAR(15) NOT NULL,
+    Description VARCHAR(40) NOT NULL,
+    UnitPrice NUMERIC(5, 2) NOT NULL
+);
+CREATE TABLE Invoice (
+    InvoiceNo VARCHAR(10) NOT NULL,
+    StockCode VARCHAR(15) NOT NULL,
+    InvoiceDate TIMESTAMP NOT NULL,
+    Quantity INT NOT NULL
+){partitioning};
+CREATE TABLE Customers (
+    CustomerID INT NOT NULL,
+    InvoiceNo VARCHAR(10) NOT NULL,
+    Country VARCHAR(25)
+);
+"""
+
+# The constraints of data/database.sql, added once the data is in.
+CONSTRAINTS = [
+    "ALTER TABLE Stock ADD PRIMARY KEY (StockCode)",
+    "ALTER TABLE Invoice ADD PRIMARY KEY (InvoiceNo)",
+    "ALTER TABLE Invoice ADD CONSTRAINT fk_stock FOREIGN KEY (StockCode) REFERENCES Stock(StockCode)",
+    "ALTER TABLE Customers ADD PRIMARY KEY (CustomerID)",
+    "ALTER TABLE Customers ADD UNIQUE (InvoiceNo)",
+    "ALTER TABLE Customers ADD CONSTRAINT fk_invoice FOREIGN KEY (InvoiceNo) REFERENCES Invoice(InvoiceNo)",
+]
+PARTITIONED_CONSTRAINTS = [
+    "ALTER TABLE Stock ADD PRIMARY KEY (StockCode)",
+    "ALTER TABLE Invoice ADD PRIMARY KEY (InvoiceNo, InvoiceDate)",
+    "CREATE INDEX invoice_invoiceno_idx ON Invoice (InvoiceNo)",
+    "ALTER TABLE Invoice ADD CONSTRAINT fk_stock FOREIGN KEY (StockCode) REFERENCES Stock(StockCode)",
+    "ALTER TABLE Customers ADD PRIMARY KEY (CustomerID)",
+    "ALTER TABLE Customers ADD UNIQUE (InvoiceNo)",
+]
+ORPHANS_SQL = """
+    SELECT count(*) FROM Customers c
+    WHERE NOT EXISTS (SELECT 1 FROM Invoice i WHERE i.InvoiceNo = c.InvoiceNo)
+"""
+
+def partition_statements(start: str, end: str) -> List[sql.Composed]:
+    """
+    CREATE TABLE statements of the monthly Invoice partitions covering a date range.
+
+    Args:
+        start (str): First InvoiceDate, as YYYY-MM-DD
+        end (str): Day after the last InvoiceDate, as YYYY-MM-DD
+
+    Returns:
+        List[sql.Composed]: One statement per month, then the default partition
+    """
+    statements = []
+    month = np.datetime64(start, "M")
+    while month < np.datetime64(end, "D"):
+        lower, upper = str(month.astype("datetime64[D]")), str((month + 1).astype("datetime64[D]"))
+        statements.append(sql.SQL("CREATE TABLE {} PARTITION OF invoice FOR VALUES FROM ({}) TO ({})").format(
+            sql.Identifier(f"invoice_{str(month).replace('-', '_')}"), sql.Literal(lower), sql.Literal(upper)))
+        month += 1
+    statements.append(sql.SQL("CREATE TABLE invoice_default PARTITION OF invoice DEFAULT"))
+    return statements
+
+def generate(connection_params: Dict[str, Any], scale: float, seed: int = 42, partitioned: bool = False,
+             start: str = "2010-12-01", end: str = "2011-12-10", queue_size: int = 2) -> Dict[str, Any]:
+    """
+    Recreate Stock, Invoice and Customers filled with generated data.
+
+    Args:
+        connection_params (Dict[str, Any]): psycopg2 connection parameters
+        scale (float): Scale factor, see `scaled_rows`
+        seed (int): Random seed
+        partitioned (bool): Range-partition Invoice by month of InvoiceDate
+        start (str): First InvoiceDate, as YYYY-MM-DD
+        end (str): Day after the last InvoiceDate, as YYYY-MM-DD
+        queue_size (int): Blocks buffered per table
+
+    Returns:
+        Dict[str, Any]: Containing:
+            - rows: Rows copied per table
+            - partitions: Invoice partitions, 0 if not partitioned
+            - orphans: Customers whose invoice is missing (checked when partitioned)
+            - seconds: Time per phase (prepare, copy, constraints) and total
+            - rows_per_second: Rows generated and copied per second overall
+
+    Raises:
+        ValueError: If the scale or date range is invalid
+        psycopg2.Error: If loading fails
+    """
+    generator = RetailGenerator(scale, seed, start, end)
+    seconds = {}
+    started = time.perf_counter()
+    conn = psycopg2.connect(**connection_params)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA.format(partitioning=" PARTITION BY RANGE (InvoiceDate)" if partitioned else ""))
+            partitions = partition_statements(start, end) if partitioned else []
+            for statement in partitions:
+                cur.execute(statement)
+        conn.commit()
+        seconds["prepare"] = time.perf_counter() - started
+
+        phase = time.perf_counter()
+        producers = {"Stock": generator.stock, "Invoice": generator.invoices, "Customers": generator.customers}
+        workers = [_CopyWorker(connection_params, spec.name, spec.columns, queue_size) for spec in TABLES]
+        for worker in workers:
+            worker.start()
+        try:
+            # Blocks of the three tables are interleaved so their workers copy in parallel.
+            for block in range(max(generator.blocks(spec.name) for spec in TABLES)):
+                for spec, worker in zip(TABLES, workers):
+                    if worker.error is not None:
+                        raise worker.error
+                    if block < generator.blocks(spec.name):
+                        worker.put(producers[spec.name](block)[spec.columns])
+        finally:
+            for worker in workers:
+                worker.put(None)
+            for worker in workers:
+                worker.join()
+        for worker in workers:
+            if worker.error is not None:
+                raise worker.error
+        seconds["copy"] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        orphans = 0
+        with conn.cursor() as cur:
+            for statement in PARTITIONED_CONSTRAINTS if partitioned else CONSTRAINTS:
+                cur.execute(statement)
+            if partitioned:
+                cur.execute(ORPHANS_SQL)
+                orphans = cur.fetchone()[0]
+            for spec in TABLES:
+                cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(spec.name.lower())))
+        conn.commit()
+        seconds["constraints"] = time.perf_counter() - phase
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    seconds["total"] = time.perf_counter() - started
+    rows = {spec.name: worker.rows for spec, worker in zip(TABLES, workers)}
+    return {
+        "rows": rows,
+        "partitions": len(partitions),
+        "orphans": orphans,
+        "seconds": {name: round(value, 3) for name, value in seconds.items()},
+        "rows_per_second": round(sum(rows.values()) / seconds["total"], 1) if seconds["total"] else 0.0,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=DATAGEN_CONFIG["scale"])
+    parser.add_argument("--seed", type=int, default=DATAGEN_CONFIG["seed"])
+    parser.add_argument("--partitioned", action="store_true", help="range-partition Invoice by InvoiceDate")
+    parser.add_argument("--start", default=DATAGEN_CONFIG["start"], help="first InvoiceDate (YYYY-MM-DD)")
+    parser.add_argument("--end", default=DATAGEN_CONFIG["end"], help="day after the last InvoiceDate")
+    parser.add_argument("--host", default=CLOUD_SQL_CONNECTION["host"])
+    parser.add_argument("--port", type=int, default=CLOUD_SQL_CONNECTION["port"])
+    parser.add_argument("--database", default=CLOUD_SQL_CONNECTION["database"])
+    parser.add_argument("--user", default=CLOUD_SQL_CONNECTION["user"])
+    parser.add_argument("--password", default=CLOUD_SQL_CONNECTION["password"])
+    parser.add_argument("--queue-size", type=int, default=DATAGEN_CONFIG["queue_size"])
+    args = parser.parse_args()
+
+    report = generate(
+        {
+            "host": args.host,
+            "port": args.port,
+            "database": args.database,
+            "user": args.user,
+            "password": args.password,
+        },
+        scale=args.scale,
+        seed=args.seed,
+        partitioned=args.partitioned,
+        start=args.start,
+        end=args.end,
+        queue_size=args.queue_size
+    )
+    layout = f"{report['partitions']} Invoice partitions" if args.partitioned else "unpartitioned"
+    print(f"Generated scale {args.scale:g} ({layout}) in {report['seconds']['total']:.1f}s "
+          f"({report['rows_per_second']:.0f} rows/s)")
+    for table, rows in report["rows"].items():
+        print(f"  {table}: {rows} rows")
+    if report["orphans"]:
+        print(f"  {report['orphans']} customers reference a missing invoice")
+    print("  " + ", ".join(f"{phase} {value:.2f}s" for phase, value in report["seconds"].items()))
+
+if __name__ == "__main__":
+    main()
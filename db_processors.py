@@ -1,16 +1,48 @@
-import re
-import json
-import vertexai
-import psycopg2
+import time
+import threading
 from enum import Enum
-from typing import Dict, List, Any, Tuple, Optional
-from psycopg2.extras import RealDictCursor
-from vertexai.generative_models import GenerativeModel
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from typing import Dict, List, Any, Tuple, Optional, Iterator, Callable, Union, BinaryIO
+from connection_pool import PostgresConnectionPool, get_pool, close_pool, pool_key
+from schema_catalog import SchemaCatalog, get_schema_catalog, release_schema_catalog, catalog_fingerprints
+from schema_context import CompiledContext
+from schema_retrieval import get_schema_index, release_schema_index, estimate_tokens
+from generation_cache import GenerationCache, get_generation_cache, normalize_question
+from result_cache import (
+    ResultCache, get_result_cache, release_result_cache, is_read_only, is_cacheable, is_single_statement,
+    estimate_size, referenced_tables, canonicalize_sql
+)
+from rate_limiter import RateLimiter
+from result_stream import ResultStream
+from psycopg2 import sql
+from query_guard import (
+    QueryGuard, GuardDecision, get_query_guard, release_query_guard, settings_sql, explain_plan
+)
+from index_advisor import (
+    WorkloadLog, IndexAdvisor, IndexRecommendation, get_workload_log, release_workload_log
+)
+from rollups import RollupManager, get_rollup_manager, release_rollup_manager
+from routing import ConnectionRouter, Replica, get_router, release_router
+from single_flight import SingleFlight
+from generation_stream import StreamedGeneration, extract_json_object, read_stream
+from hedging import HedgedGenerator
+from query_templates import QueryTemplates, get_query_templates, release_query_templates
+from instrumentation import (
+    Instrumentation, NOOP_INSTRUMENTATION, trace_query, current_trace,
+    stage, add_duration, add_count
+)
 from config import (
     PROJECT_ID, MODEL_NAME, SYSTEM_PROMPT,
-    GENERATION_CONFIG, NL2SQL_PROMPT
+    GENERATION_CONFIG, GENERATION_STREAMING_CONFIG, HEDGED_GENERATION_CONFIG, NL2SQL_PROMPT, POOL_CONFIG,
+    SCHEMA_CATALOG_CONFIG, SCHEMA_PRUNING_CONFIG, GENERATION_CACHE_CONFIG,
+    RESULT_CACHE_CONFIG, BATCH_CONFIG, STREAMING_CONFIG, COLUMNAR_CONFIG, EXPORT_CONFIG,
+    QUERY_GUARD_CONFIG, WORKLOAD_LOG_CONFIG, INDEX_ADVISOR_CONFIG, ROLLUP_CONFIG,
+    QUERY_TEMPLATE_CONFIG, REPLICA_ROUTING_CONFIG, COALESCING_CONFIG
 )
 
+FETCH_BATCH_SIZE = 1000
+
 class OperationType(Enum):
     """
     Enumeration of supported database operation types.
@@ -34,20 +66,78 @@ class NLToPostgresProcessor:
     
     This class handles the conversion of natural language input to SQL queries and executes
     them against a PostgreSQL database. It supports all CRUD operations and maintains a
-    cache of database schema information for improved performance.
+    process-wide catalog of database schema information for improved performance.
+    Database access goes through a connection pool shared by every processor for
+    the same target.
     
     Attributes:
-        table_metadata (Dict[str, str]): Mapping of table names to their descriptions
+        table_metadata (Dict[str, str]): Mapping of table names to their descriptions,
+            including the available rollups
         connection_params (Dict[str, str]): PostgreSQL connection parameters
-        schema_cache (Dict[str, List[Dict[str, str]]]): Cache of table schema information
+        pool (PostgresConnectionPool): Shared connection pool for `connection_params`
+        schema_catalog (SchemaCatalog): Shared schema catalog for `connection_params`
+        pruning_config (Dict[str, Any]): Schema-relevance pruning settings
+        embedder (Optional[Callable]): Local embedding function used for pruning
+        generation_cache (Optional[GenerationCache]): Shared cache of generated SQL,
+            or None when disabled
+        result_cache (Optional[ResultCache]): Shared cache of READ results for
+            `connection_params`, or None when disabled
+        query_guard (Optional[QueryGuard]): Shared EXPLAIN-based cost guard for
+            `connection_params`, or None when disabled
+        workload_log (Optional[WorkloadLog]): Shared log of the SQL executed against
+            `connection_params`, used by `recommend_indexes`, or None when disabled
+        rollups (Optional[RollupManager]): Shared manager of the materialized revenue
+            rollups, or None when disabled
+        instrumentation (Instrumentation): Hooks receiving per-stage measurements
     
     Args:
         connection_params (Dict[str, str]): Database connection parameters including host,
             port, database name, user, and password
         table_metadata (Dict[str, str]): Mapping of table names to their descriptions
+        pool_config (Optional[Dict[str, Any]]): Pool settings used if the shared pool
+            does not exist yet; defaults to POOL_CONFIG
+        pruning_config (Optional[Dict[str, Any]]): Schema pruning settings; defaults
+            to SCHEMA_PRUNING_CONFIG
+        embedder (Optional[Callable[[List[str]], List[List[float]]]]): Optional local
+            embedding function blended into the schema relevance ranking
+        generation_cache_config (Optional[Dict[str, Any]]): Generation cache settings;
+            defaults to GENERATION_CACHE_CONFIG
+        result_cache_config (Optional[Dict[str, Any]]): Result cache settings;
+            defaults to RESULT_CACHE_CONFIG
+        model (Optional[Any]): Generative model to use instead of the Vertex AI
+            model named by MODEL_NAME
+        instrumentation (Optional[Instrumentation]): Metrics/tracing hooks; defaults
+            to the no-op NOOP_INSTRUMENTATION
+        guard_config (Optional[Dict[str, Any]]): Query cost guard settings; defaults
+            to QUERY_GUARD_CONFIG
+        workload_log_config (Optional[Dict[str, Any]]): Workload log settings; defaults
+            to WORKLOAD_LOG_CONFIG
+        rollup_config (Optional[Dict[str, Any]]): Rollup settings; defaults to ROLLUP_CONFIG
+        streaming_generation_config (Optional[Dict[str, Any]]): Streamed generation
+            settings; defaults to GENERATION_STREAMING_CONFIG
+        hedging_config (Optional[Dict[str, Any]]): Hedged generation settings;
+            defaults to HEDGED_GENERATION_CONFIG
+        template_config (Optional[Dict[str, Any]]): Query template settings;
+            defaults to QUERY_TEMPLATE_CONFIG
     """
 
-    def __init__(self, connection_params: Dict[str, str], table_metadata: Dict[str, str]):
+    def __init__(self, connection_params: Dict[str, str], table_metadata: Dict[str, str],
+                 pool_config: Optional[Dict[str, Any]] = None,
+                 pruning_config: Optional[Dict[str, Any]] = None,
+                 embedder: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 generation_cache_config: Optional[Dict[str, Any]] = None,
+                 result_cache_config: Optional[Dict[str, Any]] = None,
+                 model: Optional[Any] = None,
+                 instrumentation: Optional[Instrumentation] = None,
+                 guard_config: Optional[Dict[str, Any]] = None,
+                 workload_log_config: Optional[Dict[str, Any]] = None,
+                 rollup_config: Optional[Dict[str, Any]] = None,
+                 streaming_generation_config: Optional[Dict[str, Any]] = None,
+                 hedging_config: Optional[Dict[str, Any]] = None,
+                 template_config: Optional[Dict[str, Any]] = None,
+                 replica_params: Optional[List[Dict[str, Any]]] = None,
+                 routing_config: Optional[Dict[str, Any]] = None,
+                 coalescing_config: Optional[Dict[str, Any]] = None):
         """
         Initialize the NL to PostgreSQL processor with connection and metadata information.
         
@@ -55,31 +145,186 @@ class NLToPostgresProcessor:
             connection_params (Dict[str, str]): Database connection parameters including
                 host, port, database name, user, and password
             table_metadata (Dict[str, str]): Mapping of table names to their descriptions
+            pool_config (Optional[Dict[str, Any]]): Pool settings used if the shared pool
+                does not exist yet; defaults to POOL_CONFIG
+            pruning_config (Optional[Dict[str, Any]]): Schema pruning settings; defaults
+                to SCHEMA_PRUNING_CONFIG
+            embedder (Optional[Callable[[List[str]], List[List[float]]]]): Optional local
+                embedding function blended into the schema relevance ranking
+            generation_cache_config (Optional[Dict[str, Any]]): Generation cache settings;
+                defaults to GENERATION_CACHE_CONFIG
+            result_cache_config (Optional[Dict[str, Any]]): Result cache settings;
+                defaults to RESULT_CACHE_CONFIG
+            model (Optional[Any]): Generative model to use instead of the Vertex AI
+                model named by MODEL_NAME; must provide `generate_content`
+            instrumentation (Optional[Instrumentation]): Metrics/tracing hooks; defaults
+                to the no-op NOOP_INSTRUMENTATION
+            guard_config (Optional[Dict[str, Any]]): Query cost guard settings; defaults
+                to QUERY_GUARD_CONFIG
+            workload_log_config (Optional[Dict[str, Any]]): Workload log settings; defaults
+                to WORKLOAD_LOG_CONFIG
+            rollup_config (Optional[Dict[str, Any]]): Rollup settings; defaults to
+                ROLLUP_CONFIG. Existing rollups are added to the schema context and
+                refreshed in the background when their base tables change.
+            streaming_generation_config (Optional[Dict[str, Any]]): Streamed generation
+                settings; defaults to GENERATION_STREAMING_CONFIG. When enabled the
+                model response is streamed and, with `cancel_on_complete`, the stream
+                is closed as soon as the JSON answer is complete.
+            hedging_config (Optional[Dict[str, Any]]): Hedged generation settings;
+                defaults to HEDGED_GENERATION_CONFIG. When enabled, slow model calls
+                are hedged with another call, answers that fail to parse or (with
+                `validate`) to EXPLAIN are regenerated, and the first valid answer wins.
+            template_config (Optional[Dict[str, Any]]): Query template settings;
+                defaults to QUERY_TEMPLATE_CONFIG. Generated queries are normalized
+                into literal-free templates with per-template statistics and, with
+                `prepare`, run as prepared statements.
+            replica_params (Optional[List[Dict[str, Any]]]): Connection parameters of
+                read replicas of `connection_params`, e.g. CLOUD_SQL_REPLICAS.
+                READ queries are routed to them by load and replication lag;
+                writes and the reads that follow them in the same session
+                (see `routing.routing_session`) stay on the primary.
+            routing_config (Optional[Dict[str, Any]]): Replica routing settings;
+                defaults to REPLICA_ROUTING_CONFIG
+            coalescing_config (Optional[Dict[str, Any]]): In-flight coalescing
+                settings; defaults to COALESCING_CONFIG. Concurrent callers with
+                the same question (`generation`) or the same read-only SQL
+                (`execution`) share one model call or query execution.
         """
-        vertexai.init(project=PROJECT_ID)
         self.table_metadata = table_metadata
         self.connection_params = connection_params
-        self.model = GenerativeModel(
-            model_name=MODEL_NAME,
-            system_instruction=SYSTEM_PROMPT
+        pool_config = POOL_CONFIG if pool_config is None else pool_config
+        self.pool: PostgresConnectionPool = get_pool(connection_params, **pool_config)
+        routing_config = dict(REPLICA_ROUTING_CONFIG if routing_config is None else routing_config)
+        self.router: Optional[ConnectionRouter] = (
+            get_router(connection_params, replica_params, pool_config, **routing_config)
+            if routing_config.pop("enabled", True) and replica_params else None
+        )
+        if model is None:
+            import vertexai
+            from vertexai.generative_models import GenerativeModel
+            vertexai.init(project=PROJECT_ID)
+            model = GenerativeModel(
+                model_name=MODEL_NAME,
+                system_instruction=SYSTEM_PROMPT
+            )
+        self.model = model
+        self.schema_catalog: SchemaCatalog = get_schema_catalog(
+            connection_params,
+            pool=self.pool,
+            **SCHEMA_CATALOG_CONFIG
+        )
+        self.pruning_config = SCHEMA_PRUNING_CONFIG if pruning_config is None else pruning_config
+        self.embedder = embedder
+
+        cache_config = dict(GENERATION_CACHE_CONFIG if generation_cache_config is None
+                            else generation_cache_config)
+        self.generation_cache: Optional[GenerationCache] = (
+            get_generation_cache(**cache_config) if cache_config.pop("enabled", True) else None
         )
-        self.schema_cache: Dict[str, List[Dict[str, str]]] = {}
 
-    def _get_db_connection(self):
+        cache_config = dict(RESULT_CACHE_CONFIG if result_cache_config is None
+                            else result_cache_config)
+        self.result_cache: Optional[ResultCache] = (
+            get_result_cache(connection_params, **cache_config)
+            if cache_config.pop("enabled", True) else None
+        )
+
+        guard_config = dict(QUERY_GUARD_CONFIG if guard_config is None else guard_config)
+        self.query_guard: Optional[QueryGuard] = (
+            get_query_guard(connection_params, pool=self.pool, **guard_config)
+            if guard_config.pop("enabled", True) else None
+        )
+
+        log_config = dict(WORKLOAD_LOG_CONFIG if workload_log_config is None else workload_log_config)
+        self.workload_log: Optional[WorkloadLog] = (
+            get_workload_log(connection_params, **log_config)
+            if log_config.pop("enabled", True) else None
+        )
+
+        rollup_config = dict(ROLLUP_CONFIG if rollup_config is None else rollup_config)
+        self.rollups: Optional[RollupManager] = None
+        if rollup_config.pop("enabled", True):
+            self.rollups = get_rollup_manager(
+                connection_params,
+                pool=self.pool,
+                on_refresh=self.result_cache.invalidate_tables if self.result_cache is not None else None,
+                **rollup_config
+            )
+            available = self.rollups.available()
+            if available:
+                self.table_metadata = {
+                    **table_metadata,
+                    **{name: spec.description for name, spec in available.items()}
+                }
+                self.rollups.start()
+        self.streaming_generation_config = (GENERATION_STREAMING_CONFIG if streaming_generation_config is None
+                                            else streaming_generation_config)
+
+        hedging_config = dict(HEDGED_GENERATION_CONFIG if hedging_config is None else hedging_config)
+        self.validate_candidates = hedging_config.pop("validate", True)
+        self.hedger: Optional[HedgedGenerator] = (
+            HedgedGenerator(**hedging_config) if hedging_config.pop("enabled", True) else None
+        )
+
+        template_config = dict(QUERY_TEMPLATE_CONFIG if template_config is None else template_config)
+        self.query_templates: Optional[QueryTemplates] = (
+            get_query_templates(connection_params, **template_config)
+            if template_config.pop("enabled", True) else None
+        )
+        coalescing_config = dict(COALESCING_CONFIG if coalescing_config is None else coalescing_config)
+        coalesce = coalescing_config.pop("enabled", True)
+        self.generation_flights: Optional[SingleFlight] = (
+            SingleFlight("generation") if coalesce and coalescing_config.get("generation", True) else None
+        )
+        self.execution_flights: Optional[SingleFlight] = (
+            SingleFlight("execution") if coalesce and coalescing_config.get("execution", True) else None
+        )
+        self.instrumentation = instrumentation or NOOP_INSTRUMENTATION
+
+    def _route_read(self, sql_query: str) -> Optional[Replica]:
         """
-        Create and return a new database connection.
+        Choose the replica a READ query runs on.
         
+        Args:
+            sql_query (str): Query to run
+            
         Returns:
-            psycopg2.extensions.connection: A connection object to the PostgreSQL database
-            configured with RealDictCursor for dictionary-style results.
+            Optional[Replica]: The replica, None to run on the primary (no
+                replicas, none usable, or the query is not read-only)
+        """
+        if self.router is None or not is_read_only(sql_query):
+            return None
+        replica = self.router.route_read()
+        if replica is not None:
+            add_count("replica_reads")
+        return replica
+
+    @contextmanager
+    def _get_db_connection(self, replica: Optional[Replica] = None) -> Iterator[Any]:
+        """
+        Borrow a database connection from the shared pool.
+        
+        The transaction is committed when the `with` block exits normally and
+        rolled back on error; the connection is then returned to the pool. The
+        time spent waiting for the connection is recorded as `connection_wait`.
+        
+        Args:
+            replica (Optional[Replica]): Replica to connect to instead of the
+                primary, see `_route_read`
+        
+        Yields:
+            psycopg2.extensions.connection: A pooled connection to the PostgreSQL
+            database configured with RealDictCursor for dictionary-style results.
         
         Raises:
             psycopg2.Error: If connection to the database fails
+            PoolExhaustedError: If no pooled connection becomes available in time
         """
-        return psycopg2.connect(
-            **self.connection_params,
-            cursor_factory=RealDictCursor
-        )
+        start = time.perf_counter()
+        connection = self.pool.connection() if replica is None else self.router.connection(replica)
+        with connection as conn:
+            add_duration("connection_wait", time.perf_counter() - start)
+            yield conn
 
     def _get_table_schema(self, table_name: str) -> List[Dict[str, str]]:
         """
@@ -87,7 +332,8 @@ class NLToPostgresProcessor:
         
         This method retrieves detailed schema information including column names,
         data types, descriptions, constraints, and foreign key relationships.
-        Results are cached for improved performance on subsequent calls.
+        Results come from the process-wide schema catalog, so they are shared
+        with every other processor for the same database.
         
         Args:
             table_name (str): Name of the table to fetch schema information for
@@ -104,108 +350,101 @@ class NLToPostgresProcessor:
         Raises:
             psycopg2.Error: If there's an error executing the schema queries
         """
-        if table_name in self.schema_cache:
-            return self.schema_cache[table_name]
-
-        schema_query = """
-        SELECT 
-            column_name,
-            data_type,
-            col_description((table_schema || '.' || table_name)::regclass::oid, ordinal_position) as description,
-            is_nullable,
-            column_default
-        FROM information_schema.columns
-        WHERE table_name = %s
-        ORDER BY ordinal_position;
-        """
-
-        schema_info = []
-        with self._get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(schema_query, (table_name,))
-                columns = cur.fetchall()
-                
-                for col in columns:
-                    schema_info.append({
-                        "name": col['column_name'],
-                        "type": col['data_type'],
-                        "description": col['description'] or "No description available",
-                        "nullable": col['is_nullable'],
-                        "default": col['column_default']
-                    })
-        
-        # Get foreign key information
-        fk_query = """
-        SELECT
-            kcu.column_name,
-            ccu.table_name AS foreign_table_name,
-            ccu.column_name AS foreign_column_name
-        FROM information_schema.table_constraints AS tc
-        JOIN information_schema.key_column_usage AS kcu
-            ON tc.constraint_name = kcu.constraint_name
-        JOIN information_schema.constraint_column_usage AS ccu
-            ON ccu.constraint_name = tc.constraint_name
-        WHERE tc.constraint_type = 'FOREIGN KEY'
-        AND tc.table_name = %s;
-        """
-        
-        with self._get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(fk_query, (table_name,))
-                foreign_keys = cur.fetchall()
-                
-                for fk in foreign_keys:
-                    for col in schema_info:
-                        if col['name'] == fk['column_name']:
-                            col['foreign_key'] = {
-                                'references_table': fk['foreign_table_name'],
-                                'references_column': fk['foreign_column_name']
-                            }
+        return self.schema_catalog.get_table_schema(table_name)
+
+    def _get_compiled_context(self) -> CompiledContext:
+        """
+        Return the precompiled schema context for this processor's tables.
         
-        self.schema_cache[table_name] = schema_info
-        return schema_info
+        The context is rendered once per schema catalog version and shared by
+        every processor with the same table metadata.
+        
+        Returns:
+            CompiledContext: Rendered context text, fingerprint and per-table blocks
+        """
+        return self.schema_catalog.get_compiled_context(self.table_metadata)
 
-    def _build_context_prompt(self) -> str:
+    @property
+    def schema_fingerprint(self) -> str:
         """
-        Build a context prompt containing schema information for all tables.
+        Content hash of the current schema context.
         
-        Generates a formatted string containing comprehensive database schema
-        information including table descriptions, column details, and relationships
-        between tables through foreign keys.
+        Changes whenever the rendered schema context changes, so downstream
+        caches can include it in their keys.
         
         Returns:
-            str: Formatted string containing the database schema context
+            str: SHA-256 hex digest of the schema context
+        """
+        return self._get_compiled_context().fingerprint
+
+    def _select_tables(self, nl_query: str, compiled: CompiledContext) -> Optional[List[str]]:
         """
-        context = "Database Schema Information:\n\n"
+        Pick the tables relevant to a question for schema-relevance pruning.
         
-        for table_name, description in self.table_metadata.items():
-            context += f"Table: {table_name}\n"
-            context += f"Description: {description}\n"
-            context += "Columns:\n"
-            
-            schema_info = self._get_table_schema(table_name)
-            for field in schema_info:
-                context += f"- {field['name']} ({field['type']})"
-                if 'foreign_key' in field:
-                    context += f" [FK -> {field['foreign_key']['references_table']}.{field['foreign_key']['references_column']}]"
-                context += f": {field['description']}\n"
-            context += "\n"
+        Tables are ranked against the question with the shared schema index;
+        the top-k tables and their foreign-key neighbours are kept within the
+        configured token budget.
+        
+        Args:
+            nl_query (str): Natural language question
+            compiled (CompiledContext): Precompiled schema context
             
-        context += "\nRelationships:\n"
-        for table_name in self.table_metadata.keys():
-            schema_info = self._get_table_schema(table_name)
-            for field in schema_info:
-                if 'foreign_key' in field:
-                    context += f"- {table_name}.{field['name']} relates to {field['foreign_key']['references_table']}.{field['foreign_key']['references_column']}\n"
-        
-        return context
+        Returns:
+            Optional[List[str]]: Selected tables, or None when the full schema
+                should be used (pruning disabled or nothing to prune)
+        """
+        config = self.pruning_config
+        if not config.get("enabled") or not nl_query:
+            return None
+
+        top_k = config.get("top_k", 5)
+        max_tokens = config.get("max_context_tokens")
+        if len(self.table_metadata) <= top_k and (
+            max_tokens is None or estimate_tokens(compiled.text) <= max_tokens
+        ):
+            return None
+
+        index = get_schema_index(
+            compiled,
+            self.table_metadata,
+            self.schema_catalog.get_tables(self.table_metadata),
+            embedder=self.embedder,
+            embedding_weight=config.get("embedding_weight", 0.5)
+        )
+        return index.select_tables(
+            nl_query,
+            compiled,
+            top_k=top_k,
+            max_tokens=max_tokens,
+            include_fk_neighbours=config.get("include_fk_neighbours", True)
+        )
+
+    def _build_context_prompt(self, nl_query: Optional[str] = None) -> str:
+        """
+        Build a context prompt containing schema information for the relevant tables.
+        
+        Returns the memoized rendering of the database schema information,
+        including table descriptions, column details, and relationships between
+        tables through foreign keys. When a question is given and pruning is
+        enabled, only the tables relevant to it are included.
+        
+        Args:
+            nl_query (Optional[str]): Question used to prune the schema
+        
+        Returns:
+            str: Formatted string containing the database schema context
+        """
+        compiled = self._get_compiled_context()
+        return compiled.render(self._select_tables(nl_query, compiled))
     
     def _extract_query_info(self, text: str) -> Tuple[OperationType, str]:
         """
         Extract operation type and SQL query from the model's response.
         
-        Parses the JSON response from the language model to identify the
-        operation type and the generated SQL query.
+        Parses the JSON object of the language model's response to identify
+        the operation type and the generated SQL query. The object is found by
+        matching braces outside of JSON strings, so queries containing braces or
+        escaped quotes are extracted intact.
         
         Args:
             text (str): Raw response text from the language model
@@ -215,16 +454,14 @@ class NLToPostgresProcessor:
                 - The identified operation type (OperationType enum)
                 - The extracted SQL query string
         """
-        pattern = r'```json\s*({[^}]+})\s*```'
-        match = re.search(pattern, text, re.DOTALL)
+        data = extract_json_object(text)
         
-        if match:
+        if data is not None:
             try:
-                data = json.loads(match.group(1))
                 operation = OperationType[data.get('operation', 'UNKNOWN')]
                 query = data.get('query', '')
-                return operation, query
-            except (json.JSONDecodeError, KeyError):
+                return operation, query if isinstance(query, str) else ""
+            except (KeyError, TypeError):
                 return OperationType.UNKNOWN, ""
         return OperationType.UNKNOWN, ""
     
@@ -251,6 +488,7 @@ class NLToPostgresProcessor:
                 - sql_query: The executed query
                 - results/created_record/updated_records/deleted_records: Based on operation
                 - message: Error message if applicable
+                - rollups: Rollups a successful READ used and their staleness, if any
         """
         response = {
             "operation": operation.value,
@@ -263,6 +501,10 @@ class NLToPostgresProcessor:
                 response["created_record"] = results[0] if results else None
             elif operation == OperationType.READ:
                 response["results"] = results
+                if self.rollups is not None and sql_query:
+                    rollups = self.rollups.describe(sql_query)
+                    if rollups:
+                        response["rollups"] = rollups
             elif operation == OperationType.UPDATE:
                 response["updated_records"] = results
             elif operation == OperationType.DELETE:
@@ -272,16 +514,27 @@ class NLToPostgresProcessor:
 
         return response
 
-    def _execute_query(self, operation: OperationType, sql_query: str) -> Tuple[List[Dict], Optional[str]]:
+    def _execute_query(self, operation: OperationType, sql_query: str,
+                       settings: Optional[Dict[str, str]] = None) -> Tuple[List[Dict], Optional[str]]:
         """
         Execute the SQL query and return results based on operation type.
         
         Executes the provided SQL query and handles the results according to
         the operation type. For non-READ operations, commits the transaction.
+        READ results are served from and stored in the shared result cache;
+        writes invalidate the cached results of the tables they touch. With
+        query templates enabled, the query runs as a prepared statement of its
+        literal-free template and the execution is added to the template's
+        statistics. READ queries run on a replica when replicas are configured;
+        their results are only cached if the replica has replayed every write
+        made through this process. Concurrent executions of the same read-only
+        query on the same target share one execution; writes never do.
         
         Args:
             operation (OperationType): Type of operation being performed
             sql_query (str): SQL query to execute
+            settings (Optional[Dict[str, str]]): Settings applied with SET LOCAL in
+                the same round trip as the query
             
         Returns:
             Tuple[List[Dict], Optional[str]]: A tuple containing:
@@ -291,33 +544,418 @@ class NLToPostgresProcessor:
         Raises:
             psycopg2.Error: If there's an error executing the query
         """
+        cache = self.result_cache
+        read_only = operation == OperationType.READ and is_read_only(sql_query)
+        epoch = None
+        if cache is not None and read_only and is_cacheable(sql_query):
+            with stage("result_cache"):
+                cached = cache.get(sql_query)
+            if cached is not None:
+                add_count("result_cache_hits")
+                add_count("rows", len(cached))
+                return cached, None
+            epoch = cache.epoch()
+
+        replica = self._route_read(sql_query) if operation == OperationType.READ else None
+        if not read_only or self.execution_flights is None:
+            return self._run_query(operation, sql_query, settings, replica, epoch)
+
+        key = (canonicalize_sql(sql_query), tuple(sorted(settings.items())) if settings else (),
+               replica.name if replica is not None else None)
+        (results, error), shared = self.execution_flights.do(
+            key, lambda: self._run_query(operation, sql_query, settings, replica, epoch)
+        )
+        if shared:
+            add_count("rows", len(results))
+        return results, error
+
+    def _run_query(self, operation: OperationType, sql_query: str, settings: Optional[Dict[str, str]],
+                   replica: Optional[Replica], epoch: Optional[int]) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Execute a query that was not served from the result cache, see `_execute_query`.
+        
+        Args:
+            operation (OperationType): Type of operation being performed
+            sql_query (str): SQL query to execute
+            settings (Optional[Dict[str, str]]): Settings applied with SET LOCAL
+            replica (Optional[Replica]): Replica to run on, None for the primary
+            epoch (Optional[int]): Result cache epoch read before the lookup, None
+                if the result is not to be cached
+            
+        Returns:
+            Tuple[List[Dict], Optional[str]]: Query results and error message, if any
+        """
+        cache = self.result_cache
+        template = None
+        if self.query_templates is not None:
+            with stage("normalize"):
+                template = self.query_templates.normalize(sql_query)
+
+        start = time.perf_counter()
         try:
-            with self._get_db_connection() as conn:
+            with self._get_db_connection(replica) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(sql_query)
+                    with stage("execution"):
+                        start = time.perf_counter()
+                        prefix = settings_sql(settings) if settings else None
+                        if template is None or not self.query_templates.execute(
+                                cur, template, prefix, self.schema_catalog.version):
+                            if prefix is not None:
+                                cur.execute(prefix + sql.SQL(sql_query))
+                            else:
+                                cur.execute(sql_query)
+                        
+                        if operation != OperationType.READ:
+                            conn.commit()
                     
-                    if operation != OperationType.READ:
-                        conn.commit()
-                    
-                    if operation in [OperationType.INSERT, OperationType.UPDATE, OperationType.DELETE]:
-                        rows = cur.fetchall() if cur.description else []
-                    else:  # READ operation
-                        rows = cur.fetchall()
-                    
-                    return [dict(row) for row in rows], None
+                    results = []
+                    if cur.description:
+                        # Convert batch by batch so the raw rows and their dict
+                        # copies are never both fully held in memory.
+                        with stage("materialization"):
+                            while True:
+                                rows = cur.fetchmany(FETCH_BATCH_SIZE)
+                                if not rows:
+                                    break
+                                results.extend(dict(row) for row in rows)
                     
         except Exception as e:
+            if template is not None:
+                self.query_templates.record(template, time.perf_counter() - start, error=True)
             return [], str(e)
 
-    def query_db(self, nl_query: str) -> Dict[str, Any]:
+        if template is not None:
+            self.query_templates.record(template, time.perf_counter() - start, len(results))
+        if self.workload_log is not None:
+            self.workload_log.record(sql_query)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_count("rows", len(results))
+            trace.add_count("bytes", estimate_size(results))
+
+        if not is_read_only(sql_query):
+            if self.router is not None:
+                self.router.record_write()
+            if self.execution_flights is not None:
+                self.execution_flights.forget()
+        if epoch is not None:
+            if self.router is None or self.router.is_current(replica):
+                cache.put(sql_query, results, epoch=epoch)
+        elif cache is not None:
+            cache.invalidate_for_write(sql_query)
+        if operation != OperationType.READ and self.rollups is not None:
+            self.rollups.mark_stale(referenced_tables(sql_query))
+        return results, None
+
+    def _build_prompt(self, nl_query: str) -> str:
+        """
+        Build the full NL2SQL prompt for a question.
+        
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+            
+        Returns:
+            str: NL2SQL_PROMPT filled with the (pruned) schema context and the question
+        """
+        with stage("schema"):
+            context = self._build_context_prompt(nl_query)
+        with stage("prompt"):
+            return NL2SQL_PROMPT.format(context=context, nl_query=nl_query)
+
+    def _record_usage(self, prompt: str, response: Any) -> None:
+        """
+        Count prompt and response tokens of a model call on the current trace.
+        
+        Uses the usage metadata reported by Vertex AI and falls back to an
+        estimate from the text length.
+        
+        Args:
+            prompt (str): Prompt sent to the model
+            response (Any): Model response
+        """
+        trace = current_trace()
+        if trace is None:
+            return
+        usage = getattr(response, "usage_metadata", None)
+        trace.add_count("prompt_tokens", getattr(usage, "prompt_token_count", None)
+                        or estimate_tokens(prompt))
+        trace.add_count("response_tokens", getattr(usage, "candidates_token_count", None)
+                        or estimate_tokens(response.text))
+
+    def _record_stream(self, response: StreamedGeneration) -> None:
+        """
+        Count the chunks of a streamed model response and whether it was cut short.
+        
+        Args:
+            response (StreamedGeneration): The consumed stream
+        """
+        add_count("generation_chunks", response.chunks)
+        if response.cancelled:
+            add_count("generation_cancelled")
+
+    def _call_model(self, prompt: str, stop: Optional[threading.Event] = None) -> Any:
+        """
+        Call the model, streaming the response when streamed generation is enabled.
+        
+        A streamed response is read only until its JSON answer is complete, so
+        with `cancel_on_complete` the `generation` stage measures time-to-SQL and
+        any explanation the model adds afterwards is never generated.
+        
+        Args:
+            prompt (str): Full NL2SQL prompt
+            stop (Optional[threading.Event]): Event closing the stream once set
+            
+        Returns:
+            Any: Model response, or the StreamedGeneration read from the stream;
+                both provide `text` and `usage_metadata`
+        """
+        config = self.streaming_generation_config
+        if not config.get("enabled", True):
+            return self.model.generate_content(prompt, generation_config=GENERATION_CONFIG)
+        response = read_stream(
+            self.model.generate_content(prompt, generation_config=GENERATION_CONFIG, stream=True),
+            cancel=config.get("cancel_on_complete", True),
+            stop=stop
+        )
+        self._record_stream(response)
+        return response
+
+    def _is_valid_candidate(self, operation: OperationType, sql_query: str) -> bool:
+        """
+        Cheaply check a generated query without executing it.
+        
+        The query must have been parsed and, with `validate`, must pass EXPLAIN.
+        EXPLAIN goes through the cost guard when enabled, whose cached plan then
+        serves the guard check before execution. Either way only a single
+        statement is planned, in a transaction that is rolled back, so a
+        candidate that is never chosen cannot change the database.
+        
+        Args:
+            operation (OperationType): Parsed operation type
+            sql_query (str): Parsed SQL query
+            
+        Returns:
+            bool: True if the query can be used
+        """
+        if operation == OperationType.UNKNOWN or not sql_query:
+            return False
+        if not self.validate_candidates:
+            return True
+        try:
+            read_only = operation == OperationType.READ
+            if self.query_guard is not None:
+                self.query_guard.explain(sql_query, read_only=read_only)
+            else:
+                with self.pool.connection() as conn:
+                    explain_plan(conn, sql_query, read_only=read_only)
+        except Exception:
+            return False
+        return True
+
+    def _generate_candidate(self, prompt: str, stop: Optional[threading.Event] = None,
+                            rate_limiter: Optional[RateLimiter] = None) -> Tuple[OperationType, str, bool]:
+        """
+        Make one hedged model call and validate its answer.
+        
+        Args:
+            prompt (str): Full NL2SQL prompt
+            stop (Optional[threading.Event]): Event set once another call has answered
+            rate_limiter (Optional[RateLimiter]): Limiter to acquire before the call;
+                if `stop` is set while waiting, no call is made
+            
+        Returns:
+            Tuple[OperationType, str, bool]: Operation type, SQL query and validity
+        """
+        if rate_limiter is not None:
+            with stage("rate_limit"):
+                while not rate_limiter.acquire(timeout=0.1):
+                    if stop is not None and stop.is_set():
+                        return OperationType.UNKNOWN, "", False
+        add_count("generation_calls")
+        response = self._call_model(prompt, stop=stop)
+        self._record_usage(prompt, response)
+        operation, sql_query = self._extract_query_info(response.text.strip())
+        valid = self._is_valid_candidate(operation, sql_query)
+        if not valid:
+            add_count("invalid_candidates")
+        return operation, sql_query, valid
+
+    def _generate_query(self, nl_query: str,
+                        rate_limiter: Optional[RateLimiter] = None) -> Tuple[OperationType, str]:
+        """
+        Generate the operation type and SQL query for a natural language question.
+        
+        Questions already answered for the current schema fingerprint are served
+        from the generation cache; otherwise the model is called and a valid
+        result is cached. Concurrent callers asking the same normalized question
+        share one model call.
+        
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+            rate_limiter (Optional[RateLimiter]): Limiter to acquire before calling
+                the model; cache hits and coalesced calls do not consume a token
+            
+        Returns:
+            Tuple[OperationType, str]: The operation type and generated SQL query
+        """
+        fingerprint = None
+        if self.generation_cache is not None:
+            with stage("schema"):
+                fingerprint = self.schema_fingerprint
+            with stage("generation_cache"):
+                cached = self.generation_cache.get(nl_query, fingerprint)
+            if cached is not None:
+                add_count("generation_cache_hits")
+                return OperationType[cached[0]], cached[1]
+
+        if self.generation_flights is None:
+            return self._generate_uncached(nl_query, rate_limiter, fingerprint)
+        generated, _ = self.generation_flights.do(
+            (fingerprint, normalize_question(nl_query)),
+            lambda: self._generate_uncached(nl_query, rate_limiter, fingerprint)
+        )
+        return generated
+
+    def _generate_uncached(self, nl_query: str, rate_limiter: Optional[RateLimiter],
+                           fingerprint: Optional[str]) -> Tuple[OperationType, str]:
+        """
+        Call the model for a question missing from the generation cache, see `_generate_query`.
+        
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+            rate_limiter (Optional[RateLimiter]): Limiter to acquire before each model call
+            fingerprint (Optional[str]): Schema fingerprint to cache the result under,
+                None if the generation cache is disabled
+            
+        Returns:
+            Tuple[OperationType, str]: The operation type and generated SQL query
+        """
+        prompt = self._build_prompt(nl_query)
+        if self.hedger is not None:
+            # Every hedged call takes its own token.
+            with stage("generation"):
+                operation, sql_query, _ = self.hedger.run(
+                    lambda stop: self._generate_candidate(prompt, stop, rate_limiter),
+                    lambda candidate: candidate[2]
+                )
+        else:
+            if rate_limiter is not None:
+                with stage("rate_limit"):
+                    rate_limiter.acquire()
+            with stage("generation"):
+                response = self._call_model(prompt)
+            self._record_usage(prompt, response)
+            with stage("parse"):
+                operation, sql_query = self._extract_query_info(response.text.strip())
+
+        if fingerprint is not None and operation != OperationType.UNKNOWN and sql_query:
+            self.generation_cache.put(nl_query, fingerprint, operation.value, sql_query)
+        return operation, sql_query
+
+    def _guard(self, operation: OperationType, sql_query: str,
+               limit_rows: bool = True) -> Optional[GuardDecision]:
+        """
+        Check a generated query against the cost guard.
+        
+        Args:
+            operation (OperationType): Operation type returned by the model
+            sql_query (str): Generated SQL query
+            limit_rows (bool): Allow a LIMIT to be injected into large READs
+            
+        Returns:
+            Optional[GuardDecision]: The guard's decision, None when the guard is disabled
+        """
+        if self.query_guard is None:
+            return None
+        with stage("guard"):
+            return self.query_guard.check(
+                sql_query,
+                limit_rows=limit_rows and operation == OperationType.READ,
+                read_only=operation == OperationType.READ
+            )
+
+    def _rejected(self, operation: OperationType, decision: GuardDecision) -> Dict[str, Any]:
+        """
+        Build the error response for a query rejected by the cost guard.
+        
+        Args:
+            operation (OperationType): Operation type returned by the model
+            decision (GuardDecision): The rejecting decision
+            
+        Returns:
+            Dict[str, Any]: Error response including the `guard` section
+        """
+        response = self._format_response(
+            operation=operation,
+            status="error",
+            sql_query=decision.sql_query,
+            message=f"Query rejected by cost guard: {decision.reason}"
+        )
+        response["guard"] = decision.as_dict()
+        return response
+
+    def _respond(self, operation: OperationType, sql_query: str) -> Dict[str, Any]:
+        """
+        Execute a generated query and build the standardized response.
+        
+        The query is checked by the cost guard first: it may be rejected, get a
+        LIMIT injected or run with a statement timeout; the decision is reported
+        in the `guard` section of the response.
+        
+        Args:
+            operation (OperationType): Operation type returned by the model
+            sql_query (str): Generated SQL query
+            
+        Returns:
+            Dict[str, Any]: Standardized response, see `query_db`
+        """
+        if operation == OperationType.UNKNOWN or not sql_query:
+            return self._format_response(
+                operation=OperationType.UNKNOWN,
+                status="error",
+                sql_query=sql_query,
+                message="Failed to determine operation type or generate valid query"
+            )
+        
+        decision = self._guard(operation, sql_query)
+        if decision is not None:
+            if decision.action == "reject":
+                return self._rejected(operation, decision)
+            sql_query = decision.sql_query
+        
+        results, error = self._execute_query(
+            operation, sql_query, settings=decision.settings if decision is not None else None
+        )
+        
+        if error:
+            response = self._format_response(
+                operation=operation,
+                status="error",
+                sql_query=sql_query,
+                message=error
+            )
+        else:
+            response = self._format_response(
+                operation=operation,
+                status="success",
+                sql_query=sql_query,
+                results=results
+            )
+        if decision is not None:
+            response["guard"] = decision.as_dict()
+        return response
+
+    def query_db(self, nl_query: str, include_timings: bool = False) -> Dict[str, Any]:
         """
         Process natural language query and execute corresponding CRUD operation.
         
         Main method for processing natural language queries. Converts the query
         to SQL, executes it, and returns the results in a standardized format.
+        Each stage is reported to the processor's instrumentation hooks.
         
         Args:
             nl_query (str): Natural language query describing the desired operation
+            include_timings (bool): Add the per-stage `timings` section to the response
             
         Returns:
             Dict[str, Any]: Standardized response containing:
@@ -326,6 +964,8 @@ class NLToPostgresProcessor:
                 - sql_query: Generated SQL query
                 - results: Query results if successful
                 - message: Error message if unsuccessful
+                - timings: Stage durations and counts, if `include_timings`
+                  (see `QueryTrace.timings`)
                 
         Example:
             >>> processor = NLToPostgresProcessor(connection_params, table_metadata)
@@ -338,47 +978,631 @@ class NLToPostgresProcessor:
                 "results": [{"id": 1, "name": "John Doe", "city": "New York"}, ...]
             }
         """
-        try:
-            context = self._build_context_prompt()
-            prompt = NL2SQL_PROMPT.format(
-                context=context,
-                nl_query=nl_query
-            )
-            response = self.model.generate_content(
-                prompt,
-                generation_config=GENERATION_CONFIG
-            )
-            operation, sql_query = self._extract_query_info(response.text.strip())
+        with trace_query(self.instrumentation, include_timings) as trace:
+            try:
+                operation, sql_query = self._generate_query(nl_query)
+                response = self._respond(operation, sql_query)
+                
+            except Exception as e:
+                response = self._format_response(
+                    operation=OperationType.UNKNOWN,
+                    status="error",
+                    sql_query=sql_query if 'sql_query' in locals() else None,
+                    message=str(e)
+                )
+            self._record_outcome(response)
+        if include_timings:
+            response["timings"] = trace.timings()
+        return response
+
+    def _record_outcome(self, response: Dict[str, Any]) -> None:
+        """
+        Count a processed question by operation and status.
+        
+        Args:
+            response (Dict[str, Any]): Response being returned
+        """
+        self.instrumentation.increment(
+            "queries",
+            labels={"operation": response["operation"], "status": response["status"]}
+        )
+
+    def query_db_stream(self, nl_query: str, batch_size: Optional[int] = None,
+                        max_rows: Optional[int] = None,
+                        max_bytes: Optional[int] = None,
+                        include_timings: bool = False,
+                        hold_connection: bool = True) -> Dict[str, Any]:
+        """
+        Process a natural language query, streaming READ results instead of
+        materializing them.
+        
+        READ queries run through a server-side cursor; the response holds the
+        first batch of rows under `results` and a ResultStream under `stream`
+        for fetching the rest on demand. `truncated` reports whether a cap was
+        hit within the first batch; `stream.truncated` is authoritative once
+        more rows are read. Other operations behave exactly like `query_db`.
+        The result cache is bypassed for streamed reads. Without
+        `hold_connection`, the stream gives its connection back after every
+        batch and runs the query again for the next one (see ResultStream).
+        
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+            batch_size (Optional[int]): Rows per batch; defaults to STREAMING_CONFIG
+            max_rows (Optional[int]): Row cap; defaults to STREAMING_CONFIG
+            max_bytes (Optional[int]): Cap on estimated row bytes; defaults to STREAMING_CONFIG
+            include_timings (bool): Add the per-stage `timings` section to the response;
+                for READs it covers the first batch only
+            hold_connection (bool): Keep the stream's connection checked out between
+                batches; False for front ends that may never fetch the next batch
             
-            if operation == OperationType.UNKNOWN or not sql_query:
+        Returns:
+            Dict[str, Any]: Standardized response (see `query_db`); for successful
+                READs additionally:
+                - stream: ResultStream positioned after the first batch
+                - truncated: Whether the row or byte cap has been reached
+                
+        Example:
+            >>> response = processor.query_db_stream("Show me all invoices")
+            >>> first_page = response["results"]
+            >>> for batch in response["stream"]:
+            ...     handle(batch)
+        """
+        with trace_query(self.instrumentation, include_timings) as trace:
+            response = self._query_stream(nl_query, batch_size, max_rows, max_bytes, hold_connection)
+            self._record_outcome(response)
+        if include_timings:
+            response["timings"] = trace.timings()
+        return response
+
+    def _query_stream(self, nl_query: str, batch_size: Optional[int], max_rows: Optional[int],
+                      max_bytes: Optional[int], hold_connection: bool = True) -> Dict[str, Any]:
+        """
+        Generate a query and open a result stream for it, see `query_db_stream`.
+        
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+            batch_size (Optional[int]): Rows per batch
+            max_rows (Optional[int]): Row cap
+            max_bytes (Optional[int]): Cap on estimated row bytes
+            hold_connection (bool): Keep the stream's connection between batches
+            
+        Returns:
+            Dict[str, Any]: Standardized response, see `query_db_stream`
+        """
+        try:
+            operation, sql_query = self._generate_query(nl_query)
+            if operation != OperationType.READ or not sql_query:
+                return self._respond(operation, sql_query)
+
+            # The stream caps the rows it fetches, so no LIMIT is injected.
+            decision = self._guard(operation, sql_query, limit_rows=False)
+            if decision is not None and decision.action == "reject":
+                return self._rejected(operation, decision)
+
+            try:
+                with stage("execution"):
+                    replica = self._route_read(sql_query)
+                    stream = ResultStream(
+                        self.pool if replica is None else replica.pool,
+                        sql_query,
+                        batch_size=batch_size or STREAMING_CONFIG["batch_size"],
+                        max_rows=STREAMING_CONFIG["max_rows"] if max_rows is None else max_rows,
+                        max_bytes=STREAMING_CONFIG["max_bytes"] if max_bytes is None else max_bytes,
+                        settings=decision.settings if decision is not None else None,
+                        idle_timeout=STREAMING_CONFIG["idle_timeout"],
+                        hold_connection=hold_connection
+                    )
+                with stage("materialization"):
+                    first_batch = stream.fetch_batch()
+            except Exception as e:
                 return self._format_response(
-                    operation=OperationType.UNKNOWN,
+                    operation=operation,
                     status="error",
                     sql_query=sql_query,
-                    message="Failed to determine operation type or generate valid query"
+                    message=str(e)
                 )
+            add_count("rows", len(first_batch))
+            add_count("bytes", stream.bytes_fetched)
+            if self.workload_log is not None:
+                self.workload_log.record(sql_query)
+
+            response = self._format_response(
+                operation=operation,
+                status="success",
+                sql_query=sql_query,
+                results=first_batch
+            )
+            response["stream"] = stream
+            response["truncated"] = stream.truncated
+            if decision is not None:
+                response["guard"] = decision.as_dict()
+            return response
+
+        except Exception as e:
+            return self._format_response(
+                operation=OperationType.UNKNOWN,
+                status="error",
+                sql_query=sql_query if 'sql_query' in locals() else None,
+                message=str(e)
+            )
+
+    def query_db_columnar(self, nl_query: str, batch_size: Optional[int] = None,
+                          max_rows: Optional[int] = None, include_timings: bool = False) -> Dict[str, Any]:
+        """
+        Process a natural language query, returning READ results in columnar form.
+        
+        READ queries run through a server-side cursor and are collected into
+        typed Arrow columns batch by batch, without building a dict per row;
+        low-cardinality string columns are dictionary-encoded. `results` holds a
+        ColumnarResult, which hands the data to Arrow without copying
+        (`to_arrow`) or converts it to pandas (`to_pandas`). Other operations
+        behave exactly like `query_db`. The result cache is bypassed.
+        
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+            batch_size (Optional[int]): Rows per round trip; defaults to COLUMNAR_CONFIG
+            max_rows (Optional[int]): Row cap; defaults to COLUMNAR_CONFIG
+            include_timings (bool): Add the per-stage `timings` section to the response
             
-            results, error = self._execute_query(operation, sql_query)
+        Returns:
+            Dict[str, Any]: Standardized response (see `query_db`); for successful
+                READs `results` is a ColumnarResult and `truncated` reports
+                whether the row cap was reached
+                
+        Example:
+            >>> response = processor.query_db_columnar("Customers per country")
+            >>> df = response["results"].to_pandas()
+        """
+        with trace_query(self.instrumentation, include_timings) as trace:
+            response = self._query_columnar(nl_query, batch_size, max_rows)
+            self._record_outcome(response)
+        if include_timings:
+            response["timings"] = trace.timings()
+        return response
+
+    def _query_columnar(self, nl_query: str, batch_size: Optional[int],
+                        max_rows: Optional[int]) -> Dict[str, Any]:
+        """
+        Generate a query and run READs in columnar form, see `query_db_columnar`.
+        
+        Args:
+            nl_query (str): Natural language query describing the desired operation
+            batch_size (Optional[int]): Rows per round trip; defaults to COLUMNAR_CONFIG
+            max_rows (Optional[int]): Row cap; defaults to COLUMNAR_CONFIG
             
-            if error:
+        Returns:
+            Dict[str, Any]: Standardized response, see `query_db_columnar`
+        """
+        from columnar import execute_columnar
+
+        try:
+            operation, sql_query = self._generate_query(nl_query)
+            if operation != OperationType.READ or not sql_query:
+                return self._respond(operation, sql_query)
+
+            decision = self._guard(operation, sql_query, limit_rows=False)
+            if decision is not None and decision.action == "reject":
+                return self._rejected(operation, decision)
+
+            try:
+                with self._get_db_connection(self._route_read(sql_query)) as conn:
+                    if decision is not None and decision.settings:
+                        with conn.cursor() as cur:
+                            cur.execute(settings_sql(decision.settings))
+                    with stage("execution"):
+                        result = execute_columnar(
+                            conn,
+                            sql_query,
+                            batch_size=batch_size or COLUMNAR_CONFIG["batch_size"],
+                            max_rows=COLUMNAR_CONFIG["max_rows"] if max_rows is None else max_rows,
+                            max_dictionary_size=COLUMNAR_CONFIG["max_dictionary_size"]
+                        )
+                    add_count("rows", result.num_rows)
+            except Exception as e:
                 return self._format_response(
                     operation=operation,
                     status="error",
                     sql_query=sql_query,
-                    message=error
+                    message=str(e)
                 )
-            
-            return self._format_response(
+
+            if self.workload_log is not None:
+                self.workload_log.record(sql_query)
+            response = self._format_response(
                 operation=operation,
                 status="success",
                 sql_query=sql_query,
-                results=results
+                results=result
             )
+            response["truncated"] = result.truncated
+            if decision is not None:
+                response["guard"] = decision.as_dict()
+            return response
+
+        except Exception as e:
+            return self._format_response(
+                operation=OperationType.UNKNOWN,
+                status="error",
+                sql_query=sql_query if 'sql_query' in locals() else None,
+                message=str(e)
+            )
+
+    def query_db_export(self, nl_query: str, out: Union[str, BinaryIO], file_format: str = "csv",
+                        include_timings: bool = False) -> Dict[str, Any]:
+        """
+        Process a natural language READ query, exporting its result to a file.
+        
+        The generated SELECT runs as `COPY (...) TO STDOUT` and is streamed to
+        `out` as CSV or as Parquet row groups (see `export.export_query`), so
+        the result is never materialized as rows in Python, whatever its size.
+        The cost guard still applies, without an injected LIMIT, and exports
+        run on a replica when one is usable. Only read-only READ queries are
+        exported; any other operation is answered with an error and not run.
+        
+        Args:
+            nl_query (str): Natural language query describing the data to export
+            out (Union[str, BinaryIO]): File path or binary file object to write to
+            file_format (str): "csv" or "parquet"
+            include_timings (bool): Add the per-stage `timings` section to the response
+            
+        Returns:
+            Dict[str, Any]: Standardized response (see `query_db`) without
+                `results`; successful exports add `export` with the format,
+                rows, CSV bytes copied, seconds taken and, for Parquet, row groups
+                
+        Example:
+            >>> response = processor.query_db_export("All invoices of 2011", "invoices.parquet",
+            ...                                      file_format="parquet")
+            >>> response["export"]["rows"]
+            12873
+        """
+        with trace_query(self.instrumentation, include_timings) as trace:
+            response = self._query_export(nl_query, out, file_format)
+            self._record_outcome(response)
+        if include_timings:
+            response["timings"] = trace.timings()
+        return response
+
+    def export_sql(self, sql_query: str, out: Union[str, BinaryIO], file_format: str = "csv",
+                   include_timings: bool = False) -> Dict[str, Any]:
+        """
+        Export the result of an already generated READ query to a file.
+        
+        Use this to export exactly the query a user was shown, e.g. the
+        `sql_query` of an earlier `query_db_stream` response, instead of
+        generating it again from the question, which may give a different
+        query. The query is checked as in `query_db_export`: it must be a
+        single read-only statement and pass the cost guard.
+        
+        Args:
+            sql_query (str): READ query to export
+            out (Union[str, BinaryIO]): File path or binary file object to write to
+            file_format (str): "csv" or "parquet"
+            include_timings (bool): Add the per-stage `timings` section to the response
             
+        Returns:
+            Dict[str, Any]: Response as for `query_db_export`
+        """
+        with trace_query(self.instrumentation, include_timings) as trace:
+            try:
+                response = self._export(OperationType.READ, sql_query, out, file_format)
+            except Exception as e:
+                response = self._format_response(
+                    operation=OperationType.READ,
+                    status="error",
+                    sql_query=sql_query,
+                    message=str(e)
+                )
+            self._record_outcome(response)
+        if include_timings:
+            response["timings"] = trace.timings()
+        return response
+
+    def _query_export(self, nl_query: str, out: Union[str, BinaryIO], file_format: str) -> Dict[str, Any]:
+        """
+        Generate a READ query and export its result, see `query_db_export`.
+        
+        Args:
+            nl_query (str): Natural language query describing the data to export
+            out (Union[str, BinaryIO]): File path or binary file object to write to
+            file_format (str): "csv" or "parquet"
+            
+        Returns:
+            Dict[str, Any]: Standardized response, see `query_db_export`
+        """
+        try:
+            operation, sql_query = self._generate_query(nl_query)
+            return self._export(operation, sql_query, out, file_format)
         except Exception as e:
             return self._format_response(
                 operation=OperationType.UNKNOWN,
                 status="error",
                 sql_query=sql_query if 'sql_query' in locals() else None,
                 message=str(e)
-            )
\ No newline at end of file
+            )
+
+    def _export(self, operation: OperationType, sql_query: str, out: Union[str, BinaryIO],
+                file_format: str) -> Dict[str, Any]:
+        """
+        Guard a READ query and export its result, see `query_db_export`.
+        
+        Args:
+            operation (OperationType): Operation type of the query
+            sql_query (str): Query to export
+            out (Union[str, BinaryIO]): File path or binary file object to write to
+            file_format (str): "csv" or "parquet"
+            
+        Returns:
+            Dict[str, Any]: Standardized response, see `query_db_export`
+        """
+        from export import export_query
+
+        if (operation != OperationType.READ or not sql_query or not is_read_only(sql_query)
+                or not is_single_statement(sql_query)):
+            return self._format_response(
+                operation=operation,
+                status="error",
+                sql_query=sql_query,
+                message="Only read-only READ queries can be exported"
+            )
+
+        decision = self._guard(operation, sql_query, limit_rows=False)
+        if decision is not None and decision.action == "reject":
+            return self._rejected(operation, decision)
+
+        try:
+            with stage("execution"):
+                with self._get_db_connection(self._route_read(sql_query)) as conn:
+                    if decision is not None and decision.settings:
+                        with conn.cursor() as cur:
+                            cur.execute(settings_sql(decision.settings))
+                    summary = export_query(conn, sql_query, out, file_format=file_format, **EXPORT_CONFIG)
+        except Exception as e:
+            return self._format_response(
+                operation=operation,
+                status="error",
+                sql_query=sql_query,
+                message=str(e)
+            )
+        add_count("rows", summary["rows"])
+        add_count("bytes", summary["bytes"])
+        if self.workload_log is not None:
+            self.workload_log.record(sql_query)
+
+        response = self._format_response(
+            operation=operation,
+            status="success",
+            sql_query=sql_query
+        )
+        del response["results"]
+        response["export"] = summary
+        if decision is not None:
+            response["guard"] = decision.as_dict()
+        return response
+
+    def query_db_many(self, nl_queries: List[str], max_concurrency: Optional[int] = None,
+                      requests_per_minute: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Process a batch of natural language queries and return their responses in order.
+        
+        Identical questions (after normalization) are generated once. SQL is
+        generated concurrently, limited to `max_concurrency` model calls in
+        flight and `requests_per_minute` model calls started (hedged calls
+        included). Execution follows the input order wherever it matters: the
+        READ queries before the first INSERT/UPDATE/DELETE are executed on the
+        shared pool as soon as their SQL is ready, in parallel with the
+        remaining generations, and run once per distinct question. From the
+        first write on, queries run one at a time in input order once
+        generation has finished; every write runs as often as it is asked,
+        and a READ is only shared with an identical READ when no write ran in
+        between. A failure in one question only affects that question's response.
+        
+        Args:
+            nl_queries (List[str]): Natural language queries
+            max_concurrency (Optional[int]): Concurrent model calls; defaults to
+                BATCH_CONFIG["max_concurrency"]
+            requests_per_minute (Optional[float]): Model call rate limit; defaults to
+                BATCH_CONFIG["requests_per_minute"], None disables limiting
+                
+        Returns:
+            List[Dict[str, Any]]: One standardized response per input query, see `query_db`
+            
+        Example:
+            >>> responses = processor.query_db_many(["Top 10 products", "Customers per country"])
+        """
+        max_concurrency = max_concurrency or BATCH_CONFIG["max_concurrency"]
+        if requests_per_minute is None:
+            requests_per_minute = BATCH_CONFIG["requests_per_minute"]
+        rate_limiter = RateLimiter.per_minute(requests_per_minute) if requests_per_minute else None
+
+        keys = [normalize_question(nl_query) for nl_query in nl_queries]
+        unique: Dict[str, str] = {}
+        for key, nl_query in zip(keys, nl_queries):
+            unique.setdefault(key, nl_query)
+
+        failures: Dict[str, Dict[str, Any]] = {}
+        generated: Dict[str, Tuple[OperationType, str]] = {}
+        reads: Dict[str, Future] = {}
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(nl_queries)
+        # Positions before `ready` are settled: failed, or READs submitted early.
+        ready = 0
+
+        def generate(nl_query: str) -> Tuple[OperationType, str]:
+            return self._generate_query(nl_query, rate_limiter=rate_limiter)
+
+        def respond(operation: OperationType, sql_query: str) -> Dict[str, Any]:
+            try:
+                return self._respond(operation, sql_query)
+            except Exception as e:
+                return self._format_response(
+                    operation=operation,
+                    status="error",
+                    sql_query=sql_query,
+                    message=str(e)
+                )
+
+        db_workers = min(self.pool.max_size, max(len(unique), 1))
+        with ThreadPoolExecutor(max_workers=max_concurrency) as generators, \
+                ThreadPoolExecutor(max_workers=db_workers) as executors:
+            futures = {generators.submit(generate, nl_query): key for key, nl_query in unique.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    generated[key] = future.result()
+                except Exception as e:
+                    failures[key] = self._format_response(
+                        operation=OperationType.UNKNOWN,
+                        status="error",
+                        sql_query=None,
+                        message=str(e)
+                    )
+
+                # Start the READs whose predecessors are all generated READs.
+                while ready < len(keys) and (keys[ready] in generated or keys[ready] in failures):
+                    key = keys[ready]
+                    if key in generated:
+                        operation, sql_query = generated[key]
+                        if operation != OperationType.READ or not sql_query:
+                            break
+                        if key not in reads:
+                            reads[key] = executors.submit(respond, operation, sql_query)
+                    ready += 1
+            for position in range(ready):
+                key = keys[position]
+                responses[position] = failures[key] if key in failures else reads[key].result()
+
+        # From the first write on, in input order.
+        shared_reads: Dict[str, Dict[str, Any]] = {}
+        for position in range(ready, len(keys)):
+            key = keys[position]
+            if key in failures:
+                responses[position] = failures[key]
+                continue
+            operation, sql_query = generated[key]
+            if operation == OperationType.READ and sql_query:
+                if key not in shared_reads:
+                    shared_reads[key] = respond(operation, sql_query)
+                responses[position] = shared_reads[key]
+            else:
+                responses[position] = respond(operation, sql_query)
+                shared_reads.clear()
+        return responses
+
+    def recommend_indexes(self, apply: bool = False,
+                          advisor_config: Optional[Dict[str, Any]] = None) -> List[IndexRecommendation]:
+        """
+        Recommend indexes for the SQL executed so far against this database.
+        
+        The workload log is shared by every processor for the same target.
+        With `apply`, the recommended indexes are created with CREATE INDEX
+        CONCURRENTLY and the cost guard's cached plans are dropped.
+        
+        Args:
+            apply (bool): Create the recommended indexes
+            advisor_config (Optional[Dict[str, Any]]): IndexAdvisor settings; defaults
+                to INDEX_ADVISOR_CONFIG
+            
+        Returns:
+            List[IndexRecommendation]: Recommendations, largest cost reduction first
+            
+        Raises:
+            RuntimeError: If the workload log is disabled or hypopg is not available
+            ValueError: If the configuration asks for "rollback" costing, which
+                builds every candidate on this live database
+        """
+        if self.workload_log is None:
+            raise RuntimeError("The workload log is disabled")
+        advisor_config = dict(INDEX_ADVISOR_CONFIG if advisor_config is None else advisor_config)
+        if advisor_config.get("method", "hypopg") != "hypopg":
+            raise ValueError("Only hypopg costing runs against the live database; "
+                             "use `python index_advisor.py --method rollback` on a scratch copy")
+        advisor = IndexAdvisor(self.connection_params, pool=self.pool, **advisor_config)
+        recommendations = advisor.recommend(self.workload_log.queries())
+        if apply and recommendations:
+            advisor.apply(recommendations)
+            if self.query_guard is not None:
+                self.query_guard.clear()
+        return recommendations
+
+    def template_stats(self, limit: Optional[int] = None, order_by: str = "calls") -> List[Dict[str, Any]]:
+        """
+        Return execution statistics per query template for this database.
+        
+        Questions whose SQL differs only in its literals share a template, so
+        the statistics show which query shapes are asked most and cost most.
+        
+        Args:
+            limit (Optional[int]): Templates to return at most
+            order_by (str): "calls", "total_seconds", "mean_ms" or "errors", descending
+            
+        Returns:
+            List[Dict[str, Any]]: Statistics per template, see `QueryTemplates.stats`
+            
+        Raises:
+            RuntimeError: If query templates are disabled
+        """
+        if self.query_templates is None:
+            raise RuntimeError("Query templates are disabled")
+        return self.query_templates.stats(limit=limit, order_by=order_by)
+
+    def close(self) -> None:
+        """
+        Release everything held for this processor's database.
+        
+        Stops the rollup refresher and the hedging threads, closes the shared
+        pools (primary and replicas) and the schema catalog's LISTEN
+        connection, and drops the schema catalog, result cache, guard,
+        workload log and templates shared for `connection_params`, so their
+        memory and connections are given back. The schema indexes and
+        in-memory generation cache entries of this schema are dropped as well
+        unless another open catalog compiled the same schema. Other processors
+        for the same database lose them too; `get_processor` builds a new
+        processor once the pool is closed.
+        """
+        with _PROCESSORS_LOCK:
+            if _PROCESSORS.get(pool_key(self.connection_params)) is self:
+                del _PROCESSORS[pool_key(self.connection_params)]
+        if self.hedger is not None:
+            self.hedger.close()
+        release_rollup_manager(self.connection_params)
+        release_router(self.connection_params)
+        fingerprints = self.schema_catalog.fingerprints()
+        release_schema_catalog(self.connection_params)
+        for fingerprint in fingerprints - catalog_fingerprints():
+            release_schema_index(fingerprint)
+            if self.generation_cache is not None:
+                self.generation_cache.forget(fingerprint)
+        release_result_cache(self.connection_params)
+        release_query_guard(self.connection_params)
+        release_workload_log(self.connection_params)
+        release_query_templates(self.connection_params)
+        close_pool(self.connection_params)
+
+_PROCESSORS: Dict[Tuple, NLToPostgresProcessor] = {}
+_PROCESSORS_LOCK = threading.Lock()
+
+def get_processor(connection_params: Dict[str, Any], table_metadata: Dict[str, str],
+                  **processor_config) -> NLToPostgresProcessor:
+    """
+    Return the process-wide processor for a connection target, creating it on first use.
+
+    The processor holds no per-question state, so one instance (with its model,
+    pool and caches) serves every session and thread of a long-running
+    front end instead of being rebuilt for each request. The table metadata
+    and configuration are only applied when the processor is created.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        table_metadata (Dict[str, str]): Mapping of table names to their descriptions
+        **processor_config: Keyword arguments forwarded to NLToPostgresProcessor on creation
+
+    Returns:
+        NLToPostgresProcessor: The shared processor for this target
+    """
+    key = pool_key(connection_params)
+    with _PROCESSORS_LOCK:
+        processor = _PROCESSORS.get(key)
+        if processor is None or processor.pool.closed:
+            processor = NLToPostgresProcessor(connection_params, table_metadata, **processor_config)
+            _PROCESSORS[key] = processor
+        return processor
@@ -0,0 +1,246 @@
+import io
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Any, Optional, Union, BinaryIO
+from psycopg2 import sql
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+def copy_statement(sql_query: str, header: bool = True) -> sql.Composed:
+    """
+    Wrap a READ query in `COPY (...) TO STDOUT` producing CSV.
+
+    NULLs are written as unquoted empty fields and empty strings as `""`, so
+    the two stay distinguishable.
+
+    Args:
+        sql_query (str): READ query
+        header (bool): Write the column names as the first line
+
+    Returns:
+        sql.Composed: The COPY statement
+    """
+    return sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER {})").format(
+        sql.SQL(sql_query.strip().rstrip(";")),
+        sql.SQL("true" if header else "false")
+    )
+
+def _open(out: Union[str, BinaryIO]):
+    """
+    Open an export target for writing.
+
+    Args:
+        out (Union[str, BinaryIO]): File path or binary file object
+
+    Returns:
+        Tuple[BinaryIO, bool]: The file object and whether it was opened here
+    """
+    if isinstance(out, str):
+        return open(out, "wb"), True
+    return out, False
+
+class _CopySink(ABC):
+    """
+    File object `copy_expert` writes COPY output to.
+
+    The server sends one CSV row per message and psycopg2 writes each message
+    separately, so every `write` receives exactly one row. Rows are buffered
+    and handed to `flush_rows` in chunks of about `chunk_size` bytes, or of
+    `chunk_rows` rows, keeping memory bounded by one chunk. Subclasses
+    implement `flush_rows`.
+
+    Args:
+        chunk_size (int): Bytes per chunk
+        chunk_rows (Optional[int]): Rows per chunk, None for no row limit
+    """
+
+    def __init__(self, chunk_size: int, chunk_rows: Optional[int] = None):
+        self.chunk_size = chunk_size
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.bytes = 0
+        self._chunk: List[bytes] = []
+        self._chunk_bytes = 0
+
+    def write(self, data: Union[bytes, str]) -> int:
+        if isinstance(data, str):
+            data = data.encode()
+        self._chunk.append(data)
+        self._chunk_bytes += len(data)
+        self.rows += 1
+        self.bytes += len(data)
+        if self._chunk_bytes >= self.chunk_size or len(self._chunk) == self.chunk_rows:
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        if self._chunk:
+            self.flush_rows(self._chunk)
+            self._chunk = []
+            self._chunk_bytes = 0
+
+    @abstractmethod
+    def flush_rows(self, rows: List[bytes]) -> None:
+        """
+        Write out one chunk of rows.
+
+        Args:
+            rows (List[bytes]): CSV rows, each ending with its newline
+        """
+
+class _CsvSink(_CopySink):
+    """
+    Writes COPY output to a file in chunks.
+
+    Args:
+        out (BinaryIO): Target file object
+        chunk_size (int): Bytes per write to `out`
+    """
+
+    def __init__(self, out: BinaryIO, chunk_size: int):
+        super().__init__(chunk_size)
+        self.out = out
+
+    def flush_rows(self, rows: List[bytes]) -> None:
+        self.out.write(b"".join(rows))
+
+class _ParquetSink(_CopySink):
+    """
+    Converts COPY output to Parquet, one row group per chunk of rows.
+
+    Args:
+        out (BinaryIO): Target file object
+        columns (List[str]): Column names
+        types (List[pyarrow.DataType]): Column types
+        row_group_size (int): Rows per row group
+        compression (str): Parquet compression codec
+    """
+
+    def __init__(self, out: BinaryIO, columns: List[str], types: List[Any], row_group_size: int,
+                 compression: str):
+        # Row groups are cut by row count only.
+        super().__init__(chunk_size=float("inf"), chunk_rows=row_group_size)
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+        self.read_options = pa_csv.ReadOptions(column_names=columns, block_size=64 * 1024 * 1024)
+        # COPY quotes values holding newlines, which stay one value.
+        self.parse_options = pa_csv.ParseOptions(newlines_in_values=True)
+        self.convert_options = pa_csv.ConvertOptions(
+            column_types=dict(zip(columns, types)),
+            true_values=["t"],
+            false_values=["f"],
+            null_values=[""],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False
+        )
+        self.writer = pq.ParquetWriter(out, pa.schema(list(zip(columns, types))), compression=compression)
+        self.row_groups = 0
+        self._read_csv = pa_csv.read_csv
+
+    def flush_rows(self, rows: List[bytes]) -> None:
+        table = self._read_csv(
+            io.BytesIO(b"".join(rows)),
+            read_options=self.read_options,
+            parse_options=self.parse_options,
+            convert_options=self.convert_options
+        )
+        self.writer.write_table(table, row_group_size=len(rows))
+        self.row_groups += 1
+
+def _arrow_types(cur, sql_query: str):
+    """
+    Arrow types of a query's result columns, from its cursor description.
+
+    Types follow `columnar.PG_ARROW_TYPES`; types without an Arrow
+    counterpart there (text, json, intervals, arrays...) are kept as strings.
+    Repeated column names get a `_<n>` suffix, as Parquet readers cannot
+    select between columns of the same name.
+
+    Args:
+        cur (psycopg2.extensions.cursor): Cursor of the export connection
+        sql_query (str): READ query
+
+    Returns:
+        Tuple[List[str], List[pyarrow.DataType]]: Column names and types
+    """
+    import pyarrow as pa
+    from columnar import PG_ARROW_TYPES, PG_NUMERIC, _numeric_type
+
+    cur.execute(sql.SQL("SELECT * FROM ({}) AS export LIMIT 0").format(sql.SQL(sql_query.strip().rstrip(";"))))
+    columns: List[str] = []
+    for column in cur.description:
+        name, suffix = column.name, 1
+        while name in columns:
+            name, suffix = f"{column.name}_{suffix}", suffix + 1
+        columns.append(name)
+    types = [
+        _numeric_type(column.precision, column.scale) if column.type_code == PG_NUMERIC
+        else PG_ARROW_TYPES.get(column.type_code, pa.string())
+        for column in cur.description
+    ]
+    return columns, types
+
+def export_query(conn, sql_query: str, out: Union[str, BinaryIO], file_format: str = "csv",
+                 chunk_size: int = 1024 * 1024, row_group_size: int = 100000,
+                 compression: str = "snappy") -> Dict[str, Any]:
+    """
+    Stream the result of a READ query to a CSV or Parquet file with COPY.
+
+    The query runs as `COPY (...) TO STDOUT` and its rows are written out as
+    they arrive: CSV in chunks of `chunk_size` bytes, Parquet in row groups
+    of `row_group_size` rows. At most one chunk or row group is held in
+    memory, whatever the size of the result. Parquet exports run in the
+    connection's transaction with TimeZone UTC and ISO dates, so timestamps
+    parse into their Arrow types.
+
+    Args:
+        conn (psycopg2.extensions.connection): Connection to run the query on
+        sql_query (str): READ query
+        out (Union[str, BinaryIO]): File path or binary file object to write to
+        file_format (str): "csv" or "parquet"
+        chunk_size (int): Bytes per CSV write
+        row_group_size (int): Rows per Parquet row group
+        compression (str): Parquet compression codec
+
+    Returns:
+        Dict[str, Any]: `format`, `rows` exported, `bytes` of CSV copied from
+            the server, `row_groups` for Parquet and `seconds` taken
+
+    Raises:
+        ValueError: If `file_format` is not supported
+        psycopg2.Error: If the query fails
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    start = time.perf_counter()
+    target, opened = _open(out)
+    try:
+        with conn.cursor() as cur:
+            if file_format == "csv":
+                sink = _CsvSink(target, chunk_size)
+                cur.copy_expert(copy_statement(sql_query, header=True).as_string(conn), sink)
+                sink.flush()
+                rows = sink.rows - 1 if sink.rows else 0
+            else:
+                cur.execute("SET LOCAL TimeZone = 'UTC'; SET LOCAL DateStyle = 'ISO, YMD'")
+                columns, types = _arrow_types(cur, sql_query)
+                sink = _ParquetSink(target, columns, types, row_group_size, compression)
+                try:
+                    cur.copy_expert(copy_statement(sql_query, header=False).as_string(conn), sink)
+                    sink.flush()
+                finally:
+                    sink.writer.close()
+                rows = sink.rows
+    finally:
+        if opened:
+            target.close()
+    summary = {
+        "format": file_format,
+        "rows": rows,
+        "bytes": sink.bytes,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    if file_format == "parquet":
+        summary["row_groups"] = sink.row_groups
+    return summary
@@ -0,0 +1,354 @@
+import re
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Tuple, Optional, Callable
+from schema_retrieval import STOPWORDS, tokenize
+
+# Quantifier and ordering words change the SQL a question needs ("top 10
+# products" vs "10 products"), so unlike in schema retrieval they are kept
+# when comparing questions.
+QUESTION_STOPWORDS = STOPWORDS - {"top", "most", "many", "much", "all", "each", "every", "per", "than", "show"}
+
+# Questions only match when they use the same ranking words, as they do numbers.
+ORDERING_WORDS = frozenset("""
+top bottom most least fewest highest lowest largest smallest biggest best worst first last
+latest earliest oldest newest max min maximum minimum ascending descending
+""".split())
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a natural language question for cache lookups.
+
+    Lowercases, replaces punctuation with spaces and collapses whitespace, so
+    "Top 10 products by quantity?" and "top 10  products by quantity" match.
+
+    Args:
+        question (str): Natural language question
+
+    Returns:
+        str: Normalized question
+    """
+    return " ".join(re.sub(r'[^\w\s]', ' ', question.lower()).split())
+
+def _numbers(question: str) -> List[str]:
+    """
+    Extract the numeric literals of a normalized question in order.
+
+    Args:
+        question (str): Normalized question
+
+    Returns:
+        List[str]: Numbers appearing in the question
+    """
+    return re.findall(r'\d+', question)
+
+def _ordering(question: str) -> List[str]:
+    """
+    Extract the ranking words (ORDERING_WORDS) of a normalized question.
+
+    Args:
+        question (str): Normalized question
+
+    Returns:
+        List[str]: Sorted distinct ranking words in the question
+    """
+    return sorted(ORDERING_WORDS.intersection(question.split()))
+
+class GenerationCache:
+    """
+    Cache of generated SQL keyed by normalized question and schema fingerprint.
+
+    Entries live in an in-memory LRU bounded by `max_entries` and expire after
+    `ttl` seconds. With `sqlite_path` set, entries are also written to a SQLite
+    file so they survive restarts. With `similarity_threshold` set, a miss
+    falls back to the most similar cached question for the same fingerprint,
+    using `embedder` cosine similarity if given and term overlap otherwise;
+    questions whose numbers differ ("top 5" vs "top 10") or whose ranking
+    words differ ("top 10" vs "10", "most" vs "least") never match. The
+    question is embedded once per lookup, outside the lock.
+
+    Attributes:
+        max_entries (int): Maximum number of in-memory entries
+        ttl (Optional[float]): Seconds an entry stays valid; None disables expiry
+        similarity_threshold (Optional[float]): Minimum similarity for a fuzzy hit
+
+    Args:
+        max_entries (int): Maximum number of in-memory entries
+        ttl (Optional[float]): Seconds an entry stays valid; None disables expiry
+        sqlite_path (Optional[str]): Path of the on-disk cache, if any
+        similarity_threshold (Optional[float]): Minimum similarity in [0, 1] for a
+            fuzzy hit; None disables fuzzy matching
+        embedder (Optional[Callable[[List[str]], List[List[float]]]]): Local
+            embedding function used for similarity
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: Optional[float] = 3600.0,
+                 sqlite_path: Optional[str] = None, similarity_threshold: Optional[float] = None,
+                 embedder: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embedder = embedder
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, str, float]]" = OrderedDict()
+        self._vectors: Dict[Tuple[str, str], List[float]] = {}
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "similar_hits": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS generation_cache ("
+                "fingerprint TEXT NOT NULL, question TEXT NOT NULL, operation TEXT NOT NULL, "
+                "sql_query TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (fingerprint, question))"
+            )
+            self._db.commit()
+
+    def _expired(self, created_at: float) -> bool:
+        """
+        Check whether an entry created at `created_at` is past the TTL.
+
+        Args:
+            created_at (float): Wall-clock creation time of the entry
+
+        Returns:
+            bool: True if the entry must not be served
+        """
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _embed(self, question: str) -> Optional[List[float]]:
+        """
+        Embed a normalized question for similarity lookups. Call without the lock held.
+
+        Args:
+            question (str): Normalized question
+
+        Returns:
+            Optional[List[float]]: The embedding, None without an embedder or
+                with fuzzy matching disabled
+        """
+        if not self.embedder or self.similarity_threshold is None:
+            return None
+        return self.embedder([question])[0]
+
+    def _store(self, key: Tuple[str, str], entry: Tuple[str, str, float],
+               vector: Optional[List[float]] = None) -> None:
+        """
+        Insert an entry into the in-memory LRU. Must be called with the lock held.
+
+        Args:
+            key (Tuple[str, str]): (fingerprint, normalized question)
+            entry (Tuple[str, str, float]): (operation, sql_query, created_at)
+            vector (Optional[List[float]]): Embedding of the question, see `_embed`
+        """
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if vector is not None:
+            self._vectors[key] = vector
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._vectors.pop(evicted, None)
+            self._metrics["evictions"] += 1
+
+    def _similarity(self, key: Tuple[str, str], vector: Optional[List[float]],
+                    candidate: Tuple[str, str]) -> float:
+        """
+        Similarity between two normalized questions.
+
+        Args:
+            key (Tuple[str, str]): Key being looked up
+            vector (Optional[List[float]]): Embedding of the key's question
+            candidate (Tuple[str, str]): Cached key
+
+        Returns:
+            float: Similarity in [0, 1]
+        """
+        if _numbers(key[1]) != _numbers(candidate[1]) or _ordering(key[1]) != _ordering(candidate[1]):
+            return 0.0
+        if vector is not None and candidate in self._vectors:
+            a = vector
+            b = self._vectors[candidate]
+            dot = sum(x * y for x, y in zip(a, b))
+            norm = sum(x * x for x in a) ** 0.5 * sum(y * y for y in b) ** 0.5
+            return dot / norm if norm else 0.0
+        terms = set(tokenize(key[1], QUESTION_STOPWORDS))
+        other = set(tokenize(candidate[1], QUESTION_STOPWORDS))
+        if not terms or not other:
+            return 0.0
+        return len(terms & other) / len(terms | other)
+
+    def _find_similar(self, key: Tuple[str, str],
+                      vector: Optional[List[float]]) -> Optional[Tuple[str, str, float]]:
+        """
+        Find the most similar live entry for the same fingerprint. Lock must be held.
+
+        Args:
+            key (Tuple[str, str]): (fingerprint, normalized question)
+            vector (Optional[List[float]]): Embedding of the question, see `_embed`
+
+        Returns:
+            Optional[Tuple[str, str, float]]: The best entry above the threshold
+        """
+        best, best_score = None, self.similarity_threshold
+        for candidate, entry in self._entries.items():
+            if candidate[0] != key[0] or self._expired(entry[2]):
+                continue
+            score = self._similarity(key, vector, candidate)
+            if score >= best_score:
+                best, best_score = candidate, score
+        if best is None:
+            return None
+        self._entries.move_to_end(best)
+        return self._entries[best]
+
+    def get(self, question: str, fingerprint: str) -> Optional[Tuple[str, str]]:
+        """
+        Look up the SQL generated for a question against a schema.
+
+        Args:
+            question (str): Natural language question
+            fingerprint (str): Schema context fingerprint
+
+        Returns:
+            Optional[Tuple[str, str]]: (operation, sql_query) on a hit, None on a miss
+        """
+        key = (fingerprint, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[2]):
+                del self._entries[key]
+                self._vectors.pop(key, None)
+                self._metrics["expirations"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._metrics["hits"] += 1
+                return entry[0], entry[1]
+            if self._db is None and self.similarity_threshold is None:
+                self._metrics["misses"] += 1
+                return None
+
+        # Embedded once, outside the lock, then compared with the stored vectors.
+        vector = self._embed(key[1])
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT operation, sql_query, created_at FROM generation_cache "
+                    "WHERE fingerprint = ? AND question = ?",
+                    key
+                ).fetchone()
+                if row is not None and not self._expired(row[2]):
+                    self._store(key, row, vector)
+                    self._metrics["hits"] += 1
+                    self._metrics["disk_hits"] += 1
+                    return row[0], row[1]
+
+            if self.similarity_threshold is not None:
+                entry = self._find_similar(key, vector)
+                if entry is not None:
+                    self._metrics["hits"] += 1
+                    self._metrics["similar_hits"] += 1
+                    return entry[0], entry[1]
+
+            self._metrics["misses"] += 1
+            return None
+
+    def put(self, question: str, fingerprint: str, operation: str, sql_query: str) -> None:
+        """
+        Remember the SQL generated for a question against a schema.
+
+        Args:
+            question (str): Natural language question
+            fingerprint (str): Schema context fingerprint
+            operation (str): Operation type value, e.g. "READ"
+            sql_query (str): Generated SQL query
+        """
+        key = (fingerprint, normalize_question(question))
+        entry = (operation, sql_query, time.time())
+        vector = self._embed(key[1])
+        with self._lock:
+            self._store(key, entry, vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO generation_cache "
+                    "(fingerprint, question, operation, sql_query, created_at) VALUES (?, ?, ?, ?, ?)",
+                    key + entry
+                )
+                if self.ttl is not None:
+                    self._db.execute(
+                        "DELETE FROM generation_cache WHERE created_at < ?",
+                        (time.time() - self.ttl,)
+                    )
+                self._db.commit()
+
+    def forget(self, fingerprint: str) -> int:
+        """
+        Drop the in-memory entries of a schema fingerprint; the on-disk cache is kept.
+
+        Args:
+            fingerprint (str): Schema context fingerprint
+
+        Returns:
+            int: Entries dropped
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == fingerprint]
+            for key in keys:
+                del self._entries[key]
+                self._vectors.pop(key, None)
+        return len(keys)
+
+    def clear(self) -> None:
+        """
+        Drop every entry from memory and disk.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM generation_cache")
+                self._db.commit()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the cache counters.
+
+        Returns:
+            Dict[str, Any]: Hit/miss/eviction counters plus the current `size`
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["size"] = len(self._entries)
+        return snapshot
+
+_CACHES: Dict[Tuple, GenerationCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+def get_generation_cache(**cache_config) -> GenerationCache:
+    """
+    Return the process-wide generation cache for a configuration.
+
+    Args:
+        **cache_config: Keyword arguments forwarded to GenerationCache on creation
+
+    Returns:
+        GenerationCache: The shared cache
+    """
+    key = tuple(sorted((k, repr(v)) for k, v in cache_config.items()))
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = GenerationCache(**cache_config)
+            _CACHES[key] = cache
+        return cache
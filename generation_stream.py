@@ -0,0 +1,213 @@
+import json
+import threading
+from typing import Dict, Any, Optional, Iterable, AsyncIterable, NamedTuple
+
+class JSONObjectExtractor:
+    """
+    Incremental extractor of the first JSON object in a model response.
+
+    Text is fed as it arrives. Braces are counted outside of JSON strings,
+    honouring backslash escapes, so SQL containing `{`, `}` or escaped quotes
+    inside the "query" string does not end the object early. Candidates that
+    do not parse as a JSON object (e.g. braces in prose before the answer) are
+    skipped and scanning resumes after their opening brace.
+
+    Attributes:
+        result (Optional[Dict[str, Any]]): The extracted object, once complete
+        text (str): All text fed so far
+    """
+
+    def __init__(self):
+        self.result: Optional[Dict[str, Any]] = None
+        self._buffer = []
+        self._text = ""
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def text(self) -> str:
+        if self._buffer:
+            self._text += "".join(self._buffer)
+            self._buffer = []
+        return self._text
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """
+        Consume the next piece of response text.
+
+        Args:
+            chunk (str): Newly received text
+
+        Returns:
+            Optional[Dict[str, Any]]: The extracted object as soon as it is
+                complete, None until then
+        """
+        if self.result is not None:
+            return self.result
+        self._buffer.append(chunk)
+        text = self.text
+        i = self._pos
+        while i < len(text):
+            char = text[i]
+            if self._start < 0:
+                if char == "{":
+                    self._start, self._depth = i, 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        candidate = json.loads(text[self._start:i + 1])
+                    except ValueError:
+                        candidate = None
+                    if isinstance(candidate, dict):
+                        self.result = candidate
+                        self._pos = i + 1
+                        return candidate
+                    i, self._start = self._start, -1
+            i += 1
+        self._pos = i
+        return None
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract the first JSON object from a complete response text.
+
+    Falls back to decoding at every `{` when unbalanced braces or quotes in
+    the surrounding prose keep the incremental scan from closing the object.
+
+    Args:
+        text (str): Response text
+
+    Returns:
+        Optional[Dict[str, Any]]: The object, or None if the text contains none
+    """
+    result = JSONObjectExtractor().feed(text)
+    if result is not None:
+        return result
+    decoder = json.JSONDecoder()
+    start = text.find("{")
+    while start >= 0:
+        try:
+            candidate, _ = decoder.raw_decode(text, start)
+        except ValueError:
+            candidate = None
+        if isinstance(candidate, dict):
+            return candidate
+        start = text.find("{", start + 1)
+    return None
+
+class StreamedGeneration(NamedTuple):
+    """
+    Outcome of reading a streamed model response.
+
+    Has the `text` and `usage_metadata` attributes of a Vertex AI response,
+    so it can be passed wherever a blocking response is expected.
+
+    Attributes:
+        text (str): Text received before the stream ended or was cancelled
+        data (Optional[Dict[str, Any]]): The extracted JSON object, if any
+        chunks (int): Chunks received
+        cancelled (bool): True if the stream was closed before its end
+        usage_metadata (Optional[Any]): Usage metadata of the last chunk that had any
+    """
+    text: str
+    data: Optional[Dict[str, Any]]
+    chunks: int
+    cancelled: bool
+    usage_metadata: Optional[Any]
+
+def _chunk_text(chunk: Any) -> str:
+    """
+    Return the text of a streamed chunk; chunks without text (e.g. a final
+    chunk carrying only usage metadata or a safety verdict) yield "".
+    """
+    try:
+        return chunk.text or ""
+    except (AttributeError, ValueError):
+        return ""
+
+def _finish(extractor: JSONObjectExtractor, chunks: int, cancelled: bool,
+            usage: Optional[Any]) -> StreamedGeneration:
+    """
+    Build the outcome of a read stream, decoding the complete text when the
+    incremental scan found no object.
+    """
+    text = extractor.text
+    data = extractor.result if extractor.result is not None else extract_json_object(text)
+    return StreamedGeneration(text, data, chunks, cancelled, usage)
+
+def read_stream(chunks: Iterable[Any], cancel: bool = True,
+                stop: Optional[threading.Event] = None) -> StreamedGeneration:
+    """
+    Read a streamed response until its JSON object is complete.
+
+    Args:
+        chunks (Iterable[Any]): Response chunks, e.g. from
+            `generate_content(..., stream=True)`
+        cancel (bool): Stop reading and close the stream as soon as the object
+            is complete instead of draining the remaining chunks
+        stop (Optional[threading.Event]): Event that, once set, stops reading and
+            closes the stream, e.g. when another call already answered
+
+    Returns:
+        StreamedGeneration: Received text, extracted object and stream statistics
+    """
+    extractor = JSONObjectExtractor()
+    count, usage, cancelled, exhausted = 0, None, False, False
+    iterator = iter(chunks)
+    try:
+        for chunk in iterator:
+            count += 1
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if (extractor.feed(_chunk_text(chunk)) is not None and cancel
+                    or stop is not None and stop.is_set()):
+                cancelled = True
+                break
+        else:
+            exhausted = True
+    finally:
+        if not exhausted and hasattr(iterator, "close"):
+            iterator.close()
+    return _finish(extractor, count, cancelled, usage)
+
+async def read_stream_async(chunks: AsyncIterable[Any], cancel: bool = True) -> StreamedGeneration:
+    """
+    Async variant of `read_stream`, e.g. for `generate_content_async(..., stream=True)`.
+
+    Args:
+        chunks (AsyncIterable[Any]): Response chunks
+        cancel (bool): Stop reading and close the stream once the object is complete
+
+    Returns:
+        StreamedGeneration: Received text, extracted object and stream statistics
+    """
+    extractor = JSONObjectExtractor()
+    count, usage, cancelled, exhausted = 0, None, False, False
+    iterator = chunks.__aiter__()
+    try:
+        async for chunk in iterator:
+            count += 1
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if extractor.feed(_chunk_text(chunk)) is not None and cancel:
+                cancelled = True
+                break
+        else:
+            exhausted = True
+    finally:
+        if not exhausted and hasattr(iterator, "aclose"):
+            await iterator.aclose()
+    return _finish(extractor, count, cancelled, usage)
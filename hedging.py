@@ -0,0 +1,341 @@
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, List, Any, Optional, Callable, Awaitable, TypeVar
+
+T = TypeVar("T")
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile.
+
+    Args:
+        values (List[float]): Samples
+        pct (float): Percentile in [0, 100]
+
+    Returns:
+        float: The percentile value
+    """
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+class HedgedGenerator:
+    """
+    Hedged requests for model calls with a long latency tail.
+
+    A call is started and, if it has not produced a valid result by the
+    hedging deadline, another identical call is started alongside it, up to
+    `max_attempts` calls. A call that returns an invalid result is replaced
+    right away instead of waiting for the deadline. The first valid result
+    wins and the other calls are cancelled: their stop event is set (streamed
+    calls close their stream) and calls that have not started yet are dropped.
+
+    The deadline is a percentile of recent call latencies, so only the slow
+    tail is hedged. Extra calls are capped at `extra_call_budget` times the
+    number of questions plus `budget_burst`, which bounds the added model cost.
+
+    Attributes:
+        max_attempts (int): Calls per question at most, including the first
+        deadline_percentile (float): Latency percentile after which a hedge is sent
+        initial_deadline (float): Deadline in seconds until `min_samples` latencies are known
+        min_deadline (float): Lower bound of the deadline in seconds
+        min_samples (int): Latencies needed before the percentile is used
+        extra_call_budget (float): Extra calls allowed per question, on average
+        budget_burst (int): Extra calls allowed on top of the average budget
+
+    Args:
+        max_attempts (int): Calls per question at most, including the first
+        deadline_percentile (float): Latency percentile after which a hedge is sent
+        initial_deadline (float): Deadline in seconds until `min_samples` latencies are known
+        min_deadline (float): Lower bound of the deadline in seconds
+        min_samples (int): Latencies needed before the percentile is used
+        window (int): Recent call latencies kept
+        extra_call_budget (float): Extra calls allowed per question, on average
+        budget_burst (int): Extra calls allowed on top of the average budget
+        max_workers (int): Threads running calls for `run`
+    """
+
+    def __init__(self, max_attempts: int = 2, deadline_percentile: float = 95.0,
+                 initial_deadline: float = 4.0, min_deadline: float = 0.2,
+                 min_samples: int = 20, window: int = 500, extra_call_budget: float = 0.1,
+                 budget_burst: int = 5, max_workers: int = 16):
+        self.max_attempts = max(1, max_attempts)
+        self.deadline_percentile = deadline_percentile
+        self.initial_deadline = initial_deadline
+        self.min_deadline = min_deadline
+        self.min_samples = min_samples
+        self.extra_call_budget = extra_call_budget
+        self.budget_burst = budget_burst
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedged-generation")
+        self._lock = threading.Lock()
+        self._call_latencies = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._metrics = {
+            "questions": 0,
+            "calls": 0,
+            "extra_calls": 0,
+            "hedges": 0,
+            "retries": 0,
+            "hedge_wins": 0,
+            "invalid_results": 0,
+            "errors": 0,
+            "budget_denied": 0,
+            "cancelled": 0,
+        }
+
+    def deadline(self) -> float:
+        """
+        Return the seconds after which a question's call gets hedged.
+
+        Returns:
+            float: The configured percentile of recent call latencies, or
+                `initial_deadline` while too few are known
+        """
+        with self._lock:
+            if len(self._call_latencies) < self.min_samples:
+                return self.initial_deadline
+            return max(self.min_deadline, percentile(list(self._call_latencies), self.deadline_percentile))
+
+    def _take_extra_call(self, reason: str) -> bool:
+        """
+        Take one extra call from the budget.
+
+        Args:
+            reason (str): "hedges" (deadline passed) or "retries" (invalid result)
+
+        Returns:
+            bool: True if the call may be made
+        """
+        with self._lock:
+            allowed = self._metrics["questions"] * self.extra_call_budget + self.budget_burst
+            if self._metrics["extra_calls"] + 1 > allowed:
+                self._metrics["budget_denied"] += 1
+                return False
+            self._metrics["extra_calls"] += 1
+            self._metrics[reason] += 1
+            return True
+
+    def _record_call(self, seconds: float, outcome: str) -> None:
+        """
+        Count a finished call and remember its latency.
+
+        Cancelled calls are remembered with their time until cancellation, a
+        lower bound of their latency, so the slow tail that gets hedged still
+        weighs on the deadline.
+
+        Args:
+            seconds (float): Latency of the call
+            outcome (str): "valid", "invalid", "error" or "cancelled"
+        """
+        with self._lock:
+            self._metrics["calls"] += 1
+            self._call_latencies.append(seconds)
+            if outcome == "invalid":
+                self._metrics["invalid_results"] += 1
+            elif outcome == "error":
+                self._metrics["errors"] += 1
+            elif outcome == "cancelled":
+                self._metrics["cancelled"] += 1
+
+    def _record_question(self, seconds: float, winner: Optional[int]) -> None:
+        """
+        Remember the latency of a question and whether a hedge won it.
+
+        Args:
+            seconds (float): Seconds until the result was available
+            winner (Optional[int]): Attempt number of the winning call
+        """
+        with self._lock:
+            self._latencies.append(seconds)
+            if winner:
+                self._metrics["hedge_wins"] += 1
+
+    def run(self, call: Callable[[threading.Event], T], is_valid: Callable[[T], bool]) -> T:
+        """
+        Run a call with hedging on worker threads.
+
+        The call runs in a copy of the caller's context, so the current trace
+        follows it. It should stop early once its stop event is set.
+
+        Args:
+            call (Callable[[threading.Event], T]): Makes one model call and returns its
+                result; receives the event set when the call is no longer needed
+            is_valid (Callable[[T], bool]): Whether a result can be used
+
+        Returns:
+            T: The first valid result, or the first result if none was valid
+
+        Raises:
+            Exception: The last error if every call failed
+        """
+        with self._lock:
+            self._metrics["questions"] += 1
+        start = time.monotonic()
+        deadline = self.deadline()
+        pending: Dict[Future, int] = {}
+        stops: List[threading.Event] = []
+        started: List[float] = []
+        fallback, error = None, None
+        have_fallback = False
+
+        def launch() -> None:
+            stop = threading.Event()
+            stops.append(stop)
+            started.append(time.monotonic())
+            context = contextvars.copy_context()
+            pending[self._executor.submit(context.run, call, stop)] = len(started) - 1
+
+        launch()
+        next_hedge = start + deadline
+        try:
+            while True:
+                if not pending:
+                    if len(started) < self.max_attempts and self._take_extra_call("retries"):
+                        launch()
+                        next_hedge = time.monotonic() + deadline
+                    else:
+                        break
+                can_hedge = len(started) < self.max_attempts and next_hedge is not None
+                timeout = max(0.0, next_hedge - time.monotonic()) if can_hedge else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    if self._take_extra_call("hedges"):
+                        launch()
+                        next_hedge = time.monotonic() + deadline
+                    else:
+                        next_hedge = None
+                    continue
+                for future in done:
+                    attempt = pending.pop(future)
+                    seconds = time.monotonic() - started[attempt]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self._record_call(seconds, "error")
+                        error = e
+                        continue
+                    if is_valid(result):
+                        self._record_call(seconds, "valid")
+                        self._record_question(time.monotonic() - start, attempt)
+                        return result
+                    self._record_call(seconds, "invalid")
+                    if not have_fallback:
+                        fallback, have_fallback = result, True
+        finally:
+            for stop in stops:
+                stop.set()
+            for future, attempt in pending.items():
+                future.cancel()
+                self._record_call(time.monotonic() - started[attempt], "cancelled")
+
+        self._record_question(time.monotonic() - start, None)
+        if have_fallback:
+            return fallback
+        raise error
+
+    async def run_async(self, call: Callable[[], Awaitable[T]], is_valid: Callable[[T], bool]) -> T:
+        """
+        Run a call with hedging as asyncio tasks; losing calls are cancelled.
+
+        Args:
+            call (Callable[[], Awaitable[T]]): Makes one model call and returns its result
+            is_valid (Callable[[T], bool]): Whether a result can be used
+
+        Returns:
+            T: The first valid result, or the first result if none was valid
+
+        Raises:
+            Exception: The last error if every call failed
+        """
+        with self._lock:
+            self._metrics["questions"] += 1
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = self.deadline()
+        pending: Dict[asyncio.Task, int] = {}
+        started: List[float] = []
+        fallback, error = None, None
+        have_fallback = False
+
+        def launch() -> None:
+            started.append(loop.time())
+            pending[asyncio.ensure_future(call())] = len(started) - 1
+
+        launch()
+        next_hedge = start + deadline
+        try:
+            while True:
+                if not pending:
+                    if len(started) < self.max_attempts and self._take_extra_call("retries"):
+                        launch()
+                        next_hedge = loop.time() + deadline
+                    else:
+                        break
+                can_hedge = len(started) < self.max_attempts and next_hedge is not None
+                timeout = max(0.0, next_hedge - loop.time()) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if self._take_extra_call("hedges"):
+                        launch()
+                        next_hedge = loop.time() + deadline
+                    else:
+                        next_hedge = None
+                    continue
+                for task in done:
+                    attempt = pending.pop(task)
+                    seconds = loop.time() - started[attempt]
+                    try:
+                        result = task.result()
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        self._record_call(seconds, "error")
+                        error = e
+                        continue
+                    if is_valid(result):
+                        self._record_call(seconds, "valid")
+                        self._record_question(loop.time() - start, attempt)
+                        return result
+                    self._record_call(seconds, "invalid")
+                    if not have_fallback:
+                        fallback, have_fallback = result, True
+        finally:
+            for task, attempt in pending.items():
+                task.cancel()
+                self._record_call(loop.time() - started[attempt], "cancelled")
+
+        self._record_question(loop.time() - start, None)
+        if have_fallback:
+            return fallback
+        raise error
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the hedging counters and latencies.
+
+        Returns:
+            Dict[str, Any]: Call counters, `extra_call_ratio` (extra calls per
+                question), the current `deadline_ms` and p50/p99 of the question
+                latencies (`latency_ms`) and of single call latencies (`call_latency_ms`)
+        """
+        deadline = self.deadline()
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._metrics)
+            latencies, call_latencies = list(self._latencies), list(self._call_latencies)
+        snapshot["extra_call_ratio"] = (snapshot["extra_calls"] / snapshot["questions"]
+                                        if snapshot["questions"] else 0.0)
+        snapshot["deadline_ms"] = round(deadline * 1000, 3)
+        for name, values in (("latency_ms", latencies), ("call_latency_ms", call_latencies)):
+            snapshot[name] = {f"p{p}": round(percentile(values, p) * 1000, 3) for p in (50, 99)} if values else {}
+        return snapshot
+
+    def close(self) -> None:
+        """
+        Stop the worker threads once running calls finish.
+        """
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,654 @@
+"""
+Workload-aware index advisor.
+
+The SQL that processors execute is collected in a WorkloadLog (in memory,
+optionally appended to a JSON-lines file). The advisor scans every logged
+query for the columns it filters, joins, groups and orders on, derives
+candidate single and multi-column B-tree indexes, and costs each candidate
+by planning the workload with and without it:
+
+    hypopg    hypothetical indexes (no build, no locks); the default, the
+              extension must be installed or creatable
+    rollback  each candidate is really built inside a transaction that is
+              rolled back; this blocks writes to the table while the index
+              is built, so it is only offered by the command line, for a
+              scratch copy of the database
+
+Candidates are ranked by the reduction of the workload's total planner cost
+(each query weighted by how often it ran) and printed as CREATE INDEX
+statements. Applying them is opt-in.
+
+Usage:
+    python index_advisor.py queries.jsonl [--apply] [--method rollback] \\
+        [--host 127.0.0.1 --database retail --user postgres]
+"""
+import re
+import json
+import argparse
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Tuple, Optional, Set, NamedTuple
+
+import psycopg2
+from psycopg2 import sql
+from connection_pool import PostgresConnectionPool, get_pool, pool_key
+from result_cache import TABLE_REFERENCE, _strip_literals, is_single_statement
+
+CLAUSE_KEYWORD = re.compile(
+    r'\b(select|from|join|on|using|where|group by|order by|having|limit|offset|union|'
+    r'intersect|except|returning|window|partition by|set|values|into)\b'
+)
+CLAUSE_ROLES = {"where": "filter", "on": "join", "using": "join", "group by": "group", "order by": "order"}
+FROM_IN_FUNCTION = re.compile(r'\b((?:extract|substring|trim)\s*\([^()]*?)\bfrom\b')
+COLUMN_REFERENCE = re.compile(r'(?<![\w$.])(?:(\w+)\.)?(\w+)(?![\w$(.])')
+COLUMN_EQUALITY = re.compile(r'(?<![\w$.])(?:(\w+)\.)?(\w+)\s*=\s*(?:(\w+)\.)?(\w+)(?![\w$(.])')
+OPERATOR = re.compile(r'\s*(=|<>|!=|<=|>=|<|>|in\b|between\b|like\b|ilike\b|is\b)')
+EQUALITY_OPERATORS = ("=", "in", "is")
+ALIAS_STOPWORDS = {"where", "on", "using", "join", "left", "right", "inner", "outer", "full",
+                   "cross", "natural", "group", "order", "limit", "offset", "union", "set",
+                   "values", "returning", "window", "for", "as", "only", "lateral"}
+
+COLUMNS_QUERY = """
+SELECT c.relname, a.attname
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_attribute a
+    ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+WHERE c.relname = ANY(%s)
+AND c.relkind IN ('r', 'p', 'm')
+AND pg_catalog.pg_table_is_visible(c.oid)
+"""
+
+INDEXES_QUERY = """
+SELECT c.relname, array_agg(a.attname ORDER BY k.ord)
+FROM pg_catalog.pg_index i
+JOIN pg_catalog.pg_class c ON c.oid = i.indrelid
+JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord) ON true
+JOIN pg_catalog.pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+WHERE c.relname = ANY(%s)
+AND pg_catalog.pg_table_is_visible(c.oid)
+GROUP BY i.indexrelid, c.relname
+"""
+
+class IndexRecommendation(NamedTuple):
+    """
+    A candidate index that lowers the workload's estimated cost.
+
+    Attributes:
+        table (str): Table to index
+        columns (Tuple[str, ...]): Indexed columns, in order
+        statement (str): CREATE INDEX statement
+        cost_before (float): Weighted planner cost of the affected queries today
+        cost_after (float): Weighted planner cost with the index
+        speedup (float): cost_before / cost_after
+        queries (int): Logged query templates whose plan gets cheaper
+        size_bytes (Optional[int]): Estimated index size
+    """
+    table: str
+    columns: Tuple[str, ...]
+    statement: str
+    cost_before: float
+    cost_after: float
+    speedup: float
+    queries: int
+    size_bytes: Optional[int]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Summarize the recommendation for reports.
+
+        Returns:
+            Dict[str, Any]: The recommendation's fields, with `columns` as a list
+        """
+        summary = self._asdict()
+        summary["columns"] = list(self.columns)
+        return summary
+
+def extract_columns(sql_query: str, table_columns: Dict[str, Set[str]]) -> Dict[str, Dict[str, Set[str]]]:
+    """
+    Find the columns a query filters, joins, groups and orders on.
+
+    This is a lightweight scan like `referenced_tables` rather than a parser:
+    aliases are resolved from FROM/JOIN clauses, unqualified names are
+    attributed to the only referenced table that has such a column, and
+    anything that is not a known column is ignored.
+
+    Args:
+        sql_query (str): SQL text
+        table_columns (Dict[str, Set[str]]): Lowercased column names per lowercased table
+
+    Returns:
+        Dict[str, Dict[str, Set[str]]]: Per table, the roles of each column:
+            "eq" and "range" (WHERE comparisons), "join", "group" and "order"
+    """
+    skeleton = FROM_IN_FUNCTION.sub(r'\1,', _strip_literals(sql_query)[1].replace('"', ''))
+
+    aliases = {}
+    for match in TABLE_REFERENCE.finditer(skeleton):
+        for item in match.group(1).split(','):
+            words = item.split()
+            if words and words[0] in ('only', 'lateral'):
+                words = words[1:]
+            if not words or not re.fullmatch(r'[\w$.]+', words[0]):
+                continue
+            table = words[0].rsplit('.', 1)[-1]
+            if table not in table_columns:
+                continue
+            aliases[table] = table
+            alias = words[2] if len(words) > 2 and words[1] == 'as' else words[1] if len(words) > 1 else None
+            if alias and alias not in ALIAS_STOPWORDS:
+                aliases[alias] = table
+
+    def resolve(qualifier: Optional[str], column: str) -> Optional[str]:
+        if qualifier is not None:
+            table = aliases.get(qualifier)
+            return table if table is not None and column in table_columns[table] else None
+        tables = {table for table in aliases.values() if column in table_columns[table]}
+        return tables.pop() if len(tables) == 1 else None
+
+    found: Dict[str, Dict[str, Set[str]]] = {}
+
+    def add(table: Optional[str], column: str, role: str) -> None:
+        if table is not None:
+            found.setdefault(table, {}).setdefault(column, set()).add(role)
+
+    keywords = list(CLAUSE_KEYWORD.finditer(skeleton))
+    for index, keyword in enumerate(keywords):
+        role = CLAUSE_ROLES.get(keyword.group(1))
+        if role is None:
+            continue
+        end = keywords[index + 1].start() if index + 1 < len(keywords) else len(skeleton)
+        segment = skeleton[keyword.end():end]
+
+        joined = set()
+        if role == "filter":
+            # col = col in WHERE is an implicit join condition.
+            for match in COLUMN_EQUALITY.finditer(segment):
+                left = resolve(match.group(1), match.group(2))
+                right = resolve(match.group(3), match.group(4))
+                if left is not None and right is not None:
+                    add(left, match.group(2), "join")
+                    add(right, match.group(4), "join")
+                    joined.update((match.start(2), match.start(4)))
+
+        for match in COLUMN_REFERENCE.finditer(segment):
+            if match.start(2) in joined:
+                continue
+            table = resolve(match.group(1), match.group(2))
+            if role != "filter":
+                add(table, match.group(2), role)
+                continue
+            operator = OPERATOR.match(segment, match.end())
+            add(table, match.group(2),
+                "eq" if operator is not None and operator.group(1) in EQUALITY_OPERATORS else "range")
+    return found
+
+def candidate_indexes(columns: Dict[str, Dict[str, Set[str]]], max_columns: int = 3) -> Set[Tuple[str, Tuple[str, ...]]]:
+    """
+    Derive candidate indexes for one query from its column roles.
+
+    Every referenced column is a single-column candidate. If the query uses
+    several columns of a table, a composite candidate puts equality and join
+    columns first, followed by one range, ORDER BY or GROUP BY column.
+
+    Args:
+        columns (Dict[str, Dict[str, Set[str]]]): Column roles, see `extract_columns`
+        max_columns (int): Maximum number of columns in a composite candidate
+
+    Returns:
+        Set[Tuple[str, Tuple[str, ...]]]: (table, columns) pairs
+    """
+    candidates = set()
+    for table, roles in columns.items():
+        for column in roles:
+            candidates.add((table, (column,)))
+        leading = [column for column, role in roles.items() if role & {"eq", "join"}]
+        trailing = [column for column, role in roles.items()
+                    if column not in leading and role & {"range", "order", "group"}]
+        composite = tuple((sorted(leading) + trailing[:1])[:max_columns])
+        if len(composite) > 1:
+            candidates.add((table, composite))
+    return candidates
+
+def index_name(table: str, columns: Tuple[str, ...]) -> str:
+    """
+    Name a candidate index, within PostgreSQL's 63 character limit.
+
+    Args:
+        table (str): Table to index
+        columns (Tuple[str, ...]): Indexed columns
+
+    Returns:
+        str: Index name
+    """
+    return "_".join((table,) + columns)[:59] + "_idx"
+
+def index_statement(table: str, columns: Tuple[str, ...], concurrently: bool = False) -> sql.Composed:
+    """
+    Build the CREATE INDEX statement for a candidate.
+
+    Args:
+        table (str): Table to index
+        columns (Tuple[str, ...]): Indexed columns
+        concurrently (bool): Build with CREATE INDEX CONCURRENTLY
+
+    Returns:
+        sql.Composed: The statement
+    """
+    return sql.SQL("CREATE INDEX {}{} ON {} ({})").format(
+        sql.SQL("CONCURRENTLY ") if concurrently else sql.SQL(""),
+        sql.Identifier(index_name(table, columns)),
+        sql.Identifier(table),
+        sql.SQL(", ").join(sql.Identifier(column) for column in columns)
+    )
+
+class WorkloadLog:
+    """
+    Bounded, thread-safe log of the SQL a processor executed.
+
+    Queries are grouped by template (canonical SQL with literals blanked out)
+    and counted; the most recent text of each template is kept so it can be
+    planned. The least recently executed templates are dropped beyond
+    `max_queries`. With a `path`, every execution is also appended to a
+    JSON-lines file that `read` (and the advisor CLI) can load later.
+
+    Attributes:
+        max_queries (int): Templates kept in memory
+        path (Optional[str]): JSON-lines file executions are appended to
+
+    Args:
+        max_queries (int): Templates kept in memory
+        path (Optional[str]): JSON-lines file executions are appended to
+    """
+
+    def __init__(self, max_queries: int = 1000, path: Optional[str] = None):
+        self.max_queries = max_queries
+        self.path = path
+        self._lock = threading.Lock()
+        self._queries: "OrderedDict[str, List[Any]]" = OrderedDict()
+
+    def record(self, sql_query: str) -> None:
+        """
+        Record one execution of a query.
+
+        Args:
+            sql_query (str): Executed SQL
+        """
+        template = _strip_literals(sql_query)[1]
+        with self._lock:
+            entry = self._queries.get(template)
+            if entry is None:
+                self._queries[template] = [sql_query, 1]
+                while len(self._queries) > self.max_queries:
+                    self._queries.popitem(last=False)
+            else:
+                entry[0] = sql_query
+                entry[1] += 1
+                self._queries.move_to_end(template)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as log_file:
+                    log_file.write(json.dumps({"sql": sql_query}) + "\n")
+
+    def queries(self) -> List[Tuple[str, int]]:
+        """
+        Return the logged workload.
+
+        Returns:
+            List[Tuple[str, int]]: (latest SQL, executions) per template
+        """
+        with self._lock:
+            return [(sql_query, count) for sql_query, count in self._queries.values()]
+
+    def clear(self) -> None:
+        """
+        Forget the logged queries. The JSON-lines file is left untouched.
+        """
+        with self._lock:
+            self._queries.clear()
+
+    @staticmethod
+    def read(path: str, max_queries: int = 1000) -> List[Tuple[str, int]]:
+        """
+        Load a workload from a JSON-lines log written by `record`.
+
+        Args:
+            path (str): JSON-lines file
+            max_queries (int): Templates kept
+
+        Returns:
+            List[Tuple[str, int]]: (latest SQL, executions) per template
+        """
+        log = WorkloadLog(max_queries=max_queries)
+        with open(path, encoding="utf-8") as log_file:
+            for line in log_file:
+                if line.strip():
+                    log.record(json.loads(line)["sql"])
+        return log.queries()
+
+class IndexAdvisor:
+    """
+    Ranks candidate indexes by how much they lower the cost of a workload.
+
+    See the module docstring for the costing methods.
+
+    Attributes:
+        connection_params (Dict[str, Any]): Database connection parameters
+        pool (PostgresConnectionPool): Pool used for planning
+        method (str): "hypopg" or "rollback"
+        max_candidates (int): Candidates costed, most frequently used first
+        max_columns (int): Maximum columns of a composite candidate
+        min_improvement (float): Minimum relative cost reduction of the affected
+            queries for a candidate to be recommended
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        pool (Optional[PostgresConnectionPool]): Pool to plan on; defaults to the
+            shared pool for `connection_params`
+        method (str): "hypopg", or "rollback" to build each candidate for real
+        max_candidates (int): Candidates costed
+        max_columns (int): Maximum columns of a composite candidate
+        min_improvement (float): Minimum relative cost reduction, e.g. 0.05 for 5%
+    """
+
+    def __init__(self, connection_params: Dict[str, Any], pool: Optional[PostgresConnectionPool] = None,
+                 method: str = "hypopg", max_candidates: int = 30, max_columns: int = 3,
+                 min_improvement: float = 0.05):
+        if method not in ("hypopg", "rollback"):
+            raise ValueError(f"Unknown costing method: {method}")
+        self.connection_params = connection_params
+        self.pool = pool or get_pool(connection_params)
+        self.method = method
+        self.max_candidates = max_candidates
+        self.max_columns = max_columns
+        self.min_improvement = min_improvement
+
+    @staticmethod
+    def _plan_cost(cur, sql_query: str) -> Optional[float]:
+        """
+        Plan a query inside a savepoint and return its total cost.
+
+        Args:
+            cur: Cursor inside a transaction
+            sql_query (str): SQL to plan
+
+        Returns:
+            Optional[float]: Planner cost, None if the query cannot be planned
+                or holds more than one statement
+        """
+        if not is_single_statement(sql_query):
+            return None
+        cur.execute("SAVEPOINT index_advisor_plan")
+        try:
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql_query)
+            row = cur.fetchone()
+        except psycopg2.Error:
+            cur.execute("ROLLBACK TO SAVEPOINT index_advisor_plan")
+            return None
+        cur.execute("RELEASE SAVEPOINT index_advisor_plan")
+        output = row["QUERY PLAN"] if isinstance(row, dict) else row[0]
+        return float(output[0]["Plan"]["Total Cost"])
+
+    @staticmethod
+    def _use_hypopg(cur, method: str) -> bool:
+        """
+        Decide whether hypothetical indexes are used, creating the extension if needed.
+
+        Args:
+            cur: Cursor inside a transaction
+            method (str): Requested costing method
+
+        Returns:
+            bool: True to cost with hypopg
+
+        Raises:
+            RuntimeError: If "hypopg" was requested but is not available
+        """
+        if method == "rollback":
+            return False
+        try:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS hypopg")
+        except psycopg2.Error as e:
+            raise RuntimeError(f"hypopg is not available: {e}".strip()) from e
+        return True
+
+    @staticmethod
+    def _cost_with_index(cur, table: str, columns: Tuple[str, ...], queries: List[Tuple[str, int]],
+                         hypopg: bool) -> Tuple[Dict[str, float], Optional[int]]:
+        """
+        Plan queries with one extra index.
+
+        Args:
+            cur: Cursor inside a transaction
+            table (str): Table to index
+            columns (Tuple[str, ...]): Indexed columns
+            queries (List[Tuple[str, int]]): Queries to plan
+            hypopg (bool): Create a hypothetical index instead of building it
+
+        Returns:
+            Tuple[Dict[str, float], Optional[int]]: Cost per query and estimated index size
+        """
+        statement = index_statement(table, columns).as_string(cur)
+        if hypopg:
+            cur.execute("SELECT indexrelid FROM hypopg_create_index(%s)", (statement,))
+            row = cur.fetchone()
+            index_oid = row["indexrelid"] if isinstance(row, dict) else row[0]
+            try:
+                costs = {sql_query: IndexAdvisor._plan_cost(cur, sql_query) for sql_query, _ in queries}
+                cur.execute("SELECT hypopg_relation_size(%s) AS size", (index_oid,))
+                row = cur.fetchone()
+            finally:
+                cur.execute("SELECT hypopg_drop_index(%s)", (index_oid,))
+        else:
+            cur.execute("SAVEPOINT index_advisor_candidate")
+            try:
+                cur.execute(statement)
+                costs = {sql_query: IndexAdvisor._plan_cost(cur, sql_query) for sql_query, _ in queries}
+                cur.execute("SELECT pg_relation_size(to_regclass(%s)) AS size",
+                            (sql.Identifier(index_name(table, columns)).as_string(cur),))
+                row = cur.fetchone()
+            finally:
+                cur.execute("ROLLBACK TO SAVEPOINT index_advisor_candidate")
+        size = row["size"] if isinstance(row, dict) else row[0]
+        return costs, int(size) if size is not None else None
+
+    def recommend(self, workload: List[Tuple[str, int]]) -> List[IndexRecommendation]:
+        """
+        Recommend indexes for a workload.
+
+        Args:
+            workload (List[Tuple[str, int]]): (SQL, executions) pairs, e.g.
+                `WorkloadLog.queries()`
+
+        Returns:
+            List[IndexRecommendation]: Recommendations, largest cost reduction first
+
+        Raises:
+            RuntimeError: If method is "hypopg" and the extension is not available
+        """
+        if not workload:
+            return []
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                tables = sorted({
+                    table for sql_query, _ in workload
+                    for table in TABLE_REFERENCE.findall(_strip_literals(sql_query)[1])
+                    for table in re.findall(r'[\w$]+', table)
+                })
+                cur.execute(COLUMNS_QUERY, (tables,))
+                table_columns: Dict[str, Set[str]] = {}
+                for row in cur.fetchall():
+                    table, column = row.values() if isinstance(row, dict) else row
+                    table_columns.setdefault(table, set()).add(column)
+                cur.execute(INDEXES_QUERY, (sorted(table_columns),))
+                existing = {
+                    (table, tuple(columns)) for table, columns in
+                    (row.values() if isinstance(row, dict) else row for row in cur.fetchall())
+                }
+
+                baseline = {}
+                for sql_query, count in workload:
+                    cost = self._plan_cost(cur, sql_query)
+                    if cost is not None:
+                        baseline[sql_query] = cost
+                queries = [(sql_query, count) for sql_query, count in workload if sql_query in baseline]
+
+                # A candidate is costed against every query using its table, so
+                # a composite index is credited for the queries its prefix serves.
+                usage: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+                affected: Dict[str, List[Tuple[str, int]]] = {}
+                for sql_query, count in queries:
+                    roles = extract_columns(sql_query, table_columns)
+                    for table in roles:
+                        affected.setdefault(table, []).append((sql_query, count))
+                    for candidate in candidate_indexes(roles, self.max_columns):
+                        if any(columns[:len(candidate[1])] == candidate[1]
+                               for table, columns in existing if table == candidate[0]):
+                            continue
+                        usage[candidate] = usage.get(candidate, 0) + count
+                ranked = sorted(usage, key=lambda candidate: (-usage[candidate], candidate))[:self.max_candidates]
+
+                hypopg = self._use_hypopg(cur, self.method)
+                if not hypopg:
+                    cur.execute("SET LOCAL lock_timeout = '5s'")
+
+                results = []
+                for table, columns in ranked:
+                    costs, size = self._cost_with_index(cur, table, columns, affected[table], hypopg)
+                    before = after = 0.0
+                    improved = 0
+                    for sql_query, count in affected[table]:
+                        cost = costs.get(sql_query)
+                        cost = baseline[sql_query] if cost is None else min(cost, baseline[sql_query])
+                        before += count * baseline[sql_query]
+                        after += count * cost
+                        improved += cost < baseline[sql_query]
+                    if before > 0 and (before - after) / before >= self.min_improvement:
+                        results.append(IndexRecommendation(
+                            table=table,
+                            columns=columns,
+                            statement=index_statement(table, columns).as_string(conn),
+                            cost_before=round(before, 2),
+                            cost_after=round(after, 2),
+                            speedup=round(before / after, 2) if after > 0 else float("inf"),
+                            queries=improved,
+                            size_bytes=size
+                        ))
+                conn.rollback()
+
+        recommendations = []
+        for recommendation in sorted(results, key=lambda r: (r.cost_after - r.cost_before, r.size_bytes or 0)):
+            # An index already recommended serves every query its prefix would,
+            # and an extension of it is only worth it if it is cheaper still.
+            if any(chosen.table == recommendation.table
+                   and (chosen.columns[:len(recommendation.columns)] == recommendation.columns
+                        or (recommendation.columns[:len(chosen.columns)] == chosen.columns
+                            and recommendation.cost_after >= chosen.cost_after))
+                   for chosen in recommendations):
+                continue
+            recommendations.append(recommendation)
+        return recommendations
+
+    def apply(self, recommendations: List[IndexRecommendation], concurrently: bool = True) -> List[str]:
+        """
+        Create recommended indexes.
+
+        Args:
+            recommendations (List[IndexRecommendation]): Indexes to create
+            concurrently (bool): Use CREATE INDEX CONCURRENTLY so writes are not
+                blocked while the indexes are built
+
+        Returns:
+            List[str]: Executed statements
+        """
+        executed = []
+        conn = psycopg2.connect(**self.connection_params)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                for recommendation in recommendations:
+                    statement = index_statement(recommendation.table, recommendation.columns, concurrently)
+                    cur.execute(statement)
+                    executed.append(statement.as_string(conn))
+        finally:
+            conn.close()
+        return executed
+
+_WORKLOAD_LOGS: Dict[Tuple, WorkloadLog] = {}
+_WORKLOAD_LOGS_LOCK = threading.Lock()
+
+def get_workload_log(connection_params: Dict[str, Any], **log_config) -> WorkloadLog:
+    """
+    Return the process-wide workload log for a connection target.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        **log_config: Keyword arguments forwarded to WorkloadLog on creation
+
+    Returns:
+        WorkloadLog: The shared log
+    """
+    key = pool_key(connection_params)
+    with _WORKLOAD_LOGS_LOCK:
+        log = _WORKLOAD_LOGS.get(key)
+        if log is None:
+            log = WorkloadLog(**log_config)
+            _WORKLOAD_LOGS[key] = log
+        return log
+
+def release_workload_log(connection_params: Dict[str, Any]) -> None:
+    """
+    Forget the shared workload log of a connection target, if any.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+    """
+    with _WORKLOAD_LOGS_LOCK:
+        log = _WORKLOAD_LOGS.pop(pool_key(connection_params), None)
+    if log is not None:
+        log.clear()
+
+def main() -> None:
+    from config import CLOUD_SQL_CONNECTION, INDEX_ADVISOR_CONFIG
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log_path", help="JSON-lines query log (WORKLOAD_LOG_PATH)")
+    parser.add_argument("--apply", action="store_true", help="create the recommended indexes")
+    parser.add_argument("--method", choices=["hypopg", "rollback"], default=INDEX_ADVISOR_CONFIG["method"],
+                        help="rollback builds every candidate, only use it on a scratch copy")
+    parser.add_argument("--host", default=CLOUD_SQL_CONNECTION["host"])
+    parser.add_argument("--port", type=int, default=CLOUD_SQL_CONNECTION["port"])
+    parser.add_argument("--database", default=CLOUD_SQL_CONNECTION["database"])
+    parser.add_argument("--user", default=CLOUD_SQL_CONNECTION["user"])
+    parser.add_argument("--password", default=CLOUD_SQL_CONNECTION["password"])
+    args = parser.parse_args()
+
+    connection_params = {
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }
+    advisor = IndexAdvisor(
+        connection_params,
+        method=args.method,
+        max_candidates=INDEX_ADVISOR_CONFIG["max_candidates"],
+        max_columns=INDEX_ADVISOR_CONFIG["max_columns"],
+        min_improvement=INDEX_ADVISOR_CONFIG["min_improvement"]
+    )
+    workload = WorkloadLog.read(args.log_path)
+    try:
+        recommendations = advisor.recommend(workload)
+    except RuntimeError as e:
+        parser.error(f"{e.args[0].splitlines()[0]}; install it or pass --method rollback on a scratch copy")
+    print(f"{len(workload)} query templates, {len(recommendations)} recommended indexes")
+    for recommendation in recommendations:
+        size = f", ~{recommendation.size_bytes / 1024:.0f} kB" if recommendation.size_bytes else ""
+        print(f"  {recommendation.statement};\n"
+              f"    cost {recommendation.cost_before:.0f} -> {recommendation.cost_after:.0f} "
+              f"({recommendation.speedup:.1f}x, {recommendation.queries} queries{size})")
+    if args.apply and recommendations:
+        for statement in advisor.apply(recommendations):
+            print(f"Created: {statement}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import time
+import threading
+from contextvars import ContextVar
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Any, Optional, Iterator
+
+class Instrumentation:
+    """
+    Hook interface receiving per-stage measurements of the query pipeline.
+
+    Every method does nothing, so the base class is the zero-cost default.
+    Subclasses override the hooks they need: `observe` and `increment` for
+    Prometheus-style histograms and counters, `span` and `annotate` for
+    OpenTelemetry-style tracing.
+
+    Attributes:
+        enabled (bool): False for the no-op default; processors skip tracing
+            entirely unless instrumentation is enabled or timings are requested
+    """
+
+    enabled = False
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        """
+        Open a span around a pipeline stage.
+
+        Args:
+            name (str): Span name, e.g. "talk_to_db.generation"
+            attributes (Optional[Dict[str, Any]]): Initial span attributes
+
+        Returns:
+            Context manager yielding a span handle passed back to `annotate`
+        """
+        return nullcontext()
+
+    def annotate(self, span: Any, attributes: Dict[str, Any]) -> None:
+        """
+        Attach attributes to an open span.
+
+        Args:
+            span (Any): Handle yielded by `span`
+            attributes (Dict[str, Any]): Attributes to set
+        """
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        """
+        Record one observation of a distribution, e.g. a stage duration in seconds.
+
+        Args:
+            name (str): Metric name, e.g. "stage_duration_seconds"
+            value (float): Observed value
+            labels (Optional[Dict[str, str]]): Metric labels
+        """
+
+    def increment(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        """
+        Add to a monotonically increasing counter, e.g. tokens or rows returned.
+
+        Args:
+            name (str): Metric name, e.g. "rows"
+            value (float): Amount to add
+            labels (Optional[Dict[str, str]]): Metric labels
+        """
+
+NOOP_INSTRUMENTATION = Instrumentation()
+
+class PrometheusInstrumentation(Instrumentation):
+    """
+    Exports stage durations as histograms and counts as counters via prometheus_client.
+
+    Metrics are created on first use: `observe("stage_duration_seconds", ...)`
+    becomes histogram `<namespace>_stage_duration_seconds` and
+    `increment("rows", ...)` becomes counter `<namespace>_rows_total`.
+
+    Args:
+        namespace (str): Metric name prefix
+        registry: prometheus_client CollectorRegistry; defaults to the global registry
+
+    Raises:
+        ImportError: If prometheus_client is not installed
+    """
+
+    enabled = True
+
+    def __init__(self, namespace: str = "talk_to_db", registry=None):
+        import prometheus_client
+        self._client = prometheus_client
+        self.namespace = namespace
+        self.registry = registry or prometheus_client.REGISTRY
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _metric(self, kind, name: str, labels: Optional[Dict[str, str]]):
+        """
+        Return the labelled child of a metric, creating the metric on first use.
+
+        Args:
+            kind: prometheus_client.Histogram or prometheus_client.Counter
+            name (str): Metric name without namespace
+            labels (Optional[Dict[str, str]]): Metric labels
+
+        Returns:
+            The labelled metric
+        """
+        labels = labels or {}
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = kind(
+                        name,
+                        f"talk-to-db {name.replace('_', ' ')}",
+                        labelnames=sorted(labels),
+                        namespace=self.namespace,
+                        registry=self.registry
+                    )
+                    self._metrics[name] = metric
+        return metric.labels(**labels) if labels else metric
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        self._metric(self._client.Histogram, name, labels).observe(value)
+
+    def increment(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        self._metric(self._client.Counter, name, labels).inc(value)
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Records each query as an OpenTelemetry span with one child span per stage.
+
+    Args:
+        tracer: opentelemetry Tracer; defaults to the tracer of the global provider
+
+    Raises:
+        ImportError: If opentelemetry-api is not installed
+    """
+
+    enabled = True
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer("talk_to_db")
+        self.tracer = tracer
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+    def annotate(self, span: Any, attributes: Dict[str, Any]) -> None:
+        span.set_attributes(attributes)
+
+class QueryTrace:
+    """
+    Measurements of one processed question.
+
+    Stage durations are accumulated in seconds with a monotonic clock and
+    forwarded to the instrumentation hooks as they are recorded. Recording is
+    thread-safe, since hedged generation records from worker threads.
+
+    Attributes:
+        instrumentation (Instrumentation): Hooks receiving the measurements
+        stages (Dict[str, float]): Seconds spent per stage
+        counts (Dict[str, float]): Counters such as tokens, rows and bytes
+
+    Args:
+        instrumentation (Instrumentation): Hooks receiving the measurements
+    """
+
+    def __init__(self, instrumentation: Instrumentation):
+        self.instrumentation = instrumentation
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Time a pipeline stage inside a span.
+
+        Args:
+            name (str): Stage name, e.g. "generation"
+        """
+        start = time.perf_counter()
+        with self.instrumentation.span(f"talk_to_db.{name}"):
+            try:
+                yield
+            finally:
+                self.add_duration(name, time.perf_counter() - start)
+
+    def add_duration(self, name: str, seconds: float) -> None:
+        """
+        Record a stage duration measured elsewhere.
+
+        Args:
+            name (str): Stage name, e.g. "connection_wait"
+            seconds (float): Duration in seconds
+        """
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.instrumentation.observe("stage_duration_seconds", seconds, {"stage": name})
+
+    def add_count(self, name: str, value: float = 1) -> None:
+        """
+        Add to a per-question counter.
+
+        Args:
+            name (str): Counter name, e.g. "rows"
+            value (float): Amount to add
+        """
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+        self.instrumentation.increment(name, value)
+
+    def finish(self) -> None:
+        """
+        Stop the total timer.
+        """
+        self._finished = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        """
+        Seconds from trace start to `finish` (or now).
+
+        Returns:
+            float: Elapsed seconds
+        """
+        return (self._finished or time.perf_counter()) - self._started
+
+    def timings(self) -> Dict[str, Any]:
+        """
+        Summarize the trace for the `timings` section of a response.
+
+        Returns:
+            Dict[str, Any]: Containing:
+                - total_ms: Wall time of the whole question
+                - stages_ms: Milliseconds per stage, in the order they ran
+                - counts: Token, row and byte counts and cache hits
+        """
+        with self._lock:
+            return {
+                "total_ms": round(self.total * 1000, 3),
+                "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+                "counts": dict(self.counts),
+            }
+
+_CURRENT_TRACE: ContextVar[Optional[QueryTrace]] = ContextVar("talk_to_db_trace", default=None)
+_NO_STAGE = nullcontext()
+
+@contextmanager
+def trace_query(instrumentation: Instrumentation, record: bool = False,
+                attributes: Optional[Dict[str, Any]] = None) -> Iterator[Optional[QueryTrace]]:
+    """
+    Make a new QueryTrace current for the duration of one question.
+
+    Nothing is traced, and None is yielded, unless the instrumentation is
+    enabled or `record` asks for timings. The trace is bound to the current
+    context, so it follows the question into `asyncio` tasks and
+    `asyncio.to_thread` calls but not into executor threads.
+
+    Args:
+        instrumentation (Instrumentation): Hooks receiving the measurements
+        record (bool): Trace even with the no-op instrumentation, for `timings`
+        attributes (Optional[Dict[str, Any]]): Attributes of the root span
+
+    Yields:
+        Optional[QueryTrace]: The active trace, or None when tracing is off
+    """
+    if not (record or instrumentation.enabled):
+        yield None
+        return
+
+    trace = QueryTrace(instrumentation)
+    token = _CURRENT_TRACE.set(trace)
+    try:
+        with instrumentation.span("talk_to_db.query", attributes) as span:
+            try:
+                yield trace
+            finally:
+                trace.finish()
+                instrumentation.observe("query_duration_seconds", trace.total)
+                if span is not None:
+                    with trace._lock:
+                        counts = dict(trace.counts)
+                    instrumentation.annotate(span, {f"talk_to_db.{name}": value
+                                                    for name, value in counts.items()})
+    finally:
+        _CURRENT_TRACE.reset(token)
+
+def current_trace() -> Optional[QueryTrace]:
+    """
+    Return the trace of the question being processed in this context.
+
+    Returns:
+        Optional[QueryTrace]: The active trace, or None when tracing is off
+    """
+    return _CURRENT_TRACE.get()
+
+def stage(name: str):
+    """
+    Time a pipeline stage on the current trace, if any.
+
+    Args:
+        name (str): Stage name, e.g. "execution"
+
+    Returns:
+        Context manager timing the stage; a shared no-op when tracing is off
+    """
+    trace = _CURRENT_TRACE.get()
+    return _NO_STAGE if trace is None else trace.stage(name)
+
+def add_duration(name: str, seconds: float) -> None:
+    """
+    Record a stage duration measured elsewhere on the current trace, if any.
+
+    Args:
+        name (str): Stage name
+        seconds (float): Duration in seconds
+    """
+    trace = _CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add_duration(name, seconds)
+
+def add_count(name: str, value: float = 1) -> None:
+    """
+    Add to a counter on the current trace, if any.
+
+    Args:
+        name (str): Counter name
+        value (float): Amount to add
+    """
+    trace = _CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add_count(name, value)
@@ -10,6 +10,10 @@ from pages.login import login
 from pages.signup import signup
 from pages.query_page import query_page
 from modules.nav import nav_bar
+from tenants import get_tenant_registry
+
+# Starts warming up WARM_TENANTS in the background while visitors sign in.
+get_tenant_registry()
 
 def navigate_to(page):
     st.session_state.page = page 
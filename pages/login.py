@@ -1,5 +1,5 @@
 import streamlit as st
-from config import auth
+from config import firebase_auth
 from modules.nav import nav_bar
 
 def login(navigate_to):
@@ -16,7 +16,7 @@ def login(navigate_to):
 
     if submit_button:
         try:
-            auth.sign_in_with_email_and_password(email, password)
+            firebase_auth().sign_in_with_email_and_password(email, password)
             st.success(f"Welcome back, {email}!")
 
             st.session_state.page = "query_page"
@@ -1,7 +1,23 @@
+import os
+import uuid
+import tempfile
 import streamlit as st
 from modules.nav import nav_bar
-from db_processors import NLToPostgresProcessor
-from config import CLOUD_SQL_CONNECTION, TABLE_METADATA
+from tenants import get_tenant_registry, TenantBudgetError
+from routing import routing_session
+from config import STREAMING_CONFIG
+
+def close_result_stream():
+
+    results = st.session_state.pop("query_results", None)
+    if results and results.get("stream") is not None:
+        results["stream"].close()
+
+def remove_export():
+
+    export = st.session_state.pop("query_export", None)
+    if export and os.path.exists(export["path"]):
+        os.remove(export["path"])
 
 def query_page(navigate_to):
 
@@ -10,30 +26,106 @@ def query_page(navigate_to):
     st.title("Query Builder")
     st.subheader("Enter your query in natural language")
 
-    processor = NLToPostgresProcessor(
-        connection_params=CLOUD_SQL_CONNECTION,
-        table_metadata=TABLE_METADATA
-    )
+    registry = get_tenant_registry()
+    session_id = st.session_state.setdefault("routing_session", uuid.uuid4().hex)
+
+    tenant_ids = sorted(registry.tenants)
+    tenant_id = tenant_ids[0]
+    if len(tenant_ids) > 1:
+        tenant_id = st.selectbox("Database", tenant_ids, key = "tenant_id")
+    if st.session_state.get("query_tenant", tenant_id) != tenant_id:
+        # Results and exports belong to the database they were read from.
+        close_result_stream()
+        remove_export()
 
     nl_query = st.text_area("Natural Language Query", placeholder = "E.g., Fetch all orders from last month")
+    show_timings = st.checkbox("Show stage timings", key = "show_timings")
     
     if st.button("Generate SQL and Execute", key = "execute_query"):
 
         if nl_query:
-            results = processor.query_db(nl_query)
-            display_results(results)  
+            close_result_stream()
+            remove_export()
+            st.session_state.query_tenant = tenant_id
+            try:
+                with registry.lease(tenant_id) as processor, routing_session(session_id):
+                    # Tabs are often left open, so no connection is held between pages.
+                    st.session_state.query_results = processor.query_db_stream(
+                        nl_query, batch_size = STREAMING_CONFIG["batch_size"], include_timings = show_timings,
+                        hold_connection = False
+                    )
+            except TenantBudgetError:
+                st.error("Every database connection is in use, please try again in a moment.")
         else:
             st.error("Please enter a query!")
 
+    if "query_results" in st.session_state:
+        display_results(st.session_state.query_results, registry)
+        if (st.session_state.query_results["operation"] == "READ"
+                and st.session_state.query_results["status"] == "success"):
+            export_results(registry, tenant_id, session_id)
+
     if st.button("Logout", key="logout"):
+        close_result_stream()
+        remove_export()
         navigate_to("main")
 
-def display_results(results: dict):
+def export_results(registry, tenant_id: str, session_id: str):
+
+    st.write("**Download the full result:**")
+    file_format = st.radio("Format", ["csv", "parquet"], horizontal = True, key = "export_format")
+
+    if st.button("Prepare download", key = "prepare_export"):
+        remove_export()
+        # The export streams to a temporary file, so no rows are held in memory.
+        handle, path = tempfile.mkstemp(suffix = f".{file_format}")
+        os.close(handle)
+        try:
+            with registry.lease(tenant_id) as processor, routing_session(session_id):
+                # Exports the query that is displayed rather than generating it again.
+                response = processor.export_sql(
+                    st.session_state.query_results["sql_query"], path, file_format = file_format
+                )
+        except TenantBudgetError as e:
+            response = {"status": "error", "message": str(e)}
+        if response["status"] == "success":
+            st.session_state.query_export = {"path": path, "format": file_format, **response["export"]}
+        else:
+            os.remove(path)
+            st.error(f"Export failed: {response.get('message', 'An error occurred.')}")
+
+    export = st.session_state.get("query_export")
+    if export:
+        st.caption(f"{export['rows']} rows exported in {export['seconds']:.1f} s.")
+        with open(export["path"], "rb") as file:
+            st.download_button(
+                f"Download {export['format'].upper()}",
+                data = file,
+                file_name = f"query_results.{export['format']}",
+                mime = "text/csv" if export["format"] == "csv" else "application/octet-stream",
+                key = "download_export"
+            )
+
+def display_results(results: dict, registry):
+
+    from columnar import ColumnarResult
 
     st.write("**Operation Type:**", results["operation"])
     st.write("**Status:**", results["status"])
     st.write("**Generated SQL Query:**")
     st.code(results["sql_query"], language = "sql")
+
+    for rollup in results.get("rollups", []):
+        if rollup["staleness_seconds"] is None:
+            st.info(f"Answered from the **{rollup['name']}** rollup.")
+        else:
+            pending = f", {rollup['pending_changes']} base-table writes since" if rollup["stale"] else ""
+            st.info(f"Answered from the **{rollup['name']}** rollup, refreshed "
+                    f"{rollup['staleness_seconds'] / 60:.0f} min ago{pending}.")
+
+    guard = results.get("guard")
+    if guard and guard["action"] in ("limit", "throttle"):
+        st.info(f"Cost guard: {guard['reason']}")
     
     if results["status"] == "success":
 
@@ -43,10 +135,22 @@ def display_results(results: dict):
         elif results["operation"] == "READ":
             st.write("**Query Results:**")
             query_results = results.get("results", [])
-            if query_results:
+            stream = results.get("stream")
+            if isinstance(query_results, ColumnarResult) and query_results.num_rows:
+                st.dataframe(query_results.to_arrow())
+            elif query_results and not isinstance(query_results, ColumnarResult):
                 st.table(query_results)
             else:
                 st.write("No results found.")
+
+            if stream is not None and not stream.exhausted:
+                st.caption(f"Showing the first {len(query_results)} rows.")
+                if st.button("Load more rows", key = "load_more"):
+                    with registry.lease(st.session_state.query_tenant):
+                        results["results"] = query_results + stream.fetch_batch()
+                    st.rerun()
+            if stream is not None and stream.truncated:
+                st.warning(f"Results were truncated after {stream.rows_fetched} rows.")
         elif results["operation"] == "UPDATE":
             st.write("**Updated Records:**")
             st.write(results.get("updated_records", "No records updated."))
@@ -55,3 +159,17 @@ def display_results(results: dict):
             st.write(results.get("deleted_records", "No records deleted."))
     else:
         st.error(f"Error: {results.get('message', 'An error occurred.')}")
+
+    if results.get("timings"):
+        display_timings(results["timings"])
+
+def display_timings(timings: dict):
+
+    with st.expander("Debug: stage timings"):
+        st.write(f"**Total:** {timings['total_ms']:.1f} ms")
+        st.table([
+            {"Stage": name, "Milliseconds": round(ms, 1)}
+            for name, ms in timings["stages_ms"].items()
+        ])
+        if timings["counts"]:
+            st.table([{"Counter": name, "Value": value} for name, value in timings["counts"].items()])
@@ -1,6 +1,6 @@
 import streamlit as st
 from modules.nav import nav_bar
-from config import auth, db, hash_password
+from config import firebase_auth, firebase_db, hash_password
 
 def signup(navigate_to):
 
@@ -23,13 +23,13 @@ def signup(navigate_to):
             st.error("Email and Password fields cannot be empty!")
         else:
             try:
-                user = auth.create_user_with_email_and_password(email, password)
+                user = firebase_auth().create_user_with_email_and_password(email, password)
                 st.success("Account created successfully!")
 
                 hashed_password = hash_password(password)
                 user_data = {"email": email, "password": hashed_password}
                 id_token = user["idToken"]
-                db.child("users").push(user_data, id_token)
+                firebase_db().child("users").push(user_data, id_token)
 
                 st.session_state.page = "login"
                 st.rerun() 
@@ -0,0 +1,380 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Tuple, Optional, NamedTuple
+from psycopg2 import sql
+from connection_pool import PostgresConnectionPool, pool_key
+from result_cache import canonicalize_sql, is_single_statement
+
+class PlanSummary(NamedTuple):
+    """
+    The parts of an EXPLAIN plan the guard decides on.
+
+    Attributes:
+        total_cost (float): Planner cost of the root node
+        plan_rows (float): Rows the root node is estimated to return
+        limited (bool): Whether the root node is a Limit
+        cartesian_rows (float): Largest estimated output of a nested loop that
+            multiplies its inputs (no usable join condition), 0 if none
+    """
+    total_cost: float
+    plan_rows: float
+    limited: bool
+    cartesian_rows: float
+
+class GuardDecision(NamedTuple):
+    """
+    What the guard decided for one query.
+
+    Attributes:
+        action (str): "allow", "limit" (LIMIT injected), "throttle" (run with
+            `settings`) or "reject"
+        sql_query (str): SQL to execute, rewritten when a LIMIT was injected
+        reason (Optional[str]): Why the query was limited, throttled or rejected
+        estimated_cost (Optional[float]): Planner cost estimate
+        estimated_rows (Optional[float]): Planner row estimate
+        settings (Dict[str, str]): Settings applied with SET LOCAL before execution
+    """
+    action: str
+    sql_query: str
+    reason: Optional[str] = None
+    estimated_cost: Optional[float] = None
+    estimated_rows: Optional[float] = None
+    settings: Dict[str, str] = {}
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Summarize the decision for the `guard` section of a response.
+
+        Returns:
+            Dict[str, Any]: action, reason, estimated_cost, estimated_rows and settings
+        """
+        return {
+            "action": self.action,
+            "reason": self.reason,
+            "estimated_cost": self.estimated_cost,
+            "estimated_rows": self.estimated_rows,
+            "settings": dict(self.settings),
+        }
+
+def summarize_plan(plan: Dict[str, Any]) -> PlanSummary:
+    """
+    Summarize the root node of an `EXPLAIN (FORMAT JSON)` plan.
+
+    A nested loop is treated as a cartesian product when its estimated output
+    is (nearly) the product of its inputs, which is what the planner estimates
+    for joins without a usable join condition.
+
+    Args:
+        plan (Dict[str, Any]): The "Plan" object of EXPLAIN output
+
+    Returns:
+        PlanSummary: Cost, rows, top-level LIMIT and cartesian product size
+    """
+    cartesian_rows = 0.0
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        children = node.get("Plans", [])
+        stack.extend(children)
+        if node.get("Node Type") == "Nested Loop" and len(children) == 2:
+            outer, inner = (child.get("Plan Rows", 0) for child in children)
+            product = outer * inner
+            if outer > 1 and inner > 1 and node.get("Plan Rows", 0) >= 0.9 * product:
+                cartesian_rows = max(cartesian_rows, float(node["Plan Rows"]))
+
+    return PlanSummary(
+        total_cost=float(plan.get("Total Cost", 0.0)),
+        plan_rows=float(plan.get("Plan Rows", 0.0)),
+        limited=plan.get("Node Type") == "Limit",
+        cartesian_rows=cartesian_rows
+    )
+
+def inject_limit(sql_query: str, limit: int) -> str:
+    """
+    Bound the rows returned by a SELECT by wrapping it in a LIMIT query.
+
+    Wrapping instead of appending keeps the rewrite valid whatever the query
+    ends with (ORDER BY, UNION, trailing comments).
+
+    Args:
+        sql_query (str): SELECT statement
+        limit (int): Maximum number of rows
+
+    Returns:
+        str: The bounded query
+    """
+    body = sql_query.strip()
+    if body.endswith(";"):
+        body = body[:-1].rstrip()
+    return f"SELECT * FROM (\n{body}\n) AS guarded_query LIMIT {int(limit)}"
+
+def settings_sql(settings: Dict[str, str]) -> sql.Composed:
+    """
+    Build SET LOCAL statements applying settings to the current transaction.
+
+    Args:
+        settings (Dict[str, str]): Setting names and values
+
+    Returns:
+        sql.Composed: Semicolon-terminated SET LOCAL statements
+    """
+    return sql.SQL("").join(
+        sql.SQL("SET LOCAL {} = {}; ").format(sql.Identifier(name), sql.Literal(str(value)))
+        for name, value in settings.items()
+    )
+
+def explain_plan(conn, sql_query: str, read_only: bool = False) -> Dict[str, Any]:
+    """
+    Plan a single statement with EXPLAIN in a transaction that is always rolled back.
+
+    Text holding several statements is refused, since EXPLAIN would only
+    plan the first one and run the others.
+
+    Args:
+        conn (psycopg2.extensions.connection): Connection outside a transaction
+        sql_query (str): SQL to plan
+        read_only (bool): Plan in a READ ONLY transaction, for READ queries
+
+    Returns:
+        Dict[str, Any]: Top plan node of EXPLAIN (FORMAT JSON)
+
+    Raises:
+        ValueError: If `sql_query` holds more than one statement
+        psycopg2.Error: If the query cannot be planned
+    """
+    if not is_single_statement(sql_query):
+        raise ValueError("Only a single SQL statement can be planned")
+    try:
+        with conn.cursor() as cur:
+            if read_only:
+                cur.execute("SET TRANSACTION READ ONLY")
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql_query)
+            row = cur.fetchone()
+    finally:
+        conn.rollback()
+    output = row["QUERY PLAN"] if isinstance(row, dict) else row[0]
+    return output[0]["Plan"]
+
+class QueryGuard:
+    """
+    Pre-execution cost guard based on EXPLAIN estimates.
+
+    Every generated query is planned with `EXPLAIN (FORMAT JSON)` (never
+    executed, in a transaction that is rolled back) and the estimates are
+    compared against thresholds:
+
+    - text holding more than one statement is rejected
+    - a cartesian nested loop above `max_cartesian_rows` or a cost above
+      `max_cost` is rejected
+    - a SELECT estimated to return more than `max_rows` without a top-level
+      LIMIT gets one injected
+    - a cost above `throttle_cost` runs under `statement_timeout` and `work_mem`
+
+    Plan summaries are cached per canonical SQL, so repeated queries are
+    checked without a round trip.
+
+    Attributes:
+        max_cost (Optional[float]): Cost above which queries are rejected
+        max_rows (Optional[int]): Row estimate above which a LIMIT is injected
+        throttle_cost (Optional[float]): Cost above which queries run with `settings`
+        max_cartesian_rows (Optional[float]): Cartesian product size above which
+            queries are rejected
+        settings (Dict[str, str]): statement_timeout and work_mem for throttled queries
+
+    Args:
+        pool (PostgresConnectionPool): Pool to run EXPLAIN on
+        max_cost (Optional[float]): Cost above which queries are rejected
+        max_rows (Optional[int]): Row estimate above which a LIMIT is injected
+        throttle_cost (Optional[float]): Cost above which queries run throttled
+        statement_timeout_ms (int): statement_timeout of throttled queries
+        work_mem (Optional[str]): work_mem of throttled queries, e.g. "64MB"
+        max_cartesian_rows (Optional[float]): Cartesian product size above which
+            queries are rejected
+        cache_size (int): Plan summaries kept
+        cache_ttl (Optional[float]): Seconds a plan summary stays valid, so new
+            statistics are picked up; None disables expiry
+    """
+
+    def __init__(self, pool: PostgresConnectionPool, max_cost: Optional[float] = 1e7,
+                 max_rows: Optional[int] = 100000, throttle_cost: Optional[float] = 1e5,
+                 statement_timeout_ms: int = 30000, work_mem: Optional[str] = "64MB",
+                 max_cartesian_rows: Optional[float] = 1e6, cache_size: int = 1024,
+                 cache_ttl: Optional[float] = 600.0):
+        self.pool = pool
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.throttle_cost = throttle_cost
+        self.max_cartesian_rows = max_cartesian_rows
+        self.settings = {"statement_timeout": str(int(statement_timeout_ms))}
+        if work_mem:
+            self.settings["work_mem"] = work_mem
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+
+        self._lock = threading.Lock()
+        self._plans: "OrderedDict[str, Tuple[PlanSummary, float]]" = OrderedDict()
+        self._metrics = {
+            "explains": 0,
+            "cache_hits": 0,
+            "explain_errors": 0,
+            "allowed": 0,
+            "limited": 0,
+            "throttled": 0,
+            "rejected": 0,
+        }
+
+    def explain(self, sql_query: str, read_only: bool = False) -> PlanSummary:
+        """
+        Return the plan summary of a query, from the cache or by running EXPLAIN.
+
+        Args:
+            sql_query (str): SQL to plan
+            read_only (bool): Plan in a READ ONLY transaction, for READ queries
+
+        Returns:
+            PlanSummary: Summary of the plan
+
+        Raises:
+            ValueError: If `sql_query` holds more than one statement
+            psycopg2.Error: If the query cannot be planned
+        """
+        key = canonicalize_sql(sql_query)
+        with self._lock:
+            entry = self._plans.get(key)
+            if entry is not None and (self.cache_ttl is None or time.monotonic() - entry[1] <= self.cache_ttl):
+                self._plans.move_to_end(key)
+                self._metrics["cache_hits"] += 1
+                return entry[0]
+
+        with self.pool.connection() as conn:
+            summary = summarize_plan(explain_plan(conn, sql_query, read_only=read_only))
+
+        with self._lock:
+            self._metrics["explains"] += 1
+            self._plans[key] = (summary, time.monotonic())
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.cache_size:
+                self._plans.popitem(last=False)
+        return summary
+
+    def check(self, sql_query: str, limit_rows: bool = True, read_only: bool = False) -> GuardDecision:
+        """
+        Decide whether and how a query may run.
+
+        Queries that cannot be planned are allowed through unchanged so that
+        execution reports the database error as before.
+
+        Args:
+            sql_query (str): Generated SQL
+            limit_rows (bool): Inject a LIMIT when too many rows are estimated; pass
+                False for writes and for callers that cap the rows they fetch
+            read_only (bool): Plan in a READ ONLY transaction, for READ queries
+
+        Returns:
+            GuardDecision: The decision
+        """
+        if not is_single_statement(sql_query):
+            with self._lock:
+                self._metrics["rejected"] += 1
+            return GuardDecision("reject", sql_query, reason="more than one SQL statement")
+        try:
+            plan = self.explain(sql_query, read_only=read_only)
+        except Exception as e:
+            with self._lock:
+                self._metrics["explain_errors"] += 1
+                self._metrics["allowed"] += 1
+            return GuardDecision("allow", sql_query, reason=f"EXPLAIN failed: {e}".strip())
+
+        estimates = {"estimated_cost": plan.total_cost, "estimated_rows": plan.plan_rows}
+        if self.max_cartesian_rows is not None and plan.cartesian_rows > self.max_cartesian_rows:
+            decision = GuardDecision(
+                "reject", sql_query,
+                reason=f"cartesian join estimated at {plan.cartesian_rows:.0f} rows", **estimates
+            )
+        elif self.max_cost is not None and plan.total_cost > self.max_cost:
+            decision = GuardDecision(
+                "reject", sql_query,
+                reason=f"estimated cost {plan.total_cost:.0f} exceeds {self.max_cost:.0f}", **estimates
+            )
+        else:
+            throttled = self.throttle_cost is not None and plan.total_cost > self.throttle_cost
+            settings = dict(self.settings) if throttled else {}
+            if limit_rows and not plan.limited and self.max_rows is not None and plan.plan_rows > self.max_rows:
+                decision = GuardDecision(
+                    "limit", inject_limit(sql_query, self.max_rows),
+                    reason=f"estimated {plan.plan_rows:.0f} rows, limited to {self.max_rows}",
+                    settings=settings, **estimates
+                )
+            elif throttled:
+                decision = GuardDecision(
+                    "throttle", sql_query,
+                    reason=f"estimated cost {plan.total_cost:.0f} exceeds {self.throttle_cost:.0f}",
+                    settings=settings, **estimates
+                )
+            else:
+                decision = GuardDecision("allow", sql_query, **estimates)
+
+        with self._lock:
+            self._metrics[{"allow": "allowed", "limit": "limited", "throttle": "throttled",
+                           "reject": "rejected"}[decision.action]] += 1
+        return decision
+
+    def clear(self) -> None:
+        """
+        Drop every cached plan summary.
+        """
+        with self._lock:
+            self._plans.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the guard counters.
+
+        Returns:
+            Dict[str, Any]: EXPLAIN/cache counters, decisions per action and the
+                current number of cached plans as `size`
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["size"] = len(self._plans)
+        return snapshot
+
+_GUARDS: Dict[Tuple, QueryGuard] = {}
+_GUARDS_LOCK = threading.Lock()
+
+def get_query_guard(connection_params: Dict[str, Any], pool: PostgresConnectionPool,
+                    **guard_config) -> QueryGuard:
+    """
+    Return the process-wide query guard for a connection target.
+
+    A guard whose pool has been closed (see `close_pool`) is replaced by one
+    on `pool`.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        pool (PostgresConnectionPool): Pool to run EXPLAIN on
+        **guard_config: Keyword arguments forwarded to QueryGuard on creation
+
+    Returns:
+        QueryGuard: The shared guard
+    """
+    key = pool_key(connection_params)
+    with _GUARDS_LOCK:
+        guard = _GUARDS.get(key)
+        if guard is None or guard.pool.closed:
+            guard = QueryGuard(pool, **guard_config)
+            _GUARDS[key] = guard
+        return guard
+
+def release_query_guard(connection_params: Dict[str, Any]) -> None:
+    """
+    Forget the shared query guard of a connection target, if any.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+    """
+    with _GUARDS_LOCK:
+        guard = _GUARDS.pop(pool_key(connection_params), None)
+    if guard is not None:
+        guard.clear()
@@ -0,0 +1,439 @@
+import re
+import time
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Any, Tuple, Optional, NamedTuple
+import psycopg2
+import psycopg2.errors
+from psycopg2 import sql
+from connection_pool import pool_key
+
+TOKEN = re.compile(r"""
+    (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<escape>[eE]'(?:[^'\\]|\\.|'')*')
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<dollar>\$(?P<tag>[A-Za-z_][A-Za-z0-9_]*)?\$.*?\$(?P=tag)\$)
+  | (?P<param>\$\d+)
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<operator>::|[<>=!~+\-*/%^&|#@?]+)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+PREPARABLE_STATEMENTS = ("select", "with", "insert", "update", "delete", "values", "table")
+COMPARISON_OPERATORS = {"=", "<", ">", "<=", ">=", "<>", "!=", "like", "ilike", "between"}
+TYPED_LITERAL_TYPES = {"date", "time", "timestamp", "timestamptz", "interval"}
+INTERVAL_FIELDS = {"year", "month", "day", "hour", "minute", "second"}
+TYPE_MODIFIER_TYPES = {
+    "varchar", "char", "character", "varying", "bpchar", "numeric", "decimal",
+    "time", "timetz", "timestamp", "timestamptz", "interval", "bit", "varbit", "float",
+}
+CLAUSE_KEYWORDS = {"select", "from", "where", "having", "limit", "offset", "window",
+                   "union", "intersect", "except", "returning", "set", "values", "on"}
+
+class QueryTemplate(NamedTuple):
+    """
+    A generated query with its literals lifted out into bind parameters.
+
+    Attributes:
+        text (str): SQL with $1..$n in place of the lifted literals
+        params (Tuple[str, ...]): Text of the lifted literals, in parameter order
+        fingerprint (str): Hash of the canonical template text; questions that
+            differ only in their literals share it
+    """
+    text: str
+    params: Tuple[str, ...]
+    fingerprint: str
+
+def _integer_type(literal: str) -> str:
+    """
+    Return the type PostgreSQL gives an integer literal.
+
+    Args:
+        literal (str): Digits
+
+    Returns:
+        str: "integer", "bigint" or "numeric"
+    """
+    value = int(literal)
+    if value < 2 ** 31:
+        return "integer"
+    return "bigint" if value < 2 ** 63 else "numeric"
+
+def parameterize(sql_query: str) -> Optional[QueryTemplate]:
+    """
+    Lift the literals of a single statement into bind parameters.
+
+    Literals are only lifted where a parameter is resolved to the same type:
+
+    - numbers, cast to the type of the literal (`$1::integer`), except type
+      modifiers (`varchar(10)`), positional ORDER BY/GROUP BY references and
+      bare select list items (whose column name would change)
+    - typed literals such as `DATE '2011-01-01'` as `$1::date`
+    - other strings where their type comes from the other side: after a
+      comparison, in IN lists and in VALUES lists
+
+    Escape and dollar-quoted strings stay inline.
+
+    Args:
+        sql_query (str): Generated SQL
+
+    Returns:
+        Optional[QueryTemplate]: The template, or None for statements that cannot
+            be prepared (several statements, existing parameters, DDL)
+    """
+    tokens = [(match.lastgroup, match.group()) for match in TOKEN.finditer(sql_query.strip().rstrip(";").rstrip())]
+    significant = [index for index, (kind, _) in enumerate(tokens) if kind != "space"]
+    if not significant or tokens[significant[0]][1].lower() not in PREPARABLE_STATEMENTS:
+        return None
+    if any(kind == "param" or text == ";" for kind, text in tokens):
+        return None
+
+    output: List[str] = []
+    params: List[str] = []
+    parens: List[str] = []
+    clauses: List[str] = ["select"]
+    prev, prev_before, in_between = "", "", False
+
+    def lift(value: str, cast: Optional[str] = None) -> str:
+        params.append(value)
+        return f"${len(params)}" + (f"::{cast}" if cast else "")
+
+    for position, index in enumerate(significant):
+        kind, text = tokens[index]
+        lower = text.lower()
+        if index > 0 and tokens[index - 1][0] == "space" and output:
+            output.append(" ")
+        paren = parens[-1] if parens else ""
+
+        if kind == "number":
+            positional = clauses[-1] in ("group by", "order by") and prev in ("by", ",")
+            select_item = clauses[-1] == "select" and prev in ("select", "distinct", ",")
+            if paren == "typmod" or positional or select_item or prev in ("first", "next"):
+                output.append(text)
+            elif text.isdigit():
+                output.append(lift(text, _integer_type(text)))
+            else:
+                output.append(lift(text, "numeric"))
+        elif kind == "string":
+            value = text[1:-1].replace("''", "'")
+            following = tokens[significant[position + 1]][1].lower() if position + 1 < len(significant) else ""
+            if prev in TYPED_LITERAL_TYPES and prev_before != "::" and following not in INTERVAL_FIELDS:
+                if output[-1] == " ":
+                    output.pop()
+                output[-1] = lift(value, prev)
+            elif (prev in COMPARISON_OPERATORS or (prev == "and" and in_between)
+                    or (prev in ("(", ",") and paren in ("in", "values"))):
+                output.append(lift(value))
+            else:
+                output.append(text)
+        else:
+            output.append(text)
+
+        if text == "(":
+            if prev == "in":
+                parens.append("in")
+            elif prev == "values" or (prev == "," and clauses[-1] == "values"):
+                parens.append("values")
+            elif prev in TYPE_MODIFIER_TYPES:
+                parens.append("typmod")
+            else:
+                parens.append("expr")
+            clauses.append("")
+        elif text == ")":
+            if parens:
+                parens.pop()
+                clauses.pop()
+        elif lower in CLAUSE_KEYWORDS:
+            clauses[-1] = lower
+        elif lower == "by" and prev in ("group", "order"):
+            clauses[-1] = f"{prev} by"
+        if lower == "between":
+            in_between = True
+        elif prev == "and" and in_between:
+            in_between = False
+        prev, prev_before = lower if kind in ("word", "operator", "other") else kind, prev
+
+    template = "".join(output)
+    # Only words, operators and placeholders differ in case between texts that
+    # canonicalize_sql treats as equal; literals left inline keep theirs.
+    canonical = "".join(part if part[:1] in ("'", '"', "$") or part[:2] in ("E'", "e'") else part.lower()
+                        for part in output)
+    fingerprint = hashlib.sha1(canonical.encode()).hexdigest()[:16]
+    return QueryTemplate(template, tuple(params), fingerprint)
+
+class QueryTemplates:
+    """
+    Template statistics and per-connection prepared statements.
+
+    Generated queries are normalized into templates with `parameterize`, so
+    questions differing only in their literals share one fingerprint. For
+    every template the call count, errors, rows and latency are kept, for
+    dashboards and other caching layers.
+
+    With `prepare`, templates run as server-side prepared statements named
+    after their fingerprint. Each pooled connection prepares a template on
+    first use, in the same round trip as its first EXECUTE, and keeps at most
+    `max_prepared` statements (the least recently used are deallocated).
+    Templates that fail to prepare are remembered and run as plain SQL. When
+    the schema version passed to `execute` changes, the connection's
+    statements are deallocated before the next EXECUTE, and a statement
+    whose cached plan no longer fits its tables is prepared again.
+
+    Attributes:
+        prepare (bool): Run templates as prepared statements
+        max_prepared (int): Prepared statements kept per connection
+        max_templates (int): Templates whose statistics are kept
+
+    Args:
+        prepare (bool): Run templates as prepared statements
+        max_prepared (int): Prepared statements kept per connection
+        max_templates (int): Templates whose statistics are kept
+    """
+
+    def __init__(self, prepare: bool = True, max_prepared: int = 256, max_templates: int = 1000):
+        self.prepare = prepare
+        self.max_prepared = max_prepared
+        self.max_templates = max_templates
+
+        self._lock = threading.Lock()
+        self._stats: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._normalized: "OrderedDict[str, Optional[QueryTemplate]]" = OrderedDict()
+        self._unpreparable: set = set()
+        self._prepared: "weakref.WeakKeyDictionary[Any, OrderedDict]" = weakref.WeakKeyDictionary()
+        self._schema_versions: "weakref.WeakKeyDictionary[Any, int]" = weakref.WeakKeyDictionary()
+        self._metrics = {
+            "prepares": 0,
+            "prepare_failures": 0,
+            "prepared_executions": 0,
+            "deallocations": 0,
+        }
+
+    def normalize(self, sql_query: str) -> Optional[QueryTemplate]:
+        """
+        Normalize a generated query into its template.
+
+        Results are memoized per SQL text, up to `max_templates` entries.
+
+        Args:
+            sql_query (str): Generated SQL
+
+        Returns:
+            Optional[QueryTemplate]: The template, or None if the statement cannot
+                be prepared
+        """
+        with self._lock:
+            if sql_query in self._normalized:
+                self._normalized.move_to_end(sql_query)
+                return self._normalized[sql_query]
+        template = parameterize(sql_query)
+        with self._lock:
+            self._normalized[sql_query] = template
+            while len(self._normalized) > self.max_templates:
+                self._normalized.popitem(last=False)
+        return template
+
+    def execute(self, cur, template: QueryTemplate, prefix: Optional[sql.Composable] = None,
+                schema_version: Optional[int] = None) -> bool:
+        """
+        Run a template as a prepared statement on the cursor's connection.
+
+        Args:
+            cur (psycopg2.extensions.cursor): Cursor to execute on
+            template (QueryTemplate): Template to run
+            prefix (Optional[sql.Composable]): Statements sent first in the same
+                round trip, e.g. SET LOCAL settings
+            schema_version (Optional[int]): Version of the schema the template was
+                generated for; the connection's statements are deallocated when
+                it differs from the version they were prepared under
+
+        Returns:
+            bool: True if the statement ran; False if the template cannot be
+                prepared, in which case nothing ran and the transaction was rolled back
+
+        Raises:
+            psycopg2.Error: If executing the prepared statement fails
+        """
+        if not self.prepare:
+            return False
+        conn = cur.connection
+        name = f"ttd_{template.fingerprint}"
+        with self._lock:
+            if template.fingerprint in self._unpreparable:
+                return False
+            statements = self._prepared.setdefault(conn, OrderedDict())
+            if schema_version is not None and self._schema_versions.get(conn, schema_version) != schema_version:
+                stale, statements = list(statements), OrderedDict()
+                self._prepared[conn] = statements
+            else:
+                stale = []
+            if schema_version is not None:
+                self._schema_versions[conn] = schema_version
+            is_new = name not in statements
+            evicted = statements.popitem(last=False)[0] if is_new and len(statements) >= self.max_prepared else None
+
+        if evicted is not None:
+            stale.append(evicted)
+        parts = [prefix] if prefix is not None else []
+        for stale_name in stale:
+            parts.append(sql.SQL("DEALLOCATE {}; ").format(sql.Identifier(stale_name)))
+        if is_new:
+            parts.append(sql.SQL("PREPARE {} AS ").format(sql.Identifier(name)))
+            parts.append(sql.SQL(template.text + "; "))
+        parts.append(sql.SQL("EXECUTE {}").format(sql.Identifier(name)))
+        if template.params:
+            parts.append(sql.SQL(" ({})").format(sql.SQL(", ").join(map(sql.Literal, template.params))))
+
+        try:
+            cur.execute(sql.Composed(parts))
+        except psycopg2.errors.DuplicatePreparedStatement:
+            # Prepared on this connection by another registry, e.g. after a reload.
+            conn.rollback()
+            with self._lock:
+                statements[name] = True
+            return self.execute(cur, template, prefix, schema_version)
+        except psycopg2.Error as e:
+            if not is_new:
+                # A failed EXECUTE leaves the statement prepared. Drop it so
+                # the next call prepares it again, and retry right away when
+                # its cached plan went stale (e.g. a SELECT * after ALTER
+                # TABLE) or it was deallocated behind the registry's back.
+                conn.rollback()
+                if not isinstance(e, psycopg2.errors.InvalidSqlStatementName):
+                    cur.execute(sql.SQL("DEALLOCATE {}").format(sql.Identifier(name)))
+                with self._lock:
+                    statements.pop(name, None)
+                    self._metrics["deallocations"] += 1
+                if isinstance(e, (psycopg2.errors.FeatureNotSupported, psycopg2.errors.InvalidSqlStatementName)):
+                    return self.execute(cur, template, prefix, schema_version)
+                raise
+            if stale and isinstance(e, psycopg2.errors.InvalidSqlStatementName):
+                # A statement to deallocate was already gone; the registry
+                # has forgotten it, so the retry only prepares.
+                conn.rollback()
+                return self.execute(cur, template, prefix, schema_version)
+            # PREPARE is not undone by a rollback, so whether the statement
+            # exists tells a failed PREPARE from a failed EXECUTE.
+            conn.rollback()
+            cur.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s", (name,))
+            if cur.fetchone() is not None:
+                with self._lock:
+                    statements[name] = True
+                    self._metrics["prepares"] += 1
+                raise
+            with self._lock:
+                self._unpreparable.add(template.fingerprint)
+                self._metrics["prepare_failures"] += 1
+            return False
+
+        with self._lock:
+            statements[name] = True
+            statements.move_to_end(name)
+            self._metrics["prepared_executions"] += 1
+            if is_new:
+                self._metrics["prepares"] += 1
+            self._metrics["deallocations"] += len(stale)
+        return True
+
+    def record(self, template: QueryTemplate, seconds: float, rows: int = 0, error: bool = False) -> None:
+        """
+        Add one execution of a template to its statistics.
+
+        Args:
+            template (QueryTemplate): Executed template
+            seconds (float): Execution time
+            rows (int): Rows returned or affected
+            error (bool): Whether the execution failed
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._stats.get(template.fingerprint)
+            if entry is None:
+                entry = {
+                    "fingerprint": template.fingerprint,
+                    "template": template.text,
+                    "calls": 0,
+                    "errors": 0,
+                    "rows": 0,
+                    "total_seconds": 0.0,
+                    "first_seen": now,
+                }
+                self._stats[template.fingerprint] = entry
+                while len(self._stats) > self.max_templates:
+                    self._stats.popitem(last=False)
+            self._stats.move_to_end(template.fingerprint)
+            entry["calls"] += 1
+            entry["errors"] += int(error)
+            entry["rows"] += rows
+            entry["total_seconds"] += seconds
+            entry["last_seen"] = now
+
+    def stats(self, limit: Optional[int] = None, order_by: str = "calls") -> List[Dict[str, Any]]:
+        """
+        Return per-template statistics.
+
+        Args:
+            limit (Optional[int]): Templates to return at most
+            order_by (str): "calls", "total_seconds", "mean_ms" or "errors", descending
+
+        Returns:
+            List[Dict[str, Any]]: fingerprint, template, calls, errors, rows,
+                total_seconds, mean_ms, prepared (False once it failed to
+                prepare), first_seen and last_seen per template
+        """
+        with self._lock:
+            entries = [dict(entry) for entry in self._stats.values()]
+            unpreparable = set(self._unpreparable)
+        for entry in entries:
+            entry["mean_ms"] = round(entry["total_seconds"] / entry["calls"] * 1000, 3) if entry["calls"] else 0.0
+            entry["prepared"] = self.prepare and entry["fingerprint"] not in unpreparable
+        entries.sort(key=lambda entry: entry[order_by], reverse=True)
+        return entries[:limit] if limit is not None else entries
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the prepared statement counters.
+
+        Returns:
+            Dict[str, Any]: prepares, prepare_failures, prepared_executions,
+                deallocations and the number of templates tracked as `templates`
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["templates"] = len(self._stats)
+        return snapshot
+
+_TEMPLATES: Dict[Tuple, QueryTemplates] = {}
+_TEMPLATES_LOCK = threading.Lock()
+
+def get_query_templates(connection_params: Dict[str, Any], **template_config) -> QueryTemplates:
+    """
+    Return the process-wide template registry for a connection target.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        **template_config: Keyword arguments forwarded to QueryTemplates on creation
+
+    Returns:
+        QueryTemplates: The shared registry
+    """
+    key = pool_key(connection_params)
+    with _TEMPLATES_LOCK:
+        templates = _TEMPLATES.get(key)
+        if templates is None:
+            templates = QueryTemplates(**template_config)
+            _TEMPLATES[key] = templates
+        return templates
+
+def release_query_templates(connection_params: Dict[str, Any]) -> None:
+    """
+    Forget the shared template registry of a connection target, if any.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+    """
+    with _TEMPLATES_LOCK:
+        _TEMPLATES.pop(pool_key(connection_params), None)
@@ -0,0 +1,75 @@
+import time
+import threading
+from typing import Optional
+
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting how often an operation may start.
+
+    Tokens refill continuously at `rate_per_second` up to `burst`. Each
+    `acquire` takes one token, blocking until one is available.
+
+    Attributes:
+        rate_per_second (float): Sustained number of acquisitions per second
+        burst (int): Maximum number of acquisitions allowed back to back
+
+    Args:
+        rate_per_second (float): Sustained number of acquisitions per second
+        burst (Optional[int]): Bucket size; defaults to one second worth of tokens
+    """
+
+    def __init__(self, rate_per_second: float, burst: Optional[int] = None):
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second must be positive")
+        self.rate_per_second = rate_per_second
+        self.burst = burst if burst is not None else max(int(rate_per_second), 1)
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self.waits = 0
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: Optional[int] = None) -> "RateLimiter":
+        """
+        Create a limiter from a per-minute quota.
+
+        Args:
+            requests_per_minute (float): Sustained requests per minute
+            burst (Optional[int]): Bucket size
+
+        Returns:
+            RateLimiter: The limiter
+        """
+        return cls(requests_per_minute / 60.0, burst)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take one token, waiting for the bucket to refill if needed.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait at most; None waits indefinitely
+
+        Returns:
+            bool: True if a token was taken, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_second)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                delay = (1 - self._tokens) / self.rate_per_second
+                if not waited:
+                    waited = True
+                    self.waits += 1
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            time.sleep(delay)
@@ -0,0 +1,415 @@
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Tuple, Optional, Set
+from connection_pool import pool_key
+
+TABLE_REFERENCE = re.compile(
+    r'\b(?:from|join|into|update)\s+(.*?)(?=\b(?:where|group|order|having|limit|offset|on|using|'
+    r'join|left|right|inner|outer|full|cross|natural|union|intersect|except|set|values|returning|'
+    r'window|for)\b|[();]|$)'
+)
+WRITE_KEYWORDS = re.compile(r'\b(insert|update|delete|merge|truncate|alter|drop|create)\b')
+# Row locks (FOR UPDATE and FOR NO KEY UPDATE already match "update") and
+# sequence updates write even inside a SELECT.
+SIDE_EFFECTS = re.compile(r'\bfor (?:key )?share\b|\b(?:nextval|setval)\s*\(')
+# Functions whose result changes between executions of the same statement.
+VOLATILE_FUNCTIONS = re.compile(
+    r'\b(?:now|random|clock_timestamp|statement_timestamp|transaction_timestamp|timeofday|'
+    r'gen_random_uuid|uuid_generate_v[14]|currval|lastval|txid_current|pg_sleep)\s*\(|'
+    r'\b(?:current_timestamp|current_time|current_date|localtime|localtimestamp)\b'
+)
+
+def _strip_literals(sql: str) -> Tuple[str, str]:
+    """
+    Canonicalize SQL text and return a copy with literals blanked out.
+
+    Comments are removed, whitespace outside literals is collapsed, text
+    outside quotes is lowercased and a trailing semicolon is dropped. Quoted
+    identifiers keep their case, string literals are left untouched.
+
+    Args:
+        sql (str): SQL text
+
+    Returns:
+        Tuple[str, str]: (canonical SQL, canonical SQL with string literals
+            replaced by '' and quoted identifiers lowercased)
+    """
+    canonical, skeleton = [], []
+    i, length = 0, len(sql)
+    pending_space = False
+    while i < length:
+        char = sql[i]
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = length if end == -1 else end
+            pending_space = True
+            continue
+        if sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            pending_space = True
+            continue
+        if char.isspace():
+            pending_space = True
+            i += 1
+            continue
+        if pending_space and canonical:
+            canonical.append(' ')
+            skeleton.append(' ')
+        pending_space = False
+        if char in ("'", '"'):
+            end = i + 1
+            while end < length:
+                if sql[end] == char:
+                    if end + 1 < length and sql[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            literal = sql[i:end + 1]
+            canonical.append(literal)
+            skeleton.append("''" if char == "'" else literal.lower())
+            i = end + 1
+            continue
+        canonical.append(char.lower())
+        skeleton.append(char.lower())
+        i += 1
+
+    canonical_sql, skeleton_sql = "".join(canonical).rstrip(), "".join(skeleton).rstrip()
+    if canonical_sql.endswith(';'):
+        canonical_sql, skeleton_sql = canonical_sql[:-1].rstrip(), skeleton_sql[:-1].rstrip()
+    return canonical_sql, skeleton_sql
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Canonicalize SQL text for use as a cache key.
+
+    Args:
+        sql (str): SQL text
+
+    Returns:
+        str: SQL without comments, with collapsed whitespace and lowercased
+            outside of quotes
+    """
+    return _strip_literals(sql)[0]
+
+def referenced_tables(sql: str) -> Set[str]:
+    """
+    Extract the names of tables referenced by a SQL statement.
+
+    This is a lightweight scan of FROM/JOIN/INTO/UPDATE clauses rather than a
+    full parser; schema prefixes and aliases are dropped.
+
+    Args:
+        sql (str): SQL text
+
+    Returns:
+        Set[str]: Lowercased table names
+    """
+    skeleton = _strip_literals(sql)[1].replace('"', '')
+    tables = set()
+    for match in TABLE_REFERENCE.finditer(skeleton):
+        for item in match.group(1).split(','):
+            words = item.split()
+            if words and words[0] in ('only', 'lateral'):
+                words = words[1:]
+            if words and re.fullmatch(r'[\w$.]+', words[0]):
+                tables.add(words[0].rsplit('.', 1)[-1])
+    return tables
+
+def is_read_only(sql: str) -> bool:
+    """
+    Check that a statement contains no data-modifying keywords, row locking
+    clauses or sequence updates outside literals.
+
+    Args:
+        sql (str): SQL text
+
+    Returns:
+        bool: True if the statement looks read-only
+    """
+    skeleton = _strip_literals(sql)[1]
+    return WRITE_KEYWORDS.search(skeleton) is None and SIDE_EFFECTS.search(skeleton) is None
+
+def is_cacheable(sql: str) -> bool:
+    """
+    Check that a statement is read-only and calls no volatile function such
+    as now() or random(), so running it again gives the same result until
+    the tables it reads change.
+
+    Args:
+        sql (str): SQL text
+
+    Returns:
+        bool: True if the results of the statement may be cached
+    """
+    skeleton = _strip_literals(sql)[1]
+    return (WRITE_KEYWORDS.search(skeleton) is None and SIDE_EFFECTS.search(skeleton) is None
+            and VOLATILE_FUNCTIONS.search(skeleton) is None)
+
+def is_single_statement(sql: str) -> bool:
+    """
+    Check that SQL text holds one statement, ignoring a trailing semicolon.
+
+    Semicolons inside string literals, quoted identifiers and comments do not
+    count; dollar-quoted bodies are not recognized, so a semicolon inside one
+    makes the text count as several statements.
+
+    Args:
+        sql (str): SQL text
+
+    Returns:
+        bool: True if there is no statement separator
+    """
+    return ';' not in _strip_literals(sql)[1]
+
+def estimate_size(rows: List[Dict[str, Any]]) -> int:
+    """
+    Estimate the memory held by a list of result rows.
+
+    Args:
+        rows (List[Dict[str, Any]]): Query results
+
+    Returns:
+        int: Approximate size in bytes
+    """
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for value in row.values():
+            size += sys.getsizeof(value)
+    return size
+
+class ResultCache:
+    """
+    Byte-bounded cache of READ query results with table-based invalidation.
+
+    Results are keyed by canonical SQL text and tagged with the tables the
+    query references. Writes executed through the processor invalidate every
+    entry tagged with a table they touch. The cache holds at most `max_bytes`
+    of estimated result size, evicting least recently used entries first, and
+    results larger than `max_entry_bytes` are never cached.
+
+    Attributes:
+        max_bytes (int): Total size budget in bytes
+        max_entry_bytes (int): Largest single result that is cached
+        ttl (Optional[float]): Seconds an entry stays valid; None disables expiry
+
+    Args:
+        max_bytes (int): Total size budget in bytes
+        max_entry_bytes (Optional[int]): Largest single result that is cached;
+            defaults to a quarter of `max_bytes`
+        ttl (Optional[float]): Seconds an entry stays valid; None disables expiry
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: Optional[int] = None,
+                 ttl: Optional[float] = 300.0):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 4 if max_entry_bytes is None else max_entry_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[List[Dict[str, Any]], int, Set[str], float]]" = OrderedDict()
+        self._by_table: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._epoch = 0
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "rejected_too_large": 0,
+        }
+
+    def _remove(self, key: str) -> None:
+        """
+        Remove an entry and its table tags. Must be called with the lock held.
+
+        Args:
+            key (str): Canonical SQL of the entry
+        """
+        _, size, tables, _ = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def get(self, sql: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up cached results for a READ query.
+
+        Args:
+            sql (str): SQL text as executed
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: A new list holding the cached rows on a
+                hit (the row dicts are shared and must not be mutated), None on a miss
+        """
+        key = canonicalize_sql(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[3] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._metrics["hits"] += 1
+            return list(entry[0])
+
+    def epoch(self) -> int:
+        """
+        Return the invalidation epoch, to be passed to `put` later.
+
+        Reading the epoch before executing a query lets `put` refuse results
+        that may predate a concurrent write.
+
+        Returns:
+            int: Counter incremented by every invalidation
+        """
+        with self._lock:
+            return self._epoch
+
+    def put(self, sql: str, rows: List[Dict[str, Any]], epoch: Optional[int] = None) -> bool:
+        """
+        Cache the results of a READ query.
+
+        Args:
+            sql (str): SQL text as executed
+            rows (List[Dict[str, Any]]): Query results
+            epoch (Optional[int]): Value of `epoch()` read before the query ran;
+                results are dropped if an invalidation happened since
+
+        Returns:
+            bool: True if the results were cached
+        """
+        if not is_cacheable(sql):
+            return False
+        key = canonicalize_sql(sql)
+        size = estimate_size(rows)
+        tables = referenced_tables(sql)
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return False
+            if size > self.max_entry_bytes:
+                self._metrics["rejected_too_large"] += 1
+                return False
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self._bytes + size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._metrics["evictions"] += 1
+            self._entries[key] = (list(rows), size, tables, time.monotonic())
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+        return True
+
+    def invalidate_tables(self, tables: Set[str]) -> int:
+        """
+        Drop every entry that references one of the given tables.
+
+        Args:
+            tables (Set[str]): Lowercased table names
+
+        Returns:
+            int: Number of entries dropped
+        """
+        with self._lock:
+            self._epoch += 1
+            keys = set()
+            for table in tables:
+                keys |= self._by_table.get(table, set())
+            for key in keys:
+                self._remove(key)
+            self._metrics["invalidations"] += len(keys)
+            return len(keys)
+
+    def invalidate_for_write(self, sql: str) -> int:
+        """
+        Invalidate the entries affected by a data-modifying statement.
+
+        If no table can be identified in the statement, the whole cache is
+        cleared to stay on the safe side.
+
+        Args:
+            sql (str): SQL text of the write
+
+        Returns:
+            int: Number of entries dropped
+        """
+        tables = referenced_tables(sql)
+        if tables:
+            return self.invalidate_tables(tables)
+        return self.clear()
+
+    def clear(self) -> int:
+        """
+        Drop every entry.
+
+        Returns:
+            int: Number of entries dropped
+        """
+        with self._lock:
+            self._epoch += 1
+            count = len(self._entries)
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+            self._metrics["invalidations"] += count
+            return count
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the cache counters.
+
+        Returns:
+            Dict[str, Any]: Hit/miss/eviction/invalidation counters plus the
+                current `size` (entries) and `bytes`
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["size"] = len(self._entries)
+            snapshot["bytes"] = self._bytes
+        return snapshot
+
+_CACHES: Dict[Tuple, ResultCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+def get_result_cache(connection_params: Dict[str, Any], **cache_config) -> ResultCache:
+    """
+    Return the process-wide result cache for a connection target.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        **cache_config: Keyword arguments forwarded to ResultCache on creation
+
+    Returns:
+        ResultCache: The shared cache
+    """
+    key = pool_key(connection_params)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = ResultCache(**cache_config)
+            _CACHES[key] = cache
+        return cache
+
+def release_result_cache(connection_params: Dict[str, Any]) -> None:
+    """
+    Empty and forget the shared result cache of a connection target, if any.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+    """
+    with _CACHES_LOCK:
+        cache = _CACHES.pop(pool_key(connection_params), None)
+    if cache is not None:
+        cache.clear()
@@ -0,0 +1,299 @@
+import time
+import uuid
+import weakref
+import threading
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from psycopg2 import sql
+from connection_pool import PostgresConnectionPool
+from result_cache import estimate_size
+from query_guard import settings_sql
+
+# Seconds between sweeps of the reaper closing idle streams
+REAP_INTERVAL = 5.0
+
+class ResultStream:
+    """
+    Iterator over the rows of a READ query, fetched in batches from a
+    server-side (named) cursor.
+
+    Only one batch is held in memory at a time. Reading stops once `max_rows`
+    rows or `max_bytes` of estimated row size have been returned, in which
+    case `truncated` is set. The pooled connection is held until the stream is
+    exhausted, truncated or closed, so callers that stop early must call
+    `close` (or use the stream as a context manager). With an `idle_timeout`,
+    a background reaper also closes the stream once no batch has been fetched
+    for that long and sets `expired`, so abandoned streams do not pin pooled
+    connections.
+
+    Without `hold_connection`, no connection is kept between batches: every
+    batch runs the query again, wrapped with OFFSET and LIMIT, on a connection
+    borrowed just for that batch. This suits interactive front ends that show
+    a first page and fetch more only on request (e.g. one stream per browser
+    tab), at the price of re-running the query per batch; batches of a query
+    without ORDER BY, or of data written to in between, may overlap or skip
+    rows.
+
+    Attributes:
+        sql_query (str): The query being streamed
+        batch_size (int): Rows fetched per round trip
+        max_rows (Optional[int]): Row cap, None for unlimited
+        max_bytes (Optional[int]): Cap on the estimated size of returned rows
+        columns (List[str]): Column names, available after the first batch
+        rows_fetched (int): Rows returned so far
+        bytes_fetched (int): Estimated size of the rows returned so far
+        truncated (bool): True if a cap stopped the stream before the end
+        exhausted (bool): True once no more rows will be returned
+        idle_timeout (Optional[float]): Seconds without a fetch after which the
+            stream is closed, None to keep it open until closed
+        expired (bool): True if the stream was closed for being idle
+        hold_connection (bool): Keep a server-side cursor open between batches
+
+    Args:
+        pool (PostgresConnectionPool): Pool to borrow the connection from
+        sql_query (str): READ query to stream
+        batch_size (int): Rows fetched per round trip
+        max_rows (Optional[int]): Row cap, None for unlimited
+        max_bytes (Optional[int]): Cap on the estimated size of returned rows
+        settings (Optional[Dict[str, str]]): Settings applied with SET LOCAL to the
+            stream's transaction before the cursor is opened
+        idle_timeout (Optional[float]): Seconds without a fetch after which the
+            stream is closed, None to keep it open until closed
+        hold_connection (bool): Keep a server-side cursor open between batches;
+            False to run the query again for every batch instead
+    """
+
+    def __init__(self, pool: PostgresConnectionPool, sql_query: str, batch_size: int = 500,
+                 max_rows: Optional[int] = None, max_bytes: Optional[int] = None,
+                 settings: Optional[Dict[str, str]] = None, idle_timeout: Optional[float] = None,
+                 hold_connection: bool = True):
+        self.pool = pool
+        self.sql_query = sql_query
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.columns: List[str] = []
+        self.rows_fetched = 0
+        self.bytes_fetched = 0
+        self.truncated = False
+        self.exhausted = False
+        self.idle_timeout = idle_timeout
+        self.expired = False
+        self.hold_connection = hold_connection
+
+        self._lock = threading.Lock()
+        self._last_used = time.monotonic()
+        self._settings = settings
+        self._conn = None
+        if not hold_connection:
+            return
+        self._conn = pool.getconn()
+        try:
+            if settings:
+                with self._conn.cursor() as cur:
+                    cur.execute(settings_sql(settings))
+            self._cursor = self._conn.cursor(name=f"talk_to_db_{uuid.uuid4().hex}")
+            self._cursor.itersize = batch_size
+            self._cursor.execute(sql_query)
+        except Exception:
+            self.pool.putconn(self._conn)
+            self._conn = None
+            raise
+        if idle_timeout is not None:
+            _track(self)
+
+    def fetch_batch(self, size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch the next batch of rows.
+
+        Args:
+            size (Optional[int]): Rows to fetch; defaults to `batch_size`
+
+        Returns:
+            List[Dict[str, Any]]: The next rows, empty once the stream is exhausted
+
+        Raises:
+            psycopg2.Error: If fetching fails; the stream is closed first
+        """
+        with self._lock:
+            if self.exhausted:
+                return []
+            self._last_used = time.monotonic()
+            size = size or self.batch_size
+            if self.max_rows is not None:
+                size = min(size, self.max_rows - self.rows_fetched)
+
+            try:
+                if self.hold_connection:
+                    rows = [dict(row) for row in self._cursor.fetchmany(size)] if size > 0 else []
+                    if not self.columns and self._cursor.description:
+                        self.columns = [column.name for column in self._cursor.description]
+                    more = len(rows) == size
+                else:
+                    rows, more = self._fetch_page(size)
+            except Exception:
+                self._close()
+                raise
+
+            if self.max_bytes is not None:
+                for index, row in enumerate(rows):
+                    row_bytes = estimate_size([row])
+                    if self.bytes_fetched + row_bytes > self.max_bytes:
+                        rows = rows[:index]
+                        self.truncated = True
+                        break
+                    self.bytes_fetched += row_bytes
+            else:
+                self.bytes_fetched += estimate_size(rows)
+            self.rows_fetched += len(rows)
+
+            if not self.truncated and self.max_rows is not None and self.rows_fetched >= self.max_rows:
+                self.truncated = bool(self._cursor.fetchmany(1)) if self.hold_connection else more
+                self._close()
+            elif self.truncated or not more:
+                self._close()
+            self._last_used = time.monotonic()
+            return rows
+
+    def _fetch_page(self, size: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Run the query for the next `size` rows on a connection borrowed for this call.
+
+        Args:
+            size (int): Rows to fetch
+
+        Returns:
+            Tuple[List[Dict[str, Any]], bool]: The rows, and whether more follow
+        """
+        if size <= 0:
+            return [], False
+        query = sql.SQL("SELECT * FROM ({}) AS result_page OFFSET {} LIMIT {}").format(
+            sql.SQL(self.sql_query.strip().rstrip(";")), sql.Literal(self.rows_fetched), sql.Literal(size + 1)
+        )
+        if self._settings:
+            query = settings_sql(self._settings) + query
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query)
+                rows = [dict(row) for row in cur.fetchall()]
+                if not self.columns and cur.description:
+                    self.columns = [column.name for column in cur.description]
+        return rows[:size], len(rows) > size
+
+    def __iter__(self) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Iterate over the remaining row batches.
+
+        Yields:
+            List[Dict[str, Any]]: Non-empty batches of rows
+        """
+        try:
+            while True:
+                rows = self.fetch_batch()
+                if not rows:
+                    return
+                yield rows
+        finally:
+            self.close()
+
+    def _close(self) -> None:
+        """
+        Close the cursor and return the connection. Must be called with the lock held.
+        """
+        self.exhausted = True
+        if self._conn is None:
+            return
+        try:
+            self._cursor.close()
+        except Exception:
+            pass
+        self.pool.putconn(self._conn)
+        self._conn = None
+
+    def expire_if_idle(self, now: Optional[float] = None) -> bool:
+        """
+        Close the stream if no batch has been fetched for `idle_timeout` seconds.
+
+        A stream busy fetching is left alone.
+
+        Args:
+            now (Optional[float]): Current monotonic time
+
+        Returns:
+            bool: True if the stream was closed
+        """
+        if self.idle_timeout is None or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            now = time.monotonic() if now is None else now
+            if self._conn is None or now - self._last_used < self.idle_timeout:
+                return False
+            self.expired = True
+            self._close()
+            return True
+        finally:
+            self._lock.release()
+
+    def close(self) -> None:
+        """
+        Stop the stream and return its connection to the pool.
+        """
+        with self._lock:
+            self._close()
+
+    def __enter__(self) -> "ResultStream":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def __del__(self):
+        if getattr(self, "_conn", None) is not None:
+            self.close()
+
+_STREAMS: "weakref.WeakSet[ResultStream]" = weakref.WeakSet()
+_STREAMS_LOCK = threading.Lock()
+_REAPER: Optional[threading.Thread] = None
+
+def _track(stream: ResultStream) -> None:
+    """
+    Register a stream with the reaper, starting the reaper on first use.
+
+    Args:
+        stream (ResultStream): Stream with an `idle_timeout`
+    """
+    global _REAPER
+    with _STREAMS_LOCK:
+        _STREAMS.add(stream)
+        if _REAPER is None or not _REAPER.is_alive():
+            _REAPER = threading.Thread(target=_reap, name="result-stream-reaper", daemon=True)
+            _REAPER.start()
+
+def _reap() -> None:
+    """
+    Close idle streams every REAP_INTERVAL seconds.
+    """
+    while True:
+        time.sleep(REAP_INTERVAL)
+        try:
+            close_idle_streams()
+        except Exception:
+            # The next round retries; a failing close must not kill the reaper.
+            pass
+
+def close_idle_streams() -> int:
+    """
+    Close every open stream idle for longer than its `idle_timeout`.
+
+    Returns:
+        int: Streams closed
+    """
+    with _STREAMS_LOCK:
+        streams = list(_STREAMS)
+    now = time.monotonic()
+    closed = 0
+    for stream in streams:
+        if stream.expire_if_idle(now):
+            closed += 1
+            with _STREAMS_LOCK:
+                _STREAMS.discard(stream)
+    return closed
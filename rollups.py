@@ -0,0 +1,544 @@
+"""
+Materialized revenue rollups.
+
+Aggregate questions (revenue by country, by month, by product) otherwise
+rescan and rejoin Invoice, Stock and Customers every time. The rollups here
+are materialized views of daily and monthly revenue (`Quantity * UnitPrice`),
+quantity and invoice lines per country and per StockCode.
+
+Routing happens in the NL-to-SQL stage: processors add the existing rollups
+to their schema context, with descriptions telling the model when to prefer
+them, and report in each response which rollups a query read and how stale
+they are.
+
+PostgreSQL cannot maintain materialized views incrementally, so refresh is
+change-driven: statement-level triggers on the base tables count write
+statements in `rollup_changes`, and a rollup is refreshed (CONCURRENTLY, so
+readers are never blocked) only when its base tables were written since its
+last refresh. Processors run this check on a schedule in a background
+thread; `refresh` can also be called directly.
+
+Usage:
+    python rollups.py create|refresh|status|drop [--force] \\
+        [--host 127.0.0.1 --database retail --user postgres]
+"""
+import time
+import argparse
+import datetime
+import threading
+from typing import Dict, List, Any, Tuple, Optional, Callable, Set, NamedTuple
+
+from psycopg2 import sql
+from connection_pool import PostgresConnectionPool, get_pool, pool_key
+from result_cache import referenced_tables
+
+REFRESH_TABLE = "rollup_refreshes"
+CHANGES_TABLE = "rollup_changes"
+CHANGE_FUNCTION = "rollup_note_change"
+
+class RollupSpec(NamedTuple):
+    """
+    Definition of one rollup materialized view.
+
+    Attributes:
+        name (str): View name
+        description (str): Table description shown to the model
+        query (str): SELECT defining the view
+        key_columns (Tuple[str, ...]): Columns of the unique index that allows
+            concurrent refreshes
+        base_tables (Tuple[str, ...]): Tables the view aggregates
+        column_comments (Dict[str, str]): Column descriptions shown to the model
+    """
+    name: str
+    description: str
+    query: str
+    key_columns: Tuple[str, ...]
+    base_tables: Tuple[str, ...]
+    column_comments: Dict[str, str]
+
+def _revenue_rollup(period: str, dimension: str) -> RollupSpec:
+    """
+    Define a revenue rollup for one time bucket and one dimension.
+
+    Args:
+        period (str): "day" or "month"
+        dimension (str): "country" or "stockcode"
+
+    Returns:
+        RollupSpec: The rollup definition
+    """
+    if dimension == "country":
+        dimension_sql = "COALESCE(c.Country, 'Unknown') AS country"
+        joins = ("JOIN Stock s ON s.StockCode = i.StockCode\n"
+                 "LEFT JOIN Customers c ON c.InvoiceNo = i.InvoiceNo")
+        base_tables = ("invoice", "stock", "customers")
+        dimension_comment = "Customer country, 'Unknown' for invoices without a customer"
+        name = f"revenue_by_country_{'daily' if period == 'day' else 'monthly'}"
+        subject = "country"
+    else:
+        dimension_sql = "i.StockCode AS stockcode"
+        joins = "JOIN Stock s ON s.StockCode = i.StockCode"
+        base_tables = ("invoice", "stock")
+        dimension_comment = "Product stock code, references stock.stockcode"
+        name = f"revenue_by_stock_{'daily' if period == 'day' else 'monthly'}"
+        subject = "product (stockcode)"
+
+    period_label = "Day" if period == "day" else "First day of the month"
+    per = "daily" if period == "day" else "monthly"
+    return RollupSpec(
+        name=name,
+        description=(
+            f"Precomputed {per} revenue rollup per {subject} (materialized view over invoice and stock). "
+            f"Prefer it over joining the base tables for revenue, quantity or invoice counts by {subject} "
+            f"and {period} or coarser; filter on {period} instead of invoicedate."
+        ),
+        query=(
+            f"SELECT date_trunc('{period}', i.InvoiceDate)::date AS {period},\n"
+            f"       {dimension_sql},\n"
+            f"       SUM(i.Quantity * s.UnitPrice) AS revenue,\n"
+            f"       SUM(i.Quantity) AS quantity,\n"
+            f"       COUNT(*) AS invoice_lines\n"
+            f"FROM Invoice i\n{joins}\n"
+            f"GROUP BY 1, 2"
+        ),
+        key_columns=(period, dimension),
+        base_tables=base_tables,
+        column_comments={
+            period: period_label,
+            dimension: dimension_comment,
+            "revenue": "Sum of quantity * unitprice",
+            "quantity": "Sum of quantity",
+            "invoice_lines": "Number of invoice rows",
+        }
+    )
+
+ROLLUPS = [
+    _revenue_rollup("day", "country"),
+    _revenue_rollup("month", "country"),
+    _revenue_rollup("day", "stockcode"),
+    _revenue_rollup("month", "stockcode"),
+]
+
+class RollupManager:
+    """
+    Creates, refreshes and reports on the rollup materialized views of one database.
+
+    Refresh times and base-table change counters are stored in the database,
+    so every process sees the same staleness. The counters are re-read at
+    most every `status_ttl` seconds; writes made through a processor are
+    reported immediately with `mark_stale`.
+
+    Attributes:
+        pool (PostgresConnectionPool): Pool used for DDL, refreshes and status queries
+        rollups (Dict[str, RollupSpec]): Managed rollups by name
+        refresh_interval (Optional[float]): Seconds between background refresh
+            checks, None to disable the background thread
+        status_ttl (float): Seconds a status snapshot is reused
+        on_refresh (Optional[Callable[[Set[str]], Any]]): Called with the names of
+            refreshed rollups, e.g. to invalidate cached results
+
+    Args:
+        pool (PostgresConnectionPool): Pool to use
+        rollups (Optional[List[RollupSpec]]): Rollups to manage; defaults to ROLLUPS
+        refresh_interval (Optional[float]): Seconds between background refresh checks
+        status_ttl (float): Seconds a status snapshot is reused
+        on_refresh (Optional[Callable[[Set[str]], Any]]): Refresh callback
+    """
+
+    def __init__(self, pool: PostgresConnectionPool, rollups: Optional[List[RollupSpec]] = None,
+                 refresh_interval: Optional[float] = 300.0, status_ttl: float = 30.0,
+                 on_refresh: Optional[Callable[[Set[str]], Any]] = None):
+        self.pool = pool
+        self.rollups = {spec.name: spec for spec in (ROLLUPS if rollups is None else rollups)}
+        self.refresh_interval = refresh_interval
+        self.status_ttl = status_ttl
+        self.on_refresh = on_refresh
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._available: Optional[Set[str]] = None
+        self._dirty: Set[str] = set()
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._status_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def available(self) -> Dict[str, RollupSpec]:
+        """
+        Return the managed rollups that exist and are populated in the database.
+
+        Returns:
+            Dict[str, RollupSpec]: Rollups by name
+        """
+        with self._lock:
+            if self._available is None:
+                with self.pool.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            "SELECT matviewname FROM pg_catalog.pg_matviews "
+                            "WHERE matviewname = ANY(%s) AND ispopulated",
+                            (list(self.rollups),)
+                        )
+                        rows = cur.fetchall()
+                self._available = {row["matviewname"] for row in rows}
+            return {name: self.rollups[name] for name in self.rollups if name in self._available}
+
+    def create(self) -> List[str]:
+        """
+        Create and populate the missing rollups, their unique indexes and comments,
+        and the change-counting triggers on their base tables.
+
+        Returns:
+            List[str]: Names of the rollups created
+        """
+        created = []
+        with self._refresh_lock:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql.SQL(
+                        "CREATE TABLE IF NOT EXISTS {} (name TEXT PRIMARY KEY, "
+                        "refreshed_at TIMESTAMPTZ NOT NULL, changes BIGINT NOT NULL)"
+                    ).format(sql.Identifier(REFRESH_TABLE)))
+                    cur.execute(sql.SQL(
+                        "CREATE TABLE IF NOT EXISTS {} (table_name TEXT PRIMARY KEY, changes BIGINT NOT NULL)"
+                    ).format(sql.Identifier(CHANGES_TABLE)))
+                    cur.execute(sql.SQL(
+                        "CREATE OR REPLACE FUNCTION {}() RETURNS trigger LANGUAGE plpgsql AS $$\n"
+                        "BEGIN\n"
+                        "    INSERT INTO {} AS c (table_name, changes) VALUES (TG_TABLE_NAME, 1)\n"
+                        "    ON CONFLICT (table_name) DO UPDATE SET changes = c.changes + 1;\n"
+                        "    RETURN NULL;\n"
+                        "END $$"
+                    ).format(sql.Identifier(CHANGE_FUNCTION), sql.Identifier(CHANGES_TABLE)))
+                    base_tables = sorted({table for spec in self.rollups.values() for table in spec.base_tables})
+                    for table in base_tables:
+                        trigger = sql.Identifier(f"{table}_{CHANGE_FUNCTION}")
+                        cur.execute(sql.SQL("DROP TRIGGER IF EXISTS {} ON {}").format(trigger, sql.Identifier(table)))
+                        cur.execute(sql.SQL(
+                            "CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {} "
+                            "FOR EACH STATEMENT EXECUTE FUNCTION {}()"
+                        ).format(trigger, sql.Identifier(table), sql.Identifier(CHANGE_FUNCTION)))
+                    cur.execute("SELECT matviewname FROM pg_catalog.pg_matviews WHERE matviewname = ANY(%s)",
+                                (list(self.rollups),))
+                    existing = {row["matviewname"] for row in cur.fetchall()}
+                    for spec in self.rollups.values():
+                        if spec.name in existing:
+                            continue
+                        view = sql.Identifier(spec.name)
+                        changes = self._changes(cur, spec.base_tables)
+                        cur.execute(sql.SQL("CREATE MATERIALIZED VIEW {} AS {}").format(view, sql.SQL(spec.query)))
+                        cur.execute(sql.SQL("CREATE UNIQUE INDEX {} ON {} ({})").format(
+                            sql.Identifier(f"{spec.name}_key"),
+                            view,
+                            sql.SQL(", ").join(sql.Identifier(column) for column in spec.key_columns)
+                        ))
+                        cur.execute(sql.SQL("COMMENT ON MATERIALIZED VIEW {} IS {}").format(
+                            view, sql.Literal(spec.description)))
+                        for column, comment in spec.column_comments.items():
+                            cur.execute(sql.SQL("COMMENT ON COLUMN {}.{} IS {}").format(
+                                view, sql.Identifier(column), sql.Literal(comment)))
+                        self._record_refresh(cur, spec, changes)
+                        created.append(spec.name)
+                    if created:
+                        cur.execute(sql.SQL("ANALYZE {}").format(
+                            sql.SQL(", ").join(sql.Identifier(name) for name in created)))
+        with self._lock:
+            self._available = None
+            self._status_at = 0.0
+        return created
+
+    def drop(self) -> None:
+        """
+        Drop every managed rollup, the change triggers and the bookkeeping tables.
+        """
+        with self._refresh_lock:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    for name in self.rollups:
+                        cur.execute(sql.SQL("DROP MATERIALIZED VIEW IF EXISTS {}").format(sql.Identifier(name)))
+                    cur.execute(sql.SQL("DROP FUNCTION IF EXISTS {}() CASCADE").format(sql.Identifier(CHANGE_FUNCTION)))
+                    cur.execute(sql.SQL("DROP TABLE IF EXISTS {}, {}").format(
+                        sql.Identifier(REFRESH_TABLE), sql.Identifier(CHANGES_TABLE)))
+        with self._lock:
+            self._available = None
+            self._status = {}
+            self._status_at = 0.0
+
+    @staticmethod
+    def _changes(cur, tables: Tuple[str, ...]) -> int:
+        """
+        Read the number of write statements run against the given tables.
+
+        Args:
+            cur: Cursor
+            tables (Tuple[str, ...]): Table names
+
+        Returns:
+            int: Write statements counted by the change triggers
+        """
+        cur.execute(
+            sql.SQL("SELECT COALESCE(SUM(changes), 0) AS changes FROM {} WHERE table_name = ANY(%s)")
+            .format(sql.Identifier(CHANGES_TABLE)),
+            (list(tables),)
+        )
+        return int(cur.fetchone()["changes"])
+
+    @staticmethod
+    def _record_refresh(cur, spec: RollupSpec, changes: int) -> None:
+        """
+        Store the refresh time of a rollup and the base-table change count it reflects.
+
+        Args:
+            cur: Cursor in the refreshing transaction
+            spec (RollupSpec): Refreshed rollup
+            changes (int): Change count read before the refresh started, so a
+                write racing with the refresh triggers another one
+        """
+        cur.execute(
+            sql.SQL(
+                "INSERT INTO {} (name, refreshed_at, changes) VALUES (%s, now(), %s) "
+                "ON CONFLICT (name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at, "
+                "changes = EXCLUDED.changes"
+            ).format(sql.Identifier(REFRESH_TABLE)),
+            (spec.name, changes)
+        )
+
+    def mark_stale(self, tables: Set[str]) -> None:
+        """
+        Mark the rollups built on any of the given tables as stale after a write.
+
+        Args:
+            tables (Set[str]): Lowercased names of the written tables
+        """
+        with self._lock:
+            for spec in self.rollups.values():
+                if tables & set(spec.base_tables):
+                    self._dirty.add(spec.name)
+            for name in self._dirty & set(self._status):
+                self._status[name]["stale"] = True
+
+    def status(self, max_age: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Report when each available rollup was refreshed and whether its base tables changed since.
+
+        Args:
+            max_age (Optional[float]): Reuse a snapshot younger than this many
+                seconds; defaults to `status_ttl`
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per rollup name: refreshed_at (datetime),
+                pending_changes (base-table write statements since the refresh)
+                and stale (changes pending or a write was reported)
+        """
+        max_age = self.status_ttl if max_age is None else max_age
+        with self._lock:
+            if time.monotonic() - self._status_at <= max_age:
+                return self._status
+        names = list(self.available())
+        status = {}
+        if names:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        sql.SQL("SELECT name, refreshed_at, changes FROM {} WHERE name = ANY(%s)")
+                        .format(sql.Identifier(REFRESH_TABLE)),
+                        (names,)
+                    )
+                    refreshes = {row["name"]: row for row in cur.fetchall()}
+                    for name in names:
+                        refresh = refreshes.get(name)
+                        current = self._changes(cur, self.rollups[name].base_tables)
+                        pending = current - refresh["changes"] if refresh else None
+                        status[name] = {
+                            "refreshed_at": refresh["refreshed_at"] if refresh else None,
+                            "pending_changes": pending,
+                            "stale": pending is None or pending > 0,
+                        }
+        with self._lock:
+            for name in self._dirty & set(status):
+                status[name]["stale"] = True
+            self._status = status
+            self._status_at = time.monotonic()
+        return status
+
+    def describe(self, sql_query: str) -> List[Dict[str, Any]]:
+        """
+        Describe the rollups a query reads, for the `rollups` section of a response.
+
+        Args:
+            sql_query (str): Executed SQL
+
+        Returns:
+            List[Dict[str, Any]]: name, refreshed_at (ISO 8601), staleness_seconds
+                (time since the refresh), pending_changes and stale for each
+                rollup referenced by the query; empty if none
+        """
+        names = [name for name in sorted(referenced_tables(sql_query)) if name in self.rollups]
+        if not names:
+            return []
+        status = self.status()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        described = []
+        for name in names:
+            entry = status.get(name)
+            if entry is None:
+                continue
+            refreshed_at = entry["refreshed_at"]
+            described.append({
+                "name": name,
+                "refreshed_at": refreshed_at.isoformat() if refreshed_at else None,
+                "staleness_seconds": round((now - refreshed_at).total_seconds(), 1) if refreshed_at else None,
+                "pending_changes": entry["pending_changes"],
+                "stale": entry["stale"],
+            })
+        return described
+
+    def refresh(self, names: Optional[List[str]] = None, force: bool = False) -> List[str]:
+        """
+        Refresh rollups whose base tables changed since their last refresh.
+
+        Each rollup is refreshed CONCURRENTLY in its own transaction, so
+        queries keep reading the previous contents meanwhile.
+
+        Args:
+            names (Optional[List[str]]): Rollups to consider; defaults to all available
+            force (bool): Refresh even if the base tables did not change
+
+        Returns:
+            List[str]: Names of the refreshed rollups
+        """
+        candidates = [name for name in (names or self.available()) if name in self.rollups]
+        if not candidates:
+            return []
+        refreshed = []
+        with self._refresh_lock:
+            status = self.status(max_age=0)
+            for name in candidates:
+                if not force and not status.get(name, {}).get("stale", True):
+                    continue
+                spec = self.rollups[name]
+                with self.pool.connection() as conn:
+                    with conn.cursor() as cur:
+                        changes = self._changes(cur, spec.base_tables)
+                        cur.execute(sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {}").format(sql.Identifier(name)))
+                        self._record_refresh(cur, spec, changes)
+                with self._lock:
+                    self._dirty.discard(name)
+                refreshed.append(name)
+        with self._lock:
+            self._status_at = 0.0
+        if refreshed and self.on_refresh is not None:
+            self.on_refresh(set(refreshed))
+        return refreshed
+
+    def _run(self) -> None:
+        """
+        Background loop refreshing changed rollups every `refresh_interval` seconds.
+        """
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # The next round retries; a failing refresh must not kill the loop.
+                pass
+
+    def start(self) -> None:
+        """
+        Start the background refresher, if a `refresh_interval` is configured.
+        """
+        with self._lock:
+            if self.refresh_interval is None or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="rollup-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background refresher.
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+_MANAGERS: Dict[Tuple, RollupManager] = {}
+_MANAGERS_LOCK = threading.Lock()
+
+def get_rollup_manager(connection_params: Dict[str, Any], pool: Optional[PostgresConnectionPool] = None,
+                       **rollup_config) -> RollupManager:
+    """
+    Return the process-wide rollup manager for a connection target.
+
+    A manager whose pool has been closed (see `close_pool`) is stopped and
+    replaced by one on the current pool.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        pool (Optional[PostgresConnectionPool]): Pool to use; defaults to the
+            shared pool for `connection_params`
+        **rollup_config: Keyword arguments forwarded to RollupManager on creation
+
+    Returns:
+        RollupManager: The shared manager
+    """
+    key = pool_key(connection_params)
+    stale = None
+    with _MANAGERS_LOCK:
+        manager = _MANAGERS.get(key)
+        if manager is not None and manager.pool.closed:
+            stale, manager = manager, None
+        if manager is None:
+            manager = RollupManager(pool or get_pool(connection_params), **rollup_config)
+            _MANAGERS[key] = manager
+    if stale is not None:
+        stale.stop()
+    return manager
+
+def release_rollup_manager(connection_params: Dict[str, Any]) -> None:
+    """
+    Stop and forget the shared rollup manager of a connection target, if any.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+    """
+    with _MANAGERS_LOCK:
+        manager = _MANAGERS.pop(pool_key(connection_params), None)
+    if manager is not None:
+        manager.stop()
+
+def main() -> None:
+    from config import CLOUD_SQL_CONNECTION
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["create", "refresh", "status", "drop"])
+    parser.add_argument("--force", action="store_true", help="refresh even if nothing changed")
+    parser.add_argument("--host", default=CLOUD_SQL_CONNECTION["host"])
+    parser.add_argument("--port", type=int, default=CLOUD_SQL_CONNECTION["port"])
+    parser.add_argument("--database", default=CLOUD_SQL_CONNECTION["database"])
+    parser.add_argument("--user", default=CLOUD_SQL_CONNECTION["user"])
+    parser.add_argument("--password", default=CLOUD_SQL_CONNECTION["password"])
+    args = parser.parse_args()
+
+    manager = RollupManager(get_pool({
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "user": args.user,
+        "password": args.password,
+    }), refresh_interval=None)
+    start = time.perf_counter()
+    if args.command == "create":
+        print("Created:", ", ".join(manager.create()) or "nothing")
+    elif args.command == "refresh":
+        print("Refreshed:", ", ".join(manager.refresh(force=args.force)) or "nothing")
+    elif args.command == "drop":
+        manager.drop()
+        print("Dropped the rollups")
+    for name, entry in manager.status(max_age=0).items():
+        print(f"  {name}: refreshed {entry['refreshed_at']:%Y-%m-%d %H:%M:%S}, "
+              f"{entry['pending_changes']} base-table writes since")
+    print(f"({time.perf_counter() - start:.2f}s)")
+
+if __name__ == "__main__":
+    main()
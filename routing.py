@@ -0,0 +1,422 @@
+import math
+import time
+import threading
+import psycopg2
+from contextlib import contextmanager, ExitStack
+from contextvars import ContextVar
+from typing import Dict, List, Any, Tuple, Optional, Iterator, Callable, Hashable
+from connection_pool import PostgresConnectionPool, PoolExhaustedError, get_pool, close_pool, pool_key
+
+# Seconds a standby's replay is behind its primary: 0 when everything received
+# has been replayed, otherwise the time since the last replayed commit (an upper
+# bound), NULL when the server is not a standby.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() <= pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END AS lag
+"""
+
+_CURRENT_SESSION: ContextVar[Optional[Hashable]] = ContextVar("talk_to_db_routing_session", default=None)
+
+@contextmanager
+def routing_session(session_id: Hashable) -> Iterator[None]:
+    """
+    Attribute the queries run inside the `with` block to a session.
+
+    Reads of a session that has just written are kept off replicas that may
+    not have replayed the write yet. Queries outside any session share one
+    default session.
+
+    Args:
+        session_id (Hashable): Identifier of the user session, e.g. a Streamlit session id
+
+    Yields:
+        None
+    """
+    token = _CURRENT_SESSION.set(session_id)
+    try:
+        yield
+    finally:
+        _CURRENT_SESSION.reset(token)
+
+class Replica:
+    """
+    A read replica and what the router last learned about it.
+
+    Attributes:
+        name (str): "host:port" of the replica
+        connection_params (Dict[str, Any]): Database connection parameters
+        pool (PostgresConnectionPool): Shared pool of the replica
+        lag (Optional[float]): Replication lag in seconds at the last check, None if unknown
+        checked_at (float): Monotonic time of the last lag check
+        next_check (float): Monotonic time from which the lag is due to be checked
+        down_until (float): Monotonic time before which the replica is not used
+        reads (int): READ queries routed to the replica
+        probe_conn (Optional[psycopg2.extensions.connection]): Connection kept for
+            lag checks, outside the pool so a check never waits for a pooled one
+    """
+
+    def __init__(self, connection_params: Dict[str, Any], pool: PostgresConnectionPool):
+        self.name = f"{connection_params.get('host')}:{connection_params.get('port', 5432)}"
+        self.connection_params = connection_params
+        self.pool = pool
+        self.lag: Optional[float] = None
+        self.checked_at = float("-inf")
+        self.next_check = 0.0
+        self.down_until = 0.0
+        self.reads = 0
+        self.probe_conn = None
+        self.probe_lock = threading.Lock()
+
+    def close_probe(self) -> None:
+        """
+        Close the lag check connection, if open.
+        """
+        conn, self.probe_conn = self.probe_conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+class ConnectionRouter:
+    """
+    Routes READ queries to replicas and everything else to the primary.
+
+    A READ goes to the replica with the lowest score, the share of its pool in
+    use plus its lag as a share of `max_lag`, among the replicas that are up
+    and whose lag is known and at most `max_lag`. Lag is checked on the request
+    path at most every `lag_check_interval` seconds per replica. Between checks
+    it is estimated as the measured lag plus the time since the check, which
+    bounds it even if replay has stalled. A replica that cannot be reached is
+    skipped for `retry_interval` seconds; its READs fail over to the primary.
+    Lag checks use a connection of their own, opened with a connect timeout
+    and a statement timeout of `probe_timeout`, so a partitioned replica
+    cannot stall the request that checks it. A replica whose pool has no free
+    connection is not marked down; the READ just goes to the primary.
+
+    Writes pin their session (see `routing_session`) to the primary: until a
+    replica's estimated lag is below the time since the session's last write,
+    the write may be missing there, so the session reads from the primary.
+    The same check against the last write of any session tells whether a
+    replica result may be cached. These guarantees cover the writes made
+    through this process; others are bounded by `max_lag` only.
+
+    Attributes:
+        primary (PostgresConnectionPool): Pool of the primary
+        replicas (List[Replica]): The read replicas
+        max_lag (float): Seconds of lag above which a replica gets no READs
+        lag_check_interval (float): Seconds between lag checks of a replica
+        retry_interval (float): Seconds an unreachable replica is skipped
+        probe_timeout (float): Seconds a lag check may take to connect and to query
+
+    Args:
+        primary (PostgresConnectionPool): Pool of the primary
+        replicas (List[Tuple[Dict[str, Any], PostgresConnectionPool]]): Connection
+            parameters and pool of every replica
+        max_lag (float): Seconds of lag above which a replica gets no READs
+        lag_check_interval (float): Seconds between lag checks of a replica
+        retry_interval (float): Seconds an unreachable replica is skipped
+        probe_timeout (float): Seconds a lag check may take to connect and to query;
+            libpq rounds connect timeouts up to whole seconds, at least 2
+        lag_probe (Optional[Callable[[Dict[str, Any]], Optional[float]]]): Returns the
+            lag of the replica with the given connection parameters instead of
+            querying it, e.g. to simulate lag without streaming replication
+    """
+
+    def __init__(self, primary: PostgresConnectionPool,
+                 replicas: List[Tuple[Dict[str, Any], PostgresConnectionPool]],
+                 max_lag: float = 5.0, lag_check_interval: float = 1.0,
+                 retry_interval: float = 10.0, probe_timeout: float = 1.0,
+                 lag_probe: Optional[Callable[[Dict[str, Any]], Optional[float]]] = None):
+        self.primary = primary
+        self.replicas = [Replica(params, pool) for params, pool in replicas]
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.retry_interval = retry_interval
+        self.probe_timeout = probe_timeout
+        self.lag_probe = lag_probe
+
+        self._lock = threading.Lock()
+        self._last_write = float("-inf")
+        self._session_writes: Dict[Hashable, float] = {}
+        self._metrics = {
+            "primary_reads": 0,
+            "replica_reads": 0,
+            "writes": 0,
+            "lag_checks": 0,
+            "lag_check_failures": 0,
+            "failovers": 0,
+            "exhausted_failovers": 0,
+            "skipped_lagging": 0,
+            "skipped_down": 0,
+            "pinned_reads": 0,
+        }
+
+    def _probe(self, replica: Replica) -> Optional[float]:
+        """
+        Measure the replication lag of a replica.
+
+        Args:
+            replica (Replica): Replica to check
+
+        Returns:
+            Optional[float]: Lag in seconds, None if the server is not a standby
+
+        Raises:
+            psycopg2.Error: If the replica cannot be queried
+        """
+        if self.lag_probe is not None:
+            return self.lag_probe(replica.connection_params)
+        conn = replica.probe_conn
+        if conn is None or conn.closed:
+            params = dict(replica.connection_params)
+            options = f"-c statement_timeout={max(1, int(self.probe_timeout * 1000))}"
+            params["options"] = f"{params['options']} {options}" if params.get("options") else options
+            params["connect_timeout"] = max(2, math.ceil(self.probe_timeout))
+            conn = psycopg2.connect(**params)
+            replica.probe_conn = conn
+        try:
+            with conn.cursor() as cur:
+                cur.execute(LAG_SQL)
+                lag = cur.fetchone()[0]
+            conn.rollback()
+        except Exception:
+            replica.close_probe()
+            raise
+        return None if lag is None else float(lag)
+
+    def _refresh(self, now: float) -> None:
+        """
+        Check the lag of every replica whose last check is older than `lag_check_interval`.
+
+        Each due replica is claimed under the lock, so concurrent requests do
+        not check the same replica twice; a replica whose previous check is
+        still running is skipped.
+
+        Args:
+            now (float): Current monotonic time
+        """
+        with self._lock:
+            due = [replica for replica in self.replicas if now >= replica.next_check]
+            for replica in due:
+                replica.next_check = now + self.lag_check_interval
+        for replica in due:
+            if not replica.probe_lock.acquire(blocking=False):
+                continue
+            started = time.monotonic()
+            try:
+                lag = self._probe(replica)
+            except Exception:
+                self.mark_down(replica)
+                with self._lock:
+                    self._metrics["lag_check_failures"] += 1
+                continue
+            finally:
+                replica.probe_lock.release()
+            with self._lock:
+                replica.lag = lag
+                replica.checked_at = started
+                self._metrics["lag_checks"] += 1
+
+    def _estimated_lag(self, replica: Replica, now: float) -> Optional[float]:
+        """
+        Bound the current lag of a replica from its last check.
+
+        Args:
+            replica (Replica): Replica to estimate
+            now (float): Current monotonic time
+
+        Returns:
+            Optional[float]: Upper bound of the lag in seconds, None if unknown
+        """
+        if replica.lag is None:
+            return None
+        return replica.lag + max(0.0, now - replica.checked_at)
+
+    def mark_down(self, replica: Replica) -> None:
+        """
+        Stop routing to a replica for `retry_interval` seconds.
+
+        Args:
+            replica (Replica): Replica that could not be reached
+        """
+        with self._lock:
+            replica.lag = None
+            replica.down_until = time.monotonic() + self.retry_interval
+            replica.next_check = replica.down_until
+
+    def route_read(self) -> Optional[Replica]:
+        """
+        Choose the replica for a READ query of the current session.
+
+        Returns:
+            Optional[Replica]: The replica to read from, None to read from the primary
+        """
+        if not self.replicas:
+            return None
+        now = time.monotonic()
+        self._refresh(now)
+        with self._lock:
+            session_write = self._session_writes.get(_CURRENT_SESSION.get(), float("-inf"))
+            best, best_score, reason = None, None, None
+            for replica in self.replicas:
+                lag = self._estimated_lag(replica, now)
+                if now < replica.down_until or lag is None:
+                    reason = reason or "skipped_down"
+                    continue
+                if lag > self.max_lag:
+                    reason = "skipped_lagging"
+                    continue
+                if lag >= now - session_write:
+                    reason = "pinned_reads"
+                    continue
+                load = replica.pool.metrics()["in_use"] / replica.pool.max_size
+                score = load + lag / self.max_lag if self.max_lag else load
+                if best_score is None or score < best_score:
+                    best, best_score = replica, score
+            if best is None:
+                self._metrics["primary_reads"] += 1
+                self._metrics[reason] += 1
+                return None
+            best.reads += 1
+            self._metrics["replica_reads"] += 1
+            return best
+
+    def is_current(self, replica: Optional[Replica]) -> bool:
+        """
+        Whether a replica has replayed every write made through this router.
+
+        Args:
+            replica (Optional[Replica]): Replica a result was read from, None for the primary
+
+        Returns:
+            bool: True if results read from it reflect all writes and may be cached
+        """
+        if replica is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            lag = self._estimated_lag(replica, now)
+            return lag is not None and lag < now - self._last_write
+
+    def record_write(self) -> None:
+        """
+        Remember that the current session has written to the primary.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._metrics["writes"] += 1
+            self._last_write = now
+            self._session_writes[_CURRENT_SESSION.get()] = now
+            # After max_lag seconds every usable replica has the write.
+            expired = [session for session, at in self._session_writes.items() if now - at > self.max_lag]
+            for session in expired:
+                del self._session_writes[session]
+
+    @contextmanager
+    def connection(self, replica: Optional[Replica] = None) -> Iterator[Any]:
+        """
+        Borrow a connection to a routing target, see `PostgresConnectionPool.connection`.
+
+        If the replica cannot be connected to, it is marked down and the
+        connection comes from the primary instead. If its pool is exhausted the
+        connection also comes from the primary, but the replica stays up.
+
+        Args:
+            replica (Optional[Replica]): Target from `route_read`, None for the primary
+
+        Yields:
+            psycopg2.extensions.connection: A pooled connection
+        """
+        with ExitStack() as stack:
+            if replica is None:
+                conn = stack.enter_context(self.primary.connection())
+            else:
+                try:
+                    conn = stack.enter_context(replica.pool.connection())
+                except PoolExhaustedError:
+                    with self._lock:
+                        self._metrics["exhausted_failovers"] += 1
+                    conn = stack.enter_context(self.primary.connection())
+                except psycopg2.OperationalError:
+                    self.mark_down(replica)
+                    with self._lock:
+                        self._metrics["failovers"] += 1
+                    conn = stack.enter_context(self.primary.connection())
+            yield conn
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the routing counters and replica states.
+
+        Returns:
+            Dict[str, Any]: Counters for reads per target, writes, lag checks,
+                failovers and the reasons READs stayed on the primary, plus
+                `replicas` with the lag, state and reads of every replica
+        """
+        now = time.monotonic()
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._metrics)
+            snapshot["replicas"] = [
+                {
+                    "name": replica.name,
+                    "lag_seconds": replica.lag,
+                    "up": now >= replica.down_until,
+                    "reads": replica.reads,
+                }
+                for replica in self.replicas
+            ]
+        return snapshot
+
+_ROUTERS: Dict[Tuple, ConnectionRouter] = {}
+_ROUTERS_LOCK = threading.Lock()
+
+def get_router(connection_params: Dict[str, Any], replica_params: List[Dict[str, Any]],
+               pool_config: Dict[str, Any], **routing_config) -> ConnectionRouter:
+    """
+    Return the process-wide router for a primary, creating it on first use.
+
+    Every processor writing to the same primary shares one router, so a write
+    through one of them pins its session for all of them.
+
+    Args:
+        connection_params (Dict[str, Any]): Connection parameters of the primary
+        replica_params (List[Dict[str, Any]]): Connection parameters of every replica
+        pool_config (Dict[str, Any]): Settings of pools that do not exist yet
+        **routing_config: Keyword arguments forwarded to ConnectionRouter on creation
+
+    Returns:
+        ConnectionRouter: The shared router
+    """
+    key = pool_key(connection_params)
+    with _ROUTERS_LOCK:
+        router = _ROUTERS.get(key)
+        if router is None:
+            router = ConnectionRouter(
+                get_pool(connection_params, **pool_config),
+                [(params, get_pool(params, **pool_config)) for params in replica_params],
+                **routing_config
+            )
+            _ROUTERS[key] = router
+        return router
+
+def release_router(connection_params: Dict[str, Any]) -> None:
+    """
+    Forget the shared router of a primary and close its replica pools and
+    lag check connections, if any.
+
+    The primary's pool is left to its owner.
+
+    Args:
+        connection_params (Dict[str, Any]): Connection parameters of the primary
+    """
+    with _ROUTERS_LOCK:
+        router = _ROUTERS.pop(pool_key(connection_params), None)
+    if router is not None:
+        for replica in router.replicas:
+            with replica.probe_lock:
+                replica.close_probe()
+            close_pool(replica.connection_params)
@@ -0,0 +1,387 @@
+import time
+import select
+import threading
+import psycopg2
+from psycopg2 import sql
+from typing import Dict, List, Any, Tuple, Optional, Iterable, Set
+from connection_pool import PostgresConnectionPool, get_pool, pool_key
+from schema_context import CompiledContext, compile_context
+from result_cache import estimate_size
+
+CATALOG_QUERY = """
+SELECT
+    c.relname AS table_name,
+    a.attname AS column_name,
+    pg_catalog.format_type(a.atttypid, a.atttypmod) AS data_type,
+    pg_catalog.col_description(c.oid, a.attnum) AS description,
+    CASE WHEN a.attnotnull THEN 'NO' ELSE 'YES' END AS is_nullable,
+    pg_catalog.pg_get_expr(d.adbin, d.adrelid) AS column_default,
+    fk.foreign_table_name,
+    fk.foreign_column_name
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_attribute a
+    ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+LEFT JOIN pg_catalog.pg_attrdef d
+    ON d.adrelid = c.oid AND d.adnum = a.attnum
+LEFT JOIN LATERAL (
+    SELECT
+        rc.relname AS foreign_table_name,
+        ra.attname AS foreign_column_name
+    FROM pg_catalog.pg_constraint con
+    JOIN pg_catalog.pg_class rc ON rc.oid = con.confrelid
+    JOIN pg_catalog.pg_attribute ra
+        ON ra.attrelid = con.confrelid
+        AND ra.attnum = con.confkey[array_position(con.conkey, a.attnum)]
+    WHERE con.conrelid = c.oid
+    AND con.contype = 'f'
+    AND a.attnum = ANY(con.conkey)
+    LIMIT 1
+) fk ON true
+WHERE c.relname = ANY(%s)
+AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+AND pg_catalog.pg_table_is_visible(c.oid)
+ORDER BY c.relname, a.attnum;
+"""
+
+class SchemaCatalog:
+    """
+    Process-wide cache of table schema information for one database.
+
+    All requested tables are introspected with a single `pg_catalog` query.
+    Loaded schemas are reused until they are older than `ttl`, until
+    `invalidate` is called, or, when a `listen_channel` is configured, until a
+    notification arrives on that channel (see `install_ddl_notify_trigger`).
+    Every reload bumps `version` so dependent caches can tell the schema changed;
+    rendered prompt contexts are memoized per version by `get_compiled_context`.
+
+    Attributes:
+        pool (PostgresConnectionPool): Pool used for catalog queries
+        ttl (Optional[float]): Seconds a loaded schema stays fresh; None disables expiry
+        listen_channel (Optional[str]): Channel LISTENed on for schema change notifications
+        version (int): Incremented every time the cached schema is replaced
+
+    Args:
+        pool (PostgresConnectionPool): Pool used for catalog queries
+        ttl (Optional[float]): Seconds a loaded schema stays fresh; None disables expiry
+        listen_channel (Optional[str]): Channel to LISTEN on for schema changes
+    """
+
+    def __init__(self, pool: PostgresConnectionPool, ttl: Optional[float] = 600.0,
+                 listen_channel: Optional[str] = None):
+        self.pool = pool
+        self.ttl = ttl
+        self.listen_channel = listen_channel
+        self.version = 0
+
+        self._lock = threading.RLock()
+        self._tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._loaded_at: Optional[float] = None
+        self._stale = False
+        self._listen_conn = None
+        self._contexts: Dict[Tuple, CompiledContext] = {}
+
+    def _open_listener(self) -> None:
+        """
+        Open the dedicated LISTEN connection if change detection is enabled.
+
+        Failures are swallowed; the catalog then relies on TTL expiry alone and
+        retries on the next access.
+        """
+        if not self.listen_channel or self._listen_conn is not None:
+            return
+        try:
+            conn = psycopg2.connect(**self.pool.connection_params)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.listen_channel)))
+            self._listen_conn = conn
+        except psycopg2.Error:
+            self._listen_conn = None
+
+    def _poll_notifications(self) -> None:
+        """
+        Drain pending schema change notifications without blocking.
+
+        Any notification marks the catalog stale. A broken listener connection
+        also marks it stale, since changes may have been missed.
+        """
+        conn = self._listen_conn
+        if conn is None:
+            return
+        try:
+            if select.select([conn], [], [], 0)[0]:
+                conn.poll()
+            if conn.notifies:
+                conn.notifies.clear()
+                self._stale = True
+        except (psycopg2.Error, OSError, ValueError):
+            try:
+                conn.close()
+            except Exception:
+                pass
+            self._listen_conn = None
+            self._stale = True
+
+    def _is_fresh(self) -> bool:
+        """
+        Check whether the cached schema can be served as is.
+
+        Returns:
+            bool: False if never loaded, invalidated, notified, or past the TTL
+        """
+        self._poll_notifications()
+        if self._loaded_at is None or self._stale:
+            return False
+        if self.ttl is not None and time.monotonic() - self._loaded_at > self.ttl:
+            return False
+        return True
+
+    def _fetch(self, table_names: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Introspect the given tables with one catalog query.
+
+        Args:
+            table_names (Iterable[str]): Tables to load
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: Column information per table, in the
+                same format as `NLToPostgresProcessor._get_table_schema`
+        """
+        names = sorted(set(table_names))
+        tables: Dict[str, List[Dict[str, Any]]] = {name: [] for name in names}
+        if not names:
+            return tables
+
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CATALOG_QUERY, (names,))
+                rows = cur.fetchall()
+
+        for row in rows:
+            column = {
+                "name": row['column_name'],
+                "type": row['data_type'],
+                "description": row['description'] or "No description available",
+                "nullable": row['is_nullable'],
+                "default": row['column_default']
+            }
+            if row['foreign_table_name']:
+                column['foreign_key'] = {
+                    'references_table': row['foreign_table_name'],
+                    'references_column': row['foreign_column_name']
+                }
+            tables[row['table_name']].append(column)
+        return tables
+
+    def get_tables(self, table_names: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Return schema information for several tables, loading what is missing.
+
+        When the cache is stale, every known table plus the requested ones are
+        reloaded in a single query; otherwise only unknown tables are fetched.
+
+        Args:
+            table_names (Iterable[str]): Tables to return
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: Column information per requested table
+
+        Raises:
+            psycopg2.Error: If the catalog query fails
+        """
+        names = list(table_names)
+        with self._lock:
+            self._open_listener()
+            if not self._is_fresh():
+                stale_names = set(self._tables) | set(names)
+                self._tables = self._fetch(stale_names)
+                self._loaded_at = time.monotonic()
+                self._stale = False
+                self.version += 1
+            else:
+                missing = [name for name in names if name not in self._tables]
+                if missing:
+                    self._tables.update(self._fetch(missing))
+                    self.version += 1
+            return {name: self._tables[name] for name in names}
+
+    def get_table_schema(self, table_name: str) -> List[Dict[str, Any]]:
+        """
+        Return schema information for a single table.
+
+        Args:
+            table_name (str): Name of the table
+
+        Returns:
+            List[Dict[str, Any]]: Column information for the table
+        """
+        return self.get_tables([table_name])[table_name]
+
+    def get_compiled_context(self, table_metadata: Dict[str, str]) -> CompiledContext:
+        """
+        Return the rendered schema context for `table_metadata`, compiling it
+        only when the schema version or the table metadata changed.
+
+        Args:
+            table_metadata (Dict[str, str]): Mapping of table names to their descriptions
+
+        Returns:
+            CompiledContext: The rendered context and its fingerprint
+        """
+        with self._lock:
+            schemas = self.get_tables(table_metadata)
+            key = tuple(table_metadata.items())
+            compiled = self._contexts.get(key)
+            if compiled is None or compiled.version != self.version:
+                compiled = compile_context(table_metadata, schemas, self.version)
+                self._contexts = {k: v for k, v in self._contexts.items() if v.version == self.version}
+                self._contexts[key] = compiled
+            return compiled
+
+    def invalidate(self) -> None:
+        """
+        Mark the cached schema stale so the next access reloads it.
+        """
+        with self._lock:
+            self._stale = True
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return the size of the cached schema.
+
+        Returns:
+            Dict[str, Any]: Schema `version`, cached `tables` and compiled
+                `contexts`, and the approximate `bytes` they hold
+        """
+        with self._lock:
+            size = sum(estimate_size(columns) for columns in self._tables.values())
+            size += sum(len(compiled.text) * 2 for compiled in self._contexts.values())
+            return {
+                "version": self.version,
+                "tables": len(self._tables),
+                "contexts": len(self._contexts),
+                "bytes": size,
+            }
+
+    def fingerprints(self) -> Set[str]:
+        """
+        Return the fingerprints of the compiled contexts held by the catalog.
+
+        Returns:
+            Set[str]: Context fingerprints
+        """
+        with self._lock:
+            return {compiled.fingerprint for compiled in self._contexts.values()}
+
+    def close(self) -> None:
+        """
+        Close the LISTEN connection, if any, and drop the cached schema and
+        compiled contexts.
+        """
+        with self._lock:
+            self._tables = {}
+            self._contexts = {}
+            self._loaded_at = None
+            if self._listen_conn is not None:
+                try:
+                    self._listen_conn.close()
+                except Exception:
+                    pass
+                self._listen_conn = None
+
+def install_ddl_notify_trigger(connection_params: Dict[str, Any], channel: str) -> None:
+    """
+    Install an event trigger that NOTIFYs `channel` after every DDL command.
+
+    Creating event triggers requires superuser privileges, so this is run once
+    by an administrator rather than by the application.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        channel (str): Notification channel the SchemaCatalog listens on
+
+    Raises:
+        psycopg2.Error: If the trigger cannot be created
+    """
+    function_body = sql.SQL(
+        "BEGIN PERFORM pg_notify({}, tg_tag); END"
+    ).format(sql.Literal(channel))
+
+    with psycopg2.connect(**connection_params) as conn:
+        with conn.cursor() as cur:
+            function_sql = sql.SQL(
+                "CREATE OR REPLACE FUNCTION talk_to_db_notify_ddl() "
+                "RETURNS event_trigger LANGUAGE plpgsql AS {}"
+            ).format(sql.Literal(function_body.as_string(conn)))
+            cur.execute(function_sql)
+            cur.execute("DROP EVENT TRIGGER IF EXISTS talk_to_db_schema_change")
+            cur.execute(
+                "CREATE EVENT TRIGGER talk_to_db_schema_change ON ddl_command_end "
+                "EXECUTE FUNCTION talk_to_db_notify_ddl()"
+            )
+    conn.close()
+
+_CATALOGS: Dict[Tuple, SchemaCatalog] = {}
+_CATALOGS_LOCK = threading.Lock()
+
+def get_schema_catalog(connection_params: Dict[str, Any], pool: Optional[PostgresConnectionPool] = None,
+                       **catalog_config) -> SchemaCatalog:
+    """
+    Return the process-wide schema catalog for a connection target.
+
+    A catalog whose pool has been closed (see `close_pool`) is closed and
+    replaced by one on the current pool.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+        pool (Optional[PostgresConnectionPool]): Pool to use; defaults to the shared
+            pool for `connection_params`
+        **catalog_config: Keyword arguments forwarded to SchemaCatalog on creation
+
+    Returns:
+        SchemaCatalog: The shared catalog for this target
+    """
+    key = pool_key(connection_params)
+    stale = None
+    with _CATALOGS_LOCK:
+        catalog = _CATALOGS.get(key)
+        if catalog is not None and catalog.pool.closed:
+            stale, catalog = catalog, None
+        if catalog is None:
+            catalog = SchemaCatalog(pool or get_pool(connection_params), **catalog_config)
+            _CATALOGS[key] = catalog
+    if stale is not None:
+        stale.close()
+    return catalog
+
+def release_schema_catalog(connection_params: Dict[str, Any]) -> None:
+    """
+    Close and forget the shared schema catalog of a connection target, if any.
+
+    Args:
+        connection_params (Dict[str, Any]): Database connection parameters
+    """
+    with _CATALOGS_LOCK:
+        catalog = _CATALOGS.pop(pool_key(connection_params), None)
+    if catalog is not None:
+        catalog.close()
+
+def catalog_fingerprints() -> Set[str]:
+    """
+    Return the fingerprints of the contexts compiled by every shared schema catalog.
+
+    Returns:
+        Set[str]: Context fingerprints still in use
+    """
+    with _CATALOGS_LOCK:
+        catalogs = list(_CATALOGS.values())
+    return set().union(*(catalog.fingerprints() for catalog in catalogs))
+
+def invalidate_all_catalogs() -> None:
+    """
+    Mark every shared schema catalog stale.
+    """
+    with _CATALOGS_LOCK:
+        catalogs = list(_CATALOGS.values())
+    for catalog in catalogs:
+        catalog.invalidate()
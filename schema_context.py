@@ -0,0 +1,137 @@
+import hashlib
+from typing import Dict, List, Any, NamedTuple, Optional, Iterable
+
+class CompiledContext(NamedTuple):
+    """
+    Schema context rendered once per schema version.
+
+    Attributes:
+        text (str): Full context for every table, as embedded in NL2SQL_PROMPT
+        fingerprint (str): SHA-256 hex digest of `text`
+        version (int): SchemaCatalog version the context was compiled from
+        table_blocks (Dict[str, str]): Rendered "Table: ..." block per table
+        relationships (Dict[str, List[str]]): Rendered relationship lines per table
+    """
+    text: str
+    fingerprint: str
+    version: int
+    table_blocks: Dict[str, str]
+    relationships: Dict[str, List[str]]
+
+    def render(self, table_names: Optional[Iterable[str]] = None) -> str:
+        """
+        Assemble the context for a subset of tables from the precompiled blocks.
+
+        Args:
+            table_names (Optional[Iterable[str]]): Tables to include, in order;
+                None returns the full context
+
+        Returns:
+            str: Context text in the same layout as `text`
+        """
+        if table_names is None:
+            return self.text
+        names = [name for name in table_names if name in self.table_blocks]
+        return _assemble(names, self.table_blocks, self.relationships)
+
+def _render_table_block(table_name: str, description: str,
+                        schema_info: List[Dict[str, Any]]) -> str:
+    """
+    Render the description and columns of one table.
+
+    Args:
+        table_name (str): Name of the table
+        description (str): Table description from TABLE_METADATA
+        schema_info (List[Dict[str, Any]]): Column information from the schema catalog
+
+    Returns:
+        str: The table block, terminated by a blank line
+    """
+    lines = [
+        f"Table: {table_name}",
+        f"Description: {description}",
+        "Columns:",
+    ]
+    for field in schema_info:
+        line = f"- {field['name']} ({field['type']})"
+        if 'foreign_key' in field:
+            line += f" [FK -> {field['foreign_key']['references_table']}.{field['foreign_key']['references_column']}]"
+        lines.append(f"{line}: {field['description']}")
+    return "\n".join(lines) + "\n\n"
+
+def _render_relationships(table_name: str, schema_info: List[Dict[str, Any]]) -> List[str]:
+    """
+    Render the foreign key relationships of one table.
+
+    Args:
+        table_name (str): Name of the table
+        schema_info (List[Dict[str, Any]]): Column information from the schema catalog
+
+    Returns:
+        List[str]: One line per foreign key column
+    """
+    return [
+        f"- {table_name}.{field['name']} relates to "
+        f"{field['foreign_key']['references_table']}.{field['foreign_key']['references_column']}\n"
+        for field in schema_info
+        if 'foreign_key' in field
+    ]
+
+def _assemble(table_names: List[str], table_blocks: Dict[str, str],
+              relationships: Dict[str, List[str]]) -> str:
+    """
+    Join precompiled table blocks and relationship lines into a context string.
+
+    Args:
+        table_names (List[str]): Tables to include, in order
+        table_blocks (Dict[str, str]): Rendered block per table
+        relationships (Dict[str, List[str]]): Rendered relationship lines per table
+
+    Returns:
+        str: The assembled context
+    """
+    parts = ["Database Schema Information:\n\n"]
+    parts.extend(table_blocks[name] for name in table_names)
+    parts.append("\nRelationships:\n")
+    for name in table_names:
+        parts.extend(relationships[name])
+    return "".join(parts)
+
+def fingerprint_text(text: str) -> str:
+    """
+    Compute the fingerprint of a rendered context.
+
+    Args:
+        text (str): Context text
+
+    Returns:
+        str: SHA-256 hex digest of the UTF-8 encoded text
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def compile_context(table_metadata: Dict[str, str], schemas: Dict[str, List[Dict[str, Any]]],
+                    version: int) -> CompiledContext:
+    """
+    Render the schema context for every table in `table_metadata`.
+
+    Args:
+        table_metadata (Dict[str, str]): Mapping of table names to their descriptions
+        schemas (Dict[str, List[Dict[str, Any]]]): Column information per table
+        version (int): SchemaCatalog version the schemas were read at
+
+    Returns:
+        CompiledContext: The rendered context, its fingerprint and per-table pieces
+    """
+    table_blocks = {
+        name: _render_table_block(name, description, schemas[name])
+        for name, description in table_metadata.items()
+    }
+    relationships = {name: _render_relationships(name, schemas[name]) for name in table_metadata}
+    text = _assemble(list(table_metadata), table_blocks, relationships)
+    return CompiledContext(
+        text=text,
+        fingerprint=fingerprint_text(text),
+        version=version,
+        table_blocks=table_blocks,
+        relationships=relationships
+    )
@@ -0,0 +1,286 @@
+import re
+import math
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Any, Tuple, Optional, Callable, Sequence, FrozenSet
+from schema_context import CompiledContext
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from get give has have how i in is it list me my of on or
+show than that the their them there these this to was were what when where which who
+with all each every per find fetch display return many much most top
+""".split())
+
+def tokenize(text: str, stopwords: FrozenSet[str] = STOPWORDS) -> List[str]:
+    """
+    Split text into lowercase search terms.
+
+    CamelCase and snake_case identifiers are split into their parts, stopwords
+    are dropped, and a trailing plural "s" is stripped so "invoices" matches
+    "invoice".
+
+    Args:
+        text (str): Question, identifier or description
+        stopwords (FrozenSet[str]): Words to drop
+
+    Returns:
+        List[str]: Normalized terms
+    """
+    text = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', text or "")
+    terms = []
+    for word in re.findall(r'[a-z0-9]+', text.lower()):
+        if word in stopwords:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the LLM token count of a text (roughly four characters per token).
+
+    Args:
+        text (str): Prompt text
+
+    Returns:
+        int: Estimated token count
+    """
+    return (len(text) + 3) // 4
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    """
+    Cosine similarity of two vectors.
+
+    Args:
+        a (Sequence[float]): First vector
+        b (Sequence[float]): Second vector
+
+    Returns:
+        float: Similarity in [-1, 1], 0 for zero vectors
+    """
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+class SchemaIndex:
+    """
+    Lexical (BM25) index over tables and columns, with optional embeddings.
+
+    Each table is indexed as one document made of its name, its TABLE_METADATA
+    description and its column names and descriptions. Column names are also
+    indexed on their own so that the columns behind a table's score can be
+    reported. When an `embedder` is given, cosine similarity between question
+    and table embeddings is blended into the lexical score.
+
+    Attributes:
+        table_names (List[str]): Indexed tables in TABLE_METADATA order
+        neighbours (Dict[str, List[str]]): Tables linked to each table by a foreign key
+
+    Args:
+        table_metadata (Dict[str, str]): Mapping of table names to their descriptions
+        schemas (Dict[str, List[Dict[str, Any]]]): Column information per table
+        embedder (Optional[Callable[[List[str]], List[List[float]]]]): Local embedding
+            function mapping texts to vectors
+        embedding_weight (float): Weight of the embedding score in [0, 1]
+        k1 (float): BM25 term frequency saturation
+        b (float): BM25 length normalization
+    """
+
+    def __init__(self, table_metadata: Dict[str, str], schemas: Dict[str, List[Dict[str, Any]]],
+                 embedder: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 embedding_weight: float = 0.5, k1: float = 1.2, b: float = 0.75):
+        self.table_names = list(table_metadata)
+        self.embedder = embedder
+        self.embedding_weight = embedding_weight if embedder else 0.0
+        self.k1 = k1
+        self.b = b
+
+        self._term_freqs: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._column_terms: Dict[str, List[Tuple[str, set]]] = {}
+        self.neighbours: Dict[str, List[str]] = {name: [] for name in self.table_names}
+        document_freq: Counter = Counter()
+        documents = []
+
+        for name, description in table_metadata.items():
+            columns = schemas.get(name, [])
+            terms = tokenize(name) * 3 + tokenize(description)
+            column_terms = []
+            for column in columns:
+                name_terms = tokenize(column['name'])
+                terms.extend(name_terms * 2)
+                terms.extend(tokenize(column.get('description', '')))
+                column_terms.append((column['name'], set(name_terms)))
+                if 'foreign_key' in column:
+                    target = column['foreign_key']['references_table']
+                    if target in self.neighbours and target != name:
+                        self.neighbours[name].append(target)
+                        self.neighbours[target].append(name)
+
+            self._term_freqs[name] = Counter(terms)
+            self._lengths[name] = len(terms)
+            self._column_terms[name] = column_terms
+            document_freq.update(set(terms))
+            documents.append(
+                f"{name}: {description}. Columns: " + ", ".join(c['name'] for c in columns)
+            )
+
+        count = max(len(self.table_names), 1)
+        self._avg_length = sum(self._lengths.values()) / count if self._lengths else 0.0
+        self._idf = {
+            term: math.log(1 + (count - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_freq.items()
+        }
+        self._embeddings = dict(zip(self.table_names, embedder(documents))) if embedder else {}
+
+    def _bm25(self, table_name: str, query_terms: List[str]) -> float:
+        """
+        BM25 score of one table for the query terms.
+
+        Args:
+            table_name (str): Indexed table
+            query_terms (List[str]): Tokenized question
+
+        Returns:
+            float: Lexical relevance score
+        """
+        freqs = self._term_freqs[table_name]
+        length_norm = 1 - self.b + self.b * self._lengths[table_name] / (self._avg_length or 1)
+        score = 0.0
+        for term in query_terms:
+            tf = freqs.get(term)
+            if tf:
+                score += self._idf[term] * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        return score
+
+    def rank(self, question: str) -> List[Dict[str, Any]]:
+        """
+        Rank every indexed table against a question.
+
+        Args:
+            question (str): Natural language question
+
+        Returns:
+            List[Dict[str, Any]]: Tables with a positive score, best first, each with:
+                - table: Table name
+                - score: Combined relevance score
+                - columns: Names of columns whose name matches a question term
+        """
+        query_terms = tokenize(question)
+        query_set = set(query_terms)
+        lexical = {name: self._bm25(name, query_terms) for name in self.table_names}
+        top = max(lexical.values(), default=0.0) or 1.0
+
+        semantic = {}
+        if self.embedder:
+            question_vector = self.embedder([question])[0]
+            semantic = {
+                name: max(_cosine(question_vector, vector), 0.0)
+                for name, vector in self._embeddings.items()
+            }
+
+        ranking = []
+        for name in self.table_names:
+            score = (1 - self.embedding_weight) * lexical[name] / top
+            score += self.embedding_weight * semantic.get(name, 0.0)
+            if score <= 0:
+                continue
+            columns = [col for col, terms in self._column_terms[name] if terms & query_set]
+            ranking.append({"table": name, "score": score, "columns": columns})
+        ranking.sort(key=lambda item: item["score"], reverse=True)
+        return ranking
+
+    def select_tables(self, question: str, compiled: CompiledContext, top_k: int = 5,
+                      max_tokens: Optional[int] = None, include_fk_neighbours: bool = True) -> List[str]:
+        """
+        Choose the tables whose schema should go into the prompt.
+
+        The `top_k` best-ranked tables are taken first, followed by their
+        foreign-key neighbours, and tables are dropped from the end of that
+        list once the rendered blocks would exceed `max_tokens`. The best
+        table is always kept. If nothing matches the question, every table is
+        returned so the model still sees the full schema.
+
+        Args:
+            question (str): Natural language question
+            compiled (CompiledContext): Precompiled context whose blocks are measured
+            top_k (int): Number of directly relevant tables to keep
+            max_tokens (Optional[int]): Token budget for the table blocks
+            include_fk_neighbours (bool): Whether to add FK-linked tables
+
+        Returns:
+            List[str]: Selected tables in TABLE_METADATA order
+        """
+        ranking = self.rank(question)
+        if not ranking:
+            return list(self.table_names)
+
+        selected = [item["table"] for item in ranking[:top_k]]
+        if include_fk_neighbours:
+            for name in list(selected):
+                for neighbour in self.neighbours[name]:
+                    if neighbour not in selected:
+                        selected.append(neighbour)
+
+        if max_tokens is not None:
+            kept, used = [], 0
+            for name in selected:
+                cost = estimate_tokens(compiled.table_blocks[name])
+                if kept and used + cost > max_tokens:
+                    continue
+                kept.append(name)
+                used += cost
+            selected = kept
+
+        chosen = set(selected)
+        return [name for name in self.table_names if name in chosen]
+
+_INDEXES: "OrderedDict[Tuple, SchemaIndex]" = OrderedDict()
+_INDEXES_LOCK = threading.Lock()
+_MAX_INDEXES = 16
+
+def get_schema_index(compiled: CompiledContext, table_metadata: Dict[str, str],
+                     schemas: Dict[str, List[Dict[str, Any]]],
+                     embedder: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                     embedding_weight: float = 0.5) -> SchemaIndex:
+    """
+    Return the process-wide index for a compiled context, building it once.
+
+    Indexes are keyed by the context fingerprint, so they are rebuilt only when
+    the schema or table metadata changes.
+
+    Args:
+        compiled (CompiledContext): Compiled context the index belongs to
+        table_metadata (Dict[str, str]): Mapping of table names to their descriptions
+        schemas (Dict[str, List[Dict[str, Any]]]): Column information per table
+        embedder (Optional[Callable[[List[str]], List[List[float]]]]): Local embedding function
+        embedding_weight (float): Weight of the embedding score in [0, 1]
+
+    Returns:
+        SchemaIndex: The shared index
+    """
+    key = (compiled.fingerprint, id(embedder), embedding_weight)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is not None:
+            _INDEXES.move_to_end(key)
+            return index
+
+    index = SchemaIndex(table_metadata, schemas, embedder=embedder, embedding_weight=embedding_weight)
+    with _INDEXES_LOCK:
+        _INDEXES[key] = index
+        while len(_INDEXES) > _MAX_INDEXES:
+            _INDEXES.popitem(last=False)
+    return index
+
+def release_schema_index(fingerprint: str) -> None:
+    """
+    Forget the shared indexes of a compiled context, if any.
+
+    Args:
+        fingerprint (str): Fingerprint of the compiled context
+    """
+    with _INDEXES_LOCK:
+        for key in [key for key in _INDEXES if key[0] == fingerprint]:
+            del _INDEXES[key]
@@ -0,0 +1,187 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Tuple, Callable, Awaitable, Hashable, TypeVar
+from instrumentation import stage, add_count
+
+T = TypeVar("T")
+
+class _LeaderAbandoned(Exception):
+    """
+    Set on a flight whose leader was cancelled or interrupted; waiting
+    callers start the work again instead of failing.
+    """
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one execution.
+
+    The first caller for a key (the leader) runs the work; callers arriving
+    while it is in flight wait for it and receive the same result, or the
+    same exception. Flights are plain concurrent futures, so threads and
+    asyncio tasks (on any event loop) coalesce with each other. Once the
+    work finishes the key is forgotten: only concurrent calls are
+    coalesced, nothing is cached.
+
+    If the leader is cancelled, its waiting callers elect a new leader among
+    themselves. A waiting asyncio task can be cancelled without affecting
+    the flight.
+
+    Each coalesced call adds to the `coalesced_<name>` count of its trace,
+    which the processor's instrumentation exports as a counter, and its wait
+    is timed as the `<name>_wait` stage.
+
+    Args:
+        name (str): Flight kind, e.g. "generation"
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Future] = {}
+        self._metrics = {
+            "leaders": 0,
+            "coalesced": 0,
+            "abandoned": 0,
+        }
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """
+        Attach to the flight for a key, starting one if none is in flight.
+
+        Args:
+            key (Hashable): Flight key
+
+        Returns:
+            Tuple[Future, bool]: The flight and whether the caller leads it
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._metrics["coalesced"] += 1
+                return flight, False
+            flight = Future()
+            self._flights[key] = flight
+            self._metrics["leaders"] += 1
+            return flight, True
+
+    def _land(self, key: Hashable, flight: Future) -> None:
+        """
+        Forget a finished flight, unless `forget` already replaced it.
+
+        Args:
+            key (Hashable): Flight key
+            flight (Future): The finished flight
+        """
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def _abandon(self, key: Hashable, flight: Future) -> None:
+        """
+        Release the callers of a flight whose leader stopped without a result.
+
+        Args:
+            key (Hashable): Flight key
+            flight (Future): The abandoned flight
+        """
+        self._land(key, flight)
+        with self._lock:
+            self._metrics["abandoned"] += 1
+        flight.set_exception(_LeaderAbandoned())
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Run `fn` once for all concurrent callers with the same key.
+
+        Args:
+            key (Hashable): Identifies equivalent work
+            fn (Callable[[], T]): The work, run by the leader on its own thread
+
+        Returns:
+            Tuple[T, bool]: The result and whether it came from another caller's flight
+
+        Raises:
+            Exception: Whatever the leader's `fn` raised
+        """
+        while True:
+            flight, leader = self._join(key)
+            if not leader:
+                add_count(f"coalesced_{self.name}")
+                try:
+                    with stage(f"{self.name}_wait"):
+                        return flight.result(), True
+                except _LeaderAbandoned:
+                    continue
+            try:
+                result = fn()
+            except Exception as e:
+                self._land(key, flight)
+                flight.set_exception(e)
+                raise
+            except BaseException:
+                self._abandon(key, flight)
+                raise
+            self._land(key, flight)
+            flight.set_result(result)
+            return result, False
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Await `fn()` once for all concurrent callers with the same key.
+
+        Args:
+            key (Hashable): Identifies equivalent work
+            fn (Callable[[], Awaitable[T]]): The work, awaited by the leader
+
+        Returns:
+            Tuple[T, bool]: The result and whether it came from another caller's flight
+
+        Raises:
+            Exception: Whatever the leader's `fn` raised
+        """
+        while True:
+            flight, leader = self._join(key)
+            if not leader:
+                add_count(f"coalesced_{self.name}")
+                try:
+                    with stage(f"{self.name}_wait"):
+                        # Shielded, so a cancelled waiter does not cancel the flight.
+                        return await asyncio.shield(asyncio.wrap_future(flight)), True
+                except _LeaderAbandoned:
+                    continue
+            try:
+                result = await fn()
+            except Exception as e:
+                self._land(key, flight)
+                flight.set_exception(e)
+                raise
+            except BaseException:
+                self._abandon(key, flight)
+                raise
+            self._land(key, flight)
+            flight.set_result(result)
+            return result, False
+
+    def forget(self) -> None:
+        """
+        Detach every flight in progress, so later callers start new ones.
+
+        Callers already waiting still receive their flight's result. Used after
+        a write, whose effects flights started earlier may not see.
+        """
+        with self._lock:
+            self._flights.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the coalescing counters.
+
+        Returns:
+            Dict[str, Any]: Flights led, calls coalesced onto another caller's
+                flight, flights abandoned by their leader, and `in_flight`
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["in_flight"] = len(self._flights)
+        return snapshot
@@ -0,0 +1,447 @@
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Tuple, Optional, Iterator, Iterable, NamedTuple
+from connection_pool import PoolExhaustedError, pool_key
+from single_flight import SingleFlight
+from db_processors import NLToPostgresProcessor
+from config import TABLE_METADATA, POOL_CONFIG, SCHEMA_CATALOG_CONFIG, TENANTS, TENANT_REGISTRY_CONFIG
+
+class TenantSpec(NamedTuple):
+    """
+    A tenant database.
+
+    Attributes:
+        connection_params (Dict[str, Any]): Database connection parameters
+        table_metadata (Dict[str, str]): Mapping of table names to their descriptions
+        replica_params (List[Dict[str, Any]]): Connection parameters of its read replicas
+    """
+    connection_params: Dict[str, Any]
+    table_metadata: Dict[str, str]
+    replica_params: List[Dict[str, Any]] = []
+
+class TenantBudgetError(PoolExhaustedError):
+    """
+    Raised when a tenant cannot be loaded within the registry's budget because
+    every loaded tenant is in use.
+    """
+
+class _Tenant:
+    """
+    A loaded tenant.
+
+    Attributes:
+        tenant_id (str): Tenant id
+        processor (NLToPostgresProcessor): The tenant's processor
+        connections (int): Connections the tenant may open at most
+        loaded_at (float): Monotonic time the tenant was loaded
+        last_used (float): Monotonic time of the last lease
+        leases (int): Leases currently held
+        requests (int): Leases taken since the tenant was loaded
+    """
+
+    def __init__(self, tenant_id: str, processor: NLToPostgresProcessor, connections: int):
+        self.tenant_id = tenant_id
+        self.processor = processor
+        self.connections = connections
+        self.loaded_at = time.monotonic()
+        self.last_used = self.loaded_at
+        self.leases = 0
+        self.requests = 0
+
+    def memory_bytes(self) -> int:
+        """
+        Approximate memory held by the tenant's schema catalog and result cache.
+
+        Returns:
+            int: Size in bytes
+        """
+        size = self.processor.schema_catalog.metrics()["bytes"]
+        if self.processor.result_cache is not None:
+            size += self.processor.result_cache.metrics()["bytes"]
+        return size
+
+class TenantRegistry:
+    """
+    Processors for many tenant databases, loaded on demand within a budget.
+
+    A tenant's processor, with its own pool, schema catalog, prompt context
+    and result cache, is created the first time the tenant is leased;
+    concurrent first leases share one load. Every processor uses the same
+    model client. Loaded tenants are kept within `max_tenants`, within
+    `max_connections` (the sum of the pool sizes they may open, replicas
+    included) and within `max_memory_bytes` (their cached results and
+    schemas) by evicting the least recently used tenants that are not leased
+    and have no connection in use. Tenants unused for `idle_timeout` seconds
+    are evicted as well, on a sweep run by `lease` at most every
+    `sweep_interval` seconds or by `evict_idle`. Evicting a tenant closes its
+    processor, giving back its connections and memory.
+
+    Attributes:
+        tenants (Dict[str, TenantSpec]): Every tenant that can be loaded, by id
+        max_tenants (int): Tenants loaded at most
+        max_connections (int): Connections the loaded tenants may open at most
+        max_memory_bytes (int): Memory the loaded tenants' caches may hold
+        idle_timeout (Optional[float]): Seconds without a lease after which a
+            tenant is evicted; None disables idle eviction
+        sweep_interval (float): Seconds between idle and memory sweeps
+        warm_tenants (List[str]): Tenants loaded by `warm_up` by default
+        warm_up_workers (int): Tenants warmed up concurrently
+
+    Args:
+        tenants (Dict[str, TenantSpec]): Every tenant that can be loaded, by id
+        max_tenants (int): Tenants loaded at most
+        max_connections (int): Connections the loaded tenants may open at most
+        max_memory_bytes (int): Memory the loaded tenants' caches may hold
+        idle_timeout (Optional[float]): Seconds without a lease after which a
+            tenant is evicted; None disables idle eviction
+        sweep_interval (float): Seconds between idle and memory sweeps
+        warm_tenants (Iterable[str]): Tenants loaded by `warm_up` by default
+        warm_up_workers (int): Tenants warmed up concurrently
+        **processor_config: Keyword arguments forwarded to every NLToPostgresProcessor;
+            `pool_config` also sets the connections counted per tenant
+
+    Raises:
+        ValueError: If two tenants share a database
+    """
+
+    def __init__(self, tenants: Dict[str, TenantSpec], max_tenants: int = 32,
+                 max_connections: int = 80, max_memory_bytes: int = 512 * 1024 * 1024,
+                 idle_timeout: Optional[float] = 900.0, sweep_interval: float = 30.0,
+                 warm_tenants: Iterable[str] = (), warm_up_workers: int = 4, **processor_config):
+        targets: Dict[Tuple, str] = {}
+        for tenant_id, spec in tenants.items():
+            other = targets.setdefault(pool_key(spec.connection_params), tenant_id)
+            if other != tenant_id:
+                raise ValueError(f"Tenants {other} and {tenant_id} share a database")
+        self.tenants = dict(tenants)
+        self.max_tenants = max_tenants
+        self.max_connections = max_connections
+        self.max_memory_bytes = max_memory_bytes
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.warm_tenants = list(warm_tenants)
+        self.warm_up_workers = warm_up_workers
+
+        self._model = processor_config.pop("model", None)
+        self._processor_config = processor_config
+        self._pool_size = (processor_config.get("pool_config") or POOL_CONFIG)["max_size"]
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, _Tenant] = {}
+        self._reserved = 0
+        self._loads = SingleFlight("tenant_load")
+        self._last_sweep = time.monotonic()
+        self._metrics = {"loads": 0, "load_failures": 0, "evictions_budget": 0,
+                         "evictions_idle": 0, "evictions_memory": 0, "evictions_manual": 0}
+
+    def _connections(self, spec: TenantSpec) -> int:
+        """
+        Connections a tenant may open at most.
+
+        Args:
+            spec (TenantSpec): The tenant
+
+        Returns:
+            int: A pool per database (primary and replicas), plus the schema
+                catalog's LISTEN connection when change notifications are on
+        """
+        listener = bool(SCHEMA_CATALOG_CONFIG.get("listen_channel"))
+        return self._pool_size * (1 + len(spec.replica_params)) + listener
+
+    def _evictable(self) -> List[_Tenant]:
+        """
+        Loaded tenants that may be evicted, least recently used first.
+
+        Must be called with `_lock` held.
+
+        Returns:
+            List[_Tenant]: Tenants without leases or connections in use
+        """
+        idle = [tenant for tenant in self._loaded.values()
+                if tenant.leases == 0 and tenant.processor.pool.metrics()["in_use"] == 0]
+        return sorted(idle, key=lambda tenant: tenant.last_used)
+
+    def _evict(self, tenant: _Tenant, reason: str) -> None:
+        """
+        Forget a loaded tenant. Its processor must be closed after `_lock` is released.
+
+        Must be called with `_lock` held.
+
+        Args:
+            tenant (_Tenant): Tenant to forget
+            reason (str): "budget", "idle", "memory" or "manual"
+        """
+        del self._loaded[tenant.tenant_id]
+        self._metrics[f"evictions_{reason}"] += 1
+
+    def _load(self, tenant_id: str) -> _Tenant:
+        """
+        Create a tenant's processor, evicting other tenants to make room.
+
+        Args:
+            tenant_id (str): Tenant to load
+
+        Returns:
+            _Tenant: The loaded tenant
+
+        Raises:
+            TenantBudgetError: If no room can be made
+            psycopg2.Error: If the tenant's database cannot be reached
+        """
+        spec = self.tenants[tenant_id]
+        connections = self._connections(spec)
+        victims: List[_Tenant] = []
+        with self._lock:
+            loaded = self._loaded.get(tenant_id)
+            if loaded is not None:
+                return loaded
+            tenants, committed = len(self._loaded), self._committed()
+            for candidate in self._evictable():
+                if tenants < self.max_tenants and committed + connections <= self.max_connections:
+                    break
+                victims.append(candidate)
+                tenants -= 1
+                committed -= candidate.connections
+            if tenants >= self.max_tenants or committed + connections > self.max_connections:
+                raise TenantBudgetError(
+                    f"Cannot load tenant {tenant_id}: {len(self._loaded)} tenants holding "
+                    f"{self._committed()} of {self.max_connections} connections are in use"
+                )
+            for victim in victims:
+                self._evict(victim, "budget")
+            self._reserved += connections
+        try:
+            for victim in victims:
+                victim.processor.close()
+            processor = NLToPostgresProcessor(
+                spec.connection_params,
+                spec.table_metadata,
+                model=self._model,
+                replica_params=spec.replica_params,
+                **self._processor_config
+            )
+        except Exception:
+            with self._lock:
+                self._reserved -= connections
+                self._metrics["load_failures"] += 1
+            raise
+        with self._lock:
+            self._model = self._model or processor.model
+            self._reserved -= connections
+            tenant = _Tenant(tenant_id, processor, connections)
+            self._loaded[tenant_id] = tenant
+            self._metrics["loads"] += 1
+        return tenant
+
+    def _committed(self) -> int:
+        """
+        Connections the loaded and loading tenants may open. Must be called with `_lock` held.
+
+        Returns:
+            int: Connection count
+        """
+        return self._reserved + sum(tenant.connections for tenant in self._loaded.values())
+
+    @contextmanager
+    def lease(self, tenant_id: str) -> Iterator[NLToPostgresProcessor]:
+        """
+        Use a tenant's processor, loading the tenant if needed.
+
+        The tenant is not evicted while leased. Take one lease per request,
+        around every call on the processor including the iteration of
+        streamed results.
+
+        Args:
+            tenant_id (str): Tenant to use
+
+        Yields:
+            NLToPostgresProcessor: The tenant's processor
+
+        Raises:
+            ValueError: If the tenant is unknown
+            TenantBudgetError: If the tenant is not loaded and no room can be made
+        """
+        if tenant_id not in self.tenants:
+            raise ValueError(f"Unknown tenant: {tenant_id}")
+        self._maybe_sweep()
+        while True:
+            with self._lock:
+                tenant = self._loaded.get(tenant_id)
+                if tenant is not None:
+                    tenant.leases += 1
+                    tenant.requests += 1
+                    tenant.last_used = time.monotonic()
+                    break
+            self._loads.do(tenant_id, lambda: self._load(tenant_id))
+        try:
+            yield tenant.processor
+        finally:
+            with self._lock:
+                tenant.leases -= 1
+                tenant.last_used = time.monotonic()
+
+    def _maybe_sweep(self) -> None:
+        """
+        Run `evict_idle` if the last sweep is more than `sweep_interval` seconds old.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        self.evict_idle()
+
+    def evict_idle(self) -> List[str]:
+        """
+        Evict tenants idle for `idle_timeout`, then least recently used tenants
+        until the loaded ones hold at most `max_memory_bytes`.
+
+        Returns:
+            List[str]: Ids of the evicted tenants
+        """
+        now = time.monotonic()
+        victims: List[_Tenant] = []
+        with self._lock:
+            candidates = self._evictable()
+            if self.idle_timeout is not None:
+                for tenant in [t for t in candidates if now - t.last_used >= self.idle_timeout]:
+                    self._evict(tenant, "idle")
+                    victims.append(tenant)
+                    candidates.remove(tenant)
+            memory = sum(tenant.memory_bytes() for tenant in self._loaded.values())
+            while memory > self.max_memory_bytes and candidates:
+                tenant = candidates.pop(0)
+                memory -= tenant.memory_bytes()
+                self._evict(tenant, "memory")
+                victims.append(tenant)
+        for tenant in victims:
+            tenant.processor.close()
+        return [tenant.tenant_id for tenant in victims]
+
+    def evict(self, tenant_id: str) -> bool:
+        """
+        Evict a tenant now, unless it is not loaded or in use.
+
+        Args:
+            tenant_id (str): Tenant to evict
+
+        Returns:
+            bool: Whether the tenant was evicted
+        """
+        with self._lock:
+            tenant = self._loaded.get(tenant_id)
+            if tenant is None or tenant not in self._evictable():
+                return False
+            self._evict(tenant, "manual")
+        tenant.processor.close()
+        return True
+
+    def warm_up(self, tenant_ids: Optional[Iterable[str]] = None) -> Dict[str, Optional[str]]:
+        """
+        Load tenants ahead of their first request.
+
+        Each tenant's pool is filled to its minimum size and its schema is
+        introspected and compiled into its prompt context, so the first
+        question pays for neither. At most `max_tenants` tenants are warmed
+        up, `warm_up_workers` at a time.
+
+        Args:
+            tenant_ids (Optional[Iterable[str]]): Tenants to warm up, most
+                important first; defaults to `warm_tenants`
+
+        Returns:
+            Dict[str, Optional[str]]: Error message per tenant, None when it warmed up
+        """
+        tenant_ids = list(self.warm_tenants if tenant_ids is None else tenant_ids)[:self.max_tenants]
+
+        def warm(tenant_id: str) -> Optional[str]:
+            try:
+                with self.lease(tenant_id) as processor:
+                    processor.pool.prefill()
+                    processor._get_compiled_context()
+            except Exception as e:
+                return str(e)
+            return None
+
+        if not tenant_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.warm_up_workers, len(tenant_ids))) as workers:
+            return dict(zip(tenant_ids, workers.map(warm, tenant_ids)))
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the loaded tenants and the registry counters.
+
+        Returns:
+            Dict[str, Any]: Load/eviction counters, the `loaded` tenant count and
+                the `connections` and `memory_bytes` they hold against their
+                budgets, plus per-tenant leases, requests, idle seconds,
+                connections, memory and pool metrics under `tenants`
+        """
+        now = time.monotonic()
+        with self._lock:
+            tenants = {
+                tenant.tenant_id: {
+                    "leases": tenant.leases,
+                    "requests": tenant.requests,
+                    "idle_seconds": round(now - tenant.last_used, 3),
+                    "connections": tenant.connections,
+                    "memory_bytes": tenant.memory_bytes(),
+                    "pool": tenant.processor.pool.metrics(),
+                }
+                for tenant in self._loaded.values()
+            }
+            snapshot = dict(self._metrics)
+            snapshot["connections"] = self._committed()
+        snapshot["loaded"] = len(tenants)
+        snapshot["memory_bytes"] = sum(tenant["memory_bytes"] for tenant in tenants.values())
+        snapshot["tenants"] = tenants
+        return snapshot
+
+    def close(self) -> None:
+        """
+        Evict every loaded tenant, leased or not.
+        """
+        with self._lock:
+            tenants = list(self._loaded.values())
+            self._loaded.clear()
+        for tenant in tenants:
+            tenant.processor.close()
+
+_REGISTRY: Optional[TenantRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+def get_tenant_registry(tenants: Optional[Dict[str, Dict[str, Any]]] = None,
+                        registry_config: Optional[Dict[str, Any]] = None) -> TenantRegistry:
+    """
+    Return the process-wide tenant registry, creating it on first use.
+
+    On creation the registry starts warming up its `warm_tenants` on a
+    background thread, so the front end does not wait for them.
+
+    Args:
+        tenants (Optional[Dict[str, Dict[str, Any]]]): Tenants by id, each with
+            "connection" parameters and optional "table_metadata" (defaults to
+            TABLE_METADATA) and "replicas"; defaults to TENANTS
+        registry_config (Optional[Dict[str, Any]]): Registry settings; defaults
+            to TENANT_REGISTRY_CONFIG
+
+    Returns:
+        TenantRegistry: The shared registry
+    """
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            specs = {
+                tenant_id: TenantSpec(
+                    tenant["connection"],
+                    tenant.get("table_metadata") or TABLE_METADATA,
+                    tenant.get("replicas") or []
+                )
+                for tenant_id, tenant in (TENANTS if tenants is None else tenants).items()
+            }
+            _REGISTRY = TenantRegistry(specs, **(TENANT_REGISTRY_CONFIG if registry_config is None
+                                                 else registry_config))
+            threading.Thread(target=_REGISTRY.warm_up, name="tenant-warm-up", daemon=True).start()
+        return _REGISTRY
@@ -0,0 +1,28 @@
+import os
+import sys
+from pathlib import Path
+import psycopg2
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+@pytest.fixture(scope="session")
+def connection_params():
+    """
+    Connection parameters of a scratch PostgreSQL database, taken from the
+    standard PGHOST/PGPORT/PGDATABASE/PGUSER/PGPASSWORD variables. Tests using
+    it are skipped when no database is configured or reachable.
+    """
+    params = {
+        name: os.environ[variable]
+        for name, variable in (("host", "PGHOST"), ("port", "PGPORT"), ("database", "PGDATABASE"),
+                               ("user", "PGUSER"), ("password", "PGPASSWORD"))
+        if variable in os.environ
+    }
+    if "database" not in params:
+        pytest.skip("PGDATABASE is not set")
+    try:
+        psycopg2.connect(**params, connect_timeout=3).close()
+    except psycopg2.Error as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+    return params
@@ -0,0 +1,66 @@
+import threading
+import psycopg2
+import pytest
+from connection_pool import PostgresConnectionPool, PoolExhaustedError
+
+@pytest.fixture
+def pool(connection_params):
+    pool = PostgresConnectionPool(connection_params, min_size=1, max_size=2,
+                                  checkout_timeout=0.2, idle_timeout=60.0)
+    yield pool
+    pool.close()
+
+def test_connections_are_reused(pool):
+    first = pool.getconn()
+    pool.putconn(first)
+    assert pool.getconn() is first
+    assert pool.metrics()["connections_created"] == 1
+
+def test_checkout_waits_and_raises_when_exhausted(pool):
+    held = [pool.getconn(), pool.getconn()]
+    with pytest.raises(PoolExhaustedError):
+        pool.getconn()
+    assert pool.metrics()["exhausted"] == 1
+
+    threading.Timer(0.05, pool.putconn, [held.pop()]).start()
+    held.append(pool.getconn(timeout=2))
+    metrics = pool.metrics()
+    assert metrics["waits"] == 2
+    assert metrics["size"] == 2
+    for conn in held:
+        pool.putconn(conn)
+
+def test_open_transaction_rolled_back_on_return(pool):
+    conn = pool.getconn()
+    with conn.cursor() as cur:
+        cur.execute("CREATE TEMP TABLE pool_rollback (id int)")
+    pool.putconn(conn)
+    conn = pool.getconn()
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('pg_temp.pool_rollback') AS name")
+        assert cur.fetchone()["name"] is None
+    pool.putconn(conn)
+
+def test_idle_connections_reaped_on_return_down_to_min_size(pool):
+    first, second = pool.getconn(), pool.getconn()
+    pool.putconn(first)
+    pool.idle_timeout = 0.0
+    pool.putconn(second)
+    metrics = pool.metrics()
+    assert metrics["size"] == 1
+    assert metrics["connections_closed"] == 1
+    assert first.closed
+
+def test_broken_connection_discarded(pool):
+    conn = pool.getconn()
+    conn.close()
+    pool.putconn(conn)
+    assert pool.metrics()["size"] == 0
+
+def test_closed_pool_refuses_checkouts(pool):
+    pool.prefill()
+    assert pool.metrics()["idle"] == 1
+    pool.close()
+    assert pool.closed
+    with pytest.raises(psycopg2.InterfaceError):
+        pool.getconn()
@@ -0,0 +1,48 @@
+import io
+import psycopg2
+import pytest
+from export import _CopySink, export_query
+
+ROWS = "SELECT n, CASE WHEN n = 2 THEN '' WHEN n = 3 THEN NULL ELSE 'line' || chr(10) || n END AS label " \
+       "FROM generate_series(1, 5) AS n ORDER BY n;"
+
+@pytest.fixture
+def conn(connection_params):
+    conn = psycopg2.connect(**connection_params)
+    yield conn
+    conn.close()
+
+def test_copy_sink_requires_flush_rows():
+    with pytest.raises(TypeError):
+        _CopySink(1024)
+
+def test_csv_export_is_written_in_chunks(conn):
+    writes = []
+
+    class Target(io.BytesIO):
+        def write(self, data):
+            writes.append(len(data))
+            return super().write(data)
+
+    target = Target()
+    summary = export_query(conn, ROWS, target, chunk_size=16)
+    assert summary["rows"] == 5
+    assert len(writes) > 1
+    lines = target.getvalue().decode().split("\n")
+    assert lines[0] == "n,label"
+    assert lines[1:3] == ['1,"line', '1"']
+    assert '2,""' in lines and "3," in lines
+
+def test_parquet_export_keeps_nulls_and_newlines(conn):
+    pq = pytest.importorskip("pyarrow.parquet")
+    target = io.BytesIO()
+    summary = export_query(conn, ROWS, target, file_format="parquet", row_group_size=2)
+    assert summary["rows"] == 5
+    assert summary["row_groups"] == 3
+    table = pq.read_table(io.BytesIO(target.getvalue()))
+    assert table.column("n").to_pylist() == [1, 2, 3, 4, 5]
+    assert table.column("label").to_pylist() == ["line\n1", "", None, "line\n4", "line\n5"]
+
+def test_unknown_format_rejected(conn):
+    with pytest.raises(ValueError):
+        export_query(conn, ROWS, io.BytesIO(), file_format="xlsx")
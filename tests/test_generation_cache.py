@@ -0,0 +1,52 @@
+from generation_cache import GenerationCache, normalize_question
+
+def test_normalize_question():
+    assert normalize_question("Top 10 products by quantity?") == normalize_question("top 10  products by quantity")
+
+def test_exact_hit_is_per_fingerprint():
+    cache = GenerationCache()
+    cache.put("Top 10 products by quantity", "fp1", "READ", "SELECT 1")
+    assert cache.get("top 10 products by quantity?", "fp1") == ("READ", "SELECT 1")
+    assert cache.get("top 10 products by quantity", "fp2") is None
+
+def test_similar_question_hits_above_threshold():
+    cache = GenerationCache(similarity_threshold=0.5)
+    cache.put("top 10 products by quantity sold", "fp", "READ", "SELECT 1")
+    assert cache.get("show the top 10 products by quantity", "fp") == ("READ", "SELECT 1")
+    assert cache.metrics()["similar_hits"] == 1
+
+def test_similar_question_with_other_numbers_or_ordering_misses():
+    cache = GenerationCache(similarity_threshold=0.5)
+    cache.put("top 10 products by quantity", "fp", "READ", "SELECT 1")
+    assert cache.get("top 5 products by quantity", "fp") is None
+    assert cache.get("10 products by quantity", "fp") is None
+    assert cache.get("bottom 10 products by quantity", "fp") is None
+
+def test_embedder_called_once_per_lookup():
+    calls = []
+
+    def embedder(texts):
+        calls.append(texts)
+        return [[1.0, float(len(text))] for text in texts]
+
+    cache = GenerationCache(similarity_threshold=0.99, embedder=embedder)
+    for question in ("customers per country", "invoices per country", "stock per country"):
+        cache.put(question, "fp", "READ", "SELECT 1")
+    calls.clear()
+    cache.get("orders per country", "fp")
+    assert len(calls) == 1
+
+def test_forget_drops_one_fingerprint():
+    cache = GenerationCache()
+    cache.put("a question", "fp1", "READ", "SELECT 1")
+    cache.put("a question", "fp2", "READ", "SELECT 2")
+    assert cache.forget("fp1") == 1
+    assert cache.get("a question", "fp1") is None
+    assert cache.get("a question", "fp2") == ("READ", "SELECT 2")
+
+def test_lru_bound():
+    cache = GenerationCache(max_entries=2)
+    for question in ("one", "two", "three"):
+        cache.put(question, "fp", "READ", question)
+    assert cache.get("one", "fp") is None
+    assert cache.metrics()["evictions"] == 1
@@ -0,0 +1,25 @@
+from generation_stream import JSONObjectExtractor, extract_json_object
+
+def test_extractor_returns_object_once_complete():
+    extractor = JSONObjectExtractor()
+    assert extractor.feed('Here you go: {"operation": "READ", ') is None
+    assert extractor.feed('"query": "SELECT 1"}') == {"operation": "READ", "query": "SELECT 1"}
+    assert extractor.result == {"operation": "READ", "query": "SELECT 1"}
+
+def test_extractor_ignores_braces_and_escaped_quotes_in_strings():
+    text = '{"query": "SELECT \'{\\"a\\": 1}\'::json -> \'a\' WHERE x = \'}\'"}'
+    extractor = JSONObjectExtractor()
+    results = [extractor.feed(char) for char in text]
+    assert results[:-1] == [None] * (len(text) - 1)
+    assert results[-1] == {"query": "SELECT '{\"a\": 1}'::json -> 'a' WHERE x = '}'"}
+
+def test_extractor_skips_braces_in_prose():
+    extractor = JSONObjectExtractor()
+    assert extractor.feed('Use {braces} carefully. {"operation": "DELETE"}') == {"operation": "DELETE"}
+
+def test_extract_json_object_falls_back_on_unbalanced_prose():
+    assert extract_json_object('A stray " quote {"operation": "READ"}') == {"operation": "READ"}
+
+def test_extract_json_object_without_object():
+    assert extract_json_object("no json here") is None
+    assert extract_json_object('["a list"]') is None
@@ -0,0 +1,72 @@
+import threading
+import time
+import pytest
+from hedging import HedgedGenerator, percentile
+
+@pytest.fixture
+def hedger():
+    generator = HedgedGenerator(max_attempts=3, initial_deadline=0.05, min_samples=1000,
+                                extra_call_budget=0.0, budget_burst=10)
+    yield generator
+    generator.close()
+
+def test_percentile():
+    assert percentile([4.0, 1.0, 3.0, 2.0], 50) == 2.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 99) == 4.0
+    assert percentile([5.0], 0) == 5.0
+
+def test_fast_call_is_not_hedged(hedger):
+    assert hedger.run(lambda stop: "ok", lambda result: True) == "ok"
+    metrics = hedger.metrics()
+    assert metrics["calls"] == 1
+    assert metrics["extra_calls"] == 0
+
+def test_slow_call_is_hedged_and_loser_stopped(hedger):
+    attempts = []
+    stops = []
+
+    def call(stop: threading.Event) -> str:
+        attempt = len(attempts)
+        attempts.append(attempt)
+        stops.append(stop)
+        if attempt == 0:
+            stop.wait(5)
+            return "slow"
+        return "fast"
+
+    assert hedger.run(call, lambda result: True) == "fast"
+    assert stops[0].wait(1)
+    metrics = hedger.metrics()
+    assert metrics["hedges"] == 1
+    assert metrics["hedge_wins"] == 1
+
+def test_invalid_result_is_retried_right_away(hedger):
+    results = iter(["bad", "good"])
+    start = time.monotonic()
+    assert hedger.run(lambda stop: next(results), lambda result: result == "good") == "good"
+    assert time.monotonic() - start < 1
+    assert hedger.metrics()["retries"] == 1
+
+def test_first_result_returned_when_none_is_valid(hedger):
+    results = iter(["first", "second", "third"])
+    assert hedger.run(lambda stop: next(results), lambda result: False) == "first"
+    assert hedger.metrics()["invalid_results"] == 3
+
+def test_last_error_raised_when_every_call_fails(hedger):
+    def fail(stop):
+        raise RuntimeError("model unavailable")
+
+    with pytest.raises(RuntimeError):
+        hedger.run(fail, lambda result: True)
+    assert hedger.metrics()["errors"] == 3
+
+def test_extra_calls_stay_within_budget():
+    hedger = HedgedGenerator(max_attempts=3, extra_call_budget=0.0, budget_burst=1)
+    try:
+        results = iter(["a", "b", "c"])
+        assert hedger.run(lambda stop: next(results), lambda result: False) == "a"
+        metrics = hedger.metrics()
+        assert metrics["calls"] == 2
+        assert metrics["budget_denied"] == 1
+    finally:
+        hedger.close()
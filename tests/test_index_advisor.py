@@ -0,0 +1,27 @@
+import psycopg2
+import pytest
+from connection_pool import PostgresConnectionPool
+from index_advisor import IndexAdvisor
+
+def test_unknown_costing_method_rejected():
+    with pytest.raises(ValueError):
+        IndexAdvisor({}, pool=object(), method="auto")
+
+@pytest.fixture
+def pool(connection_params):
+    with psycopg2.connect(**connection_params) as conn, conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'hypopg'")
+        if cur.fetchone() is not None:
+            pytest.skip("hypopg is available")
+        cur.execute("CREATE TABLE advisor_items (id int, country text)")
+    pool = PostgresConnectionPool(connection_params)
+    yield pool
+    pool.close()
+    with psycopg2.connect(**connection_params) as conn, conn.cursor() as cur:
+        cur.execute("DROP TABLE advisor_items")
+
+def test_missing_hypopg_fails_instead_of_building_indexes(pool):
+    advisor = IndexAdvisor({}, pool=pool)
+    with pytest.raises(RuntimeError):
+        advisor.recommend([("SELECT * FROM advisor_items WHERE country = 'France'", 3)])
+    assert pool.metrics()["in_use"] == 0
@@ -0,0 +1,57 @@
+import pytest
+from connection_pool import PostgresConnectionPool
+from query_guard import QueryGuard, inject_limit
+from result_cache import is_single_statement
+
+def test_inject_limit_wraps_the_statement():
+    assert inject_limit("SELECT * FROM t ORDER BY a; ", 100) == (
+        "SELECT * FROM (\nSELECT * FROM t ORDER BY a\n) AS guarded_query LIMIT 100"
+    )
+
+def test_inject_limit_survives_trailing_comment():
+    assert inject_limit("SELECT 1 -- note", 5) == "SELECT * FROM (\nSELECT 1 -- note\n) AS guarded_query LIMIT 5"
+
+def test_is_single_statement():
+    assert is_single_statement("SELECT 1;")
+    assert is_single_statement("SELECT ';' AS a -- ;")
+    assert not is_single_statement("SELECT 1; DELETE FROM t")
+
+@pytest.fixture
+def guard(connection_params):
+    pool = PostgresConnectionPool(connection_params)
+    yield QueryGuard(pool, max_cost=1e6, max_rows=1000, throttle_cost=1e4, max_cartesian_rows=1e5)
+    pool.close()
+
+def test_multiple_statements_rejected_without_planning():
+    decision = QueryGuard(pool=None).check("SELECT 1; DROP TABLE invoice")
+    assert decision.action == "reject"
+
+def test_large_result_gets_a_limit(guard):
+    decision = guard.check("SELECT n FROM generate_series(1, 5000) AS n")
+    assert decision.action == "limit"
+    assert decision.sql_query.endswith("LIMIT 1000")
+
+def test_no_limit_when_rows_are_capped_by_the_caller(guard):
+    assert guard.check("SELECT n FROM generate_series(1, 5000) AS n", limit_rows=False).action == "allow"
+    assert guard.check("SELECT n FROM generate_series(1, 5000) AS n LIMIT 10").action == "allow"
+
+def test_cartesian_join_rejected(guard):
+    decision = guard.check("SELECT * FROM generate_series(1, 1000) AS a, generate_series(1, 1000) AS b")
+    assert decision.action == "reject"
+    assert "cartesian" in decision.reason
+
+def test_expensive_query_throttled_or_rejected(guard):
+    throttled = guard.check("SELECT count(*) FROM generate_series(1, 5000000) AS n")
+    assert throttled.action == "throttle"
+    assert throttled.settings["statement_timeout"] == "30000"
+    rejected = guard.check("SELECT count(*) FROM generate_series(1, 1000) AS a "
+                           "JOIN generate_series(1, 100000000) AS b ON a = b")
+    assert rejected.action == "reject"
+
+def test_unplannable_query_allowed_and_plans_cached(guard):
+    assert guard.check("SELECT * FROM no_such_table").action == "allow"
+    guard.check("SELECT 1")
+    guard.check("select 1")
+    metrics = guard.metrics()
+    assert metrics["explain_errors"] == 1
+    assert metrics["cache_hits"] == 1
@@ -0,0 +1,87 @@
+import psycopg2
+import pytest
+from psycopg2.extras import RealDictCursor
+from query_templates import QueryTemplates, parameterize
+
+def test_parameterize_lifts_comparison_and_limit_literals():
+    template = parameterize("SELECT * FROM invoice WHERE country = 'France' AND quantity > 10 LIMIT 5")
+    assert template.text == "SELECT * FROM invoice WHERE country = $1 AND quantity > $2::integer LIMIT $3::integer"
+    assert template.params == ("France", "10", "5")
+
+def test_parameterize_types_numbers_by_size():
+    assert parameterize("SELECT * FROM t WHERE v > 3000000000").text == "SELECT * FROM t WHERE v > $1::bigint"
+    assert parameterize("SELECT * FROM t WHERE v > 1.5").text == "SELECT * FROM t WHERE v > $1::numeric"
+
+def test_parameterize_lifts_typed_literals_and_in_lists():
+    assert parameterize("SELECT * FROM t WHERE d >= DATE '2011-01-01'").text == "SELECT * FROM t WHERE d >= $1::date"
+    template = parameterize("SELECT * FROM t WHERE c IN ('a','b')")
+    assert template.text == "SELECT * FROM t WHERE c IN ($1,$2)"
+    assert template.params == ("a", "b")
+
+def test_parameterize_unescapes_quotes():
+    assert parameterize("SELECT * FROM t WHERE name = 'O''Brien'").params == ("O'Brien",)
+
+def test_parameterize_keeps_positional_references_and_select_items():
+    assert parameterize("SELECT name, 1 FROM t ORDER BY 1").params == ()
+    assert parameterize("SELECT 'x' AS label FROM t").params == ()
+
+def test_parameterize_refuses_what_cannot_be_prepared():
+    assert parameterize("SELECT 1; DELETE FROM t") is None
+    assert parameterize("SELECT * FROM t WHERE a = $1") is None
+    assert parameterize("CREATE TABLE x (a int)") is None
+
+def test_parameterize_fingerprint_ignores_literals_and_case():
+    first = parameterize("SELECT * FROM t WHERE c = 'a'")
+    assert first.fingerprint == parameterize("select * from t where c = 'b'").fingerprint
+    assert first.fingerprint != parameterize("SELECT * FROM t WHERE d = 'a'").fingerprint
+
+@pytest.fixture
+def conn(connection_params):
+    conn = psycopg2.connect(**connection_params, cursor_factory=RealDictCursor)
+    with conn.cursor() as cur:
+        cur.execute("CREATE TEMP TABLE template_items (id int, name text)")
+        cur.execute("INSERT INTO template_items VALUES (1, 'a'), (2, 'b')")
+    conn.commit()
+    yield conn
+    conn.close()
+
+def prepared_names(conn) -> list:
+    with conn.cursor() as cur:
+        cur.execute("SELECT name FROM pg_prepared_statements ORDER BY name")
+        return [row["name"] for row in cur.fetchall()]
+
+def test_select_star_prepared_again_after_alter_table(conn):
+    templates = QueryTemplates()
+    template = parameterize("SELECT * FROM template_items WHERE id = 1")
+    with conn.cursor() as cur:
+        assert templates.execute(cur, template)
+        assert list(cur.fetchone()) == ["id", "name"]
+        cur.execute("ALTER TABLE template_items ADD COLUMN price numeric")
+        conn.commit()
+        assert templates.execute(cur, template)
+        assert list(cur.fetchone()) == ["id", "name", "price"]
+    metrics = templates.metrics()
+    assert metrics["prepares"] == 2
+    assert metrics["deallocations"] == 1
+    assert prepared_names(conn) == [f"ttd_{template.fingerprint}"]
+
+def test_failed_execute_drops_the_statement(conn):
+    templates = QueryTemplates()
+    template = parameterize("SELECT 10 / id FROM template_items WHERE name = 'a'")
+    with conn.cursor() as cur:
+        assert templates.execute(cur, template)
+        cur.execute("UPDATE template_items SET id = 0")
+        conn.commit()
+        with pytest.raises(psycopg2.errors.DivisionByZero):
+            templates.execute(cur, template)
+    assert prepared_names(conn) == []
+
+def test_statements_deallocated_when_schema_version_changes(conn):
+    templates = QueryTemplates()
+    first = parameterize("SELECT id FROM template_items WHERE id = 1")
+    second = parameterize("SELECT name FROM template_items WHERE id = 1")
+    with conn.cursor() as cur:
+        assert templates.execute(cur, first, schema_version=1)
+        assert templates.execute(cur, second, schema_version=2)
+    assert prepared_names(conn) == [f"ttd_{second.fingerprint}"]
+    assert templates.metrics()["deallocations"] == 1
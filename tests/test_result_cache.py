@@ -0,0 +1,76 @@
+import psycopg2
+import pytest
+from result_cache import ResultCache, referenced_tables, is_read_only, is_cacheable
+
+def test_referenced_tables():
+    assert referenced_tables("SELECT * FROM public.Invoice i JOIN stock s ON i.a = s.a") == {"invoice", "stock"}
+    assert referenced_tables("SELECT * FROM a, b WHERE x") == {"a", "b"}
+    assert referenced_tables("SELECT * FROM (SELECT * FROM inner_t) q") == {"inner_t"}
+    assert referenced_tables('SELECT * FROM "Invoice"') == {"invoice"}
+    assert referenced_tables("SELECT * FROM ONLY t") == {"t"}
+
+def test_referenced_tables_of_writes():
+    assert referenced_tables("INSERT INTO t (a) VALUES (1)") == {"t"}
+    assert referenced_tables("UPDATE t SET a = 1") == {"t"}
+    assert referenced_tables("DELETE FROM t WHERE a IN (SELECT a FROM u)") == {"t", "u"}
+
+def test_referenced_tables_ignores_literals():
+    assert referenced_tables("SELECT 'from fake' FROM real_t") == {"real_t"}
+
+def test_is_read_only():
+    assert is_read_only("SELECT * FROM t WHERE note = 'delete me'")
+    assert not is_read_only("DELETE FROM t")
+    assert not is_read_only("SELECT * FROM t FOR UPDATE")
+    assert not is_read_only("SELECT * FROM t FOR SHARE")
+    assert not is_read_only("SELECT nextval('s')")
+
+def test_is_cacheable_rejects_volatile_functions():
+    assert is_cacheable("SELECT count(*) FROM t")
+    assert is_cacheable("SELECT random_col FROM t")
+    assert not is_cacheable("SELECT now()")
+    assert not is_cacheable("SELECT * FROM t WHERE d > current_date")
+    assert not is_cacheable("SELECT * FROM t ORDER BY random()")
+
+def test_write_invalidates_only_the_tables_it_touches():
+    cache = ResultCache()
+    cache.put("SELECT * FROM invoice", [{"a": 1}])
+    cache.put("SELECT * FROM stock", [{"b": 2}])
+    assert cache.invalidate_for_write("UPDATE invoice SET a = 2") == 1
+    assert cache.get("SELECT * FROM invoice") is None
+    assert cache.get("select *  from STOCK") == [{"b": 2}]
+
+def test_results_read_before_a_write_are_not_cached():
+    cache = ResultCache()
+    epoch = cache.epoch()
+    cache.invalidate_for_write("DELETE FROM invoice")
+    assert not cache.put("SELECT * FROM invoice", [{"a": 1}], epoch=epoch)
+    assert cache.get("SELECT * FROM invoice") is None
+
+@pytest.fixture
+def processor(connection_params):
+    from db_processors import NLToPostgresProcessor
+    with psycopg2.connect(**connection_params) as conn, conn.cursor() as cur:
+        cur.execute("CREATE TABLE cache_items (id int PRIMARY KEY, name text)")
+        cur.execute("CREATE TABLE cache_others (id int)")
+        cur.execute("INSERT INTO cache_items VALUES (1, 'old')")
+    processor = NLToPostgresProcessor({**connection_params, "application_name": "test_result_cache"},
+                                      {"cache_items": "Items", "cache_others": "Others"}, model=object())
+    yield processor
+    processor.close()
+    with psycopg2.connect(**connection_params) as conn, conn.cursor() as cur:
+        cur.execute("DROP TABLE cache_items, cache_others")
+
+def test_processor_reads_its_own_writes_through_the_cache(processor):
+    from db_processors import OperationType
+    read = "SELECT name FROM cache_items WHERE id = 1"
+    assert processor._execute_query(OperationType.READ, read) == ([{"name": "old"}], None)
+    assert processor._execute_query(OperationType.READ, read) == ([{"name": "old"}], None)
+    assert processor.result_cache.metrics()["hits"] == 1
+
+    processor._execute_query(OperationType.INSERT, "INSERT INTO cache_others VALUES (1)")
+    assert processor._execute_query(OperationType.READ, read) == ([{"name": "old"}], None)
+    assert processor.result_cache.metrics()["hits"] == 2
+
+    processor._execute_query(OperationType.UPDATE, "UPDATE cache_items SET name = 'new' WHERE id = 1")
+    assert processor._execute_query(OperationType.READ, read) == ([{"name": "new"}], None)
+    assert processor.result_cache.metrics()["invalidations"] == 1
@@ -0,0 +1,60 @@
+import pytest
+from connection_pool import PostgresConnectionPool
+from result_stream import ResultStream
+
+SERIES = "SELECT n FROM generate_series(1, 10) AS n ORDER BY n;"
+
+@pytest.fixture
+def pool(connection_params):
+    pool = PostgresConnectionPool(connection_params, max_size=2)
+    yield pool
+    pool.close()
+
+@pytest.mark.parametrize("hold_connection", [True, False])
+def test_batches_cover_every_row(pool, hold_connection):
+    stream = ResultStream(pool, SERIES, batch_size=4, hold_connection=hold_connection)
+    batches = [[row["n"] for row in batch] for batch in stream]
+    assert batches == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+    assert stream.columns == ["n"]
+    assert stream.exhausted and not stream.truncated
+    assert pool.metrics()["in_use"] == 0
+
+@pytest.mark.parametrize("hold_connection", [True, False])
+def test_row_cap_truncates(pool, hold_connection):
+    stream = ResultStream(pool, SERIES, batch_size=4, max_rows=6, hold_connection=hold_connection)
+    assert len(stream.fetch_batch()) == 4
+    assert len(stream.fetch_batch()) == 2
+    assert stream.truncated and stream.exhausted
+    assert stream.fetch_batch() == []
+
+@pytest.mark.parametrize("hold_connection", [True, False])
+def test_row_cap_matching_the_result_does_not_truncate(pool, hold_connection):
+    stream = ResultStream(pool, SERIES, batch_size=10, max_rows=10, hold_connection=hold_connection)
+    assert len(stream.fetch_batch()) == 10
+    assert stream.exhausted and not stream.truncated
+
+@pytest.mark.parametrize("hold_connection", [True, False])
+def test_byte_cap_truncates(pool, hold_connection):
+    stream = ResultStream(pool, "SELECT repeat('x', 1000) AS payload FROM generate_series(1, 10)",
+                          batch_size=10, max_bytes=3500, hold_connection=hold_connection)
+    rows = stream.fetch_batch()
+    assert 0 < len(rows) < 10
+    assert stream.truncated and stream.exhausted
+    assert stream.bytes_fetched <= 3500
+
+def test_held_connection_released_when_idle(pool):
+    stream = ResultStream(pool, SERIES, batch_size=4, idle_timeout=60.0)
+    stream.fetch_batch()
+    assert pool.metrics()["in_use"] == 1
+    assert not stream.expire_if_idle()
+    assert stream.expire_if_idle(now=stream._last_used + 61)
+    assert stream.expired and stream.exhausted
+    assert pool.metrics()["in_use"] == 0
+
+def test_released_stream_holds_no_connection_between_batches(pool):
+    stream = ResultStream(pool, SERIES, batch_size=4, hold_connection=False,
+                          settings={"statement_timeout": "5s"})
+    assert [row["n"] for row in stream.fetch_batch()] == [1, 2, 3, 4]
+    assert pool.metrics()["in_use"] == 0
+    assert not stream.exhausted
+    assert [row["n"] for row in stream.fetch_batch()] == [5, 6, 7, 8]
@@ -0,0 +1,72 @@
+from connection_pool import PostgresConnectionPool
+from routing import ConnectionRouter, routing_session
+
+def make_router(lags: dict, **config) -> ConnectionRouter:
+    """
+    Router over pools that are never connected; `lags` maps replica hosts to the
+    lag reported by the probe, an exception to raise, or None for a primary.
+    """
+    def probe(params):
+        lag = lags[params["host"]]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    config.setdefault("lag_check_interval", 0.0)
+    return ConnectionRouter(
+        PostgresConnectionPool({"host": "primary"}),
+        [({"host": host}, PostgresConnectionPool({"host": host})) for host in lags],
+        lag_probe=probe, **config
+    )
+
+def test_reads_go_to_the_least_lagging_replica():
+    router = make_router({"a": 2.0, "b": 0.1})
+    assert router.route_read().name == "b:5432"
+    assert router.metrics()["replica_reads"] == 1
+
+def test_lagging_replicas_skipped():
+    lags = {"a": 10.0}
+    router = make_router(lags, max_lag=5.0)
+    assert router.route_read() is None
+    assert router.metrics()["skipped_lagging"] == 1
+    lags["a"] = 0.0
+    assert router.route_read() is not None
+
+def test_unreachable_replica_skipped_until_retry():
+    lags = {"a": OSError("unreachable")}
+    router = make_router(lags, retry_interval=60.0)
+    assert router.route_read() is None
+    lags["a"] = 0.0
+    assert router.route_read() is None
+    metrics = router.metrics()
+    assert metrics["lag_check_failures"] == 1
+    assert metrics["skipped_down"] == 2
+    assert not metrics["replicas"][0]["up"]
+
+def test_server_that_is_not_a_standby_gets_no_reads():
+    router = make_router({"a": None})
+    assert router.route_read() is None
+
+def test_writing_session_pinned_to_primary_until_replica_catches_up():
+    lags = {"a": 1.0}
+    router = make_router(lags)
+    with routing_session("writer"):
+        router.record_write()
+        assert router.route_read() is None
+    with routing_session("reader"):
+        assert router.route_read() is not None
+    assert not router.is_current(router.replicas[0])
+
+    lags["a"] = 0.0
+    with routing_session("writer"):
+        assert router.route_read() is not None
+    assert router.is_current(router.replicas[0])
+    assert router.metrics()["pinned_reads"] == 1
+
+def test_lag_estimate_grows_between_checks():
+    router = make_router({"a": 0.0}, lag_check_interval=60.0)
+    assert router.route_read() is not None
+    router.record_write()
+    # The last check predates the write, so the replica may not have it yet.
+    assert router.route_read() is None
+    assert not router.is_current(router.replicas[0])
@@ -0,0 +1,75 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from single_flight import SingleFlight
+
+def wait_for_followers(flight: SingleFlight, count: int) -> None:
+    deadline = time.monotonic() + 5
+    while flight.metrics()["coalesced"] < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as workers:
+        leader = workers.submit(flight.do, "key", work)
+        assert started.wait(5)
+        followers = [workers.submit(flight.do, "key", work) for _ in range(3)]
+        wait_for_followers(flight, 3)
+        release.set()
+        assert leader.result() == ("result", False)
+        assert [f.result() for f in followers] == [("result", True)] * 3
+    assert len(calls) == 1
+    assert flight.metrics() == {"leaders": 1, "coalesced": 3, "abandoned": 0, "in_flight": 0}
+
+def test_sequential_calls_are_not_cached():
+    flight = SingleFlight("test")
+    assert flight.do("key", lambda: 1) == (1, False)
+    assert flight.do("key", lambda: 2) == (2, False)
+
+def test_waiters_receive_the_leader_exception():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as workers:
+        leader = workers.submit(flight.do, "key", fail)
+        assert started.wait(5)
+        follower = workers.submit(flight.do, "key", fail)
+        wait_for_followers(flight, 1)
+        release.set()
+        with pytest.raises(ValueError):
+            leader.result()
+        with pytest.raises(ValueError):
+            follower.result()
+    assert flight.metrics()["in_flight"] == 0
+
+def test_forget_detaches_flights_in_progress():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "old"
+
+    with ThreadPoolExecutor(max_workers=1) as workers:
+        leader = workers.submit(flight.do, "key", slow)
+        assert started.wait(5)
+        flight.forget()
+        assert flight.do("key", lambda: "new") == ("new", False)
+        release.set()
+        assert leader.result() == ("old", False)
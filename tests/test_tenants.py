@@ -0,0 +1,121 @@
+import pytest
+import tenants
+from tenants import TenantRegistry, TenantSpec, TenantBudgetError
+
+class FakePool:
+    def __init__(self):
+        self.in_use = 0
+
+    def metrics(self):
+        return {"in_use": self.in_use}
+
+class FakeCatalog:
+    def __init__(self, size: int):
+        self.size = size
+
+    def metrics(self):
+        return {"bytes": self.size}
+
+class FakeProcessor:
+    """
+    Stands in for NLToPostgresProcessor: no database, a fixed memory footprint.
+    """
+
+    memory = 0
+
+    def __init__(self, connection_params, table_metadata, model=None, replica_params=(), **config):
+        self.connection_params = connection_params
+        self.model = model
+        self.pool = FakePool()
+        self.schema_catalog = FakeCatalog(FakeProcessor.memory)
+        self.result_cache = None
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture(autouse=True)
+def fake_processors(monkeypatch):
+    monkeypatch.setattr(tenants, "NLToPostgresProcessor", FakeProcessor)
+    monkeypatch.setitem(tenants.SCHEMA_CATALOG_CONFIG, "listen_channel", None)
+    FakeProcessor.memory = 0
+
+def make_registry(count: int = 4, replicas: int = 0, **config) -> TenantRegistry:
+    specs = {
+        f"t{i}": TenantSpec({"host": "db", "database": f"tenant_{i}"}, {},
+                            [{"host": f"replica{r}", "database": f"tenant_{i}"} for r in range(replicas)])
+        for i in range(count)
+    }
+    config.setdefault("idle_timeout", None)
+    return TenantRegistry(specs, pool_config={"max_size": 5}, **config)
+
+def lease(registry: TenantRegistry, tenant_id: str) -> FakeProcessor:
+    with registry.lease(tenant_id) as processor:
+        return processor
+
+def test_connections_count_every_pool():
+    registry = make_registry(replicas=2, max_connections=100)
+    lease(registry, "t0")
+    assert registry.metrics()["connections"] == 15
+
+def test_least_recently_used_tenant_evicted_beyond_max_tenants():
+    registry = make_registry(max_tenants=2)
+    first = lease(registry, "t0")
+    lease(registry, "t1")
+    lease(registry, "t0")
+    lease(registry, "t2")
+    metrics = registry.metrics()
+    assert sorted(metrics["tenants"]) == ["t0", "t2"]
+    assert metrics["evictions_budget"] == 1
+    assert not first.closed
+
+def test_connection_budget_evicts_enough_tenants():
+    registry = make_registry(replicas=1, max_tenants=10, max_connections=25)
+    lease(registry, "t0")
+    lease(registry, "t1")
+    assert registry.metrics()["connections"] == 20
+    lease(registry, "t2")
+    metrics = registry.metrics()
+    assert sorted(metrics["tenants"]) == ["t1", "t2"]
+    assert metrics["connections"] == 20
+
+def test_leased_and_busy_tenants_are_not_evicted():
+    registry = make_registry(max_tenants=2)
+    with registry.lease("t0"):
+        busy = lease(registry, "t1")
+        busy.pool.in_use = 1
+        with pytest.raises(TenantBudgetError):
+            lease(registry, "t2")
+        busy.pool.in_use = 0
+        lease(registry, "t2")
+    assert sorted(registry.metrics()["tenants"]) == ["t0", "t2"]
+    assert busy.closed
+
+def test_tenant_larger_than_connection_budget_is_refused():
+    registry = make_registry(replicas=3, max_connections=10)
+    with pytest.raises(TenantBudgetError):
+        lease(registry, "t0")
+    assert registry.metrics()["connections"] == 0
+
+def test_memory_budget_evicts_least_recently_used():
+    FakeProcessor.memory = 300
+    registry = make_registry(max_memory_bytes=1000)
+    for tenant_id in ("t0", "t1", "t2"):
+        lease(registry, tenant_id)
+    assert registry.evict_idle() == []
+    lease(registry, "t0")
+    lease(registry, "t3")
+    assert registry.evict_idle() == ["t1"]
+    assert registry.metrics()["memory_bytes"] == 900
+
+def test_idle_tenants_evicted():
+    registry = make_registry(idle_timeout=0.0)
+    processor = lease(registry, "t0")
+    assert registry.evict_idle() == ["t0"]
+    assert processor.closed
+    assert registry.metrics()["evictions_idle"] == 1
+
+def test_tenants_sharing_a_database_rejected():
+    spec = TenantSpec({"host": "db", "database": "shared"}, {})
+    with pytest.raises(ValueError):
+        TenantRegistry({"a": spec, "b": spec})